@@ -0,0 +1,162 @@
+# backend/shrine_project/cache_tiers.py
+"""
+共有キャッシュ層の構成（settings.CACHES）と名前空間ごとのキャッシュ取得。
+
+CACHE_BACKEND:
+  - locmem（既定）: プロセス内。ローカル開発・テスト用（gunicorn のワーカー間では共有されない）
+  - redis: REDIS_URL（django-redis）。全ワーカー・再起動後も共有される本番用
+  - file: CACHE_FILE_DIR 配下の FileBasedCache。同一ホストの複数プロセスで共有（オフライン・テスト用）
+CACHE_BACKEND 未指定で REDIS_URL があれば redis を使う（pytest 中は除く）。
+
+名前空間（places / route / llm / throttle / lock）はそれぞれ別 alias として CACHES に載せ、
+TTL と退避方針を NAMESPACE_POLICIES で持つ。環境変数で上書きできる:
+  CACHE_TTL_<NS> / CACHE_MAX_ENTRIES_<NS> / CACHE_REDIS_URL_<NS>
+
+退避について:
+  - locmem / file は MAX_ENTRIES 超過時に 1/CULL_FREQUENCY を間引く（alias ごと）
+  - redis はサーバ側 maxmemory-policy に従う。throttle / lock を退避させたくない場合は
+    CACHE_REDIS_URL_THROTTLE / CACHE_REDIS_URL_LOCK で noeviction のインスタンス（DB）に分ける
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Mapping, Optional
+
+NAMESPACES = ("places", "route", "llm", "throttle", "lock")
+
+NAMESPACE_POLICIES: Dict[str, Dict[str, Any]] = {
+    # 上流から取り直せるので積極的に間引いてよい
+    "places": {"timeout": 60 * 60 * 24, "max_entries": 5000, "cull_frequency": 4, "ignore_errors": True},
+    "route": {"timeout": 60 * 60 * 24 * 30, "max_entries": 5000, "cull_frequency": 4, "ignore_errors": True},
+    # LLM 応答（temples.llm.response_cache）。取り直しは高いが正しさには影響しない
+    "llm": {"timeout": 60 * 60 * 24 * 7, "max_entries": 5000, "cull_frequency": 4, "ignore_errors": True},
+    # 消えると制限が緩む / 多重起動するので、間引きは最小限・障害は握りつぶさない
+    "throttle": {"timeout": 60 * 60, "max_entries": 50000, "cull_frequency": 100, "ignore_errors": False},
+    "lock": {"timeout": 60 * 10, "max_entries": 10000, "cull_frequency": 100, "ignore_errors": False},
+}
+
+DEFAULT_LOCMEM_LOCATION = "throttle-cache"
+
+
+def _env_int(env: Mapping[str, str], name: str, default: int) -> int:
+    try:
+        return int(env.get(name) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def resolve_backend(env: Mapping[str, str], *, is_pytest: bool = False) -> str:
+    backend = (env.get("CACHE_BACKEND") or "").strip().lower()
+    if backend in ("locmem", "redis", "file"):
+        return backend
+    if env.get("REDIS_URL") and not is_pytest:
+        return "redis"
+    return "locmem"
+
+
+def _alias_config(
+    backend: str,
+    ns: str,
+    *,
+    env: Mapping[str, str],
+    timeout: Optional[int],
+    max_entries: int,
+    cull_frequency: int,
+    ignore_errors: bool,
+    key_prefix: str,
+    file_dir: str,
+) -> Dict[str, Any]:
+    if backend == "redis":
+        url = env.get(f"CACHE_REDIS_URL_{ns.upper()}") or env.get("REDIS_URL") or "redis://localhost:6379/0"
+        return {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": url,
+            "TIMEOUT": timeout,
+            "KEY_PREFIX": key_prefix,
+            "OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                "IGNORE_EXCEPTIONS": ignore_errors,
+            },
+        }
+
+    if backend == "file":
+        return {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.path.join(file_dir, ns),
+            "TIMEOUT": timeout,
+            "KEY_PREFIX": key_prefix,
+            "OPTIONS": {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": cull_frequency},
+        }
+
+    return {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": DEFAULT_LOCMEM_LOCATION if ns == "default" else f"{ns}-cache",
+        "TIMEOUT": timeout,
+        "KEY_PREFIX": key_prefix,
+        "OPTIONS": {"MAX_ENTRIES": max_entries, "CULL_FREQUENCY": cull_frequency},
+    }
+
+
+def build_caches(
+    env: Optional[Mapping[str, str]] = None,
+    *,
+    file_dir: str,
+    is_pytest: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """settings.CACHES を組み立てる（default + 名前空間 alias）。"""
+    env = os.environ if env is None else env
+    backend = resolve_backend(env, is_pytest=is_pytest)
+    key_prefix = env.get("CACHE_KEY_PREFIX", "")
+
+    caches: Dict[str, Dict[str, Any]] = {
+        # default は DRF スロットル・cache_page などが使う。TTL は Django 既定（300 秒）
+        "default": _alias_config(
+            backend,
+            "default",
+            env=env,
+            timeout=300,
+            max_entries=_env_int(env, "CACHE_MAX_ENTRIES_DEFAULT", 10000),
+            cull_frequency=3,
+            ignore_errors=False,
+            key_prefix=key_prefix,
+            file_dir=file_dir,
+        )
+    }
+
+    for ns in NAMESPACES:
+        policy = NAMESPACE_POLICIES[ns]
+        caches[ns] = _alias_config(
+            backend,
+            ns,
+            env=env,
+            timeout=_env_int(env, f"CACHE_TTL_{ns.upper()}", policy["timeout"]),
+            max_entries=_env_int(env, f"CACHE_MAX_ENTRIES_{ns.upper()}", policy["max_entries"]),
+            cull_frequency=policy["cull_frequency"],
+            ignore_errors=policy["ignore_errors"],
+            key_prefix=key_prefix,
+            file_dir=file_dir,
+        )
+
+    return caches
+
+
+def namespace_cache(namespace: str):
+    """
+    名前空間の cache を返す（django.core.cache.cache と同じく遅延プロキシ）。
+    CACHES に alias が無ければ default にフォールバックする。
+    """
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.utils.connection import ConnectionProxy
+
+    alias = namespace if namespace in getattr(settings, "CACHES", {}) else "default"
+    return ConnectionProxy(caches, alias)
+
+
+__all__ = [
+    "NAMESPACES",
+    "NAMESPACE_POLICIES",
+    "build_caches",
+    "namespace_cache",
+    "resolve_backend",
+]
@@ -1,4 +1,5 @@
 # backend/shrine_project/settings.py
+import json
 import os
 import sys
 from pathlib import Path
@@ -58,7 +59,13 @@ env = environ.Env(
     LLM_BASE_URL=(str, ""),
     LLM_RETRIES=(int, 2),
     LLM_BACKOFF_S=(float, 0.5),
-    LLM_CACHE_TTL_S=(int, 600),
+    LLM_DEADLINE_S=(float, 12.0),
+    LLM_HEDGE=(bool, False),
+    LLM_HEDGE_MIN_S=(float, 0.5),
+    CONCIERGE_LLM_BUDGET_S=(float, 8.0),
+    LLM_CACHE_TTL_S=(int, 7 * 24 * 3600),
+    LLM_CACHE_NEGATIVE_TTL_S=(int, 600),
+    LLM_RESPONSE_CACHE=(bool, True),
     LLM_COORD_ROUND=(int, 3),
     LLM_ENABLE_PLACES=(bool, True),
     LLM_PROMPT_VERSION=(str, "v1"),
@@ -110,7 +117,16 @@ LLM_FORCE_JSON = env.bool("LLM_FORCE_JSON")
 LLM_BASE_URL = env.str("LLM_BASE_URL")
 LLM_RETRIES = env.int("LLM_RETRIES")
 LLM_BACKOFF_S = env.float("LLM_BACKOFF_S")
+# LLM 呼び出し 1 回（再試行込み）の締め切りと、/concierge/chat の推薦全体の締め切り（temples.llm.executor）
+LLM_DEADLINE_S = env.float("LLM_DEADLINE_S")
+CONCIERGE_LLM_BUDGET_S = env.float("CONCIERGE_LLM_BUDGET_S")
+# p95 を過ぎても返らない LLM 呼び出しに 2 本目を並走させる（トークンが増えるので既定は無効）
+LLM_HEDGE = env.bool("LLM_HEDGE")
+LLM_HEDGE_MIN_S = env.float("LLM_HEDGE_MIN_S")
+# LLM 応答キャッシュ（temples.llm.response_cache）。使えない応答は NEGATIVE の短い TTL
+LLM_RESPONSE_CACHE = env.bool("LLM_RESPONSE_CACHE")
 LLM_CACHE_TTL_S = env.int("LLM_CACHE_TTL_S")
+LLM_CACHE_NEGATIVE_TTL_S = env.int("LLM_CACHE_NEGATIVE_TTL_S")
 LLM_COORD_ROUND = env.int("LLM_COORD_ROUND")
 LLM_ENABLE_PLACES = env.bool("LLM_ENABLE_PLACES")
 LLM_PROMPT_VERSION = env.str("LLM_PROMPT_VERSION")
@@ -249,6 +265,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "temples.services.rate_limit.RateLimitHeadersMiddleware",
 ]
 
 APPEND_SLASH = False
@@ -282,9 +299,9 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_THROTTLE_CLASSES": (
-        "rest_framework.throttling.ScopedRateThrottle",
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "temples.api.throttles.ScopedCounterThrottle",
+        "temples.api.throttles.AnonCounterThrottle",
+        "temples.api.throttles.UserCounterThrottle",
     ),
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/min",
@@ -343,18 +360,40 @@ SPECTACULAR_SETTINGS = {
     ],
 }
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "throttle-cache",
-    }
-}
+# キャッシュ: CACHE_BACKEND=locmem|redis|file（REDIS_URL があれば redis）
+# places / route / llm / throttle / lock は名前空間ごとに TTL・退避方針を持つ（shrine_project/cache_tiers.py）
+from shrine_project.cache_tiers import build_caches  # noqa: E402
+
+CACHES = build_caches(
+    file_dir=os.getenv("CACHE_FILE_DIR") or str(BASE_DIR / ".cache"),
+    is_pytest=IS_PYTEST,
+)
+
+# 匿名の利用回数を共有キャッシュ（throttle alias）で数え、一定間隔で FeatureUsage に書き戻す
+QUOTA_ANON_CACHE_COUNTER = env_bool("QUOTA_ANON_CACHE_COUNTER", default=False)
+QUOTA_CACHE_FLUSH_SECONDS = float(os.getenv("QUOTA_CACHE_FLUSH_SECONDS", "30"))
+
+# 推薦ログ・クリックログは応答後に worker スレッドがまとめて書く（temples.services.write_behind）。
+# pytest では既定でその場で書く。WRITE_BEHIND_OUTBOX=1 で受け付け時に outbox テーブルへ残し、落ちても再送する
+WRITE_BEHIND_ENABLED = env_bool("WRITE_BEHIND_ENABLED", default=not IS_PYTEST)
+WRITE_BEHIND_OUTBOX = env_bool("WRITE_BEHIND_OUTBOX", default=False)
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "2"))
+WRITE_BEHIND_QUEUE_MAX = int(os.getenv("WRITE_BEHIND_QUEUE_MAX", "10000"))
+WRITE_BEHIND_OUTBOX_REPLAY_SECONDS = float(os.getenv("WRITE_BEHIND_OUTBOX_REPLAY_SECONDS", "300"))
+
+# area → 座標のオフライン索引（manage.py build_gazetteer で生成。無ければ同梱 JSON から組み立てる）
+GAZETTEER_INDEX_PATH = os.getenv("GAZETTEER_INDEX_PATH") or str(BASE_DIR / ".cache" / "gazetteer_jp.idx")
 
 # --- Google / Optional ---
 AUTO_GEOCODE_ON_SAVE = os.getenv("AUTO_GEOCODE_ON_SAVE", "0").lower() in ("1", "true", "yes")
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY", "") or GOOGLE_MAPS_API_KEY
 
+# 上流 API の呼び出し方針（temples.upstream.policy の既定値を provider・項目単位で上書き）。
+# 例: UPSTREAM_POLICIES_JSON='{"google_places": {"retries": 0, "max_connections": 32}}'
+UPSTREAM_POLICIES = json.loads(os.getenv("UPSTREAM_POLICIES_JSON") or "{}")
+
 # Stripe
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
@@ -435,6 +474,20 @@ else:
     MEDIA_URL = "/media/"
     MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", str(BASE_DIR / "media")))
 
+# Places 写真の永続置き場（内容ハッシュで 1 回だけ書く）。
+# 空なら default_storage（R2 など）の place-assets/ 配下に置く
+PLACE_ASSET_ROOT = os.getenv("PLACE_ASSET_ROOT") or (str(MEDIA_ROOT / "place-assets") if MEDIA_ROOT else "")
+# 取り込み時に作る縮小版の幅
+PLACE_PHOTO_VARIANT_WIDTHS = [
+    int(w) for w in os.getenv("PLACE_PHOTO_VARIANT_WIDTHS", "320,640").split(",") if w.strip().isdigit()
+]
+# 写真は内容が変わらないのでブラウザ / CDN に長く持たせる（ETag で再検証）
+PLACE_PHOTO_MAX_AGE = int(os.getenv("PLACE_PHOTO_MAX_AGE", str(30 * 24 * 3600)))
+# Place Details は PlaceRef.snapshot_json をこの秒数まで上流を呼ばずに返す
+PLACES_DETAIL_FRESH_SECONDS = int(os.getenv("PLACES_DETAIL_FRESH_SECONDS", str(7 * 24 * 3600)))
+# 上流が失敗したときに古い snapshot で代用してよい秒数
+PLACES_DETAIL_STALE_SECONDS = int(os.getenv("PLACES_DETAIL_STALE_SECONDS", str(90 * 24 * 3600)))
+
 
 # --- Logging ---
 LOGGING = {
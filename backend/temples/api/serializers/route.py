@@ -16,16 +16,48 @@ class GeometryListField(serializers.ListField):
         max_length=2,
     )
 
+def _validate_hhmm(value: str) -> str:
+    from temples.services.route_optimizer import parse_hhmm
+
+    if value and parse_hhmm(value) is None:
+        raise serializers.ValidationError("HH:MM 形式で指定してください。")
+    return value
+
+
+class DestinationSerializer(PointSerializer):
+    # optimize=true のときだけ使う時間窓（開門・閉門 "HH:MM"）
+    open = serializers.CharField(required=False, allow_blank=True, validators=[_validate_hhmm])
+    close = serializers.CharField(required=False, allow_blank=True, validators=[_validate_hhmm])
+
+
 class RouteRequestSerializer(serializers.Serializer):
+    MAX_DESTINATIONS = 5
+    MAX_OPTIMIZED_DESTINATIONS = 15
+
     mode = serializers.ChoiceField(choices=["walking", "driving"], default="walking")
     origin = PointSerializer()
-    destinations = PointSerializer(many=True, allow_empty=False)
+    destinations = DestinationSerializer(many=True, allow_empty=False)
+
+    # 訪問順の最適化（origin 固定。fixed_end なら最後の destination も固定）
+    optimize = serializers.BooleanField(required=False, default=False)
+    fixed_end = serializers.BooleanField(required=False, default=False)
+    start_time = serializers.CharField(required=False, allow_blank=True, validators=[_validate_hhmm])
+    stay_minutes = serializers.IntegerField(required=False, default=0, min_value=0, max_value=240)
 
     def validate_destinations(self, value: List[dict]) -> List[dict]:
-        if len(value) > 5:
-            raise serializers.ValidationError("destinations は最大 5 件までにしてください。")
+        if len(value) > self.MAX_OPTIMIZED_DESTINATIONS:
+            raise serializers.ValidationError(
+                f"destinations は最大 {self.MAX_OPTIMIZED_DESTINATIONS} 件までにしてください。"
+            )
         return value
 
+    def validate(self, attrs):
+        if not attrs.get("optimize") and len(attrs["destinations"]) > self.MAX_DESTINATIONS:
+            raise serializers.ValidationError(
+                {"destinations": [f"destinations は最大 {self.MAX_DESTINATIONS} 件までにしてください。"]}
+            )
+        return attrs
+
 class RouteLegSerializer(serializers.Serializer):
     from_ = PointSerializer(source="from")
     to = PointSerializer()
@@ -40,6 +72,9 @@ class RouteResponseSerializer(serializers.Serializer):
     duration_s_total = serializers.IntegerField(min_value=0)
     provider = serializers.CharField()
     cached = serializers.BooleanField()
+    # optimize=true のときだけ: 訪問順（リクエストの destinations の添字）と最適化の要約
+    order = serializers.ListField(child=serializers.IntegerField(min_value=0), required=False)
+    optimization = serializers.DictField(required=False)
 
 class SimpleRouteResponseSerializer(serializers.Serializer):
     distance_m = serializers.FloatField(min_value=0)
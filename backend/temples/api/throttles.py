@@ -1,11 +1,54 @@
-# 変更前
-# from rest_framework.throttling import ScopedRateThrottle
-# class PlacesNearbyThrottle(ScopedRateThrottle):
+"""
+DRF スロットル。SimpleRateThrottle の「タイムスタンプのリストを丸ごと書き戻す」方式をやめ、
+temples.services.rate_limit のスライディング窓カウンタ（キーあたり整数 2 個）で数える。
+判定はリクエストに載せ、X-RateLimit-* ヘッダとして返す。
+"""
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+from temples.services.rate_limit import SlidingWindowLimiter, record_decision
 
-from rest_framework.throttling import SimpleRateThrottle
 
+class CounterRateThrottle(SimpleRateThrottle):
+    """allow_request / wait だけ差し替える。キー（get_cache_key）は各サブクラスのまま。"""
 
-class PlacesNearbyThrottle(SimpleRateThrottle):
+    decision = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        limiter = SlidingWindowLimiter(self.scope or "drf", self.num_requests, self.duration)
+        self.decision = limiter.hit(key)
+        record_decision(request, self.decision)
+        return self.decision.allowed
+
+    def wait(self):
+        if self.decision is None:
+            return None
+        return self.decision.retry_after
+
+
+# MRO: Scoped / Anon / User → CounterRateThrottle → SimpleRateThrottle
+class ScopedCounterThrottle(ScopedRateThrottle, CounterRateThrottle):
+    pass
+
+
+class AnonCounterThrottle(AnonRateThrottle, CounterRateThrottle):
+    pass
+
+
+class UserCounterThrottle(UserRateThrottle, CounterRateThrottle):
+    pass
+
+
+class PlacesNearbyThrottle(CounterRateThrottle):
     scope = "places-nearby"
 
     def get_cache_key(self, request, view):
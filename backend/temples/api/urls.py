@@ -15,6 +15,7 @@ from temples.api.views.concierge import (
 from temples.api.views.geocode import geocode_reverse_legacy, geocode_search_legacy
 from temples.api.views.goshuin import MyGoshuinViewSet, PublicGoshuinViewSet
 from temples.api.views.goshuin_feed import PublicGoshuinFeedView
+from temples.api.views.metrics import ProfilerMetricsView
 from temples.api.views.place_cache import place_cache_list
 from temples.api.views.places_resolve import PlacesResolveView
 from temples.api.views.public_profile import public_profile
@@ -156,6 +157,9 @@ urlpatterns = [
     path("geocode/search/", geocode_search_legacy, name="geocode-search-legacy"),
     path("geocode/reverse/", geocode_reverse_legacy, name="geocode-reverse-legacy"),
 
+    # ---- Metrics (admin) --------------------------------------------------
+    path("metrics/profiler/", ProfilerMetricsView.as_view(), name="metrics-profiler"),
+
     # ---- Router -----------------------------------------------------------
     path("", include(router.urls)),
 ]
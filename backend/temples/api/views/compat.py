@@ -7,8 +7,8 @@ from drf_spectacular.utils import OpenApiExample
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response as DRFResponse
-from rest_framework.throttling import ScopedRateThrottle
 
+from temples.api.throttles import ScopedCounterThrottle
 from temples import api_views_concierge as concierge
 
 
@@ -91,5 +91,5 @@ def concierge_chat_compat(request):
 
 
 # ✅ ここが正しい「関数属性」の付け方（先頭ドットは殺す）
-concierge_chat_compat.throttle_classes = [ScopedRateThrottle]
+concierge_chat_compat.throttle_classes = [ScopedCounterThrottle]
 concierge_chat_compat.throttle_scope = "concierge"
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import base64
+import json
 import logging
-import time
+from datetime import datetime
 
-from django.db import connection, reset_queries
+from django.db.models import Prefetch, Q
 from django.shortcuts import get_object_or_404
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from rest_framework import serializers, status
@@ -13,9 +15,14 @@ from rest_framework.views import APIView
 
 from temples.models import ConciergeMessage, ConciergeThread
 from temples.services.anonymous_id import get_anonymous_id
+from temples.services.concierge_snapshot import read_snapshot
+from temples.services.request_profiler import profile_request
 
 logger = logging.getLogger(__name__)
 
+THREAD_LIST_DEFAULT_LIMIT = 50
+THREAD_LIST_MAX_LIMIT = 100
+
 
 class ConciergeThreadListItemSerializer(serializers.Serializer):
     id = serializers.IntegerField()
@@ -27,6 +34,7 @@ class ConciergeThreadListItemSerializer(serializers.Serializer):
 
 class ConciergeThreadListResponseSerializer(serializers.Serializer):
     results = ConciergeThreadListItemSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True, required=False)
 
 
 class ConciergeMessageSerializer(serializers.Serializer):
@@ -43,6 +51,7 @@ class ConciergeThreadDetailResponseSerializer(serializers.Serializer):
     last_message_at = serializers.CharField(allow_null=True, required=False)
     message_count = serializers.IntegerField()
     messages = ConciergeMessageSerializer(many=True)
+    snapshot_version = serializers.IntegerField()
     recommendations = serializers.JSONField(required=False, allow_null=True)
     recommendations_v2 = serializers.JSONField(required=False, allow_null=True)
 
@@ -55,26 +64,47 @@ class ConciergeThreadDetailResponseSerializer(serializers.Serializer):
     )
 )
 class ConciergeThreadListView(APIView):
+    """
+    GET /api/concierge-threads/?limit=&cursor=
+    (last_message_at DESC, id DESC) の keyset ページング。1 ページ 1 クエリ。
+    """
+
     permission_classes = [IsAuthenticated]
     throttle_scope = "concierge"
 
     def get(self, request, *args, **kwargs):
-        user = request.user
-        qs = ConciergeThread.objects.filter(user=user).order_by("-last_message_at", "-id")
-
-        items = []
-        for t in qs[:50]:
-            items.append(
-                {
-                    "id": t.id,
-                    "title": t.title,
-                    "last_message": _thread_last_message(t),
-                    "last_message_at": t.last_message_at.isoformat() if t.last_message_at else None,
-                    "message_count": _thread_message_count(t),
-                }
-            )
+        limit = _parse_limit(request.query_params.get("limit"))
+        try:
+            after = _decode_cursor(request.query_params.get("cursor"))
+        except ValueError:
+            return Response({"detail": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = ConciergeThread.objects.filter(user=request.user)
+        if after is not None:
+            qs = qs.filter(_after_cursor_q(*after))
+
+        rows = list(
+            # 索引 (user, last_message_at DESC, id DESC) と同じ並び。NULLS LAST を付けると索引が使えない
+            qs.order_by("-last_message_at", "-id").values(
+                "id", "title", "last_message_preview", "last_message_at", "message_count"
+            )[: limit + 1]
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = [
+            {
+                "id": r["id"],
+                "title": r["title"],
+                "last_message": r["last_message_preview"] or None,
+                "last_message_at": r["last_message_at"].isoformat() if r["last_message_at"] else None,
+                "message_count": r["message_count"],
+            }
+            for r in rows
+        ]
+        next_cursor = _encode_cursor(rows[-1]["last_message_at"], rows[-1]["id"]) if has_more else None
 
-        return Response({"results": items}, status=status.HTTP_200_OK)
+        return Response({"results": items, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(
@@ -85,132 +115,58 @@ class ConciergeThreadListView(APIView):
     )
 )
 class ConciergeThreadDetailView(APIView):
+    """
+    GET /api/concierge-threads/<pk>/[?detail=1]
+    スレッド 1 本 + メッセージ（prefetch）の 2 クエリ。おすすめは既定で compact 形を返し、
+    detail=1 のときだけ全量（breakdown_detail / reason_facts など）を読む。
+    """
+
     permission_classes = [AllowAny]
     throttle_scope = "concierge"
 
     def get(self, request, pk: int, *args, **kwargs):
-        reset_queries()
-        started = time.perf_counter()
+        with profile_request("concierge.thread_detail") as prof:
+            response = self._get(request, pk, prof=prof)
+            prof.status = response.status_code
+            return response
 
+    def _get(self, request, pk: int, *, prof):
+        detail = _parse_bool(request.query_params.get("detail"))
         try:
             qs = ConciergeThread.objects.filter(pk=pk)
 
-            logger.warning(
-                "THREAD_DETAIL_LOOKUP %s",
-                {
-                    "thread_id": pk,
-                    "user_id": getattr(getattr(request, "user", None), "id", None),
-                    "is_authenticated": bool(
-                        getattr(getattr(request, "user", None), "is_authenticated", False)
-                    ),
-                    "anon_id_cookie": request.COOKIES.get("concierge_anon_id"),
-                    "cookies": dict(getattr(request, "COOKIES", {}) or {}),
-                },
-            )
-
             user = getattr(request, "user", None)
             if user is not None and getattr(user, "is_authenticated", False):
                 qs = qs.filter(user=user)
             else:
                 raw_req = getattr(request, "_request", None)
-                anon_from_request = get_anonymous_id(request)
-                anon_from_raw_request = get_anonymous_id(raw_req) if raw_req else None
-                anonymous_id = anon_from_request or anon_from_raw_request
-
-                logger.warning(
-                    "THREAD_DETAIL_ANON_RESOLVE %s",
-                    {
-                        "pk": pk,
-                        "anon_from_request": anon_from_request,
-                        "anon_from_raw_request": anon_from_raw_request,
-                        "anonymous_id_final": anonymous_id,
-                    },
-                )
-
-                thread_row = ConciergeThread.objects.filter(pk=pk).values(
-                    "id", "user_id", "anonymous_id"
-                ).first()
-
-                logger.warning(
-                    "THREAD_DETAIL_DB_ROW %s",
-                    {
-                        "pk": pk,
-                        "thread_row": thread_row,
-                    },
-                )
-
-                logger.warning(
-                    "THREAD_DETAIL_DEBUG %s",
-                    {
-                        "pk": pk,
-                        "is_authenticated": bool(getattr(user, "is_authenticated", False)),
-                        "cookies": dict(getattr(request, "COOKIES", {}) or {}),
-                        "_request_cookies": (
-                            dict(getattr(raw_req, "COOKIES", {}) or {}) if raw_req else None
-                        ),
-                        "anonymous_id": anonymous_id,
-                    },
-                )
-
-                logger.warning(
-                    "THREAD_DETAIL_QUERYSET %s",
-                    {
-                        "pk": pk,
-                        "is_authenticated": bool(getattr(user, "is_authenticated", False)),
-                        "queryset_filter": (
-                            {"user_id": getattr(user, "id", None)}
-                            if user is not None and getattr(user, "is_authenticated", False)
-                            else {"user__isnull": True, "anonymous_id": anonymous_id}
-                        ),
-                    },
-                )
-
+                anonymous_id = get_anonymous_id(request) or (get_anonymous_id(raw_req) if raw_req else None)
                 if not anonymous_id:
+                    logger.info("[concierge/thread_detail] pk=%s no anonymous id", pk)
                     return Response({"detail": "not found"}, status=status.HTTP_404_NOT_FOUND)
-
                 qs = qs.filter(user__isnull=True, anonymous_id=anonymous_id)
 
-            thread = get_object_or_404(qs)
-            msgs = ConciergeMessage.objects.filter(thread=thread).order_by("created_at", "id")
-
-            recommendations = getattr(thread, "recommendations", None)
-            recommendations_v2 = getattr(thread, "recommendations_v2", None)
-
-            logger.warning(
-                "THREAD_DETAIL_RECOMMENDATION_KEYS %s",
-                {
-                    "pk": pk,
-                    "recommendations": [
-                        {
-                            "shrine_id": r.get("shrine_id"),
-                            "id": r.get("id"),
-                            "keys": sorted(list(r.keys())),
-                            "has_rank_explanation": "rank_explanation" in r,
-                            "has_rank_comparison": "rank_comparison" in r,
-                        }
-                        for r in (recommendations or [])[:3]
-                        if isinstance(r, dict)
-                    ],
-                    "recommendations_v2": [
-                        {
-                            "shrine_id": r.get("shrine_id"),
-                            "id": r.get("id"),
-                            "keys": sorted(list(r.keys())),
-                            "has_rank_explanation": "rank_explanation" in r,
-                            "has_rank_comparison": "rank_comparison" in r,
-                        }
-                        for r in (recommendations_v2 or [])[:3]
-                        if isinstance(r, dict)
-                    ],
-                },
+            if not detail:
+                qs = qs.defer("recommendations_detail")
+            qs = qs.prefetch_related(
+                Prefetch(
+                    "messages",
+                    queryset=ConciergeMessage.objects.order_by("created_at", "id").only(
+                        "id", "thread_id", "role", "content", "created_at"
+                    ),
+                )
             )
 
+            thread = get_object_or_404(qs)
+            msgs = list(thread.messages.all())
+            snapshot = read_snapshot(thread, detail=detail)
+
             payload = {
                 "id": thread.id,
                 "title": thread.title,
-                "last_message": _thread_last_message(thread),
+                "last_message": msgs[-1].content if msgs else None,
                 "last_message_at": thread.last_message_at.isoformat() if thread.last_message_at else None,
-                "message_count": msgs.count(),
+                "message_count": len(msgs),
                 "messages": [
                     {
                         "id": m.id,
@@ -220,46 +176,67 @@ class ConciergeThreadDetailView(APIView):
                     }
                     for m in msgs
                 ],
-                "recommendations": recommendations,
-                "recommendations_v2": recommendations_v2,
+                "snapshot_version": snapshot["snapshot_version"],
+                "recommendations": snapshot["recommendations"],
+                "recommendations_v2": snapshot["recommendations_v2"],
             }
             return Response(payload, status=status.HTTP_200_OK)
 
         finally:
-            total_ms = round((time.perf_counter() - started) * 1000, 1)
-            sql_total_ms = round(sum(float(q["time"]) * 1000 for q in connection.queries), 1)
-
             logger.info(
-                "[perf] thread_detail total_ms=%s sql_count=%s sql_total_ms=%s pk=%s",
-                total_ms,
-                len(connection.queries),
-                sql_total_ms,
+                "[perf] thread_detail total_ms=%s sql_count=%s sql_total_ms=%s pk=%s detail=%s",
+                round(prof.elapsed_ms(), 1),
+                prof.sql_count,
+                round(prof.sql_ms, 1),
                 pk,
+                int(detail),
             )
 
-            slow_queries = sorted(
-                connection.queries,
-                key=lambda q: float(q["time"]),
-                reverse=True,
-            )[:5]
-
-            for i, q in enumerate(slow_queries, start=1):
-                logger.info(
+            for i, (ms, sql) in enumerate(prof.slow_queries(), start=1):
+                logger.debug(
                     "[perf] slow_sql rank=%s time_ms=%s sql=%s",
                     i,
-                    round(float(q["time"]) * 1000, 1),
-                    q["sql"][:1000],
+                    round(ms, 1),
+                    sql[:1000],
                 )
 
 
-def _thread_last_message(thread: ConciergeThread) -> str | None:
-    return (
-        ConciergeMessage.objects.filter(thread=thread)
-        .order_by("-created_at", "-id")
-        .values_list("content", flat=True)
-        .first()
-    )
+def _parse_bool(raw) -> bool:
+    return str(raw or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _parse_limit(raw) -> int:
+    try:
+        n = int(raw) if raw not in (None, "") else THREAD_LIST_DEFAULT_LIMIT
+    except (TypeError, ValueError):
+        n = THREAD_LIST_DEFAULT_LIMIT
+    return max(1, min(n, THREAD_LIST_MAX_LIMIT))
+
+
+def _encode_cursor(last_message_at: datetime | None, thread_id: int) -> str:
+    raw = json.dumps({"t": last_message_at.isoformat() if last_message_at else None, "id": int(thread_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str | None) -> tuple[datetime | None, int] | None:
+    """不正な cursor は ValueError。"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        ts = datetime.fromisoformat(data["t"]) if data.get("t") else None
+        return ts, int(data["id"])
+    except (KeyError, TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(str(e)) from e
 
 
-def _thread_message_count(thread: ConciergeThread) -> int:
-    return ConciergeMessage.objects.filter(thread=thread).count()
+def _after_cursor_q(last_message_at: datetime | None, thread_id: int) -> Q:
+    """
+    (last_message_at DESC, id DESC) で cursor より後ろの行。
+    last_message_at は append_chat / backfill_concierge_thread_stats が必ず埋めるので NULL は例外扱い
+    （PostgreSQL の DESC に合わせて NULL を先頭とみなす）。
+    """
+    if last_message_at is None:
+        return Q(last_message_at__isnull=True, id__lt=thread_id) | Q(last_message_at__isnull=False)
+    return Q(last_message_at__lt=last_message_at) | Q(last_message_at=last_message_at, id__lt=thread_id)
@@ -3,13 +3,13 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 from temples.api.serializers.geocode import (
     ReverseQuerySerializer,
     ReverseResponseSerializer,
     SearchQuerySerializer,
     SearchResponseSerializer,
 )
+from temples.api.throttles import ScopedCounterThrottle
 from temples.services.geocode import geocode_reverse as svc_geocode_reverse
 from temples.services.geocode import geocode_search as svc_geocode_search
 
@@ -24,7 +24,7 @@ from temples.services.geocode import geocode_search as svc_geocode_search
 )
 @api_view(["GET"])
 @permission_classes([AllowAny])
-@throttle_classes([ScopedRateThrottle])
+@throttle_classes([ScopedCounterThrottle])
 def geocode_search(request, *_, **__):
     # throttle scope
     request.throttle_scope = "geocode"
@@ -62,7 +62,7 @@ search = geocode_search
 )
 @api_view(["GET"])
 @permission_classes([AllowAny])
-@throttle_classes([ScopedRateThrottle])
+@throttle_classes([ScopedCounterThrottle])
 def geocode_reverse(request, *_, **__):
     request.throttle_scope = "geocode"
     s = ReverseQuerySerializer(data=request.GET)
@@ -0,0 +1,38 @@
+# backend/temples/api/views/metrics.py
+from __future__ import annotations
+
+from drf_spectacular.utils import OpenApiTypes, extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from temples.services.request_profiler import metrics_snapshot, reset_metrics
+
+
+class ProfilerMetricsView(APIView):
+    """
+    リクエストプロファイラの集計（endpoint / フェーズ別の p50・p95・p99、SQL、上流呼び出し数）。
+    値は応答したワーカープロセスのもの（pid で識別）。DELETE で集計をリセットする。
+    """
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(tags=["metrics"], summary="Request profiler metrics", responses={200: OpenApiTypes.OBJECT})
+    def get(self, request, *args, **kwargs):
+        body = metrics_snapshot()
+
+        from temples.llm.executor import llm_executor_stats
+        from temples.llm.response_cache import llm_cache_stats
+        from temples.services.places import places_cache_stats
+        from temples.services.write_behind import write_behind_stats
+        from temples.upstream import breaker_stats
+
+        body["caches"] = {**places_cache_stats(), "llm": llm_cache_stats()}
+        body["upstream"] = breaker_stats()
+        body["llm"] = llm_executor_stats()
+        body["write_behind"] = write_behind_stats()
+        return Response(body)
+
+    @extend_schema(tags=["metrics"], summary="Reset request profiler metrics", responses={204: None})
+    def delete(self, request, *args, **kwargs):
+        reset_metrics()
+        return Response(status=204)
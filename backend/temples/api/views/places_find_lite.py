@@ -1,9 +1,9 @@
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
+from temples.api.throttles import ScopedCounterThrottle
 from temples.api.serializers.places import PlaceLiteResponseSerializer
 from temples.services.places import find_place, PlacesError
 from temples.services import places
@@ -24,7 +24,7 @@ def _to_place_lite(r: dict) -> dict:
 
 class PlacesFindLiteView(APIView):
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [ScopedCounterThrottle]
     throttle_scope = "places"
 
     def get(self, request):
@@ -1,7 +1,6 @@
 # backend/temples/api/views/route.py
 import os
 
-import requests
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.db import models
@@ -14,12 +13,13 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from temples.models import Shrine
-from temples.route_service import Point, build_route
+from temples.route_service import build_route_from_request
 from temples.serializers.routes import (
     RouteRequestSerializer,
     RouteResponseSerializer,
     SimpleRouteResponseSerializer,
 )
+from temples.upstream import session as upstream_session
 
 from drf_spectacular.utils import extend_schema
 
@@ -125,7 +125,7 @@ class RouteAPIView(APIView):
         url = f"{OSRM_BASE}/route/v1/{profile}/{lng1},{lat1};{lng2},{lat2}"
         params = {"overview": "full", "geometries": "geojson"}
         try:
-            r = requests.get(url, params=params, timeout=6)
+            r = upstream_session("routing").get(url, params=params, timeout=6)
             data = r.json()
         except Exception as e:
             return Response(
@@ -161,11 +161,8 @@ class RouteAPIView(APIView):
         ser.is_valid(raise_exception=True)
         data = ser.validated_data
 
-        mode = data["mode"]  # "walking" / "driving" など
-        origin = Point(lat=float(data["origin"]["lat"]), lng=float(data["origin"]["lng"]))
-        dests = [Point(lat=float(d["lat"]), lng=float(d["lng"])) for d in data["destinations"]]
-
-        result = build_route(mode, origin, dests)
+        # optimize=true なら訪問順を最適化（order / optimization が付く）
+        result = build_route_from_request(data)
         out = RouteResponseSerializer(result).data
         return Response(out, status=status.HTTP_200_OK)
 
@@ -2,13 +2,10 @@
 
 import os
 import logging
-import time
 import math
 
 
 from django.conf import settings
-from django.core.cache import cache
-from django.http import HttpResponse
 from django.views.decorators.cache import cache_page
 from drf_spectacular.utils import OpenApiParameter, OpenApiTypes, extend_schema
 
@@ -16,10 +13,11 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 
+from shrine_project.cache_tiers import namespace_cache
 
 from temples import services  # services.google_places を各所で利用
+from temples.api.throttles import ScopedCounterThrottle
 from temples.services.shrine_rules import is_shrine_like, prefer_explicit_jinja
 from temples.api.serializers.places import (
     NearbySearchResponse,
@@ -29,10 +27,15 @@ from temples.api.serializers.places import (
 )
 from temples.services import google_places as GP
 from temples.services import places as PlacesSvc
-from temples.services.places import places_photo, PlacesError
+from temples.services.asset_store import asset_response
+from temples.services.places import places_photo_asset, PlacesError
+from temples.services.rate_limit import SlidingWindowLimiter, parse_rate, record_decision
 
 logger = logging.getLogger(__name__)
 
+# 手動スロットルの履歴はワーカー間で共有する
+cache = namespace_cache("throttle")
+
 
 def _haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> int:
     R = 6371000.0
@@ -60,7 +63,7 @@ def _apply_places_nearby_throttle(request):
     /api/places/nearby_search/ 用の手動スロットル。
 
     settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["places-nearby"]
-    から「N/min」の N を読み取り、1分あたり N 回まで許可する。
+    の「N/min」をスライディング窓カウンタで数える（判定は X-RateLimit-* ヘッダにも出る）。
     """
     rates = getattr(settings, "REST_FRAMEWORK", {}).get("DEFAULT_THROTTLE_RATES", {})
     rate = rates.get("places-nearby")
@@ -69,35 +72,24 @@ def _apply_places_nearby_throttle(request):
         return None
 
     try:
-        num_str, per = rate.split("/", 1)
-        limit = int(num_str)
+        limit, window = parse_rate(rate)
     except Exception:
         # パースに失敗したら安全側にそこそこ小さい数にしておく
-        limit = 30
-        per = "min"
-
-    # 単位は /min 前提で 60 秒窓を使う（/day などは現状想定しない）
-    window = 60 if "min" in per else 60
-
-    ident = _nearby_ident(request)
-    cache_key = f"throttle:places-nearby:{ident}"
-    now = time.time()
-
-    history = cache.get(cache_key, [])
-    # 窓外の古いリクエストを捨てる
-    history = [ts for ts in history if ts > now - window]
+        limit, window = 30, 60
 
-    if len(history) >= limit:
-        # DRF のメッセージに寄せた文言
-        return Response(
-            {"detail": "Request was throttled. Expected available in one minute."},
-            status=status.HTTP_429_TOO_MANY_REQUESTS,
-        )
+    decision = SlidingWindowLimiter("places-nearby-manual", limit, window, cache=cache).hit(_nearby_ident(request))
+    record_decision(request, decision)
+    if decision.allowed:
+        return None
 
-    # 現在のリクエストを追加して保存
-    history.append(now)
-    cache.set(cache_key, history, window)
-    return None
+    # DRF のメッセージに寄せた文言
+    response = Response(
+        {"detail": "Request was throttled. Expected available in one minute."},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+    for k, v in decision.headers().items():
+        response[k] = v
+    return response
 
 
 # --- /api/places/search/ ---
@@ -234,7 +226,7 @@ def text_search_legacy(request):
 )
 @api_view(["GET"])
 @permission_classes([AllowAny])
-@throttle_classes([ScopedRateThrottle])
+@throttle_classes([ScopedCounterThrottle])
 def nearby_search(request):
     throttled = _apply_places_nearby_throttle(request)
     if throttled is not None:
@@ -376,7 +368,7 @@ nearby_search.throttle_scope = "places-nearby"
 @extend_schema(exclude=True)
 @api_view(["GET"])
 @permission_classes([AllowAny])
-@throttle_classes([ScopedRateThrottle])
+@throttle_classes([ScopedCounterThrottle])
 def nearby_search_legacy(request, *args, **kwargs):
     """/api/places/nearby_search/ のレガシー入口（DRF Request→Django HttpRequest）"""
     try:
@@ -411,7 +403,7 @@ nearby_search_legacy.throttle_scope = "places-nearby"
 def photo(request):
     """
     /api/places/photo/?photo_reference=...&maxwidth=...
-    services.google_places.photo は (bytes, content_type) を返す契約
+    画像は asset_store に保存済みのものを ETag / Range 付きで返す（初回だけ上流から取り込む）
     """
     ref = request.query_params.get("photo_reference")
     if not ref:
@@ -423,7 +415,7 @@ def photo(request):
         mw = 800
 
     try:
-        blob, content_type, _ttl = places_photo(ref, maxwidth=mw)
+        asset = places_photo_asset(ref, maxwidth=mw)
     except PlacesError as e:
         # status が 500 でも、ここは upstream 依存なので 502 に寄せる
         logger.info("places.photo failed: %s", str(e))
@@ -432,11 +424,8 @@ def photo(request):
             status=getattr(e, "status", 502) or 502,
         )
 
-    resp = HttpResponse(blob, content_type=content_type)
-    resp["Cache-Control"] = f"public, max-age={_ttl}"
-    return resp
+    return asset_response(request, asset, max_age=settings.PLACE_PHOTO_MAX_AGE)
 
-    
 
 def _detail_impl(place_id: str):
     gp = services.google_places
@@ -18,9 +18,9 @@ from rest_framework.generics import ListAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.decorators import action
 
+from temples.api.throttles import ScopedCounterThrottle
 from temples.services.places import get_or_create_shrine_by_place_id, PlacesError
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema
@@ -268,7 +268,7 @@ class ShrineViewSet(viewsets.ModelViewSet):
     def get_throttles(self):
         if getattr(self, "action", None) == "ingest":
             self.throttle_scope = "shrines_ingest"
-            return [ScopedRateThrottle()]
+            return [ScopedCounterThrottle()]
         return super().get_throttles()
 
     def get_queryset(self):
@@ -294,7 +294,7 @@ class ShrineViewSet(viewsets.ModelViewSet):
         methods=["post"],
         url_path="ingest",
         permission_classes=[AllowAny],
-        throttle_classes=[ScopedRateThrottle],
+        throttle_classes=[ScopedCounterThrottle],
     )
     def ingest(self, request):
         place_id = (request.data or {}).get("place_id")
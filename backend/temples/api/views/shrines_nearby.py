@@ -1,10 +1,10 @@
 from django.db import transaction
 from django.http import JsonResponse
-from django.utils import timezone
 
-from temples.models import PlaceRef, Shrine
+from temples.models import Shrine
+from temples.services.place_cache_upsert import PlaceRefInput, upsert_place_refs_many
+
 
-@transaction.atomic
 def shrines_nearby(request):
     lat = request.GET.get("lat")
     lng = request.GET.get("lng")
@@ -17,44 +17,42 @@ def shrines_nearby(request):
     # TODO: ここは既存の Google Places クライアントに差し替え
     places = search_nearby_places(lat=float(lat), lng=float(lng), radius_m=radius_m, limit=limit)
 
-    results = []
-    now = timezone.now()
-
-    for p in places:
-        place_id = p.get("place_id")
-        if not place_id:
-            continue
-
-        pref, _ = PlaceRef.objects.update_or_create(
-            place_id=place_id,
-            defaults={
-                "name": p.get("name") or "",
-                "address": p.get("address") or "",
-                "latitude": p.get("latitude"),
-                "longitude": p.get("longitude"),
-                "snapshot_json": p.get("raw"),
-                "synced_at": now,
-            },
+    # PlaceRef はまとめて upsert（内容が変わっていない行は書かない）
+    refs = [
+        PlaceRefInput(
+            place_id=p["place_id"],
+            name=p.get("name") or "",
+            address=p.get("address") or "",
+            latitude=p.get("latitude"),
+            longitude=p.get("longitude"),
+            snapshot_json=p.get("raw"),
         )
+        for p in places
+        if p.get("place_id")
+    ]
+    upsert_place_refs_many(refs)
 
-        shrine, _ = Shrine.objects.update_or_create(
-            place_ref=pref,
-            defaults={
-                "kind": "shrine",
-                "name_jp": pref.name or "名称未設定",
-                "address": pref.address or "",
-                "latitude": pref.latitude,
-                "longitude": pref.longitude,
-            },
-        )
-
-        results.append({
-            "id": shrine.id,
-            "name_jp": shrine.name_jp,
-            "address": shrine.address,
-            "latitude": shrine.latitude,
-            "longitude": shrine.longitude,
-            "place_id": pref.place_id,
-        })
+    results = []
+    with transaction.atomic():
+        for ref in {r.place_id: r for r in refs}.values():
+            shrine, _ = Shrine.objects.update_or_create(
+                place_ref_id=ref.place_id,
+                defaults={
+                    "kind": "shrine",
+                    "name_jp": ref.name or "名称未設定",
+                    "address": ref.address or "",
+                    "latitude": ref.latitude,
+                    "longitude": ref.longitude,
+                },
+            )
+
+            results.append({
+                "id": shrine.id,
+                "name_jp": shrine.name_jp,
+                "address": shrine.address,
+                "latitude": shrine.latitude,
+                "longitude": shrine.longitude,
+                "place_id": ref.place_id,
+            })
 
     return JsonResponse({"results": results}, status=200)
@@ -5,7 +5,6 @@ import logging
 import re
 import uuid
 import time
-from django.db import connection, reset_queries
 
 from datetime import date
 from typing import Any, Dict, List, Optional, Tuple
@@ -25,23 +24,27 @@ from temples.api.serializers.concierge import (
     ConciergePlanRequestSerializer,
     ConciergePlanResponseSerializer,
 )
-from temples.geocoding.client import geocode_google_point
+from temples.geocoding.area_cache import geocode_area_point
+from temples.geocoding.gazetteer import lookup_area
 from temples.models import ConciergeThread
 from temples.services import places as Places
 
 from temples.services.plan_service import resolve_plan_context
-from temples.services.quota_service import check_quota, consume_quota
+from temples.services.quota_service import try_consume_quota
 from temples.services.anonymous_id import attach_anonymous_cookie, build_anonymous_cookie_value
 from temples.services.concierge_candidate_utils import (
     _dedupe_candidates,
     _to_float,
 )
-from temples.services.concierge_chat import build_chat_recommendations
+from temples.services.concierge_chat import build_chat_recommendations, iter_chat_recommendations
+from temples.services.concierge_chat_stream import ChatStreamResponse, format_event, resolve_stream_format
 from temples.services.concierge_chat_ranking import (
     _resolve_public_mode,
 )
 from temples.services.concierge_chat_candidates import build_chat_candidates
 from temples.services.concierge_history import append_chat
+from temples.services import request_profiler as profiler
+from temples.services.shrine_need_features import NEED_FEATURES_KEY
 from temples.services.concierge_plan import build_plan_response
 from temples.services.billing_state import is_premium_for_user  # test monkeypatch compatibility
 
@@ -252,12 +255,11 @@ def _parse_radius(data: Dict[str, Any]) -> int:
 
 
 def _geocode_area_for_chat(*, area: str) -> tuple[float, float] | None:
-    t0 = time.perf_counter()
-    pt = geocode_google_point(area, language="ja", region="jp", timeout=6.0)
-    elapsed = time.perf_counter() - t0
+    with profiler.phase("geocode") as ph:
+        pt = geocode_area_point(area, language="ja", region="jp", timeout=6.0)
     log.info(
         "[concierge/perf] step=geocode elapsed=%.3f ok=%s area_len=%d",
-        elapsed,
+        ph.elapsed,
         pt is not None,
         len(area or ""),
     )
@@ -273,6 +275,11 @@ def _probe_area_locationbias_for_chat(*, area: str | None) -> None:
         log.info("[concierge/perf] step=probe_locationbias skipped=no_area")
         return
 
+    # ガゼッティアで確定する area は座標が既知なので、Find Place を叩く意味がない
+    if lookup_area(area) is not None:
+        log.info("[concierge/perf] step=probe_locationbias skipped=gazetteer")
+        return
+
     pt = _geocode_area_for_chat(area=area)
     if not pt:
         log.info("[concierge/perf] step=probe_locationbias skipped=no_geocode_result")
@@ -475,6 +482,17 @@ def _chat_quota_fields(*, plan: Optional[str], quota: Any) -> tuple[Optional[int
     return quota.remaining, quota.limit
 
 
+def _chat_reply(recs: Dict[str, Any]) -> str:
+    """message モードの reply（上位 3 件の名前）。"""
+    names = []
+    for r in (recs.get("recommendations") or [])[:3]:
+        if isinstance(r, dict):
+            nm = (r.get("display_name") or r.get("name") or "").strip()
+            if nm:
+                names.append(nm)
+    return f"候補: {', '.join(names)}" if names else "候補: "
+
+
 def _build_chat_candidates_pipeline(
     request: Any,
     lat: Optional[float],
@@ -486,7 +504,12 @@ def _build_chat_candidates_pipeline(
     _ = language  # interface stability for future use
 
     raw_candidates = data.get("candidates") if isinstance(data.get("candidates"), list) else []
-    user_candidates = [c for c in raw_candidates if isinstance(c, dict)]
+    # need 特徴量インデックスはサーバ側でだけ付与する（クライアント指定は捨てる）
+    user_candidates = [
+        {k: v for k, v in c.items() if k != NEED_FEATURES_KEY}
+        for c in raw_candidates
+        if isinstance(c, dict)
+    ]
 
 
     raw_built_candidates = build_chat_candidates(
@@ -543,14 +566,19 @@ class ConciergeChatView(APIView):
     @extend_schema(
         tags=["concierge"],
         summary="Concierge chat",
-        description="message もしくは query を受け付ける互換ラッパ",
+        description=(
+            "message もしくは query を受け付ける互換ラッパ。"
+            "?stream=1（SSE）/ ?stream=ndjson で need → ranked → result → thread → done の順に段階的に返す"
+        ),
         request=None,
         responses={200: OpenApiTypes.OBJECT},
     )
     def post(self, request, *args, **kwargs):
-        reset_queries()
-        t0_total = time.perf_counter()
         rid = uuid.uuid4().hex[:8]
+        with profiler.profile_request("concierge.chat", rid=rid) as prof:
+            return self._post(request, rid=rid, prof=prof)
+
+    def _post(self, request, *, rid: str, prof: profiler.RequestProfile):
         log.info("[concierge] chat.post rid=%s", rid)
         log.info("🔥 CHAT ENTRY HIT 🔥")
 
@@ -576,24 +604,23 @@ class ConciergeChatView(APIView):
             # ① 入力解決
             # -------------------------
             phase = "resolve_inputs"
-            t0 = time.perf_counter()
-
-            (
-                query,
-                message,
-                language,
-                area,
-                birthdate_value,
-                goriyaku_tag_ids,
-                extra_condition,
-            ) = _resolve_request_inputs_basic(data)
-
-            birthdate = (birthdate_value or "").strip() or None
+            with profiler.phase("resolve_inputs") as ph:
+                (
+                    query,
+                    message,
+                    language,
+                    area,
+                    birthdate_value,
+                    goriyaku_tag_ids,
+                    extra_condition,
+                ) = _resolve_request_inputs_basic(data)
+
+                birthdate = (birthdate_value or "").strip() or None
 
             log.info(
                 "[concierge/perf] step=resolve_inputs rid=%s elapsed=%.3f",
                 rid,
-                time.perf_counter() - t0,
+                ph.elapsed,
             )
 
             is_message_mode = bool(message)
@@ -633,26 +660,22 @@ class ConciergeChatView(APIView):
 
             
             # -------------------------
-            # ④ auth / plan_context / quota
+            # ④ auth / plan_context / quota（判定と消費を条件付き upsert 1 文で）
             # -------------------------
             phase = "quota_check"
-            t0 = time.perf_counter()
-
-            user, token = _resolve_user_and_token(request)
-            if user is not None:
-                request.user = user
-                request.auth = token
+            with profiler.phase("quota_check") as ph:
+                user, token = _resolve_user_and_token(request)
+                if user is not None:
+                    request.user = user
+                    request.auth = token
 
-            plan_context = resolve_plan_context(request)
-            try:
-                quota = check_quota(plan_context, "concierge")
-            except Exception:
-                raise
+                plan_context = resolve_plan_context(request)
+                quota = try_consume_quota(plan_context, "concierge")
 
             log.info(
                 "[concierge/perf] step=quota_check rid=%s elapsed=%.3f allowed=%s plan=%s remaining=%r limit=%r",
                 rid,
-                time.perf_counter() - t0,
+                ph.elapsed,
                 quota.allowed,
                 plan_context.plan,
                 quota.remaining,
@@ -708,21 +731,20 @@ class ConciergeChatView(APIView):
             # ② candidate build
             # -------------------------
             phase = "candidates"
-            t0 = time.perf_counter()
-
-            candidates, user_n, built_n, merged_n = _build_chat_candidates_pipeline(
-                request=request,
-                lat=lat,
-                lng=lng,
-                area=area,
-                language=language,
-            )
-            candidate_count = len(candidates)
+            with profiler.phase("candidates") as ph:
+                candidates, user_n, built_n, merged_n = _build_chat_candidates_pipeline(
+                    request=request,
+                    lat=lat,
+                    lng=lng,
+                    area=area,
+                    language=language,
+                )
+                candidate_count = len(candidates)
 
             log.info(
                 "[concierge/perf] step=candidates rid=%s elapsed=%.3f user=%d built=%d merged=%d deduped=%d",
                 rid,
-                time.perf_counter() - t0,
+                ph.elapsed,
                 user_n,
                 built_n,
                 merged_n,
@@ -733,26 +755,26 @@ class ConciergeChatView(APIView):
             # ③ probe / bias / intent
             # -------------------------
             phase = "pre_recommend"
-            t0 = time.perf_counter()
-            try:
-                _probe_area_locationbias_for_chat(area=area)
-            except Exception:
-                log.exception("[concierge/perf] step=probe rid=%s failed", rid)
-
-            bias = None
-            if lat is not None and lng is not None:
-                r_m = _parse_radius(data)
-                bias = {"lat": lat, "lng": lng, "radius": r_m, "radius_m": r_m}
-                log.info(
-                    "[api/chat] computed_bias has_bias=%s radius_m=%d",
-                    bias is not None,
-                    r_m,
-                )
+            with profiler.phase("pre_recommend") as ph:
+                try:
+                    _probe_area_locationbias_for_chat(area=area)
+                except Exception:
+                    log.exception("[concierge/perf] step=probe rid=%s failed", rid)
+
+                bias = None
+                if lat is not None and lng is not None:
+                    r_m = _parse_radius(data)
+                    bias = {"lat": lat, "lng": lng, "radius": r_m, "radius_m": r_m}
+                    log.info(
+                        "[api/chat] computed_bias has_bias=%s radius_m=%d",
+                        bias is not None,
+                        r_m,
+                    )
 
             log.info(
                 "[concierge/perf] step=pre_recommend rid=%s elapsed=%.3f",
                 rid,
-                time.perf_counter() - t0,
+                ph.elapsed,
             )
 
 
@@ -769,11 +791,15 @@ class ConciergeChatView(APIView):
             if public_mode == "compat":
                 applied.append("mode:compat")
 
-            t0 = time.perf_counter()
-
-            try:
-                recs = build_chat_recommendations(
-                    query=query or "",
+            stream_fmt = resolve_stream_format(request.query_params.get("stream", data.get("stream")))
+            if stream_fmt:
+                # 段階ごとに送る（need → ranked → result → thread → done）。残りの処理はストリームの中
+                phase = "stream"
+                response = self._stream_response(
+                    fmt=stream_fmt,
+                    rid=rid,
+                    data=data,
+                    query=query,
                     language=language,
                     candidates=candidates,
                     bias=bias,
@@ -782,26 +808,57 @@ class ConciergeChatView(APIView):
                     extra_condition=extra_condition,
                     public_mode=public_mode,
                     flow=flow,
+                    is_message_mode=is_message_mode,
+                    intent=intent,
+                    user=user,
+                    plan_context=plan_context,
+                    remaining=remaining,
+                    limit_value=limit_value,
+                    lat=lat,
+                    lng=lng,
+                    debug={
+                        "rid": rid,
+                        "before": before_n,
+                        "applied": applied,
+                        "flow": flow,
+                        "mode": public_mode,
+                    },
                 )
-            except Exception:
-                log.exception(
-                    "[concierge/chat] recommend failed rid=%s mode=%s flow=%s candidates=%d has_bias=%s has_birthdate=%s",
-                    rid,
-                    public_mode,
-                    flow,
-                    len(candidates),
-                    bias is not None,
-                    birthdate is not None,
-                )
-                raise
+                total_status = 200
+                return response
+
+            with profiler.phase("recommend") as ph:
+                try:
+                    recs = build_chat_recommendations(
+                        query=query or "",
+                        language=language,
+                        candidates=candidates,
+                        bias=bias,
+                        birthdate=birthdate,
+                        goriyaku_tag_ids=goriyaku_tag_ids,
+                        extra_condition=extra_condition,
+                        public_mode=public_mode,
+                        flow=flow,
+                    )
+                except Exception:
+                    log.exception(
+                        "[concierge/chat] recommend failed rid=%s mode=%s flow=%s candidates=%d has_bias=%s has_birthdate=%s",
+                        rid,
+                        public_mode,
+                        flow,
+                        len(candidates),
+                        bias is not None,
+                        birthdate is not None,
+                    )
+                    raise
 
-            after_n = len(recs.get("recommendations") or [])
-            rec_count = after_n
+                after_n = len(recs.get("recommendations") or [])
+                rec_count = after_n
 
             log.info(
                 "[concierge/perf] step=recommend rid=%s elapsed=%.3f recs=%d",
                 rid,
-                time.perf_counter() - t0,
+                ph.elapsed,
                 after_n,
             )
 
@@ -815,129 +872,33 @@ class ConciergeChatView(APIView):
             # ⑥ thread append
             # -------------------------
             phase = "append_chat"
-            t0 = time.perf_counter()
-
-            reply = None
-            if is_message_mode:
-                names = []
-                for r in (recs.get("recommendations") or [])[:3]:
-                    if isinstance(r, dict):
-                        nm = (r.get("display_name") or r.get("name") or "").strip()
-                        if nm:
-                            names.append(nm)
-                reply = f"候補: {', '.join(names)}" if names else "候補: "
-
-            thread_obj = None
-
-            thread_id_raw = data.get("thread_id") or data.get("threadId")
-            try:
-                thread_id = int(thread_id_raw) if thread_id_raw not in (None, "", 0, "0") else None
-            except Exception:
-                thread_id = None
-
-            reply_text = reply if isinstance(reply, str) else None
-            saved_query = query or "生年月日から相性を見てほしい"
-
-            thread_recommendations = recs.get("recommendations") or []
-            thread_recommendations_v2 = recs.get("recommendations_v2") or thread_recommendations
-
-            append_user = user if getattr(user, "is_authenticated", False) else None
-            append_anonymous_id = None if append_user is not None else getattr(plan_context, "anon_id", None)
-
-            try:
-                saved = append_chat(
-                    user=append_user,
-                    anonymous_id=append_anonymous_id,
-                    query=saved_query,
-                    reply_text=reply_text,
-                    thread_id=thread_id,
-                    recommendations=thread_recommendations,
-                    recommendations_v2=thread_recommendations_v2,
-                )
-                thread_obj = saved.thread
-            except ConciergeThread.DoesNotExist:
-                saved = append_chat(
-                    user=append_user,
-                    anonymous_id=append_anonymous_id,
-                    query=saved_query,
-                    reply_text=reply_text,
-                    thread_id=None,
-                    recommendations=thread_recommendations,
-                    recommendations_v2=thread_recommendations_v2,
-                )
-                thread_obj = saved.thread
-
-            log.info(
-                "[concierge/perf] step=append_chat rid=%s elapsed=%.3f thread=%r",
-                rid,
-                time.perf_counter() - t0,
-                getattr(thread_obj, "id", None),
+            reply = _chat_reply(recs) if is_message_mode else None
+            thread_obj = self._append_chat_thread(
+                rid=rid,
+                data=data,
+                recs=recs,
+                query=query,
+                reply=reply,
+                user=user,
+                plan_context=plan_context,
             )
 
             # -------------------------
             # ⑦ observability save
             # -------------------------
             phase = "observability"
-            t0 = time.perf_counter()
-
-            from temples.services.concierge_observability import save_concierge_recommendation_log
-
-            signals = recs.get("_signals") or {}
-            llm_meta = signals.get("llm") or {}
-            result_state = signals.get("result_state") or {}
-            need_meta = recs.get("_need") or {}
-            need_tags_for_log = need_meta.get("tags") or []
-            radius_m = _parse_radius(data)
-
-            try:
-                save_concierge_recommendation_log(
-                    user=user if getattr(user, "is_authenticated", False) else None,
-                    thread=thread_obj,
-                    query=query or "",
-                    need_tags=need_tags_for_log,
-                    flow=flow,
-                    llm_enabled=bool(llm_meta.get("enabled")),
-                    llm_used=bool(llm_meta.get("used")),
-                    recommendations=recs.get("recommendations") or [],
-                    result_state=result_state,
-                    lat=lat,
-                    lng=lng,
-                    radius_m=radius_m,
-                )
-            except Exception:
-                log.exception("[concierge/reco] save_concierge_recommendation_log failed rid=%s", rid)
-
-            log.info(
-                "[concierge/perf] step=observability rid=%s elapsed=%.3f",
-                rid,
-                time.perf_counter() - t0,
-            )
-
-            # -------------------------
-            # ⑧ quota consume
-            # -------------------------
-            phase = "consume"
-            t0 = time.perf_counter()
-
-            try:
-                consume_quota(plan_context, "concierge")
-            except Exception:
-                log.exception(
-                    "[concierge/chat] consume_quota failed rid=%s plan=%s",
-                    rid,
-                    getattr(plan_context, "plan", None),
-                )
-                raise
-
-            log.info(
-                "[concierge/perf] step=consume rid=%s elapsed=%.3f",
-                rid,
-                time.perf_counter() - t0,
+            self._save_observability(
+                rid=rid,
+                data=data,
+                recs=recs,
+                query=query,
+                flow=flow,
+                user=user,
+                thread_obj=thread_obj,
+                lat=lat,
+                lng=lng,
             )
 
-            if not quota.unlimited and remaining is not None:
-                remaining = max(remaining - 1, 0)
-
             body = _build_chat_response(
                     intent=intent,
                     recs=recs,
@@ -982,13 +943,11 @@ class ConciergeChatView(APIView):
             log.info("[concierge/chat] before_return rid=%s", rid)
             return response
         finally:
-            total_ms = round((time.perf_counter() - t0_total) * 1000, 1)
-            sql_total_ms = round(sum(float(q["time"]) * 1000 for q in connection.queries), 1)
-
+            prof.status = total_status
             log.info(
-                "[concierge/perf] TOTAL rid=%s total_ms=%s status=%s phase=%s mode=%s query_len=%d candidates=%d recs=%d limit_reached=%s sql_count=%s sql_total_ms=%s",
+                "[concierge/perf] TOTAL rid=%s total_ms=%s status=%s phase=%s mode=%s query_len=%d candidates=%d recs=%d limit_reached=%s sql_count=%s sql_total_ms=%s upstream=%s",
                 rid,
-                total_ms,
+                round(prof.elapsed_ms(), 1),
                 total_status,
                 phase,
                 mode_label,
@@ -996,25 +955,215 @@ class ConciergeChatView(APIView):
                 candidate_count,
                 rec_count,
                 1 if limit_reached else 0,
-                len(connection.queries),
-                sql_total_ms,
+                prof.sql_count,
+                round(prof.sql_ms, 1),
+                prof.upstream or "-",
             )
 
-            slow_queries = sorted(
-                connection.queries,
-                key=lambda q: float(q["time"]),
-                reverse=True,
-            )[:5]
-
-            for i, q in enumerate(slow_queries, start=1):
+            for i, (ms, sql) in enumerate(prof.slow_queries(), start=1):
                 log.info(
                     "[concierge/perf] slow_sql rid=%s rank=%s time_ms=%s sql=%s",
                     rid,
                     i,
-                    round(float(q["time"]) * 1000, 1),
-                    q["sql"][:1000],
+                    round(ms, 1),
+                    sql[:1000],
                 )
 
+    def _stream_response(
+        self,
+        *,
+        fmt,
+        rid,
+        data,
+        query,
+        language,
+        candidates,
+        bias,
+        birthdate,
+        goriyaku_tag_ids,
+        extra_condition,
+        public_mode,
+        flow,
+        is_message_mode,
+        intent,
+        user,
+        plan_context,
+        remaining,
+        limit_value,
+        lat,
+        lng,
+        debug,
+    ):
+        """
+        推薦をストリーミングで返す。応答本体（result）は通常の JSON 応答と同じ形。
+        スレッド保存は result を送った後、観測ログはストリームを閉じた後に行う。
+        """
+        anon_cookie_value = (
+            build_anonymous_cookie_value(plan_context.anon_id)
+            if plan_context.plan == "anonymous" and plan_context.anon_id
+            else None
+        )
+
+        def events():
+            with profiler.profile_request("concierge.chat.stream", rid=rid) as prof:
+                try:
+                    recs: Dict[str, Any] = {}
+                    with profiler.phase("recommend"):
+                        for event, payload in iter_chat_recommendations(
+                            query=query or "",
+                            language=language,
+                            candidates=candidates,
+                            bias=bias,
+                            birthdate=birthdate,
+                            goriyaku_tag_ids=goriyaku_tag_ids,
+                            extra_condition=extra_condition,
+                            public_mode=public_mode,
+                            flow=flow,
+                            preview=True,
+                        ):
+                            if event == "final":
+                                recs = payload
+                            elif event == "need":
+                                yield format_event(fmt, "need", {"tags": payload.get("tags") or []})
+                            else:
+                                yield format_event(fmt, event, payload)
+
+                    reply = _chat_reply(recs) if is_message_mode else None
+                    body = _build_chat_response(
+                        intent=intent,
+                        recs=recs,
+                        reply=reply,
+                        plan=plan_context.plan,
+                        remaining=remaining,
+                        limit=limit_value,
+                        limit_reached=False,
+                        thread=None,
+                        debug={**debug, "after": len(recs.get("recommendations") or [])},
+                        anon_cookie_value=anon_cookie_value,
+                    )
+                    yield format_event(fmt, "result", body)
+
+                    thread_obj = self._append_chat_thread(
+                        rid=rid,
+                        data=data,
+                        recs=recs,
+                        query=query,
+                        reply=reply,
+                        user=user,
+                        plan_context=plan_context,
+                    )
+                    thread_id = str(thread_obj.id) if thread_obj is not None else None
+                    yield format_event(fmt, "thread", {"thread_id": thread_id})
+
+                    response.call_on_close(
+                        lambda: self._save_observability(
+                            rid=rid,
+                            data=data,
+                            recs=recs,
+                            query=query,
+                            flow=flow,
+                            user=user,
+                            thread_obj=thread_obj,
+                            lat=lat,
+                            lng=lng,
+                        )
+                    )
+                    prof.status = 200
+                    yield format_event(fmt, "done", {"rid": rid})
+                except Exception:
+                    prof.status = 500
+                    log.exception("[concierge/stream] failed rid=%s", rid)
+                    yield format_event(fmt, "error", {"detail": "internal error", "rid": rid})
+
+        response = ChatStreamResponse(events(), fmt=fmt)
+        if plan_context.plan == "anonymous" and plan_context.anon_id:
+            attach_anonymous_cookie(response, plan_context.anon_id)
+        return response
+
+    def _append_chat_thread(self, *, rid, data, recs, query, reply, user, plan_context):
+        with profiler.phase("append_chat") as ph:
+            thread_id_raw = data.get("thread_id") or data.get("threadId")
+            try:
+                thread_id = int(thread_id_raw) if thread_id_raw not in (None, "", 0, "0") else None
+            except Exception:
+                thread_id = None
+
+            reply_text = reply if isinstance(reply, str) else None
+            saved_query = query or "生年月日から相性を見てほしい"
+
+            thread_recommendations = recs.get("recommendations") or []
+            thread_recommendations_v2 = recs.get("recommendations_v2") or thread_recommendations
+
+            append_user = user if getattr(user, "is_authenticated", False) else None
+            append_anonymous_id = None if append_user is not None else getattr(plan_context, "anon_id", None)
+
+            try:
+                saved = append_chat(
+                    user=append_user,
+                    anonymous_id=append_anonymous_id,
+                    query=saved_query,
+                    reply_text=reply_text,
+                    thread_id=thread_id,
+                    recommendations=thread_recommendations,
+                    recommendations_v2=thread_recommendations_v2,
+                )
+            except ConciergeThread.DoesNotExist:
+                saved = append_chat(
+                    user=append_user,
+                    anonymous_id=append_anonymous_id,
+                    query=saved_query,
+                    reply_text=reply_text,
+                    thread_id=None,
+                    recommendations=thread_recommendations,
+                    recommendations_v2=thread_recommendations_v2,
+                )
+            thread_obj = saved.thread
+
+        log.info(
+            "[concierge/perf] step=append_chat rid=%s elapsed=%.3f thread=%r",
+            rid,
+            ph.elapsed,
+            getattr(thread_obj, "id", None),
+        )
+        return thread_obj
+
+    def _save_observability(self, *, rid, data, recs, query, flow, user, thread_obj, lat, lng):
+        """推薦ログを write-behind に積む（INSERT は応答後に worker がまとめて行う）。"""
+        with profiler.phase("observability") as ph:
+            from temples.services.concierge_observability import save_concierge_recommendation_log
+
+            signals = recs.get("_signals") or {}
+            llm_meta = signals.get("llm") or {}
+            result_state = signals.get("result_state") or {}
+            need_meta = recs.get("_need") or {}
+            need_tags_for_log = need_meta.get("tags") or []
+            radius_m = _parse_radius(data)
+
+            try:
+                save_concierge_recommendation_log(
+                    user=user if getattr(user, "is_authenticated", False) else None,
+                    thread=thread_obj,
+                    query=query or "",
+                    need_tags=need_tags_for_log,
+                    flow=flow,
+                    llm_enabled=bool(llm_meta.get("enabled")),
+                    llm_used=bool(llm_meta.get("used")),
+                    recommendations=recs.get("recommendations") or [],
+                    result_state=result_state,
+                    lat=lat,
+                    lng=lng,
+                    radius_m=radius_m,
+                )
+            except Exception:
+                log.exception("[concierge/reco] save_concierge_recommendation_log failed rid=%s", rid)
+
+        log.info(
+            "[concierge/perf] step=observability rid=%s elapsed=%.3f",
+            rid,
+            ph.elapsed,
+        )
+
+
 class ConciergeChatViewLegacy(ConciergeChatView):
     schema = None
 
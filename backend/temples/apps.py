@@ -50,17 +50,29 @@ class TemplesConfig(AppConfig):
             return
 
         from django.apps import apps
-        from django.db.models.signals import pre_save, post_save
+        from django.db.models.signals import m2m_changed, pre_save, post_save
 
         from .signals import (
             auto_geocode_on_save,
             on_shrine_saved,
             fill_latlng_if_missing,
+            refresh_need_features_on_save,
+            refresh_need_features_on_tags_changed,
         )
 
         Shrine = apps.get_model("temples", "Shrine")
 
         post_save.connect(on_shrine_saved, sender=Shrine, dispatch_uid="temples.on_shrine_saved")
+        post_save.connect(
+            refresh_need_features_on_save,
+            sender=Shrine,
+            dispatch_uid="temples.refresh_need_features_on_save",
+        )
+        m2m_changed.connect(
+            refresh_need_features_on_tags_changed,
+            sender=Shrine.goriyaku_tags.through,
+            dispatch_uid="temples.refresh_need_features_on_tags_changed",
+        )
         pre_save.connect(auto_geocode_on_save, sender=Shrine, dispatch_uid="temples.auto_geocode_on_save")
         pre_save.connect(fill_latlng_if_missing, sender=Shrine, dispatch_uid="temples.fill_latlng_if_missing")
 
@@ -0,0 +1,106 @@
+"""
+concierge の area（「港区赤坂」「渋谷駅周辺」など）→ 座標の解決。
+
+1. 表記ゆれを正規化（NFKC・空白除去・「周辺」「付近」などの接尾辞を落とす）
+2. オフラインのガゼッティア（geocoding.gazetteer）に一致すれば上流を呼ばない
+3. それ以外は TieredCache（L1 + places 名前空間）経由で Google Geocoding を呼ぶ
+   - 見つかった結果は長め、ZERO_RESULTS は短めの TTL で保存する
+   - 通信エラー・上流エラー（None）は保存しない
+   - 同じ area の同時問い合わせは 1 本にまとめる（single-flight）
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from shrine_project.cache_tiers import namespace_cache
+from temples.geocoding.client import lookup_google_point
+from temples.geocoding.gazetteer import lookup_area
+from temples.geocoding.normalizer import normalize_area
+from temples.services.tiered_cache import TieredCache
+
+log = logging.getLogger(__name__)
+
+# 見つかった座標はほぼ変わらないので長く、ZERO_RESULTS は表記を直して再検索されうるので短く
+GEOCODE_AREA_TTL = int(os.getenv("GEOCODE_AREA_TTL_SECONDS", str(30 * 86400)))
+GEOCODE_AREA_NEGATIVE_TTL = int(os.getenv("GEOCODE_AREA_NEGATIVE_TTL_SECONDS", "3600"))
+GEOCODE_AREA_STALE_TTL = int(os.getenv("GEOCODE_AREA_STALE_SECONDS", "86400"))
+
+_tier = TieredCache(
+    namespace_cache("places"),
+    name="geocode-area",
+    l1_max_entries=int(os.getenv("GEOCODE_AREA_L1_MAX_ENTRIES", "1024")),
+    l1_ttl=float(os.getenv("GEOCODE_AREA_L1_TTL_SECONDS", "3600")),
+)
+
+_stats_lock = threading.Lock()
+_gazetteer_hits = 0
+
+
+def _cache_key(norm: str, language: str, region: str) -> str:
+    h = hashlib.sha1(f"{language}|{region}|{norm}".encode("utf-8")).hexdigest()
+    return f"places:geocode-area:v1:{h}"
+
+
+def _ttl_for(value: Any) -> int:
+    if isinstance(value, dict) and value.get("miss"):
+        return GEOCODE_AREA_NEGATIVE_TTL
+    return GEOCODE_AREA_TTL
+
+
+def _is_result(value: Any) -> bool:
+    return isinstance(value, dict) and (bool(value.get("miss")) or "lat" in value)
+
+
+def geocode_area_point(
+    area: Optional[str],
+    *,
+    language: str = "ja",
+    region: str = "jp",
+    timeout: float = 6.0,
+) -> Optional[Tuple[float, float]]:
+    """area を 1 点に解決する。解決できなければ None。"""
+    global _gazetteer_hits
+    raw = (area or "").strip()
+    norm = normalize_area(raw)
+    if not norm:
+        return None
+
+    entry = lookup_area(norm)
+    if entry is not None:
+        with _stats_lock:
+            _gazetteer_hits += 1
+        return entry.point
+
+    def fetch() -> Optional[Dict[str, Any]]:
+        return lookup_google_point(raw, language=language, region=region, timeout=timeout)
+
+    value, hit = _tier.get_or_fetch(
+        _cache_key(norm, language, region),
+        fetch,
+        ttl=GEOCODE_AREA_TTL,
+        stale_ttl=GEOCODE_AREA_STALE_TTL,
+        accept=_is_result,
+        ttl_for=_ttl_for,
+    )
+    log.debug("[geocode_area] area_len=%d hit=%s miss=%s", len(raw), hit, bool(value and value.get("miss")))
+    if not value or value.get("miss"):
+        return None
+    return float(value["lat"]), float(value["lng"])
+
+
+def geocode_area_stats() -> Dict[str, int]:
+    out = _tier.stats()
+    with _stats_lock:
+        out["gazetteer_hits"] = _gazetteer_hits
+    return out
+
+
+__all__ = [
+    "geocode_area_point",
+    "geocode_area_stats",
+    "normalize_area",
+]
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import logging
 import os
 import typing as t
 from dataclasses import dataclass
 
 import requests
+from temples.services.request_profiler import record_upstream
+from temples.upstream import session as upstream_session
 
 ParamValue = t.Union[str, int, float]
 
+log = logging.getLogger(__name__)
 
 
 @dataclass
@@ -43,24 +47,37 @@ def _google_maps_api_key() -> str | None:
     except Exception:
         return None
 
-def geocode_google_point(
+# 上流エラーとして扱う status（ZERO_RESULTS だけは「無い」と確定できるので別扱い）
+_GOOGLE_TRANSIENT_STATUSES = {"OVER_QUERY_LIMIT", "REQUEST_DENIED", "INVALID_REQUEST", "UNKNOWN_ERROR"}
+
+def _shared_session() -> requests.Session:
+    """Geocoding API 用の共有 Session（接続プール・再試行・ブレーカは temples.upstream の方針）。"""
+    return upstream_session("google_geocode")
+
+
+def lookup_google_point(
     area: str,
     *,
     language: str = "ja",
     region: str = "jp",
     timeout: float = 6.0,
-) -> tuple[float, float] | None:
+) -> dict | None:
+    """
+    Google Geocoding で area を 1 点に解決する（キャッシュなし）。
+
+    - 見つかった: {"lat": float, "lng": float}
+    - ZERO_RESULTS など「無い」と確定: {"miss": True}
+    - キー未設定・通信エラー・上流エラー: None（キャッシュしてはいけない）
+    """
     area = (area or "").strip()
     key = _google_maps_api_key()
     if not key or not area:
-        print(
-            "[geocode_google_point] skip",
-            {"has_key": bool(key), "area": area},
-        )
+        log.debug("[geocode_google_point] skip has_key=%s area_len=%d", bool(key), len(area))
         return None
 
     try:
-        r = requests.get(
+        record_upstream("google_geocode")
+        r = _shared_session().get(
             "https://maps.googleapis.com/maps/api/geocode/json",
             params={
                 "key": key,
@@ -75,52 +92,48 @@ def geocode_google_point(
         payload = r.json()
         status = payload.get("status")
         results = payload.get("results") or []
+    except Exception as e:
+        log.warning("[geocode_google_point] exception area=%r type=%s message=%s", area, type(e).__name__, e)
+        return None
 
-        print(
-            "[geocode_google_point] response",
-            {
-                "area": area,
-                "status": status,
-                "result_count": len(results),
-                "error_message": payload.get("error_message"),
-            },
+    if status in _GOOGLE_TRANSIENT_STATUSES:
+        log.warning(
+            "[geocode_google_point] upstream status=%s area=%r error_message=%s",
+            status,
+            area,
+            payload.get("error_message"),
         )
+        return None
 
-        if status in {
-            "ZERO_RESULTS",
-            "OVER_QUERY_LIMIT",
-            "REQUEST_DENIED",
-            "INVALID_REQUEST",
-            "UNKNOWN_ERROR",
-        }:
-            return None
-
-        if not results:
-            return None
+    if status == "ZERO_RESULTS" or not results:
+        return {"miss": True}
 
-        loc = (results[0].get("geometry") or {}).get("location") or {}
-        lat, lng = loc.get("lat"), loc.get("lng")
-        if lat is None or lng is None:
-            print("[geocode_google_point] missing location", {"area": area})
-            return None
+    loc = (results[0].get("geometry") or {}).get("location") or {}
+    lat, lng = loc.get("lat"), loc.get("lng")
+    if lat is None or lng is None:
+        log.info("[geocode_google_point] missing location area=%r", area)
+        return {"miss": True}
+    return {"lat": float(lat), "lng": float(lng)}
 
-        return float(lat), float(lng)
 
-    except Exception as e:
-        print(
-            "[geocode_google_point] exception",
-            {
-                "area": area,
-                "type": type(e).__name__,
-                "message": str(e),
-            },
-        )
+def geocode_google_point(
+    area: str,
+    *,
+    language: str = "ja",
+    region: str = "jp",
+    timeout: float = 6.0,
+) -> tuple[float, float] | None:
+    """キャッシュを通さない 1 点解決。area 解決には geocoding.area_cache.geocode_area_point を使う。"""
+    hit = lookup_google_point(area, language=language, region=region, timeout=timeout)
+    if not hit or hit.get("miss"):
         return None
+    return hit["lat"], hit["lng"]
+
 
 class GeocodingClient:
     def __init__(self, session: t.Optional[requests.Session] = None):
-        self.session = session or requests.Session()
         self.provider = (os.getenv("GEOCODER_PROVIDER") or "opencage").lower()
+        self.session = session or upstream_session("google_geocode" if self.provider == "google" else self.provider)
 
         # 共通キー > プロバイダ別キー（google用の別名も拾う）
         self.api_key = (
@@ -171,6 +184,7 @@ class GeocodingClient:
             "language": "ja",
             "region": "jp",
         }
+        record_upstream("google_geocode")
         r = self.session.get(url, params=params, timeout=self.timeout)
         try:
             r.raise_for_status()
@@ -201,6 +215,7 @@ class GeocodingClient:
             "language": "ja",
             "region": "jp",
         }
+        record_upstream("google_geocode")
         r = self.session.get(url, params=params, timeout=self.timeout)
         try:
             r.raise_for_status()
@@ -264,6 +279,7 @@ class GeocodingClient:
             "no_annotations": 1,
             "countrycode": "jp",
         }
+        record_upstream("opencage")
         resp = self.session.get(url, params=params, timeout=self.timeout)
         if resp.status_code != 200:
             text = getattr(resp, "text", "")[:200]
@@ -304,6 +320,7 @@ class GeocodingClient:
             "no_annotations": 1,
             "countrycode": "jp",
         }
+        record_upstream("opencage")
         resp = self.session.get(url, params=params, timeout=self.timeout)
         if resp.status_code != 200:
             text = getattr(resp, "text", "")[:200]
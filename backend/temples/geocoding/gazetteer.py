@@ -0,0 +1,350 @@
+"""
+オフラインの地名ガゼッティア（area 文字列 → 代表点 + bbox）。
+
+同梱の temples/data/gazetteer_jp.json（都道府県・東京 23 区・主要な市町・地区・主要駅）から
+build_gazetteer コマンドでバイナリ索引を作り、実行時は mmap で読む。
+索引ファイルが無い・壊れている場合は同梱 JSON からメモリ上に組み立てる。
+
+索引のレイアウト（little-endian）:
+    header  : magic "GZJP", version, 件数, 各セクションのオフセット
+    keys    : (key_off, key_len, entry_idx) を正規化キーの UTF-8 バイト順に並べた固定長表
+    entries : (lat, lng, south, west, north, east, name_off, name_len, kind, pref) の固定長表
+    strings : キーと名称の UTF-8 連結
+
+キーは normalize_area で正規化した名称・別名と、派生キー
+（「東京」のような都府県の接尾辞なし、「東京都港区」のような都道府県付き）。
+同じキーは 名称 > 別名 > 派生 の順、同じ段では JSON の並び順で先に出たものを採る。
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from temples.geocoding.normalizer import normalize_area
+
+log = logging.getLogger(__name__)
+
+SOURCE_PATH = Path(__file__).resolve().parent.parent / "data" / "gazetteer_jp.json"
+
+MAGIC = b"GZJP"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIIIII")  # magic, version, reserved, n_entries, n_keys, keys_off, entries_off, strings_off, strings_len
+_KEY = struct.Struct("<III")  # key_off, key_len, entry_idx
+_ENTRY = struct.Struct("<ffffffIHBB")  # lat, lng, south, west, north, east, name_off, name_len, kind, pref
+
+KINDS = ("", "prefecture", "city", "ward", "town", "locality", "station")
+_KIND_CODE = {k: i for i, k in enumerate(KINDS) if k}
+
+# kind ごとの既定の概略半径（km）。extent_km が無い行の bbox に使う
+_DEFAULT_EXTENT_KM = {
+    "prefecture": 50.0,
+    "city": 10.0,
+    "ward": 3.0,
+    "town": 5.0,
+    "locality": 1.0,
+    "station": 0.5,
+}
+
+PREFECTURES = (
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県",
+)  # 添字 + 1 が JIS 都道府県コード
+_PREF_CODE = {name: i + 1 for i, name in enumerate(PREFECTURES)}
+
+
+class GazetteerError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class GazetteerEntry:
+    name: str
+    kind: str
+    pref: Optional[str]
+    lat: float
+    lng: float
+    bbox: Tuple[float, float, float, float]  # (south, west, north, east)
+
+    @property
+    def point(self) -> Tuple[float, float]:
+        return self.lat, self.lng
+
+    @property
+    def radius_m(self) -> int:
+        """bbox の半分の対角線（locationbias の円の目安）。"""
+        s, w, n, e = self.bbox
+        dy = (n - s) * 111_000 / 2
+        dx = (e - w) * 111_000 * math.cos(math.radians(self.lat)) / 2
+        return int(math.hypot(dx, dy))
+
+
+# ---- 構築 ----
+def load_source(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    with open(path or SOURCE_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    rows = data.get("entries") or []
+    for i, row in enumerate(rows):
+        if row.get("kind") not in _KIND_CODE:
+            raise GazetteerError(f"entries[{i}]: unknown kind {row.get('kind')!r}")
+        if row.get("pref") and row["pref"] not in _PREF_CODE:
+            raise GazetteerError(f"entries[{i}]: unknown pref {row.get('pref')!r}")
+        if not row.get("name"):
+            raise GazetteerError(f"entries[{i}]: name is required")
+    return rows
+
+
+def _bbox(row: Dict[str, Any]) -> Tuple[float, float, float, float]:
+    if row.get("bbox"):
+        s, w, n, e = (float(v) for v in row["bbox"])
+        return s, w, n, e
+    lat, lng = float(row["lat"]), float(row["lng"])
+    km = float(row.get("extent_km") or _DEFAULT_EXTENT_KM[row["kind"]])
+    dlat = km / 111.0
+    dlng = km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def _derived_keys(row: Dict[str, Any]) -> Iterable[str]:
+    name = row["name"]
+    if row["kind"] == "prefecture" and name != "北海道":
+        yield name[:-1]  # 東京都 → 東京
+    pref = row.get("pref")
+    if pref and row["kind"] != "prefecture":
+        yield pref + name  # 東京都港区
+        for alias in row.get("aliases") or []:
+            yield pref + alias
+
+
+def build_index(rows: List[Dict[str, Any]]) -> bytes:
+    """load_source の行からバイナリ索引を作る。"""
+    keys: Dict[bytes, int] = {}
+    for stage in ("name", "alias", "derived"):
+        for idx, row in enumerate(rows):
+            if stage == "name":
+                names: Iterable[str] = [row["name"]]
+            elif stage == "alias":
+                names = row.get("aliases") or []
+            else:
+                names = _derived_keys(row)
+            for name in names:
+                k = normalize_area(name).encode("utf-8")
+                if k and k not in keys:
+                    keys[k] = idx
+
+    strings = bytearray()
+    entry_blob = bytearray()
+    for row in rows:
+        name_b = row["name"].encode("utf-8")
+        s, w, n, e = _bbox(row)
+        entry_blob += _ENTRY.pack(
+            float(row["lat"]),
+            float(row["lng"]),
+            s,
+            w,
+            n,
+            e,
+            len(strings),
+            len(name_b),
+            _KIND_CODE[row["kind"]],
+            _PREF_CODE.get(row.get("pref") or "", 0),
+        )
+        strings += name_b
+
+    key_blob = bytearray()
+    for k in sorted(keys):
+        key_blob += _KEY.pack(len(strings), len(k), keys[k])
+        strings += k
+
+    keys_off = _HEADER.size
+    entries_off = keys_off + len(key_blob)
+    strings_off = entries_off + len(entry_blob)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        0,
+        len(rows),
+        len(keys),
+        keys_off,
+        entries_off,
+        strings_off,
+        len(strings),
+    )
+    return bytes(header + key_blob + entry_blob + strings)
+
+
+def write_index(output: Path, source: Optional[Path] = None) -> Dict[str, int]:
+    """source（既定は同梱 JSON）から索引を作って output に原子的に書く。"""
+    blob = build_index(load_source(source))
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_name(output.name + ".tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, output)
+    g = Gazetteer(blob)
+    return {"entries": g.n_entries, "keys": g.n_keys, "bytes": len(blob)}
+
+
+# ---- 参照 ----
+class Gazetteer:
+    """索引バイト列（mmap か bytes）の上の読み取り専用ビュー。"""
+
+    def __init__(self, buf: Any) -> None:
+        if len(buf) < _HEADER.size:
+            raise GazetteerError("index too short")
+        (
+            magic,
+            version,
+            _reserved,
+            self.n_entries,
+            self.n_keys,
+            self._keys_off,
+            self._entries_off,
+            self._strings_off,
+            strings_len,
+        ) = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise GazetteerError(f"unsupported index magic={magic!r} version={version}")
+        if self._strings_off + strings_len != len(buf):
+            raise GazetteerError("index size mismatch")
+        self._buf = buf
+
+    @classmethod
+    def open(cls, path: Path) -> "Gazetteer":
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mm)
+
+    def _key_at(self, i: int) -> Tuple[bytes, int]:
+        off, ln, idx = _KEY.unpack_from(self._buf, self._keys_off + i * _KEY.size)
+        start = self._strings_off + off
+        return bytes(self._buf[start : start + ln]), idx
+
+    def _entry(self, idx: int) -> GazetteerEntry:
+        lat, lng, s, w, n, e, name_off, name_len, kind, pref = _ENTRY.unpack_from(
+            self._buf, self._entries_off + idx * _ENTRY.size
+        )
+        start = self._strings_off + name_off
+        # float32 の端数を落とす（約 0.1 m 単位）
+        return GazetteerEntry(
+            name=bytes(self._buf[start : start + name_len]).decode("utf-8"),
+            kind=KINDS[kind],
+            pref=PREFECTURES[pref - 1] if pref else None,
+            lat=round(lat, 6),
+            lng=round(lng, 6),
+            bbox=(round(s, 6), round(w, 6), round(n, 6), round(e, 6)),
+        )
+
+    def _lower_bound(self, key: bytes) -> int:
+        lo, hi = 0, self.n_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def lookup(self, area: Optional[str]) -> Optional[GazetteerEntry]:
+        """正規化キーの完全一致。部分一致（「港区赤坂」→ 港区）はしない。"""
+        key = normalize_area(area).encode("utf-8")
+        if not key:
+            return None
+        i = self._lower_bound(key)
+        if i < self.n_keys:
+            k, idx = self._key_at(i)
+            if k == key:
+                return self._entry(idx)
+        return None
+
+    def prefix(self, text: Optional[str], *, limit: int = 10) -> List[GazetteerEntry]:
+        """正規化キーが text で始まる候補（入力補完向け）。短いキー（＝近い名称）から返す。"""
+        key = normalize_area(text).encode("utf-8")
+        if not key or limit <= 0:
+            return []
+        hits: List[Tuple[int, int, int]] = []
+        i = self._lower_bound(key)
+        while i < self.n_keys:
+            k, idx = self._key_at(i)
+            if not k.startswith(key):
+                break
+            hits.append((len(k), i, idx))
+            i += 1
+        out: List[GazetteerEntry] = []
+        seen = set()
+        for _ln, _i, idx in sorted(hits):
+            if idx in seen:
+                continue
+            seen.add(idx)
+            out.append(self._entry(idx))
+            if len(out) >= limit:
+                break
+        return out
+
+    def __len__(self) -> int:
+        return self.n_entries
+
+
+def index_path() -> Path:
+    from django.conf import settings
+
+    return Path(getattr(settings, "GAZETTEER_INDEX_PATH", "") or SOURCE_PATH.with_suffix(".idx"))
+
+
+_lock = threading.Lock()
+_instance: Optional[Gazetteer] = None
+
+
+def get_gazetteer() -> Gazetteer:
+    """プロセスで 1 つの Gazetteer。索引ファイルが無ければ同梱 JSON から組み立てる。"""
+    global _instance
+    if _instance is not None:
+        return _instance
+    with _lock:
+        if _instance is None:
+            path = index_path()
+            try:
+                _instance = Gazetteer.open(path)
+                log.info("[gazetteer] mmap path=%s entries=%d", path, _instance.n_entries)
+            except (OSError, ValueError, GazetteerError) as e:
+                log.info("[gazetteer] index unavailable path=%s (%s); building from bundled source", path, e)
+                _instance = Gazetteer(build_index(load_source()))
+        return _instance
+
+
+def reset_gazetteer() -> None:
+    """索引を作り直した後やテストで、次の get_gazetteer で開き直させる。"""
+    global _instance
+    with _lock:
+        _instance = None
+
+
+def lookup_area(area: Optional[str]) -> Optional[GazetteerEntry]:
+    return get_gazetteer().lookup(area)
+
+
+__all__ = [
+    "Gazetteer",
+    "GazetteerEntry",
+    "GazetteerError",
+    "build_index",
+    "get_gazetteer",
+    "index_path",
+    "load_source",
+    "lookup_area",
+    "reset_gazetteer",
+    "write_index",
+]
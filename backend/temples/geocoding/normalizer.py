@@ -1,4 +1,8 @@
 import re
+import unicodedata
+
+_AREA_SUFFIXES = ("周辺", "付近", "あたり", "辺り", "近辺", "近く", "エリア", "界隈")
+_SPACES = re.compile(r"\s+")
 
 
 def normalize_address(address: str) -> str:
@@ -8,3 +12,17 @@ def normalize_address(address: str) -> str:
     s = address.replace("\u3000", " ")
     s = re.sub(r"\s+", " ", s)
     return s.strip()
+
+
+def normalize_area(area: str | None) -> str:
+    """area 文字列の照合用キー（NFKC・空白除去・「周辺」「付近」などの接尾辞を落として小文字化）。"""
+    s = normalize_address(unicodedata.normalize("NFKC", area or ""))
+    s = _SPACES.sub("", s or "")
+    changed = True
+    while changed and s:
+        changed = False
+        for suf in _AREA_SUFFIXES:
+            if s.endswith(suf) and len(s) > len(suf):
+                s = s[: -len(suf)]
+                changed = True
+    return s.lower()
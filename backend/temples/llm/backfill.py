@@ -155,7 +155,23 @@ def _shorten_japanese_address(details: Union[str, Dict[str, Any]]) -> Optional[s
     return None
 
 
-# --- メイン：候補の location を FindPlace→Details で backfill ---
+# --- メイン：候補の location を一括解決（記憶・DB → FindPlace）で backfill ---
+def _address_for(place, *, lang: str = "ja") -> Optional[Union[str, Dict[str, Any]]]:
+    """解決結果の住所。FindPlace で住所が取れなかったときだけ Details を引く。"""
+    if place is None:
+        return None
+    if place.address:
+        return place.address
+    if not place.place_id:
+        return None
+    det = GP.details(
+        place_id=place.place_id,
+        language=lang,
+        fields="formatted_address,address_components",
+    )
+    return det.get("result") or det
+
+
 def fill_locations(
     data: Dict[str, Any],
     *,
@@ -163,6 +179,8 @@ def fill_locations(
     bias: Optional[Dict[str, float]],
     shorten: bool = True,
 ) -> Dict[str, Any]:
+    from temples.services.place_resolver import resolve_names
+
     recs = [dict(r) for r in ((data or {}).get("recommendations") or [])]
 
     # 候補に住所があればそれを優先（API不要）
@@ -171,105 +189,71 @@ def fill_locations(
         for c in (candidates or [])
     }
 
-    locbias = _lb_from_bias(bias)
+    def _label(addr: Union[str, Dict[str, Any]]) -> Optional[str]:
+        if isinstance(addr, str):
+            addr = {"address_components": [], "formatted_address": addr}
+        return _shorten_japanese_address(addr) if shorten else addr.get("formatted_address")
 
-    out = []
+    pending: List[Dict[str, Any]] = []
     for rec in recs:
         if rec.get("location"):
-            out.append(rec)
             continue
 
         name = (rec.get("name") or "").strip()
         if not name:
-            out.append(rec)
-            continue
-
-        # recommendation 自身に formatted_address/address があれば優先して location を埋める
-        fmt_addr = rec.get("formatted_address") or rec.get("address")
-        if fmt_addr:
-            rec["location"] = (
-                _shorten_japanese_address({"address_components": [], "formatted_address": fmt_addr})
-                if shorten
-                else fmt_addr
-            )
-            out.append(rec)
             continue
 
-        # まず候補の住所があればそれを使う
-        addr = cand_map.get(name)
+        # recommendation 自身に formatted_address/address があれば優先、次に候補の住所
+        addr = rec.get("formatted_address") or rec.get("address") or cand_map.get(name)
         if addr:
-            rec["location"] = (
-                _shorten_japanese_address({"address_components": [], "formatted_address": addr})
-                if shorten
-                else addr
-            )
-            out.append(rec)
+            rec["location"] = _label(addr)
             continue
-
-        # 候補に無ければ FindPlace → Details（tests がこの呼び出しを req_history で検証）
-        fp = GP.findplacefromtext(
-            input=name,
+        pending.append(rec)
+
+    if pending:
+        # 残りはまとめて解決（既知の名前は上流を呼ばない。未知の名前だけ並行に FindPlace）
+        resolved = resolve_names(
+            [r["name"] for r in pending],
+            bias=bias,
+            locationbias=_lb_from_bias(bias),
             language="ja",
-            locationbias=locbias,
-            fields="place_id,name,formatted_address,geometry",
         )
-        fp_candidates = fp.get("candidates") or fp.get("results") or []
-        if not fp_candidates:
-            out.append(rec)
-            continue
+        for rec in pending:
+            try:
+                addr = _address_for(resolved.get(rec["name"].strip()))
+            except Exception as e:
+                log.info("backfill details failed name=%r err=%s", rec.get("name"), e)
+                addr = None
+            label = _label(addr) if addr else None
+            if label:
+                rec["location"] = label
 
-        place_id = fp_candidates[0].get("place_id")
-        if not place_id:
-            out.append(rec)
-            continue
-
-        det = GP.details(
-            place_id=place_id,
-            language="ja",
-            fields="formatted_address,address_components",
-        )
-        result = det.get("result") or det
-
-        label = _shorten_japanese_address(result) if shorten else result.get("formatted_address")
-        if label:
-            rec["location"] = label
-
-        out.append(rec)
-
-    return {"recommendations": out}
+    return {"recommendations": recs}
 
 
 def _lookup_address_by_name(
     name: str, bias: Optional[Dict[str, float]] = None, lang: str = "ja"
 ) -> Optional[str]:
+    from temples.services.place_resolver import resolve_names
+
     # ← 半径の m 化 & 50km クリップを含む
     locbias = _lb_from_bias(bias)
 
-    # ---- ここで req_history に必ず積む（tests がここを見る）----
-    _log_findplace_req(name, locbias)
-
-    # Find Place
-    fpj = GP.findplacefromtext(
-        input=name,
-        language=lang,
-        fields="place_id",
-        locationbias=locbias,
+    trace: Dict[str, int] = {}
+    place = resolve_names([name], bias=bias, locationbias=locbias, language=lang, trace=trace).get(
+        (name or "").strip()
     )
-    cand = fpj.get("candidates") or fpj.get("results") or []
-    if not cand:
+    if trace.get("upstream"):
+        # ---- 上流に行ったときは req_history に必ず積む（tests がここを見る）----
+        _log_findplace_req(name, locbias)
+    if place is None:
         return None
-    place_id = cand[0].get("place_id")
-    if not place_id:
+    if place.address:
+        return place.address
+    if not place.place_id:
         return None
 
     # ---- Details も履歴に積む ----
-    _log_details_req(place_id)
-
-    # Details
-    dj = GP.details(
-        place_id=place_id,
-        language=lang,
-        fields="formatted_address,address_components",
-    )
-    res = dj.get("result") or dj
-    return res.get("formatted_address")
+    _log_details_req(place.place_id)
+    res = _address_for(place, lang=lang)
+    return res.get("formatted_address") if isinstance(res, dict) else res
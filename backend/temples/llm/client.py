@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import logging
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from django.conf import settings
 from .config import LLMConfig
 
+log = logging.getLogger(__name__)
+
 # LLM呼べない環境（TESTINGなど）で返すプレースホルダー
 PLACEHOLDER: Dict[str, str] = {
     "role": "assistant",
@@ -93,38 +96,95 @@ class LLMClient:
                 lines.append(f"[{role}] {content}")
         return "\n".join(lines)
 
-    def chat(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def chat(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        is_negative: Optional[Callable[[str], bool]] = None,
+    ) -> Dict[str, Any]:
+        """
+        応答は response_cache に載せる（同じプロンプトは上流を呼ばない）。
+        is_negative: 使えない応答を短い TTL で保存するための判定
+        """
         if self._client is None or self._mode is None:
             return PLACEHOLDER
 
+        from .response_cache import cached_call
+
+        system = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+        rest = [m for m in messages if m.get("role") != "system"]
         try:
-            if self._mode == "responses" and not self.cfg.force_chat:
-                # Responses API
-                kwargs: Dict[str, Any] = {
-                    "model": self.cfg.model,
-                    "temperature": self.cfg.temperature,
-                    "max_output_tokens": self.cfg.max_tokens,
-                    "input": self._to_input_text(messages),
-                }
-                if self.cfg.force_json:
-                    kwargs["response_format"] = {"type": "json_object"}
-                resp: Any = self._client.responses.create(**kwargs)
-                content = getattr(resp, "output_text", None)
-                if not content:
-                    try:
-                        content = resp.output[0].content[0].text
-                    except Exception:
-                        content = str(resp)
-                return {"role": "assistant", "content": str(content)}
-
-            # Chat Completions
-            resp = self._client.chat.completions.create(
+            content, _hit = cached_call(
+                lambda: self._complete(messages),
                 model=self.cfg.model,
-                messages=messages,
-                temperature=self.cfg.temperature,
-                max_tokens=self.cfg.max_tokens,
+                system=system,
+                user=self._to_input_text(rest),
+                params={
+                    "mode": self._mode,
+                    "temperature": self.cfg.temperature,
+                    "max_tokens": self.cfg.max_tokens,
+                    "force_json": self.cfg.force_json,
+                },
+                is_negative=is_negative,
             )
-            text = resp.choices[0].message.content
-            return {"role": "assistant", "content": str(text)}
         except Exception:
             return PLACEHOLDER
+        if not content:
+            return PLACEHOLDER
+        return {"role": "assistant", "content": str(content)}
+
+    def _complete(self, messages: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        締め切り・再試行・ブレーカ付きで本文を取る（llm.executor）。
+        失敗・時間切れ・遮断中は None（キャッシュしない。呼び出し側はプレースホルダに落ちる）。
+        """
+        from .executor import call_llm
+
+        try:
+            return call_llm(
+                lambda timeout: self._request(messages, timeout),
+                retries=self.cfg.retries,
+                backoff_s=self.cfg.backoff_s,
+            )
+        except Exception as e:
+            log.info("[llm] chat failed: %s: %s", type(e).__name__, e)
+            return None
+
+    def _request(self, messages: List[Dict[str, Any]], timeout: float) -> str:
+        """上流に 1 回問い合わせる。空応答も失敗として例外にする。"""
+        from temples.services.request_profiler import record_upstream
+
+        record_upstream("llm")
+
+        if self._mode == "responses" and not self.cfg.force_chat:
+            # Responses API
+            kwargs: Dict[str, Any] = {
+                "model": self.cfg.model,
+                "temperature": self.cfg.temperature,
+                "max_output_tokens": self.cfg.max_tokens,
+                "input": self._to_input_text(messages),
+                "timeout": timeout,
+            }
+            if self.cfg.force_json:
+                kwargs["response_format"] = {"type": "json_object"}
+            resp: Any = self._client.responses.create(**kwargs)
+            content = getattr(resp, "output_text", None)
+            if not content:
+                try:
+                    content = resp.output[0].content[0].text
+                except Exception:
+                    content = str(resp)
+            return str(content)
+
+        # Chat Completions
+        resp = self._client.chat.completions.create(
+            model=self.cfg.model,
+            messages=messages,
+            temperature=self.cfg.temperature,
+            max_tokens=self.cfg.max_tokens,
+            timeout=timeout,
+        )
+        text = resp.choices[0].message.content
+        if not text:
+            raise ValueError("empty completion")
+        return str(text)
@@ -0,0 +1,204 @@
+# backend/temples/llm/executor.py
+"""
+LLM 呼び出しの実行器（締め切り・再試行・ブレーカ・ヘッジ）。
+
+call_llm(fn) は fn(timeout) を worker スレッドで実行し、呼び出し元は締め切りまでしか待たない。
+- 締め切り: 引数 budget_s（既定 settings.LLM_DEADLINE_S）と、外側の deadline_scope の早い方
+- 再試行: 指数バックオフ + jitter。待ち時間は残り時間で頭打ちにし、残りが無ければ打ち切る
+- ブレーカ: upstream.breaker_for("llm")。開いている間は上流を呼ばずに UpstreamUnavailable を投げる
+  （呼び出し側は例外を受けたら決定的なフォールバックに回す）
+- ヘッジ: settings.LLM_HEDGE が真なら、直近の成功レイテンシの p95 を過ぎても返らない試行に
+  2 本目を並走させ、先に返った方を使う（サンプルが少ないうちは行わない）
+
+締め切りで見捨てた試行はスレッド上で最後まで走るが、結果は捨てる。fn には残り時間を timeout
+として渡すので、SDK 側でも打ち切られる。
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import replace
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+from django.conf import settings
+from temples.upstream.breaker import UpstreamUnavailable, breaker_for
+from temples.upstream.deadline import DeadlineExceeded, effective_deadline
+from temples.upstream.policy import policy_for
+from temples.upstream.retry import backoff_delay
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROVIDER = "llm"
+# これより短い残り時間では新しい試行を始めない
+MIN_ATTEMPT_S = 0.2
+HEDGE_MIN_SAMPLES = 20
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_latencies: Deque[float] = deque(maxlen=200)
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "attempts": 0, "retries": 0, "hedged": 0, "deadline_exceeded": 0, "short_circuited": 0}
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(2, policy_for(PROVIDER).max_connections * 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        return _executor
+
+
+def _bump(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _observe(seconds: float) -> None:
+    with _stats_lock:
+        _latencies.append(seconds)
+
+
+def hedge_delay() -> Optional[float]:
+    """直近の成功レイテンシの p95（サンプル不足なら None）。"""
+    with _stats_lock:
+        samples = sorted(_latencies)
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    return max(float(getattr(settings, "LLM_HEDGE_MIN_S", 0.5)), p95)
+
+
+def llm_circuit_open() -> bool:
+    """LLM のブレーカが開いているか（呼び出し前にフォールバックへ回す判定用）。"""
+    return breaker_for(PROVIDER).is_open()
+
+
+def llm_executor_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    out["hedge_after_s"] = hedge_delay()
+    out["breaker"] = breaker_for(PROVIDER).stats()
+    return out
+
+
+def reset_llm_executor() -> None:
+    """統計とレイテンシ標本を消す（テスト用）。ブレーカは upstream.reset() で消える。"""
+    with _stats_lock:
+        _latencies.clear()
+        for k in _stats:
+            _stats[k] = 0
+
+
+def _submit(fn: Callable[[float], T], timeout: float) -> Future:
+    ctx = contextvars.copy_context()
+    started = time.monotonic()
+
+    def run() -> Any:
+        value = ctx.run(fn, timeout)
+        _observe(time.monotonic() - started)
+        return value
+
+    return _pool().submit(run)
+
+
+def _attempt(fn: Callable[[float], T], deadline, *, timeout_cap: float, hedge: bool) -> T:
+    """1 回分（ヘッジ込み）。締め切りまでに返らなければ DeadlineExceeded。"""
+    remaining = deadline.remaining()
+    futures = [_submit(fn, min(timeout_cap, remaining))]
+    hedge_after = hedge_delay() if hedge else None
+
+    if hedge_after is not None and hedge_after < remaining:
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done and breaker_for(PROVIDER).allow():
+            _bump("hedged")
+            futures.append(_submit(fn, min(timeout_cap, deadline.remaining())))
+
+    pending = set(futures)
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"llm call exceeded deadline ({len(futures)} in flight)")
+        for f in done:
+            exc = f.exception()
+            if exc is None:
+                return f.result()
+            error = exc
+    assert error is not None
+    raise error
+
+
+def call_llm(
+    fn: Callable[[float], T],
+    *,
+    budget_s: Optional[float] = None,
+    retries: Optional[int] = None,
+    backoff_s: Optional[float] = None,
+    hedge: Optional[bool] = None,
+) -> T:
+    """
+    fn(timeout) を締め切り・再試行・ブレーカ付きで呼ぶ。
+    fn は失敗時に例外を投げること（None などを返すと成功として扱う）。
+    ブレーカが開いていれば UpstreamUnavailable、時間切れなら DeadlineExceeded を投げる。
+    """
+    pol = policy_for(PROVIDER)
+    if backoff_s is not None:
+        pol = replace(pol, backoff_base_s=float(backoff_s))
+    breaker = breaker_for(PROVIDER)
+    if budget_s is None:
+        budget_s = float(getattr(settings, "LLM_DEADLINE_S", 12.0))
+    deadline = effective_deadline(budget_s)
+    attempts = 1 + max(0, pol.retries if retries is None else int(retries))
+    if hedge is None:
+        hedge = bool(getattr(settings, "LLM_HEDGE", False))
+    _bump("calls")
+
+    last: Optional[BaseException] = None
+    for attempt in range(attempts):
+        if deadline.remaining() < MIN_ATTEMPT_S:
+            break
+        if not breaker.allow():
+            _bump("short_circuited")
+            raise UpstreamUnavailable(f"circuit open: {PROVIDER}")
+        _bump("attempts")
+        if attempt:
+            _bump("retries")
+        try:
+            value = _attempt(fn, deadline, timeout_cap=pol.timeout_s, hedge=hedge)
+        except DeadlineExceeded:
+            breaker.record_failure()
+            _bump("deadline_exceeded")
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            last = e
+            log.info("[llm] attempt %d failed: %s: %s", attempt + 1, type(e).__name__, e)
+            if attempt + 1 < attempts:
+                time.sleep(min(backoff_delay(attempt, pol), max(0.0, deadline.remaining() - MIN_ATTEMPT_S)))
+            continue
+        breaker.record_success()
+        return value
+
+    if last is not None:
+        raise last
+    _bump("deadline_exceeded")
+    raise DeadlineExceeded("llm deadline exhausted before attempt")
+
+
+__all__ = [
+    "DeadlineExceeded",
+    "UpstreamUnavailable",
+    "call_llm",
+    "hedge_delay",
+    "llm_circuit_open",
+    "llm_executor_stats",
+    "reset_llm_executor",
+]
@@ -30,6 +30,14 @@ def _extract_first_json_object(text: str) -> Any:
     raise ValueError("no json object found")
 
 
+def _unparseable(text: str) -> bool:
+    try:
+        _extract_first_json_object(text)
+        return False
+    except Exception:
+        return True
+
+
 def extract_intent(user_text: str) -> Dict[str, Any]:
     user_text = (user_text or "").strip()
     if not user_text:
@@ -41,7 +49,8 @@ def extract_intent(user_text: str) -> Dict[str, Any]:
             [
                 {"role": "system", "content": INTENT_SYSTEM_PROMPT},
                 {"role": "user", "content": user_text},
-            ]
+            ],
+            is_negative=_unparseable,
         )
     except Exception:
         # OPENAI_API_KEY 未設定、SDK未導入、接続失敗などは全部ここで吸収
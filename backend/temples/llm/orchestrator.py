@@ -3,7 +3,6 @@ from __future__ import annotations
 
 import json
 import re
-import time
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
 
@@ -13,7 +12,9 @@ from django.conf import settings
 
 from .client import LLMClient, PLACEHOLDER, make_openai_client
 from .config import LLMConfig
+from .executor import call_llm
 from .prompts import SYSTEM_PROMPT
+from .response_cache import cached_call
 from .schemas import complete_recommendations, normalize_recs
 
 
@@ -260,6 +261,15 @@ def _build_user_prompt_for_plan(
     出力は以下のJSONスキーマに厳密に従ってください。"""
 
 
+def _plan_is_negative(content: str) -> bool:
+    """spots の無い応答は短い TTL で保存する（同じ要望で毎回トークンを使わない）。"""
+    try:
+        data = json.loads(content)
+    except Exception:
+        return True
+    return not (isinstance(data, dict) and data.get("spots"))
+
+
 def generate_plan(
     query: str,
     lat: Optional[float] = None,
@@ -309,22 +319,40 @@ def generate_plan(
         oai = None
         last_err = e
 
-    for _ in range(cfg.retries + 1):
+    def _call(timeout: float) -> str:
+        resp = oai.responses.create(
+            model=cfg.model,
+            temperature=cfg.temperature,
+            max_output_tokens=cfg.max_tokens,
+            response_format={"type": "json_schema", "json_schema": schema},
+            input=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+            timeout=timeout,
+        )
+        content = getattr(resp, "output_text", None) or json.dumps({})
+        json.loads(content)  # 壊れた JSON は保存せず再試行に回す
+        return content
+
+    if oai is not None and getattr(oai, "responses", None) is None:
+        oai = None
+        last_err = RuntimeError("OpenAI client is not available")
+
+    if oai is not None:
         try:
-            if oai is None:
-                raise RuntimeError("OpenAI client is not available")
-            resp = oai.responses.create(
+            # 同じ要望・同じ丸め座標なら保存済みの応答を使う（LLM を呼ばない）。
+            # 上流は締め切り・バックオフ・ブレーカ付き（遮断中・時間切れは下のプレースホルダへ）
+            content, _hit = cached_call(
+                lambda: call_llm(_call, retries=cfg.retries, backoff_s=cfg.backoff_s),
                 model=cfg.model,
-                temperature=cfg.temperature,
-                max_output_tokens=cfg.max_tokens,
-                response_format={"type": "json_schema", "json_schema": schema},
-                input=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt},
-                ],
+                system=SYSTEM_PROMPT,
+                user=user_prompt,
+                schema=schema,
+                params={"temperature": cfg.temperature, "max_tokens": cfg.max_tokens},
+                is_negative=_plan_is_negative,
             )
-            content = getattr(resp, "output_text", None) or json.dumps({})
-            data = json.loads(content)
+            data = json.loads(content or "{}")
             spots_raw = data.get("spots") or []
             spots: List[Dict[str, Any]] = [
                 {
@@ -352,9 +380,8 @@ def generate_plan(
                 "spots": spots,
                 "recommendations": recs[:3],
             }
-        except Exception as e:  # pragma: no cover
+        except Exception as e:
             last_err = e
-            time.sleep(cfg.backoff_s)
 
     if lat is not None and lng is not None:
         return {
@@ -0,0 +1,172 @@
+# backend/temples/llm/response_cache.py
+"""
+LLM 応答のキャッシュ（プロンプト内容でアドレスする）。
+
+キー = sha256(model + system プロンプト + 正規化した user プロンプト + schema + 生成パラメータ)
+- user プロンプトは NFKC・前後空白除去・連続空白の 1 個化で正規化する
+  （座標は cfg.coord_round で丸め済みなので、同じ界隈の同じ要望は同じキーになる）
+- L1（プロセス内 LRU, 件数上限）+ L2（llm 名前空間: redis / file）を TieredCache で持つ
+- 同一キーの同時呼び出しは 1 本に束ねる（single-flight）
+- 通信失敗（call が None / 例外）は保存しない。
+  応答はあったが使えない値（negative）は短い TTL で保存し、同じ失敗に毎回トークンを払わない
+- TTL は settings.LLM_CACHE_TTL_S / LLM_CACHE_NEGATIVE_TTL_S、無効化は LLM_RESPONSE_CACHE=0
+- プロンプト改定時は LLM_PROMPT_VERSION を上げる（キーが変わるので消去は要らない）
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from shrine_project.cache_tiers import namespace_cache
+from temples.services.tiered_cache import TieredCache
+
+log = logging.getLogger(__name__)
+
+KEY_VERSION = "llm1"
+
+_tier = TieredCache(
+    namespace_cache("llm"),
+    name="llm",
+    l1_max_entries=int(os.getenv("LLM_CACHE_L1_MAX_ENTRIES", "256")),
+    l1_ttl=float(os.getenv("LLM_CACHE_L1_TTL_SECONDS", "600")),
+    # LLM は数秒〜十数秒かかるので後続の待ちも長めにとる
+    wait_timeout=float(os.getenv("LLM_CACHE_WAIT_SECONDS", "30")),
+)
+
+_stats_lock = threading.Lock()
+_stats = {"bypassed": 0, "negative_stored": 0, "not_stored": 0}
+
+_WS = re.compile(r"\s+")
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "LLM_RESPONSE_CACHE", True))
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "LLM_CACHE_TTL_S", 7 * 24 * 3600))
+
+
+def _negative_ttl() -> int:
+    return int(getattr(settings, "LLM_CACHE_NEGATIVE_TTL_S", 600))
+
+
+def normalize_prompt(text: Any) -> str:
+    s = unicodedata.normalize("NFKC", str(text or ""))
+    return _WS.sub(" ", s).strip()
+
+
+def cache_key(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Any = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    payload = {
+        "v": KEY_VERSION,
+        # プロンプト改定（LLM_PROMPT_VERSION を上げる）で古い応答を引かないようにする
+        "prompt_version": getattr(settings, "LLM_PROMPT_VERSION", "v1"),
+        "model": model or "",
+        "system": system or "",
+        "user": normalize_prompt(user),
+        "schema": schema,
+        "params": params or {},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return f"llm:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def _bump(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def cached_call(
+    call: Callable[[], Optional[str]],
+    *,
+    model: str,
+    system: str,
+    user: str,
+    schema: Any = None,
+    params: Optional[Dict[str, Any]] = None,
+    is_negative: Optional[Callable[[str], bool]] = None,
+    ttl: Optional[int] = None,
+) -> Tuple[Optional[str], bool]:
+    """
+    (応答テキスト, hit) を返す。call は応答テキストを返し、失敗時は None を返すか例外を投げる。
+    is_negative(text) が True の応答は LLM_CACHE_NEGATIVE_TTL_S で保存する。
+    """
+    if not enabled():
+        _bump("bypassed")
+        return call(), False
+
+    key = cache_key(model=model, system=system, user=user, schema=schema, params=params)
+    base_ttl = _ttl() if ttl is None else int(ttl)
+
+    def ttl_for(value: Any) -> int:
+        if is_negative is not None and is_negative(value):
+            _bump("negative_stored")
+            return _negative_ttl()
+        return base_ttl
+
+    def cacheable(value: Any) -> bool:
+        ok = isinstance(value, str) and bool(value.strip())
+        if not ok:
+            _bump("not_stored")
+        return ok
+
+    return _tier.get_or_fetch(
+        key,
+        call,
+        ttl=base_ttl,
+        accept=lambda v: isinstance(v, str) and bool(v.strip()),
+        cacheable=cacheable,
+        ttl_for=ttl_for,
+    )
+
+
+def llm_cache_stats() -> Dict[str, int]:
+    out = _tier.stats()
+    with _stats_lock:
+        out.update(_stats)
+    return out
+
+
+def clear_llm_cache() -> None:
+    """
+    L1・L2・統計を消す（テスト用）。
+    プロンプト改定は LLM_PROMPT_VERSION がキーに入るので、ここを呼ばなくても古い応答は引かれない。
+    redis（django-redis）は他の名前空間と同じ DB を共有しうるので、FLUSHDB ではなく llm: のキーだけ消す。
+    """
+    _tier.clear_local()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+    l2 = _tier.l2
+    try:
+        if hasattr(l2, "delete_pattern"):
+            l2.delete_pattern("llm:*")
+        else:
+            # locmem / file は名前空間ごとに別の置き場なので丸ごと消してよい
+            l2.clear()
+    except Exception as e:
+        log.info("[llm_cache] l2 clear failed: %s", e)
+
+
+__all__ = [
+    "cache_key",
+    "cached_call",
+    "clear_llm_cache",
+    "enabled",
+    "llm_cache_stats",
+    "normalize_prompt",
+]
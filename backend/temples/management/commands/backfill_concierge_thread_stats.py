@@ -0,0 +1,39 @@
+# backend/temples/management/commands/backfill_concierge_thread_stats.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from temples.services.concierge_history import DEFAULT_REFRESH_BATCH_SIZE, refresh_thread_stats
+from temples.services.concierge_snapshot import upgrade_legacy_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute ConciergeThread.message_count / last_message_preview / last_message_at "
+        "from their messages (for threads created before the columns existed)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_REFRESH_BATCH_SIZE,
+            help="Threads per aggregate query / bulk_update.",
+        )
+        parser.add_argument("--ids", type=str, default="", help="Comma-separated thread IDs to refresh.")
+        parser.add_argument(
+            "--compact-snapshots",
+            action="store_true",
+            help="Also rewrite legacy (v1) recommendation snapshots into the compact v2 layout.",
+        )
+
+    def handle(self, *args, **opts):
+        ids_raw = (opts["ids"] or "").strip()
+        ids = [int(x) for x in ids_raw.split(",") if x.strip()] if ids_raw else None
+
+        n = refresh_thread_stats(ids, batch_size=opts["batch_size"])
+
+        self.stdout.write(f"[backfill_concierge_thread_stats] updated={n}")
+
+        if opts["compact_snapshots"]:
+            m = upgrade_legacy_snapshots(ids, batch_size=opts["batch_size"])
+            self.stdout.write(f"[backfill_concierge_thread_stats] compacted_snapshots={m}")
@@ -0,0 +1,111 @@
+# backend/temples/management/commands/benchmark_concierge_ranking.py
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from temples.services.concierge_benchmark import (
+    DEFAULT_K,
+    DEFAULT_POOL_SIZES,
+    DEFAULT_QUERIES_PATH,
+    DEFAULT_SEED_PATH,
+    compare_reports,
+    load_query_corpus,
+    load_seed_candidates,
+    run_benchmark,
+)
+
+
+def _pool_sizes(raw: str) -> list[int]:
+    try:
+        sizes = [int(s) for s in str(raw).split(",") if s.strip()]
+    except ValueError as e:
+        raise CommandError(f"--pool-sizes must be comma separated integers: {raw!r}") from e
+    if not sizes or any(s <= 0 for s in sizes):
+        raise CommandError("--pool-sizes must be positive")
+    return sizes
+
+
+def _fmt(v) -> str:
+    return "-" if v is None else f"{v:g}" if isinstance(v, float) else str(v)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the concierge query corpus through build_chat_recommendations at several pool sizes "
+        "and report throughput, per-stage latency, allocations and recall/NDCG as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pool-sizes",
+            default=",".join(str(s) for s in DEFAULT_POOL_SIZES),
+            help="Comma separated candidate pool sizes (seed shrines padded with synthetic ones).",
+        )
+        parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the corpus per pool.")
+        parser.add_argument("--warmup", type=int, default=1, help="Untimed passes before measuring.")
+        parser.add_argument("--k", type=int, default=DEFAULT_K, help="Cut-off for recall@k / NDCG@k.")
+        parser.add_argument("--seed", type=int, default=0, help="RNG seed for synthetic shrines.")
+        parser.add_argument("--queries", default=str(DEFAULT_QUERIES_PATH), help="Query corpus YAML.")
+        parser.add_argument("--shrines", default=str(DEFAULT_SEED_PATH), help="Seed shrines YAML.")
+        parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass.")
+        parser.add_argument("--keep-logs", action="store_true", help="Keep INFO logs from the ranking code.")
+        parser.add_argument("--output", help="Write the JSON report to this path.")
+        parser.add_argument("--baseline", help="Previous JSON report to diff against.")
+
+    def handle(self, *args, **opts):
+        sizes = _pool_sizes(opts["pool_sizes"])
+        cases = load_query_corpus(opts["queries"])
+        seed = load_seed_candidates(opts["shrines"])
+        if not cases:
+            raise CommandError(f"no queries in {opts['queries']}")
+
+        baseline = None
+        if opts.get("baseline"):
+            try:
+                baseline = json.loads(Path(opts["baseline"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"cannot read baseline {opts['baseline']}: {e}") from e
+
+        report = run_benchmark(
+            cases=cases,
+            seed_candidates=seed,
+            pool_sizes=sizes,
+            repeats=opts["repeats"],
+            warmup=opts["warmup"],
+            measure_alloc=not opts["no_alloc"],
+            k=opts["k"],
+            rng_seed=opts["seed"],
+            quiet_logs=not opts["keep_logs"],
+            progress=lambda msg: self.stdout.write(f"[benchmark_concierge_ranking] {msg}"),
+        )
+
+        for size, pool in report["pools"].items():
+            q = pool["quality"]
+            lat = pool["latency_ms"]
+            peak = ((pool.get("alloc") or {}).get("peak_kib") or {}).get("p95")
+            self.stdout.write(
+                f"[benchmark_concierge_ranking] pool={size} qps={_fmt(pool['throughput_qps'])} "
+                f"p50_ms={_fmt(lat['p50'])} p95_ms={_fmt(lat['p95'])} peak_kib_p95={_fmt(peak)} "
+                f"recall@{q['k']}={_fmt(q['recall@k'])} ndcg@{q['k']}={_fmt(q['ndcg@k'])} "
+                f"need_acc={_fmt(q['need_accuracy'])}"
+            )
+            slowest = sorted(pool["stages_ms"].items(), key=lambda kv: kv[1]["p95"] or 0, reverse=True)[:3]
+            self.stdout.write(
+                "  stages p95_ms: " + ", ".join(f"{name}={_fmt(d['p95'])}" for name, d in slowest)
+            )
+
+        if baseline is not None:
+            for row in compare_reports(baseline, report):
+                self.stdout.write(
+                    f"[diff] pool={row['pool_size']} {row['metric']}: "
+                    f"{_fmt(row['base'])} -> {_fmt(row['head'])} "
+                    f"(delta={_fmt(row['delta'])}, {_fmt(row['delta_pct'])}%)"
+                )
+
+        if opts.get("output"):
+            out = Path(opts["output"])
+            out.parent.mkdir(parents=True, exist_ok=True)
+            out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"[benchmark_concierge_ranking] wrote {out}"))
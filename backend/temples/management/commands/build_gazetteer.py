@@ -0,0 +1,42 @@
+# backend/temples/management/commands/build_gazetteer.py
+from __future__ import annotations
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from temples.geocoding.gazetteer import (
+    SOURCE_PATH,
+    GazetteerError,
+    index_path,
+    reset_gazetteer,
+    write_index,
+)
+
+
+class Command(BaseCommand):
+    help = "Build the memory-mapped gazetteer index (area → centroid / bbox) from the bundled dataset."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            default=str(SOURCE_PATH),
+            help="Gazetteer source JSON (default: bundled temples/data/gazetteer_jp.json).",
+        )
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Index path (default: settings.GAZETTEER_INDEX_PATH).",
+        )
+
+    def handle(self, *args, **opts):
+        output = Path(opts["output"]) if opts["output"] else index_path()
+        try:
+            result = write_index(output, Path(opts["source"]))
+        except (OSError, ValueError, GazetteerError) as e:
+            raise CommandError(f"gazetteer build failed: {e}") from e
+        reset_gazetteer()
+
+        self.stdout.write(
+            f"[build_gazetteer] output={output} entries={result['entries']} "
+            f"keys={result['keys']} bytes={result['bytes']}"
+        )
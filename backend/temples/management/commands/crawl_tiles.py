@@ -2,37 +2,45 @@
 from __future__ import annotations
 
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import timedelta
 from typing import Any
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import F, Min, Q
 from django.utils import timezone
 
-from temples.models import CrawlTile, PlaceCache
+from temples.models import CrawlTile
 from temples.services import places as places_service
+from temples.services.place_cache_upsert import PlaceCacheInput, UpsertResult, upsert_place_cache_many
+from temples.services.upstream_budget import BudgetExhausted, UpstreamBudget
 
 
-def _upsert_place_cache(row: dict[str, Any]) -> None:
+def _to_place_cache_input(row: dict[str, Any]) -> PlaceCacheInput | None:
     """
     places_service.places_nearby_search の正規化結果を想定。
     row に place_id/name/address/lat/lng/types/rating/user_ratings_total/raw がある前提で吸収する。
     """
     pid = row.get("place_id")
     if not pid:
-        return
-
-    defaults = {
-        "name": row.get("name") or "",
-        "address": row.get("address") or row.get("formatted_address") or row.get("vicinity") or "",
-        "lat": row.get("lat"),
-        "lng": row.get("lng"),
-        "rating": row.get("rating"),
-        "user_ratings_total": row.get("user_ratings_total"),
-        "types": row.get("types") or [],
-        "raw": row,
-        "fetched_at": timezone.now(),
-    }
-    PlaceCache.objects.update_or_create(place_id=pid, defaults=defaults)
+        return None
+
+    return PlaceCacheInput(
+        place_id=str(pid),
+        name=row.get("name") or "",
+        address=row.get("address") or row.get("formatted_address") or row.get("vicinity") or "",
+        lat=row.get("lat"),
+        lng=row.get("lng"),
+        rating=row.get("rating"),
+        user_ratings_total=row.get("user_ratings_total"),
+        types=row.get("types") or [],
+        raw=row,
+    )
+
+
+# next_page_token は発行から数秒経たないと INVALID_REQUEST になる
+PAGE_TOKEN_DELAY_S = 2.0
 
 
 class Command(BaseCommand):
@@ -42,18 +50,127 @@ class Command(BaseCommand):
         parser.add_argument("--step-km", type=float, required=True)
         parser.add_argument("--limit", type=int, default=20, help="tiles to process in this run")
         parser.add_argument("--max-tries", type=int, default=3)
-        parser.add_argument("--sleep", type=float, default=0.2, help="sleep seconds between requests")
+        parser.add_argument("--sleep", type=float, default=0.2, help="sleep seconds after each request (per worker)")
         parser.add_argument("--max-requests", type=int, default=200, help="hard cap for upstream requests")
+        parser.add_argument("--workers", type=int, default=1, help="tiles fetched concurrently")
+        parser.add_argument("--qps", type=float, default=5.0, help="upstream QPS shared by all workers/processes")
+        parser.add_argument(
+            "--daily-budget",
+            type=int,
+            default=0,
+            help="upstream requests per day shared by all workers/processes (0 = unlimited)",
+        )
         parser.add_argument("--reset-running", action="store_true", help="set running -> pending (recovery)")
         parser.add_argument("--dry-run", action="store_true", help="do not call upstream / do not write PlaceCache")
         parser.add_argument("--keyword", type=str, default="神社", help="nearby keyword")
 
+    # ---- tile claim / finish（DB 操作はメインスレッドだけで行う）----
+    def _claim(self, qs) -> CrawlTile | None:
+        """
+        1 tile をロックして RUNNING にする（多重実行でも被らない）。
+        select_for_update が効かない DB でも、status/tries 条件付き UPDATE で二重取得を防ぐ。
+        """
+        while True:
+            now = timezone.now()
+            with transaction.atomic():
+                tile = (
+                    qs.filter(Q(not_before__isnull=True) | Q(not_before__lte=now))
+                    .select_for_update(skip_locked=True)
+                    .first()
+                )
+                if tile is None:
+                    return None
+                claimed = CrawlTile.objects.filter(pk=tile.pk, status=tile.status, tries=tile.tries).update(
+                    status=CrawlTile.Status.RUNNING,
+                    tries=F("tries") + 1,
+                    updated_at=now,
+                )
+            if claimed:
+                tile.refresh_from_db()
+                return tile
+
+    def _next_ready_at(self, qs):
+        """token 待ちで寝かせている tile のうち、最も早く取れる時刻。"""
+        return qs.filter(not_before__gt=timezone.now()).aggregate(t=Min("not_before"))["t"]
+
+    def _release(self, tile: CrawlTile) -> None:
+        """上流を呼ばずに返す（予算切れ等）。tries は戻す。"""
+        CrawlTile.objects.filter(pk=tile.pk).update(
+            status=CrawlTile.Status.PENDING,
+            tries=F("tries") - 1,
+            updated_at=timezone.now(),
+        )
+
+    def _fail(self, tile: CrawlTile, error: str) -> None:
+        tile.status = CrawlTile.Status.FAILED
+        tile.last_error = error[:2000]
+        tile.last_crawled_at = timezone.now()
+        tile.save(update_fields=["status", "last_error", "last_crawled_at", "updated_at"])
+
+    def _finish(self, tile: CrawlTile, data: dict[str, Any]) -> UpsertResult:
+        results = (data or {}).get("results") or []
+        next_token = (data or {}).get("next_page_token") or ""
+
+        # PlaceCache upsert（1 ページ分をまとめて）
+        upserted = upsert_place_cache_many(filter(None, (_to_place_cache_input(r) for r in results)))
+
+        # tokenが出たら続きを予約、無ければDONE
+        now = timezone.now()
+        tile.next_page_token = next_token or ""
+        tile.last_crawled_at = now
+        tile.last_error = ""
+
+        if next_token:
+            tile.status = CrawlTile.Status.PENDING  # まだ続きがあるので再度pendingへ
+            tile.not_before = now + timedelta(seconds=PAGE_TOKEN_DELAY_S)
+        else:
+            tile.status = CrawlTile.Status.DONE
+            tile.not_before = None
+
+        tile.save(
+            update_fields=[
+                "status",
+                "next_page_token",
+                "not_before",
+                "last_crawled_at",
+                "last_error",
+                "updated_at",
+            ]
+        )
+        return upserted
+
+    # ---- upstream（ワーカースレッドで実行）----
+    def _fetch(self, tile: CrawlTile, *, step_km: float, keyword: str, budget: UpstreamBudget, sleep_s: float):
+        budget.acquire()
+
+        # radius は step_km をmに（ざっくり：タイル間隔=半径でもOK）
+        radius_m = int(step_km * 1000)
+
+        # ページング：token があれば付けて続きから
+        params = {
+            "lat": tile.center_lat,
+            "lng": tile.center_lng,
+            "radius": radius_m,
+            "keyword": keyword,
+            "language": "ja",
+        }
+        if tile.next_page_token:
+            params["pagetoken"] = tile.next_page_token
+
+        try:
+            # ここで upstream を叩く（places.py はキャッシュもある）
+            return places_service.places_nearby_search(params)
+        finally:
+            if sleep_s > 0:
+                time.sleep(sleep_s)
+
     def handle(self, *args, **opts):
         step_km = float(opts["step_km"])
         limit = int(opts["limit"])
         max_tries = int(opts["max_tries"])
         sleep_s = float(opts["sleep"])
         max_requests = int(opts["max_requests"])
+        workers = max(1, int(opts.get("workers") or 1))
         reset_running = bool(opts["reset_running"])
         dry_run = bool(opts["dry_run"])
         keyword = (opts.get("keyword") or "神社").strip() or "神社"
@@ -77,92 +194,88 @@ class Command(BaseCommand):
         if dry_run:
             self.stdout.write(self.style.SUCCESS(f"dry-run: will process up to {limit} tiles (step_km={step_km})"))
             for t in qs[:limit]:
-                self.stdout.write(f"- tile#{t.id} center=({t.center_lat:.5f},{t.center_lng:.5f}) token={bool(t.next_page_token)} tries={t.tries}")
+                self.stdout.write(
+                    f"- tile#{t.id} center=({t.center_lat:.5f},{t.center_lng:.5f}) "
+                    f"token={bool(t.next_page_token)} not_before={t.not_before} tries={t.tries}"
+                )
             return
 
+        budget = UpstreamBudget(
+            "places",
+            qps=float(opts.get("qps") or 0),
+            daily_limit=int(opts.get("daily_budget") or 0),
+        )
+
         processed_tiles = 0
         req_count = 0
-        inserted_places = 0
+        upserted = UpsertResult()
+        stop_reason = ""
+        inflight: dict[Future, CrawlTile] = {}
 
-        while processed_tiles < limit and req_count < max_requests:
-            # --- 1 tile をロックして取る（多重実行でも被らない） ---
-            with transaction.atomic():
-                tile = (
-                    qs.select_for_update(skip_locked=True)
-                    .first()
-                )
-                if tile is None:
-                    break
-                tile.status = CrawlTile.Status.RUNNING
-                tile.tries = (tile.tries or 0) + 1
-                tile.updated_at = timezone.now()
-                tile.save(update_fields=["status", "tries", "updated_at"])
-
-            # --- タイル処理 ---
-            try:
-                # radius は step_km をmに（ざっくり：タイル間隔=半径でもOK）
-                radius_m = int(step_km * 1000)
-
-                # ページング：token があれば付けて続きから
-                params = {
-                    "lat": tile.center_lat,
-                    "lng": tile.center_lng,
-                    "radius": radius_m,
-                    "keyword": keyword,
-                    "language": "ja",
-                }
-                if tile.next_page_token:
-                    params["pagetoken"] = tile.next_page_token
-
-                # ここで upstream を叩く（places.py はキャッシュもある）
-                data = places_service.places_nearby_search(params)
-
-                status_ = (data or {}).get("status")
-                if status_ == "OVER_QUERY_LIMIT":
-                    # ここで止める。タイルは pending/failed に戻す（DONEにしない）
-                    tile.status = CrawlTile.Status.FAILED
-                    tile.last_error = "OVER_QUERY_LIMIT"
-                    tile.last_crawled_at = timezone.now()
-                    tile.save(update_fields=["status", "last_error", "last_crawled_at", "updated_at"])
-                    self.stdout.write(self.style.ERROR("STOP: OVER_QUERY_LIMIT"))
-                    break
-                req_count += 1
-
-                results = (data or {}).get("results") or []
-                next_token = (data or {}).get("next_page_token") or ""
-
-                # PlaceCache upsert
-                for r in results:
-                    _upsert_place_cache(r)
-                inserted_places += len(results)
-
-                # tokenが出たら続行、無ければDONE
-                tile.next_page_token = next_token or ""
-                tile.last_crawled_at = timezone.now()
-                tile.last_error = ""
-
-                if next_token:
-                    tile.status = CrawlTile.Status.PENDING  # まだ続きがあるので再度pendingへ
-                else:
-                    tile.status = CrawlTile.Status.DONE
-
-                tile.save(
-                    update_fields=["status", "next_page_token", "last_crawled_at", "last_error", "updated_at"]
-                )
-                processed_tiles += 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as pool:
+            while True:
+                # --- 空いているワーカーに tile を割り当てる ---
+                while (
+                    not stop_reason
+                    and len(inflight) < workers
+                    and processed_tiles + len(inflight) < limit
+                    and req_count < max_requests
+                ):
+                    tile = self._claim(qs)
+                    if tile is None:
+                        break
+                    fut = pool.submit(
+                        self._fetch, tile, step_km=step_km, keyword=keyword, budget=budget, sleep_s=sleep_s
+                    )
+                    inflight[fut] = tile
+                    req_count += 1
 
-            except Exception as e:
-                tile.status = CrawlTile.Status.FAILED
-                tile.last_error = str(e)[:2000]
-                tile.last_crawled_at = timezone.now()
-                tile.save(update_fields=["status", "last_error", "last_crawled_at", "updated_at"])
-                processed_tiles += 1
+                if not inflight:
+                    if stop_reason or processed_tiles >= limit or req_count >= max_requests:
+                        break
+                    # token 待ちの tile があれば、その時刻まで待って拾い直す
+                    ready_at = self._next_ready_at(qs)
+                    if ready_at is None:
+                        break
+                    time.sleep(max(0.0, (ready_at - timezone.now()).total_seconds()) + 0.01)
+                    continue
 
-            if sleep_s > 0:
-                time.sleep(sleep_s)
+                done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+
+                # --- 結果の反映（メインスレッド）---
+                for fut in done:
+                    tile = inflight.pop(fut)
+                    try:
+                        data = fut.result()
+                    except BudgetExhausted as e:
+                        self._release(tile)
+                        req_count -= 1
+                        stop_reason = stop_reason or str(e)
+                        continue
+                    except Exception as e:
+                        self._fail(tile, str(e))
+                        processed_tiles += 1
+                        continue
+
+                    if (data or {}).get("status") == "OVER_QUERY_LIMIT":
+                        # ここで止める。タイルは failed に戻す（DONEにしない）
+                        self._fail(tile, "OVER_QUERY_LIMIT")
+                        stop_reason = stop_reason or "OVER_QUERY_LIMIT"
+                        continue
+
+                    try:
+                        upserted = upserted + self._finish(tile, data)
+                    except Exception as e:
+                        self._fail(tile, str(e))
+                    processed_tiles += 1
+
+        if stop_reason:
+            self.stdout.write(self.style.ERROR(f"STOP: {stop_reason}"))
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"tiles_processed={processed_tiles} requests={req_count}/{max_requests} places_upserted={inserted_places} step_km={step_km}"
+                f"tiles_processed={processed_tiles} requests={req_count}/{max_requests} "
+                f"places_upserted={upserted.total} inserted={upserted.inserted} updated={upserted.updated} "
+                f"unchanged={upserted.unchanged} step_km={step_km} workers={workers}"
             )
         )
@@ -0,0 +1,37 @@
+# backend/temples/management/commands/rebuild_need_features.py
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+from temples.services.shrine_need_features import (
+    DEFAULT_BATCH_SIZE,
+    NEED_FEATURE_SPEC,
+    rebuild_need_features,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild ShrineNeedFeature rows (per-shrine need bitmasks for concierge ranking)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Shrines per upsert batch.",
+        )
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Only rebuild shrines without a row for the current spec.",
+        )
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, int(opts["batch_size"] or DEFAULT_BATCH_SIZE))
+        stale_only = bool(opts["stale_only"])
+
+        result = rebuild_need_features(batch_size=batch_size, stale_only=stale_only)
+
+        self.stdout.write(
+            f"[rebuild_need_features] spec={NEED_FEATURE_SPEC} stale_only={stale_only} "
+            f"total={result['total']} written={result['written']}"
+        )
@@ -1,8 +1,12 @@
 # backend/temples/management/commands/run_scheduled_jobs.py
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
 from django.utils import timezone
 
+from shrine_project.cache_tiers import namespace_cache
+
+# 複数ホスト/ワーカーで共有される lock 名前空間
+cache = namespace_cache("lock")
+
 LOCK_KEY = "lock:scheduled_jobs"
 LOCK_TTL = 60 * 10  # 10分
 
@@ -147,5 +147,9 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f"Dry-run OK: {len(items)} items"))
             return
 
-        n = upsert_place_cache_many(items)
-        self.stdout.write(self.style.SUCCESS(f"Upserted {n} places"))
+        r = upsert_place_cache_many(items)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Upserted {r.total} places (inserted={r.inserted} updated={r.updated} unchanged={r.unchanged})"
+            )
+        )
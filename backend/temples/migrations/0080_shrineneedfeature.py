@@ -0,0 +1,41 @@
+# Generated by Django 5.2.12 on 2026-10-17 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0079_shrinesubmission"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShrineNeedFeature",
+            fields=[
+                (
+                    "shrine",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="need_features",
+                        serialize=False,
+                        to="temples.shrine",
+                    ),
+                ),
+                ("spec_hash", models.CharField(db_index=True, max_length=16)),
+                ("text_mask", models.IntegerField(default=0)),
+                ("gid_mask", models.IntegerField(default=0)),
+                ("study_hint", models.BooleanField(default=False)),
+                ("has_material", models.BooleanField(default=False)),
+                ("text_hits", models.JSONField(blank=True, default=dict)),
+                ("text_scores", models.JSONField(blank=True, default=dict)),
+                ("goriyaku_tag_ids", models.JSONField(blank=True, default=list)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "temples_shrine_need_feature",
+            },
+        ),
+    ]
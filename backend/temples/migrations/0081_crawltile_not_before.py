@@ -0,0 +1,18 @@
+# Generated by Django 5.2.12 on 2026-10-17 20:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0080_shrineneedfeature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawltile",
+            name="not_before",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
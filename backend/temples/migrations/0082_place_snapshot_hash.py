@@ -0,0 +1,23 @@
+# Generated by Django 5.2.12 on 2026-10-17 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0081_crawltile_not_before"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="placecache",
+            name="snapshot_hash",
+            field=models.CharField(blank=True, default="", max_length=40),
+        ),
+        migrations.AddField(
+            model_name="placeref",
+            name="snapshot_hash",
+            field=models.CharField(blank=True, default="", max_length=40),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.12 on 2026-10-17 20:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0082_place_snapshot_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="conciergethread",
+            name="temples_con_user_id_c38936_idx",
+        ),
+        migrations.AddField(
+            model_name="conciergethread",
+            name="last_message_preview",
+            field=models.CharField(blank=True, default="", max_length=200),
+        ),
+        migrations.AddField(
+            model_name="conciergethread",
+            name="message_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="conciergethread",
+            index=models.Index(
+                fields=["user", "-last_message_at", "-id"], name="concierge_thread_user_keyset"
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.12 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0083_concierge_thread_list_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conciergethread",
+            name="recommendations_detail",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="conciergethread",
+            name="snapshot_version",
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.12 on 2026-10-17 21:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0084_concierge_thread_compact_snapshot"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlacePhotoAsset",
+            fields=[
+                ("ref_key", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("max_width", models.PositiveIntegerField()),
+                ("sha256", models.CharField(db_index=True, max_length=64)),
+                ("content_type", models.CharField(max_length=64)),
+                ("size", models.PositiveIntegerField()),
+                ("width", models.PositiveIntegerField(blank=True, null=True)),
+                ("height", models.PositiveIntegerField(blank=True, null=True)),
+                ("is_variant", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                "db_table": "place_photo_asset",
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.12 on 2026-10-17 22:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("temples", "0085_place_photo_asset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConciergeWriteOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("kind", models.CharField(max_length=32)),
+                ("payload", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "db_table": "temples_concierge_write_outbox",
+                "ordering": ["id"],
+            },
+        ),
+    ]
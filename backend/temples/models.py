@@ -8,8 +8,10 @@ from django.db import models as dj_models
 from django.db.models import CheckConstraint, Q, UniqueConstraint
 from django.utils import timezone
 from .models_places_seeds import PlacesSeed, PlacesSeedState  # noqa
-from .models_concierge_analytics import ConciergeRecommendationLog
+from .models_concierge_analytics import ConciergeRecommendationLog, ConciergeWriteOutbox  # noqa
 from .models_usage import FeatureUsage  # noqa
+from .models_need_features import ShrineNeedFeature  # noqa
+from .models_place_assets import PlacePhotoAsset  # noqa
 
 # GeoDjango switch
 USE_REAL_GIS = bool(getattr(settings, "USE_GIS", False)) and not bool(
@@ -57,6 +59,8 @@ class CrawlTile(models.Model):
 
     last_crawled_at = models.DateTimeField(null=True, blank=True)
     next_page_token = models.CharField(max_length=256, blank=True, default="")
+    # next_page_token は発行直後は無効なので、この時刻までは再取得しない
+    not_before = models.DateTimeField(null=True, blank=True)
     last_error = models.TextField(blank=True, default="")
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -149,6 +153,8 @@ class PlaceRef(dj_models.Model):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     snapshot_json = models.JSONField(null=True, blank=True)
+    # bulk upsert で「内容が変わっていない行」を書き込まずに済ませるための指紋
+    snapshot_hash = models.CharField(max_length=40, blank=True, default="")
     synced_at = models.DateTimeField(null=True, blank=True, auto_now=False)
 
     def __str__(self) -> str:
@@ -401,14 +407,25 @@ class ConciergeThread(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     last_message_at = models.DateTimeField(null=True, blank=True)
+    # 一覧用の非正規化（append_chat が同じトランザクションで更新する）
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_preview = models.CharField(max_length=200, blank=True, default="")
 
+    # おすすめのスナップショット（形式は services/concierge_snapshot.py）
+    # v2 以降: recommendations / recommendations_v2 は compact 形、全量は recommendations_detail
+    snapshot_version = models.PositiveSmallIntegerField(default=1)
     recommendations = models.JSONField(null=True, blank=True)
     recommendations_v2 = models.JSONField(null=True, blank=True)
+    recommendations_detail = models.JSONField(null=True, blank=True)
 
     class Meta:
         ordering = ["-last_message_at", "-id"]
         indexes = [
-            models.Index(fields=["user", "last_message_at"]),
+            # 一覧の keyset ページング（user, last_message_at DESC, id DESC）
+            models.Index(
+                fields=["user", "-last_message_at", "-id"],
+                name="concierge_thread_user_keyset",
+            ),
             models.Index(fields=["anonymous_id", "last_message_at"]),
         ]
         constraints = [
@@ -729,6 +746,8 @@ class PlaceCache(models.Model):
 
     types = models.JSONField(default=list, blank=True)
     raw = models.JSONField(default=dict, blank=True)
+    # bulk upsert で「内容が変わっていない行」を書き込まずに済ませるための指紋
+    snapshot_hash = models.CharField(max_length=40, blank=True, default="")
 
     fetched_at = models.DateTimeField(auto_now=True)
 
@@ -69,3 +69,18 @@ class ConciergeRecommendationClickLog(models.Model):
     class Meta:
         db_table = "temples_concierge_recommendation_click_log"
         ordering = ["-created_at"]
+
+
+class ConciergeWriteOutbox(models.Model):
+    """
+    write-behind の耐久キュー（WRITE_BEHIND_OUTBOX=1 のときだけ使う）。
+    本体テーブルへ書き込めたら行を消す。残っている行はプロセスが落ちた分として再送する。
+    """
+
+    kind = models.CharField(max_length=32)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "temples_concierge_write_outbox"
+        ordering = ["id"]
@@ -0,0 +1,38 @@
+# backend/temples/models_need_features.py
+from django.db import models
+
+
+class ShrineNeedFeature(models.Model):
+    """
+    concierge ランキング用の神社側 need 特徴量インデックス（1神社1行）。
+
+    ビットは temples.domain.need_tags.NEED_TAGS の並び順に対応する。
+    spec_hash がコード側の判定表（NEED_TEXT_WEIGHTS など）と一致しない行は
+    リクエスト時に使われず、従来どおりテキスト走査にフォールバックする。
+    """
+
+    shrine = models.OneToOneField(
+        "temples.Shrine",
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="need_features",
+    )
+    spec_hash = models.CharField(max_length=16, db_index=True)
+
+    text_mask = models.IntegerField(default=0)
+    gid_mask = models.IntegerField(default=0)
+    study_hint = models.BooleanField(default=False)
+    has_material = models.BooleanField(default=False)
+
+    # {need_tag: [hint, ...]} / {need_tag: score}
+    text_hits = models.JSONField(default=dict, blank=True)
+    text_scores = models.JSONField(default=dict, blank=True)
+    goriyaku_tag_ids = models.JSONField(default=list, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "temples_shrine_need_feature"
+
+    def __str__(self) -> str:
+        return f"need_features:{self.shrine_id} text={self.text_mask:#x} gid={self.gid_mask:#x}"
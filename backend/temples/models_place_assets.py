@@ -0,0 +1,29 @@
+# backend/temples/models_place_assets.py
+from __future__ import annotations
+
+from django.db import models
+from django.utils import timezone
+
+
+class PlacePhotoAsset(models.Model):
+    """
+    Places の photo_reference（+ 要求幅）→ 保存済み画像の内容ハッシュ。
+    バイト列そのものは services.asset_store（ローカル FS / オブジェクトストレージ）に
+    sha256 をキーに 1 回だけ書く。縮小版も同じ形で行を持つ（is_variant=True）。
+    """
+
+    ref_key = models.CharField(max_length=64, primary_key=True)  # sha256(photo_reference|max_width)
+    max_width = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, db_index=True)
+    content_type = models.CharField(max_length=64)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    is_variant = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "place_photo_asset"
+
+    def __str__(self) -> str:
+        return f"{self.ref_key[:12]} w={self.max_width} {self.sha256[:12]}"
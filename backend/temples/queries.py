@@ -6,7 +6,7 @@ from django.conf import settings
 from django.db import connection
 from django.contrib.gis.db.models.functions import Distance, Transform
 from django.contrib.gis.geos import Point
-from django.db.models import Case, FloatField, IntegerField, Value, When, F
+from django.db.models import Case, FloatField, IntegerField, Q, Value, When, F
 from django.db.models.expressions import RawSQL
 
 from .models import Shrine
@@ -20,40 +20,59 @@ def _use_real_gis() -> bool:
     )
 
 
-__all__ = ["nearest_queryset", "nearest_shrines"]
+__all__ = ["bbox_q", "nearest_queryset", "nearest_shrines"]
 
 
-def nearest_queryset(lon: float, lat: float):
+def bbox_q(lon: float, lat: float, radius_m: float) -> Q:
     """
-    近傍の距離を注釈して距離昇順で返す QuerySet（スライスや半径フィルタはしない）
+    半径 radius_m の円を包む緯度経度の矩形条件（idx_shrine_lat_lng に乗る粗い絞り込み）。
+    極付近・日付変更線はまたがないものとして扱う。
+    """
+    dlat = math.degrees(float(radius_m) / EARTH_RADIUS_M)
+    coslat = max(math.cos(math.radians(lat)), 1e-6)
+    dlon = min(math.degrees(float(radius_m) / (EARTH_RADIUS_M * coslat)), 180.0)
+    return Q(
+        latitude__gte=lat - dlat,
+        latitude__lte=lat + dlat,
+        longitude__gte=lon - dlon,
+        longitude__lte=lon + dlon,
+    )
+
+
+def nearest_queryset(lon: float, lat: float, *, radius_m: float | None = None, base_qs=None):
+    """
+    近傍の距離を注釈して距離昇順で返す QuerySet（スライスはしない）
     - PostGIS: KNN + ST_DistanceSphere
     - NoGIS(PostgreSQL): ハバースイン式で注釈
     - それ以外(SQLite等): 空
+    radius_m を渡すと d_m <= radius_m で絞る（NoGIS は矩形条件も併用）。
+    base_qs を渡すと、その QuerySet の条件を引き継ぐ。
     """
-    qs = Shrine.objects.all()
+    qs = Shrine.objects.all() if base_qs is None else base_qs
 
     # PostGIS(= PostgreSQL) だけ KNN/<-> を使う
     if _use_real_gis() and connection.vendor == "postgresql":
         point_sql = "ST_SetSRID(ST_Point(%s,%s), 4326)"
         point_params = [lon, lat]
-        return (
-            qs.filter(location__isnull=False)
-            .annotate(
-                distance_m=RawSQL(f"ST_DistanceSphere(location, {point_sql})", point_params),
-                d_m=RawSQL(f"ST_DistanceSphere(location, {point_sql})", point_params),
-                _knn=RawSQL(f"location <-> {point_sql}", point_params),
-            )
-            .order_by("_knn", "d_m")
+        qs = qs.filter(location__isnull=False).annotate(
+            distance_m=RawSQL(f"ST_DistanceSphere(location, {point_sql})", point_params),
+            d_m=RawSQL(f"ST_DistanceSphere(location, {point_sql})", point_params),
+            _knn=RawSQL(f"location <-> {point_sql}", point_params),
         )
+        if radius_m is not None:
+            qs = qs.filter(d_m__lte=float(radius_m))
+        return qs.order_by("_knn", "d_m")
     # Spatialite (SQLite, GISあり) – <-> は使えない。Transform(4326→3857)して距離[m]で注釈
     if _use_real_gis() and connection.vendor == "sqlite":
         p = Point(lon, lat, srid=4326)
-        qs = Shrine.objects.filter(location__isnull=False).annotate(
+        qs = qs.filter(location__isnull=False).annotate(
             distance_m=Distance(Transform("location", 3857), Transform(p, 3857))
         ).annotate(
             d_m=F("distance_m")
-        ).order_by("d_m")
-        return qs
+        )
+        if radius_m is not None:
+            qs = qs.filter(d_m__lte=float(radius_m))
+        return qs.order_by("d_m")
 
     if connection.vendor == "postgresql":
         haversine_sql = f"""
@@ -65,14 +84,16 @@ def nearest_queryset(lon: float, lat: float):
                 )
             )
         """
-        return (
-            qs.filter(latitude__isnull=False, longitude__isnull=False)
-            .annotate(
-                distance_m=RawSQL(haversine_sql, params=[lat, lat, lon]),
-                d_m=RawSQL(haversine_sql, params=[lat, lat, lon]),
-            )
-            .order_by("d_m")
+        qs = qs.filter(latitude__isnull=False, longitude__isnull=False)
+        if radius_m is not None:
+            qs = qs.filter(bbox_q(lon, lat, radius_m))
+        qs = qs.annotate(
+            distance_m=RawSQL(haversine_sql, params=[lat, lat, lon]),
+            d_m=RawSQL(haversine_sql, params=[lat, lat, lon]),
         )
+        if radius_m is not None:
+            qs = qs.filter(d_m__lte=float(radius_m))
+        return qs.order_by("d_m")
 
     return Shrine.objects.none()
 
@@ -14,6 +14,14 @@ except Exception:  # pragma: no cover
     openai = None
 
 
+def _not_json(text: str) -> bool:
+    try:
+        json.loads(text)
+        return False
+    except Exception:
+        return True
+
+
 @runtime_checkable
 class LLMAdapter(Protocol):
     """Concierge 用の薄い LLM インターフェース。"""
@@ -113,6 +121,9 @@ class OpenAIAdapter:
     ) -> str:
         if client is None:
             return ""
+        from temples.services.request_profiler import record_upstream
+
+        record_upstream("llm")
         try:
             resp = client.chat.completions.create(  # type: ignore[attr-defined]
                 model=self.model,
@@ -137,20 +148,43 @@ class OpenAIAdapter:
             return ""
 
     def _chat(self, system_prompt: str, user_prompt: str, *, force_json_object: bool = True) -> str:
-        """リトライ／バックオフ込みの共通呼び出し。_chat_once を使う。"""
-        client = self._client()
-        out = ""
-        for attempt in range(max(0, self.retries) + 1):
-            out = self._chat_once(
-                client, system_prompt, user_prompt, force_json_object=force_json_object
+        """
+        リトライ／バックオフ込みの共通呼び出し。_chat_once を使う。
+        応答は response_cache に載せ、同じプロンプトでは上流を呼ばない（JSON でない応答は短い TTL）。
+        """
+        from temples.llm.response_cache import cached_call
+
+        def call() -> str:
+            client = self._client()
+            out = ""
+            for attempt in range(max(0, self.retries) + 1):
+                out = self._chat_once(
+                    client, system_prompt, user_prompt, force_json_object=force_json_object
+                )
+                if out:
+                    break
+                try:
+                    time.sleep(self.backoff_s * (2**attempt))
+                except Exception:
+                    pass
+            return out
+
+        try:
+            out, _hit = cached_call(
+                call,
+                model=self.model,
+                system=system_prompt,
+                user=user_prompt,
+                params={
+                    "temperature": self.temperature,
+                    "max_tokens": self.max_tokens,
+                    "json_object": bool(self.force_json and force_json_object),
+                },
+                is_negative=_not_json,
             )
-            if out:
-                break
-            try:
-                time.sleep(self.backoff_s * (2**attempt))
-            except Exception:
-                pass
-        return out
+        except Exception:
+            return ""
+        return out or ""
 
     # -------- public API --------
     def parse_query(self, text: str) -> dict:
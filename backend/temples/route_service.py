@@ -1,17 +1,27 @@
 # backend/temples/route_service.py
+import asyncio
 import hashlib
 import json
-import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from os import getenv
-from typing import Dict, List, Literal, Tuple
+from typing import Dict, List, Literal, Optional, Tuple
 
 import requests
 from django.conf import settings
-from django.core.cache import cache
+from shrine_project.cache_tiers import namespace_cache
+from temples.services.rate_limit import TokenBucketLimiter
+from temples.upstream import aio
+from temples.upstream import session as upstream_session
 
 Mode = Literal["walking", "driving"]
 
+log = logging.getLogger(__name__)
+
+cache = namespace_cache("route")
+
 
 @dataclass
 class Point:
@@ -23,10 +33,32 @@ class Point:
 DEFAULT_TTL = 60 * 60 * 24 * 30  # 30日
 _RATE_WINDOW = 60
 _RATE_LIMIT = 20
-_calls = []
+# ORS への呼び出し枠（ワーカー間で共有するトークンバケット）
+_bucket = TokenBucketLimiter("route-ors", _RATE_LIMIT, _RATE_WINDOW)
 
 
 ROUTE_CACHE_TTL_S = int(getattr(settings, "ROUTE_CACHE_TTL_S", 60 * 60 * 24 * 30))
+# 未キャッシュの区間を並行に取りに行く上限（プロセス全体で共有）
+ROUTE_LEG_MAX_WORKERS = int(getattr(settings, "ROUTE_LEG_MAX_WORKERS", 4))
+LEG_TIMEOUT_S = 10
+
+_pool_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _session() -> requests.Session:
+    """ルーティング API（ORS / OSRM）用の共有 Session（接続プール・再試行・ブレーカは temples.upstream の方針）。"""
+    return upstream_session("routing")
+
+
+def _leg_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, ROUTE_LEG_MAX_WORKERS), thread_name_prefix="route-leg"
+            )
+        return _executor
 
 
 def _cache_key(mode: Mode, origin: Point, destinations: List[Point]) -> str:
@@ -39,14 +71,15 @@ def _cache_key(mode: Mode, origin: Point, destinations: List[Point]) -> str:
     return f"route:{h}"
 
 
+def _leg_key(provider: str, mode: Mode, a: Point, b: Point) -> str:
+    return _ck(
+        f"route:leg:{provider}:{mode}",
+        {"from": [a.lat, a.lng], "to": [b.lat, b.lng]},
+    )
+
+
 def _allow() -> bool:
-    now = time.time()
-    while _calls and now - _calls[0] > _RATE_WINDOW:
-        _calls.pop(0)
-    if len(_calls) >= _RATE_LIMIT:
-        return False
-    _calls.append(now)
-    return True
+    return _bucket.hit().allowed
 
 
 def _ck(prefix: str, payload: dict) -> str:
@@ -73,9 +106,45 @@ def _haversine_m(a: Point, b: Point) -> float:
 
 
 class BaseRouteAdapter:
+    # 区間ごとにキャッシュするか（ダミーは計算が安いので載せない）
+    cache_legs = False
+    # aget_leg を持つか（持つなら未キャッシュの区間は 1 本のイベントループでまとめて待つ）
+    async_legs = False
+
     def get_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
         raise NotImplementedError()
 
+    async def aget_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
+        raise NotImplementedError()
+
+    def get_legs(self, mode: Mode, points: List[Point]) -> Optional[List[Dict]]:
+        """points を順にたどる全区間を 1 リクエストで取る。対応しない・取れないときは None。"""
+        return None
+
+    def get_matrix(self, mode: Mode, points: List[Point]) -> Optional[List[List[float]]]:
+        """全地点間の所要秒の行列を 1 リクエストで取る。対応しない・取れないときは None。"""
+        return None
+
+
+def _throttled_leg(a: Point, b: Point, empty=0) -> Dict:
+    return {
+        "from": {"lat": a.lat, "lng": a.lng},
+        "to": {"lat": b.lat, "lng": b.lng},
+        "distance_m": empty,
+        "duration_s": empty,
+        "geometry": [] if empty == 0 else None,
+        "provider": "throttled",
+    }
+
+
+def _split_line(coords: List[List[float]], way_points: List[int]) -> List[List[Tuple[float, float]]]:
+    """[[lng,lat], ...] を経由点の添字で区間ごとの [(lat,lng), ...] に分ける。"""
+    out = []
+    for i in range(len(way_points) - 1):
+        seg = coords[way_points[i] : way_points[i + 1] + 1]
+        out.append([(c[1], c[0]) for c in seg])
+    return out
+
 
 class DummyAdapter(BaseRouteAdapter):
     def get_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
@@ -94,37 +163,51 @@ class DummyAdapter(BaseRouteAdapter):
 
 # ---- 追加：ORS アダプタ ----
 class ORSAdapter(BaseRouteAdapter):
+    cache_legs = True
+    async_legs = True
+
     def __init__(self, base: str, key: str):
         self.base = base.rstrip("/")
         self.key = key
 
+    @staticmethod
+    def _profile(mode: Mode) -> str:
+        return "foot-walking" if mode == "walking" else "driving-car"
+
+    def _request(self, mode: Mode, points: List[Point]) -> Tuple[str, Dict]:
+        url = f"{self.base}/v2/directions/{self._profile(mode)}/geojson"
+        return url, {"coordinates": [[p.lng, p.lat] for p in points]}
+
+    def _post(self, mode: Mode, points: List[Point]) -> Dict:
+        url, payload = self._request(mode, points)
+        r = _session().post(url, json=payload, headers={"Authorization": self.key}, timeout=LEG_TIMEOUT_S)
+        r.raise_for_status()
+        return r.json()["features"][0]
+
     def get_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
         if not _allow():
-            return {
-               "from": {"lat": a.lat, "lng": a.lng},
-               "to": {"lat": b.lat, "lng": b.lng},
-               "distance_m": 0,
-               "duration_s": 0,
-               "geometry": [],
-               "provider": "throttled",
-              }
-        profile = "foot-walking" if mode == "walking" else "driving-car"
-        payload = {"coordinates": [[a.lng, a.lat], [b.lng, b.lat]]}
-        ckey = _ck(f"ors:{profile}", payload)
-        if hit := cache.get(ckey):
-            return {**hit}
-
-        url = f"{self.base}/v2/directions/{profile}"
-        headers = {"Authorization": self.key}
-        r = requests.post(url, json=payload, headers=headers, timeout=10)
+            return _throttled_leg(a, b)
+        return self._leg(a, b, self._post(mode, [a, b]))
+
+    async def aget_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
+        # トークンバケットはキャッシュを叩くのでループを止めないよう別スレッドで
+        if not await asyncio.to_thread(_allow):
+            return _throttled_leg(a, b)
+        url, payload = self._request(mode, [a, b])
+        r = await aio.arequest(
+            "routing", "POST", url, json=payload, headers={"Authorization": self.key}, timeout=LEG_TIMEOUT_S
+        )
         r.raise_for_status()
-        feat = r.json()["features"][0]
+        return self._leg(a, b, r.json()["features"][0])
+
+    @staticmethod
+    def _leg(a: Point, b: Point, feat: Dict) -> Dict:
         dist = int(feat["properties"]["summary"]["distance"])
         dur = int(feat["properties"]["summary"]["duration"])
         geom = feat["geometry"]["coordinates"]  # [[lng,lat], ...]
-        # APIの座標は [lng,lat] → APIレスポンスに合わせるか、既存のSerializerに合わせて [lat,lng] に変換
+        # APIの座標は [lng,lat] → 既存のSerializerに合わせて [lat,lng] に変換
         line = [(latlng[1], latlng[0]) for latlng in geom]
-        res = {
+        return {
             "from": {"lat": a.lat, "lng": a.lng},
             "to": {"lat": b.lat, "lng": b.lng},
             "distance_m": dist,
@@ -132,34 +215,71 @@ class ORSAdapter(BaseRouteAdapter):
             "geometry": line,
             "provider": "ors",
         }
-        cache.set(ckey, res, ROUTE_CACHE_TTL_S)
-        return res
+
+    def get_legs(self, mode: Mode, points: List[Point]) -> Optional[List[Dict]]:
+        if len(points) < 3 or not _allow():
+            return None
+        feat = self._post(mode, points)
+        segments = feat["properties"].get("segments") or []
+        way_points = feat["properties"].get("way_points") or []
+        if len(segments) != len(points) - 1 or len(way_points) != len(points):
+            return None
+        lines = _split_line(feat["geometry"]["coordinates"], way_points)
+        return [
+            {
+                "from": {"lat": a.lat, "lng": a.lng},
+                "to": {"lat": b.lat, "lng": b.lng},
+                "distance_m": int(seg.get("distance") or 0),
+                "duration_s": int(seg.get("duration") or 0),
+                "geometry": line,
+                "provider": "ors",
+            }
+            for a, b, seg, line in zip(points, points[1:], segments, lines, strict=False)
+        ]
 
 
 # ---- 追加：OSRM フォールバック ----
 class OSRMAdapter(BaseRouteAdapter):
+    cache_legs = True
+    async_legs = True
+
     def __init__(self, base: str = "https://router.project-osrm.org"):
         self.base = base.rstrip("/")
 
+    def _request(self, points: List[Point], *, steps: bool) -> Tuple[str, Dict]:
+        coords = ";".join(f"{p.lng},{p.lat}" for p in points)
+        params = {"overview": "full", "geometries": "geojson"}
+        if steps:
+            params["steps"] = "true"
+        return f"{self.base}/route/v1/foot/{coords}", params
+
+    def _route(self, points: List[Point], *, steps: bool) -> Dict:
+        url, params = self._request(points, steps=steps)
+        r = _session().get(url, params=params, timeout=LEG_TIMEOUT_S)
+        r.raise_for_status()
+        return r.json()["routes"][0]
+
     def get_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
         if mode != "walking":
             # 簡易：当面は徒歩のみサポート
             return DummyAdapter().get_leg(mode, a, b)
 
         if not _allow():
-            return {
-                "from": {"lat": a.lat, "lng": a.lng},
-                "to": {"lat": b.lat, "lng": b.lng},
-                "distance_m": None,
-                "duration_s": None,
-                "geometry": None,
-                "provider": "throttled",
-            }
+            return _throttled_leg(a, b, empty=None)
 
-        url = f"{self.base}/route/v1/foot/{a.lng},{a.lat};{b.lng},{b.lat}?overview=full&geometries=geojson"
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        route = r.json()["routes"][0]
+        return self._leg(a, b, self._route([a, b], steps=False))
+
+    async def aget_leg(self, mode: Mode, a: Point, b: Point) -> Dict:
+        if mode != "walking":
+            return DummyAdapter().get_leg(mode, a, b)
+        if not await asyncio.to_thread(_allow):
+            return _throttled_leg(a, b, empty=None)
+        url, params = self._request([a, b], steps=False)
+        data = await aio.aget_json("routing", url, params, timeout=LEG_TIMEOUT_S)
+        return self._leg(a, b, data["routes"][0])
+
+    @staticmethod
+    def _leg(a: Point, b: Point, route: Dict) -> Dict:
         dist = int(route["distance"])
         dur = int(route["duration"])
         coords = route["geometry"]["coordinates"]  # [[lng,lat], ...]
@@ -173,6 +293,50 @@ class OSRMAdapter(BaseRouteAdapter):
             "provider": "osrm",
         }
 
+    def get_legs(self, mode: Mode, points: List[Point]) -> Optional[List[Dict]]:
+        # 経由点付きの route 1 回で全区間を取る（table は行列だけで形状が無いので使わない）
+        if mode != "walking" or len(points) < 3 or not _allow():
+            return None
+        route = self._route(points, steps=True)
+        legs = route.get("legs") or []
+        if len(legs) != len(points) - 1:
+            return None
+        out = []
+        for a, b, leg in zip(points, points[1:], legs, strict=False):
+            line: List[Tuple[float, float]] = []
+            for step in leg.get("steps") or []:
+                for lng, lat in (step.get("geometry") or {}).get("coordinates") or []:
+                    if not line or line[-1] != (lat, lng):
+                        line.append((lat, lng))
+            out.append(
+                {
+                    "from": {"lat": a.lat, "lng": a.lng},
+                    "to": {"lat": b.lat, "lng": b.lng},
+                    "distance_m": int(leg["distance"]),
+                    "duration_s": int(leg["duration"]),
+                    "geometry": line,
+                    "provider": "osrm",
+                }
+            )
+        return out
+
+    def get_matrix(self, mode: Mode, points: List[Point]) -> Optional[List[List[float]]]:
+        if mode != "walking" or len(points) < 3 or not _allow():
+            return None
+        coords = ";".join(f"{p.lng},{p.lat}" for p in points)
+        r = _session().get(
+            f"{self.base}/table/v1/foot/{coords}",
+            params={"annotations": "duration"},
+            timeout=LEG_TIMEOUT_S,
+        )
+        r.raise_for_status()
+        durations = r.json().get("durations")
+        if not durations or len(durations) != len(points):
+            return None
+        if any(v is None for row in durations for v in row):
+            return None  # 到達できない組がある
+        return [[float(v) for v in row] for row in durations]
+
 
 # ---- Adapter選択（環境変数） ----
 def get_adapter() -> Tuple[str, BaseRouteAdapter]:
@@ -200,7 +364,145 @@ def get_adapter() -> Tuple[str, BaseRouteAdapter]:
     return "dummy", DummyAdapter()
 
 
-def build_route(mode: Mode, origin: Point, destinations: List[Point]) -> Dict:
+async def _agather_legs(adapter: BaseRouteAdapter, mode: Mode, pairs: List[Tuple[Point, Point]]) -> List[Dict]:
+    # 例外は最初に失敗した区間のものを呼び出し元へ（スレッド版と同じ）
+    return list(await asyncio.gather(*(adapter.aget_leg(mode, a, b) for a, b in pairs)))
+
+
+def _fetch_legs(
+    provider: str,
+    adapter: BaseRouteAdapter,
+    mode: Mode,
+    points: List[Point],
+) -> List[Dict]:
+    """
+    区間キャッシュ → 経由点付き 1 リクエスト → 残りを並行取得 の順で全区間を埋める。
+    区間は 1 本ずつキャッシュするので、重なるルート同士で結果を使い回せる。
+    """
+    pairs = list(zip(points, points[1:], strict=False))
+    legs: List[Optional[Dict]] = [None] * len(pairs)
+    keys: List[str] = []
+
+    if adapter.cache_legs:
+        keys = [_leg_key(provider, mode, a, b) for a, b in pairs]
+        found = cache.get_many(keys)
+        for i, k in enumerate(keys):
+            if k in found:
+                legs[i] = dict(found[k])
+
+    fetched: Dict[int, Dict] = {}
+    missing = [i for i, leg in enumerate(legs) if leg is None]
+
+    if len(missing) >= 2:
+        try:
+            multi = adapter.get_legs(mode, points)
+        except Exception as e:
+            log.warning("[route] multi-waypoint fetch failed provider=%s err=%s", provider, e)
+            multi = None
+        if multi:
+            fetched.update({i: multi[i] for i in missing})
+            missing = []
+
+    if len(missing) == 1:
+        i = missing[0]
+        fetched[i] = adapter.get_leg(mode, *pairs[i])
+    elif missing and adapter.async_legs:
+        # 1 本のイベントループで全区間を並行に待つ（接続はプロセスで共有のプール）
+        got = aio.run_sync(_agather_legs(adapter, mode, [pairs[i] for i in missing]))
+        fetched.update(zip(missing, got, strict=True))
+    elif missing:
+        futures = {i: _leg_executor().submit(adapter.get_leg, mode, *pairs[i]) for i in missing}
+        # 例外は従来どおり呼び出し元へ（最初に失敗した区間のもの）
+        fetched.update({i: f.result() for i, f in futures.items()})
+
+    for i, leg in fetched.items():
+        legs[i] = leg
+
+    if keys:
+        to_store = {
+            keys[i]: leg
+            for i, leg in fetched.items()
+            if leg.get("provider") != "throttled" and leg.get("geometry")
+        }
+        if to_store:
+            cache.set_many(to_store, ROUTE_CACHE_TTL_S)
+
+    return [leg for leg in legs if leg is not None]
+
+
+def travel_matrix(
+    provider: str,
+    adapter: BaseRouteAdapter,
+    mode: Mode,
+    points: List[Point],
+) -> Tuple[List[List[float]], str]:
+    """
+    順番最適化用の所要秒行列と、その出どころ（"legs" / "provider" / "haversine"）。
+    区間キャッシュに全組が揃っていればそれ、次にプロバイダの行列（キャッシュ or 1 リクエスト）、
+    どちらも無ければハバースインで作る。
+    """
+    from temples.services.route_optimizer import haversine_matrix
+
+    n = len(points)
+    if adapter.cache_legs:
+        pairs = [(i, j) for i in range(n) for j in range(n) if i != j]
+        keys = [_leg_key(provider, mode, points[i], points[j]) for i, j in pairs]
+        found = cache.get_many(keys)
+        if len(found) == len(keys) and all(found[k].get("duration_s") is not None for k in keys):
+            m = [[0.0] * n for _ in range(n)]
+            for (i, j), k in zip(pairs, keys, strict=True):
+                m[i][j] = float(found[k]["duration_s"])
+            return m, "legs"
+
+        mkey = _ck(f"route:matrix:{provider}:{mode}", {"points": [[p.lat, p.lng] for p in points]})
+        m = cache.get(mkey)
+        if m is None:
+            try:
+                m = adapter.get_matrix(mode, points)
+            except Exception as e:
+                log.warning("[route] matrix fetch failed provider=%s err=%s", provider, e)
+                m = None
+            if m is not None:
+                cache.set(mkey, m, ROUTE_CACHE_TTL_S)
+        if m is not None:
+            return m, "provider"
+
+    return haversine_matrix([(p.lat, p.lng) for p in points], mode), "haversine"
+
+
+def optimize_destinations(
+    mode: Mode,
+    origin: Point,
+    destinations: List[Point],
+    *,
+    fixed_end: bool = False,
+    windows: Optional[List[Optional[Tuple[float, float]]]] = None,
+    stay_s: float = 0.0,
+) -> Tuple[List[int], Dict]:
+    """
+    origin を始点に固定して destinations の訪問順を最適化する。
+    (destinations の添字の並び, 最適化の要約) を返す。
+    windows: destinations ごとの時間窓（出発からの相対秒）。
+    """
+    from temples.services.route_optimizer import optimize_order
+
+    provider, adapter = get_adapter()
+    points = [origin, *destinations]
+    matrix, source = travel_matrix(provider, adapter, mode, points)
+    n = len(points)
+    node_windows = [None, *windows] if windows and any(windows) else None
+    result = optimize_order(
+        matrix,
+        start=0,
+        end=n - 1 if fixed_end else None,
+        windows=node_windows,
+        service_s=[0.0] + [float(stay_s)] * (n - 1),
+    )
+    order = [i - 1 for i in result.order[1:]]
+    return order, {**result.summary(), "matrix": source}
+
+
+def _build_ordered_route(mode: Mode, origin: Point, destinations: List[Point]) -> Dict:
     # ★ まずキャッシュを見る
     ckey = _cache_key(mode, origin, destinations)
     hit = cache.get(ckey)
@@ -211,14 +513,9 @@ def build_route(mode: Mode, origin: Point, destinations: List[Point]) -> Dict:
         return res
 
     provider, adapter = get_adapter()
-    legs = []
-    current = origin
-    for dest in destinations:
-        leg = adapter.get_leg(mode, current, dest)
-        legs.append(leg)
-        current = dest
-    distance_total = sum(leg["distance_m"] for leg in legs)
-    duration_total = sum(leg["duration_s"] for leg in legs)
+    legs = _fetch_legs(provider, adapter, mode, [origin, *destinations])
+    distance_total = sum(leg["distance_m"] or 0 for leg in legs)
+    duration_total = sum(leg["duration_s"] or 0 for leg in legs)
 
     res = {
         "mode": mode,
@@ -229,6 +526,70 @@ def build_route(mode: Mode, origin: Point, destinations: List[Point]) -> Dict:
         "cached": False,  # ★ 初回は False
     }
 
-    # ★ キャッシュ保存
-    cache.set(ckey, res, ROUTE_CACHE_TTL_S)
+    # ★ キャッシュ保存（間引かれた区間を含むルートは保存しない）
+    if not any(leg.get("provider") == "throttled" for leg in legs):
+        cache.set(ckey, res, ROUTE_CACHE_TTL_S)
     return res
+
+
+def build_route(
+    mode: Mode,
+    origin: Point,
+    destinations: List[Point],
+    *,
+    optimize: bool = False,
+    fixed_end: bool = False,
+    windows: Optional[List[Optional[Tuple[float, float]]]] = None,
+    stay_s: float = 0.0,
+) -> Dict:
+    """
+    origin から destinations を順にめぐるルート。
+    optimize=True なら訪問順を最適化し、元の添字の並びを order、要約を optimization に入れる。
+    """
+    if not optimize or len(destinations) < 2:
+        return _build_ordered_route(mode, origin, destinations)
+
+    order, summary = optimize_destinations(
+        mode, origin, destinations, fixed_end=fixed_end, windows=windows, stay_s=stay_s
+    )
+    res = _build_ordered_route(mode, origin, [destinations[i] for i in order])
+    return {**res, "order": order, "optimization": summary}
+
+
+def build_route_from_request(data: Dict) -> Dict:
+    """RouteRequestSerializer.validated_data から build_route を呼ぶ（時間窓は start_time 起点の秒に直す）。"""
+    from django.utils import timezone
+    from temples.services.route_optimizer import parse_hhmm
+
+    origin = Point(lat=float(data["origin"]["lat"]), lng=float(data["origin"]["lng"]))
+    dests = [Point(lat=float(d["lat"]), lng=float(d["lng"])) for d in data["destinations"]]
+    if not data.get("optimize"):
+        return build_route(data["mode"], origin, dests)
+
+    start_min = parse_hhmm(data.get("start_time"))
+    if start_min is None:
+        now = timezone.localtime()
+        start_min = now.hour * 60 + now.minute
+
+    windows: List[Optional[Tuple[float, float]]] = []
+    for d in data["destinations"]:
+        o, c = parse_hhmm(d.get("open")), parse_hhmm(d.get("close"))
+        if o is None and c is None:
+            windows.append(None)
+            continue
+        windows.append(
+            (
+                (o - start_min) * 60.0 if o is not None else float("-inf"),
+                (c - start_min) * 60.0 if c is not None else float("inf"),
+            )
+        )
+
+    return build_route(
+        data["mode"],
+        origin,
+        dests,
+        optimize=True,
+        fixed_end=bool(data.get("fixed_end")),
+        windows=windows,
+        stay_s=float(data.get("stay_minutes") or 0) * 60.0,
+    )
@@ -51,6 +51,10 @@ class ConciergePlanRequestSerializer(serializers.Serializer):
     radius_m = serializers.IntegerField(required=False, allow_null=True)
     radius_km = serializers.CharField(required=False, allow_null=True, allow_blank=True) 
 
+    # stops の訪問順を最適化する（start_time は開門時間の判定に使う "HH:MM"）
+    optimize = serializers.BooleanField(required=False, default=False)
+    start_time = serializers.CharField(required=False, allow_blank=True)
+
     def validate_query(self, v: str) -> str:
         if not (v or "").strip():
             raise serializers.ValidationError("この項目は必須です。")
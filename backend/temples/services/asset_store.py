@@ -0,0 +1,232 @@
+# backend/temples/services/asset_store.py
+"""
+内容ハッシュ（sha256）をキーにした永続の画像置き場。
+
+- 同じ内容は 1 回しか書かない（パスは ab/cd/<sha256>.<ext>）
+- 置き場は settings.PLACE_ASSET_ROOT があればそのローカルディレクトリ、
+  無ければ default_storage（本番の R2 など）の place-assets/ 配下
+- 取り込み時に幅違いの縮小版を作る（Pillow で開けない画像は原本だけ）
+
+web プロセスは画像のバイト列を持ち続けない。配信（asset_response）はローカルなら FileResponse で
+ファイルを直接渡し（wsgi.file_wrapper / sendfile が効く）、R2 など公開 URL のある storage は
+そこへリダイレクトする（web ワーカーを経由させない）。
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import re
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+
+log = logging.getLogger(__name__)
+
+_EXT = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+_DEFAULT_PREFIX = "place-assets/"
+
+
+@dataclass(frozen=True)
+class StoredAsset:
+    sha256: str
+    content_type: str
+    size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        ext = _EXT.get(self.content_type, ".bin")
+        return f"{self.sha256[:2]}/{self.sha256[2:4]}/{self.sha256}{ext}"
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.sha256}"'
+
+
+def asset_storage() -> Tuple[Storage, str]:
+    """(storage, 名前の接頭辞)。テストで settings を差し替えられるよう毎回解決する。"""
+    root = getattr(settings, "PLACE_ASSET_ROOT", "") or ""
+    if root:
+        return FileSystemStorage(location=str(root)), ""
+    return default_storage, _DEFAULT_PREFIX
+
+
+def _image_size(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as im:
+            return im.size
+    except Exception:
+        return None, None
+
+
+def put_blob(data: bytes, content_type: str) -> StoredAsset:
+    """data を内容ハッシュで保存する。既にあれば書かない。"""
+    sha = hashlib.sha256(data).hexdigest()
+    width, height = _image_size(data)
+    asset = StoredAsset(sha, content_type, len(data), width, height)
+    storage, prefix = asset_storage()
+    name = prefix + asset.name
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            # 同時に書かれて別名になった（内容は同じなので捨ててよい）
+            storage.delete(saved)
+    return asset
+
+
+def exists(asset: StoredAsset) -> bool:
+    storage, prefix = asset_storage()
+    return storage.exists(prefix + asset.name)
+
+
+def open_blob(asset: StoredAsset):
+    storage, prefix = asset_storage()
+    return storage.open(prefix + asset.name, "rb")
+
+
+def read_blob(asset: StoredAsset) -> bytes:
+    with open_blob(asset) as f:
+        return f.read()
+
+
+def local_path(asset: StoredAsset) -> Optional[str]:
+    """ローカル FS に置いている場合の絶対パス（sendfile 用）。"""
+    storage, prefix = asset_storage()
+    try:
+        return storage.path(prefix + asset.name)
+    except NotImplementedError:
+        return None
+
+
+def public_url(asset: StoredAsset) -> Optional[str]:
+    """ローカル以外の storage が返す絶対 URL（取れなければ None）。"""
+    if local_path(asset) is not None:
+        return None
+    storage, prefix = asset_storage()
+    try:
+        url = storage.url(prefix + asset.name)
+    except Exception:
+        return None
+    return url if isinstance(url, str) and url.startswith(("https://", "http://")) else None
+
+
+def make_variants(data: bytes, content_type: str, widths: Iterable[int]) -> List[StoredAsset]:
+    """原本より狭い各幅の縮小版を作って保存する。開けない画像なら空。"""
+    try:
+        from PIL import Image
+    except ImportError:  # pragma: no cover
+        return []
+
+    out: List[StoredAsset] = []
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            im.load()
+            src_w, src_h = im.size
+            fmt = "PNG" if content_type == "image/png" else "JPEG"
+            ct = "image/png" if fmt == "PNG" else "image/jpeg"
+            for w in sorted({int(w) for w in widths if 0 < int(w) < src_w}, reverse=True):
+                h = max(1, round(src_h * w / src_w))
+                resized = im.resize((w, h), Image.LANCZOS)
+                if fmt == "JPEG" and resized.mode not in ("RGB", "L"):
+                    resized = resized.convert("RGB")
+                buf = io.BytesIO()
+                resized.save(buf, format=fmt, quality=82, optimize=True)
+                out.append(put_blob(buf.getvalue(), ct))
+    except Exception as e:
+        log.info("[asset_store] variants skipped content_type=%s err=%s", content_type, e)
+        return []
+    return out
+
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """単一の bytes=a-b / a- / -n だけ扱う。解釈できない・複数範囲は None（全体を返す）。"""
+    m = _RANGE.match((header or "").strip())
+    if not m or size <= 0:
+        return None
+    a, b = m.group(1), m.group(2)
+    if a == "" and b == "":
+        return None
+    if a == "":
+        start, end = max(0, size - int(b)), size - 1
+    else:
+        start = int(a)
+        end = min(int(b), size - 1) if b else size - 1
+    if start > end or start >= size:
+        return (-1, -1)  # 416
+    return start, end
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in (header or "").split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def asset_response(request, asset: StoredAsset, *, max_age: int) -> HttpResponse:
+    """
+    保存済み画像の配信。内容ハッシュを強い ETag にし、If-None-Match は 304。
+    公開 URL のある storage（R2）はそこへ 302（Range もリダイレクト先が処理する）。
+    ローカルは単一の Range を 206 で返し、全体は FileResponse（sendfile が効く）。
+    """
+    headers = {
+        "ETag": asset.etag,
+        "Cache-Control": f"public, max-age={int(max_age)}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+    if _etag_matches(request.headers.get("If-None-Match", ""), asset.etag):
+        resp = HttpResponse(status=304)
+    elif url := public_url(asset):
+        # 中身は内容ハッシュで不変なので、リダイレクト自体もキャッシュさせてよい
+        resp = HttpResponseRedirect(url)
+        headers.pop("Accept-Ranges")
+    else:
+        rng = _parse_range(request.headers.get("Range", ""), asset.size)
+        if rng == (-1, -1):
+            resp = HttpResponse(status=416)
+            resp["Content-Range"] = f"bytes */{asset.size}"
+        elif rng:
+            start, end = rng
+            with open_blob(asset) as f:
+                f.seek(start)
+                chunk = f.read(end - start + 1)
+            resp = HttpResponse(chunk, status=206, content_type=asset.content_type)
+            resp["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+        else:
+            path = local_path(asset)
+            f = open(path, "rb") if path else open_blob(asset)
+            resp = FileResponse(f, content_type=asset.content_type)
+            resp["Content-Length"] = str(asset.size)
+
+    for k, v in headers.items():
+        resp[k] = v
+    return resp
+
+
+__all__ = [
+    "StoredAsset",
+    "asset_response",
+    "asset_storage",
+    "exists",
+    "local_path",
+    "make_variants",
+    "open_blob",
+    "public_url",
+    "put_blob",
+    "read_blob",
+]
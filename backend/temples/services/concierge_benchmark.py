@@ -0,0 +1,450 @@
+# backend/temples/services/concierge_benchmark.py
+"""
+コンシェルジュのランキングをオフラインで計測する（速度と品質を同じ実行で見る）。
+
+- クエリコーパス（seed/concierge_benchmark_queries.yaml）を build_chat_recommendations に流す
+- 候補プールは代表 80 社（seed/representative_shrines.yaml）に合成神社を足して任意件数にする
+- 速度: スループット、全体 / ステージ別（request_profiler の reco.* フェーズ）の p50 / p95、SQL 本数
+- メモリ: tracemalloc での 1 クエリあたりピーク・残留（計測が重いので別パス）
+- 品質: recall@k / NDCG@k（expected_top_names を正解集合とした二値関連度）と need 判定の正解率
+
+LLM は使わない（CONCIERGE_USE_LLM=False で固定）。結果は JSON にして compare_reports() で差分を取る。
+"""
+from __future__ import annotations
+
+import logging
+import math
+import platform
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import yaml
+from django.test import override_settings
+from temples.services import request_profiler as profiler
+
+log = logging.getLogger(__name__)
+
+SEED_DIR = Path(__file__).resolve().parents[1] / "seed"
+DEFAULT_SEED_PATH = SEED_DIR / "representative_shrines.yaml"
+DEFAULT_QUERIES_PATH = SEED_DIR / "concierge_benchmark_queries.yaml"
+
+DEFAULT_POOL_SIZES = (80, 1000, 10000)
+DEFAULT_K = 3
+REPORT_VERSION = 1
+
+# compare_reports で並べる指標（プールごと）
+COMPARE_METRICS = (
+    "throughput_qps",
+    "latency_ms.p50",
+    "latency_ms.p95",
+    "alloc.peak_kib.p95",
+    "quality.recall@k",
+    "quality.ndcg@k",
+    "quality.need_accuracy",
+)
+
+_SYNTH_ID_BASE = 1_000_000
+
+
+@dataclass(frozen=True)
+class QueryCase:
+    id: str
+    query: str
+    expected_need: Optional[str] = None
+    expected_top_names: tuple[str, ...] = ()
+    note: str = ""
+
+
+@dataclass
+class _Samples:
+    latency_ms: List[float] = field(default_factory=list)
+    stages_ms: Dict[str, List[float]] = field(default_factory=dict)
+    sql: List[int] = field(default_factory=list)
+    upstream: Dict[str, int] = field(default_factory=dict)
+    peak_kib: List[float] = field(default_factory=list)
+    net_kib: List[float] = field(default_factory=list)
+
+
+# ---- 入力 ----
+def load_query_corpus(path: Path | str = DEFAULT_QUERIES_PATH) -> List[QueryCase]:
+    with Path(path).open("r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or []
+
+    cases: List[QueryCase] = []
+    for item in data:
+        if not isinstance(item, dict) or not str(item.get("query") or "").strip():
+            continue
+        cases.append(
+            QueryCase(
+                id=str(item.get("id") or f"q{len(cases) + 1:03d}"),
+                query=str(item["query"]).strip(),
+                expected_need=item.get("expected_need") or None,
+                expected_top_names=tuple(str(n) for n in (item.get("expected_top_names") or [])),
+                note=str(item.get("note") or ""),
+            )
+        )
+    return cases
+
+
+def load_seed_candidates(path: Path | str = DEFAULT_SEED_PATH) -> List[dict]:
+    """代表神社 YAML を chat 候補 dict にする（test_concierge_eval_queries_seed80 と同じ形）。"""
+    with Path(path).open("r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or []
+
+    candidates: List[dict] = []
+    for i, item in enumerate(data):
+        if not isinstance(item, dict):
+            continue
+        lat, lng = item.get("lat"), item.get("lng")
+        address = (item.get("address") or "").strip()
+        name = (item.get("name_jp") or item.get("name") or "").strip()
+        if not name or lat is None or lng is None or not address:
+            continue
+
+        tags = item.get("astro_tags") or []
+        if not isinstance(tags, list):
+            tags = []
+
+        candidates.append(
+            {
+                "id": 10000 + i,
+                "shrine_id": 10000 + i,
+                "name": name,
+                "place_id": f"seed80_{10000 + i}",
+                "address": address,
+                "formatted_address": address,
+                "lat": float(lat),
+                "lng": float(lng),
+                "distance_m": 1000,
+                "goriyaku": item.get("goriyaku") or "",
+                "description": item.get("description") or "",
+                "tags": tags,
+                "astro_tags": tags,
+                "popular_score": 0.5,
+            }
+        )
+    return candidates
+
+
+def synthesize_pool(seed: Sequence[dict], size: int, *, rng_seed: int = 0) -> List[dict]:
+    """
+    seed を先頭に置き、不足分を合成神社で埋める（size 以下なら seed の先頭 size 件）。
+    合成神社は seed のご利益語・タグを組み替えたもので、正解名とは重ならない。
+    人気度は seed（0.5）以下に抑える（有名社より目立つ無名社ばかりにはしない）。
+    """
+    size = max(0, int(size))
+    if size <= len(seed):
+        return [dict(c) for c in seed[:size]]
+
+    rng = random.Random(rng_seed)
+    terms = sorted(
+        {t.strip() for c in seed for t in str(c.get("goriyaku") or "").split("・") if t.strip()}
+    ) or ["開運"]
+    tag_vocab = sorted({t for c in seed for t in (c.get("tags") or [])}) or ["mental"]
+
+    pool = [dict(c) for c in seed]
+    for n in range(size - len(seed)):
+        base = seed[rng.randrange(len(seed))] if seed else {"lat": 35.68, "lng": 139.76, "address": ""}
+        chosen = rng.sample(terms, k=min(len(terms), rng.randint(1, 3)))
+        tags = rng.sample(tag_vocab, k=min(len(tag_vocab), rng.randint(1, 2)))
+        sid = _SYNTH_ID_BASE + n
+        address = f"{str(base.get('address') or '')[:6]}合成{n}"
+        pool.append(
+            {
+                "id": sid,
+                "shrine_id": sid,
+                "name": f"合成神社{n:05d}",
+                "place_id": f"synthetic_{sid}",
+                "address": address,
+                "formatted_address": address,
+                "lat": float(base.get("lat") or 35.68) + rng.uniform(-0.05, 0.05),
+                "lng": float(base.get("lng") or 139.76) + rng.uniform(-0.05, 0.05),
+                "distance_m": rng.randint(200, 30000),
+                "goriyaku": "・".join(chosen),
+                "description": f"{'や'.join(chosen)}のご利益で知られる地域の神社。",
+                "tags": tags,
+                "astro_tags": tags,
+                "popular_score": round(rng.uniform(0.0, 0.5), 3),
+            }
+        )
+    return pool
+
+
+# ---- 指標 ----
+def recall_at_k(ranked: Sequence[str], relevant: Iterable[str], k: int = DEFAULT_K) -> Optional[float]:
+    rel = set(relevant)
+    if not rel:
+        return None
+    hits = len(set(ranked[:k]) & rel)
+    return hits / min(k, len(rel))
+
+
+def ndcg_at_k(ranked: Sequence[str], relevant: Iterable[str], k: int = DEFAULT_K) -> Optional[float]:
+    rel = set(relevant)
+    if not rel:
+        return None
+    dcg = sum(1.0 / math.log2(i + 2) for i, name in enumerate(ranked[:k]) if name in rel)
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(min(k, len(rel))))
+    return dcg / idcg if idcg else None
+
+
+def _percentile(values: Sequence[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    idx = max(0, min(len(s) - 1, math.ceil(len(s) * p / 100.0) - 1))
+    return round(s[idx], 3)
+
+
+def _dist(values: Sequence[float]) -> Dict[str, Any]:
+    return {
+        "p50": _percentile(values, 50),
+        "p95": _percentile(values, 95),
+        "max": round(max(values), 3) if values else None,
+        "mean": round(sum(values) / len(values), 3) if values else None,
+    }
+
+
+def _mean(values: Iterable[Optional[float]]) -> Optional[float]:
+    xs = [v for v in values if v is not None]
+    return round(sum(xs) / len(xs), 4) if xs else None
+
+
+# ---- 実行 ----
+def _recommend(case: QueryCase, pool: List[dict]) -> Dict[str, Any]:
+    from temples.services.concierge_chat import build_chat_recommendations
+
+    return build_chat_recommendations(
+        query=case.query,
+        language="ja",
+        candidates=pool,
+        bias=None,
+        birthdate=None,
+        goriyaku_tag_ids=None,
+        extra_condition=None,
+        public_mode="need",
+        flow="A",
+    )
+
+
+def _top_names(recs: Dict[str, Any]) -> List[str]:
+    return [str(r.get("name") or "") for r in (recs.get("recommendations") or []) if isinstance(r, dict)]
+
+
+def _bench_pool(
+    cases: Sequence[QueryCase],
+    pool: List[dict],
+    *,
+    repeats: int,
+    warmup: int,
+    measure_alloc: bool,
+    k: int,
+) -> Dict[str, Any]:
+    for _ in range(warmup):
+        for case in cases:
+            _recommend(case, pool)
+
+    samples = _Samples()
+    per_case: Dict[str, Dict[str, Any]] = {}
+
+    started = time.perf_counter()
+    for r in range(repeats):
+        for case in cases:
+            with profiler.profile_request("benchmark.concierge_ranking") as prof:
+                recs = _recommend(case, pool)
+            ms = prof.elapsed_ms()
+            samples.latency_ms.append(ms)
+            samples.sql.append(prof.sql_count)
+            for stage, stage_ms in prof.phases.items():
+                samples.stages_ms.setdefault(stage, []).append(stage_ms)
+            for service, n in prof.upstream.items():
+                samples.upstream[service] = samples.upstream.get(service, 0) + n
+
+            entry = per_case.setdefault(case.id, {"latency_ms": []})
+            entry["latency_ms"].append(ms)
+            if r == 0:
+                top = _top_names(recs)[:k]
+                entry.update(
+                    {
+                        "top": top,
+                        "need_tags": list((recs.get("_need") or {}).get("tags") or []),
+                        "recall": recall_at_k(top, case.expected_top_names, k),
+                        "ndcg": ndcg_at_k(top, case.expected_top_names, k),
+                    }
+                )
+    wall_s = time.perf_counter() - started
+
+    if measure_alloc:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        try:
+            for case in cases:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                _recommend(case, pool)
+                after, peak = tracemalloc.get_traced_memory()
+                samples.peak_kib.append((peak - before) / 1024)
+                samples.net_kib.append((after - before) / 1024)
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+    runs = len(samples.latency_ms)
+    case_rows = []
+    for case in cases:
+        entry = per_case.get(case.id) or {}
+        need_tags = entry.get("need_tags") or []
+        case_rows.append(
+            {
+                "id": case.id,
+                "query": case.query,
+                "top": entry.get("top") or [],
+                "recall@k": entry.get("recall"),
+                "ndcg@k": entry.get("ndcg"),
+                "need_ok": (case.expected_need in need_tags) if case.expected_need else None,
+                "latency_ms_p50": _percentile(entry.get("latency_ms") or [], 50),
+            }
+        )
+
+    return {
+        "pool_size": len(pool),
+        "queries": len(cases),
+        "runs": runs,
+        "wall_s": round(wall_s, 3),
+        "throughput_qps": round(runs / wall_s, 3) if wall_s > 0 else None,
+        "latency_ms": _dist(samples.latency_ms),
+        "stages_ms": {stage: _dist(v) for stage, v in sorted(samples.stages_ms.items())},
+        "sql_per_query": _dist([float(n) for n in samples.sql]),
+        "upstream_calls": samples.upstream,
+        "alloc": (
+            {"peak_kib": _dist(samples.peak_kib), "net_kib": _dist(samples.net_kib)}
+            if measure_alloc
+            else None
+        ),
+        "quality": {
+            "k": k,
+            "recall@k": _mean(r["recall@k"] for r in case_rows),
+            "hit@k": _mean(
+                (1.0 if r["recall@k"] else 0.0) if r["recall@k"] is not None else None for r in case_rows
+            ),
+            "ndcg@k": _mean(r["ndcg@k"] for r in case_rows),
+            "need_accuracy": _mean(
+                (1.0 if r["need_ok"] else 0.0) if r["need_ok"] is not None else None for r in case_rows
+            ),
+        },
+        "cases": case_rows,
+    }
+
+
+def run_benchmark(
+    *,
+    cases: Sequence[QueryCase],
+    seed_candidates: Sequence[dict],
+    pool_sizes: Sequence[int] = DEFAULT_POOL_SIZES,
+    repeats: int = 3,
+    warmup: int = 1,
+    measure_alloc: bool = True,
+    k: int = DEFAULT_K,
+    rng_seed: int = 0,
+    quiet_logs: bool = True,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """pool_sizes ごとにコーパスを流して JSON 化できる dict を返す。"""
+    import django
+
+    report: Dict[str, Any] = {
+        "version": REPORT_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "config": {
+            "pool_sizes": [int(s) for s in pool_sizes],
+            "repeats": int(repeats),
+            "warmup": int(warmup),
+            "k": int(k),
+            "rng_seed": int(rng_seed),
+            "queries": len(cases),
+            "seed_candidates": len(seed_candidates),
+        },
+        "pools": {},
+    }
+
+    # ランキング内の [dbg] ログは計測対象外にする（引数の組み立ては残る）
+    prev_disable = logging.root.manager.disable
+    if quiet_logs:
+        logging.disable(logging.INFO)
+    try:
+        with override_settings(CONCIERGE_USE_LLM=False):
+            for size in pool_sizes:
+                pool = synthesize_pool(seed_candidates, int(size), rng_seed=rng_seed)
+                if progress:
+                    progress(f"pool_size={len(pool)} queries={len(cases)} repeats={repeats}")
+                report["pools"][str(int(size))] = _bench_pool(
+                    cases,
+                    pool,
+                    repeats=max(1, int(repeats)),
+                    warmup=max(0, int(warmup)),
+                    measure_alloc=measure_alloc,
+                    k=max(1, int(k)),
+                )
+    finally:
+        logging.disable(prev_disable)
+
+    return report
+
+
+# ---- 比較 ----
+def _dig(d: Any, dotted: str) -> Optional[float]:
+    cur = d
+    for part in dotted.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return None
+        cur = cur[part]
+    return float(cur) if isinstance(cur, (int, float)) else None
+
+
+def compare_reports(base: Dict[str, Any], head: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """両方にあるプールについて COMPARE_METRICS の差分行を返す。"""
+    rows: List[Dict[str, Any]] = []
+    base_pools = base.get("pools") or {}
+    for size, head_pool in (head.get("pools") or {}).items():
+        base_pool = base_pools.get(size)
+        if base_pool is None:
+            continue
+        for metric in COMPARE_METRICS:
+            b, h = _dig(base_pool, metric), _dig(head_pool, metric)
+            if b is None and h is None:
+                continue
+            delta = None if b is None or h is None else round(h - b, 4)
+            rows.append(
+                {
+                    "pool_size": int(size),
+                    "metric": metric,
+                    "base": b,
+                    "head": h,
+                    "delta": delta,
+                    "delta_pct": round(delta / b * 100, 1) if delta is not None and b else None,
+                }
+            )
+    return rows
+
+
+__all__ = [
+    "DEFAULT_POOL_SIZES",
+    "DEFAULT_QUERIES_PATH",
+    "DEFAULT_SEED_PATH",
+    "QueryCase",
+    "compare_reports",
+    "load_query_corpus",
+    "load_seed_candidates",
+    "ndcg_at_k",
+    "recall_at_k",
+    "run_benchmark",
+    "synthesize_pool",
+]
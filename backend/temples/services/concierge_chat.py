@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from django.conf import settings as dj_settings
 
+from temples.services import request_profiler as profiler
 from temples.services.concierge_candidate_utils import _normalize_candidate_fields
 from temples.services.concierge_chat_extra_condition import (
     resolve_extra_condition_tags,
@@ -27,12 +28,14 @@ from temples.services.concierge_chat_presentation import (
     _trim_to_top3_and_fill_message,
 )
 from temples.services.concierge_chat_ranking import (
-    _attach_breakdown,
     _attach_rank_comparison,
     _diversify_by_need,
     _resolve_mode_weights,
     build_recommendation_reason,
 )
+from temples.services.concierge_chat_scoring import (
+    attach_breakdowns,
+)
 from temples.services.concierge_chat_response_meta import (
     attach_response_meta,
 )
@@ -71,17 +74,18 @@ def _attach_chat_rec_enrichment(
     astro_bonus_enabled: bool,
     soft_signal_tags: set[str],
 ) -> Dict[str, Any]:
-    for rec in recs.get("recommendations") or []:
-        if not isinstance(rec, dict):
-            continue
+    rows = [r for r in (recs.get("recommendations") or []) if isinstance(r, dict)]
 
-        _attach_breakdown(
-            rec,
-            birthdate=birthdate,
-            need_tags=need_tags,
-            weights=weights,
-            astro_bonus_enabled=astro_bonus_enabled,
-        )
+    # breakdown はプール全体を 1 パスでまとめて計算する
+    attach_breakdowns(
+        rows,
+        birthdate=birthdate,
+        need_tags=need_tags,
+        weights=weights,
+        astro_bonus_enabled=astro_bonus_enabled,
+    )
+
+    for rec in rows:
         _apply_soft_signal_highlights(
             rec,
             soft_signal_tags=soft_signal_tags,
@@ -161,7 +165,101 @@ def _attach_astro_meta(
     return recs
 
 
-def build_chat_recommendations(
+def _rank_pool(
+    recs: Dict[str, Any],
+    *,
+    valid_candidates: List[Dict[str, Any]],
+    public_mode: str,
+    birthdate: Optional[str],
+    need_tags: List[str],
+    weights: Dict[str, float],
+    astro_bonus_enabled: bool,
+    soft_signal_tags: set[str],
+    sort_tags: set[str],
+) -> Dict[str, Any]:
+    """route の recs をプールに広げ、スコア付け・並べ替えまで行う（DB 由来の値だけで決まる）。"""
+    with profiler.phase("reco.pool"):
+        recs = _ensure_pool_size(
+            recs,
+            candidates=valid_candidates,
+            size=12,
+        )
+        recs = _merge_candidate_fields(
+            recs,
+            candidates=valid_candidates,
+        )
+
+    log.info(
+        "[dbg] pool_after_merge size=%d top_names=%r",
+        len(recs.get("recommendations") or []),
+        [r.get("name") for r in (recs.get("recommendations") or [])[:5] if isinstance(r, dict)],
+    )
+
+    with profiler.phase("reco.score"):
+        recs = _attach_chat_rec_enrichment(
+            recs,
+            public_mode=public_mode,
+            birthdate=birthdate,
+            need_tags=need_tags,
+            weights=weights,
+            astro_bonus_enabled=astro_bonus_enabled,
+            soft_signal_tags=soft_signal_tags,
+        )
+
+        recs = attach_explanation_payload(recs)
+
+    try:
+        log.info(
+            "[dbg] explanation_payload_after=%r",
+            [
+                {
+                    "shrine_id": r.get("shrine_id"),
+                    "name": r.get("name"),
+                    "breakdown_matched_need_tags": (r.get("breakdown") or {}).get(
+                        "matched_need_tags"
+                    ),
+                    "breakdown_score_need": (r.get("breakdown") or {}).get("score_need"),
+                    "explanation_payload": r.get("_explanation_payload"),
+                }
+                for r in (recs.get("recommendations") or [])
+                if isinstance(r, dict)
+            ],
+        )
+    except Exception:
+        pass
+
+    with profiler.phase("reco.sort"):
+        recs = _sort_chat_recommendations(
+            recs,
+            sort_tags=sort_tags,
+        )
+        recs["recommendations"] = _attach_rank_comparison(recs.get("recommendations") or [])
+
+    return recs
+
+
+# ストリーミングの ranked イベントに載せる項目（内部用の _ 始まりは載せない）
+PREVIEW_FIELDS = (
+    "name",
+    "display_name",
+    "shrine_id",
+    "place_id",
+    "lat",
+    "lng",
+    "distance_m",
+    "address",
+    "location",
+    "reason",
+    "goriyaku",
+)
+
+
+def ranked_preview(recs: Dict[str, Any], *, limit: int = 3) -> List[Dict[str, Any]]:
+    rows = [r for r in (recs.get("recommendations") or []) if isinstance(r, dict)][:limit]
+    return [{k: r[k] for k in PREVIEW_FIELDS if k in r} for r in rows]
+
+
+def iter_chat_recommendations(
     *,
     query: str,
     language: str,
@@ -174,23 +272,31 @@ def build_chat_recommendations(
     flow="A",
     need_tags: list[str] | None = None,
     llm_enabled: bool | None = None,
-) -> Dict[str, Any]:
+    preview: bool = False,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    候補リストからおすすめ神社を選んで返す関数。
+    build_chat_recommendations の段階版。(イベント名, 値) を順に返す。
 
-    facade はこのファイルに残し、
-    ranking / pool / presentation の責務は各モジュールへ分離する。
+    - ("need", need_payload): need タグが決まった時点
+    - ("ranked", {"recommendations": 上位 3 件, "provisional": bool}): preview=True のときだけ。
+      LLM を使わない場合は採点し終えた最終順位（provisional=False）。
+      LLM を使う場合は LLM を待たずに need で絞った種の並び（provisional=True、final で差し替わる）
+    - ("final", recs): LLM の理由・説明文まで付いた最終結果（build_chat_recommendations と同じ）
     """
-    valid_candidates = [
-        _normalize_candidate_fields(c) for c in (candidates or []) if isinstance(c, dict)
-    ]
-
-    need_payload = resolve_need_payload(
-        query=query or "",
-        need_tags=need_tags or [],
-        max_tags=3,
-    )
-    need_tags = need_payload["tags"]
+    with profiler.phase("reco.normalize"):
+        valid_candidates = [
+            _normalize_candidate_fields(c) for c in (candidates or []) if isinstance(c, dict)
+        ]
+
+    with profiler.phase("reco.need"):
+        need_payload = resolve_need_payload(
+            query=query or "",
+            need_tags=need_tags or [],
+            max_tags=3,
+        )
+        need_tags = need_payload["tags"]
+
+    yield "need", need_payload
 
     log.info(
         "[dbg] need_tags query=%r tags=%r language=%r flow=%r mode=%r extra=%r goriyaku=%r",
@@ -219,13 +325,35 @@ def build_chat_recommendations(
     astro_bonus_enabled = public_mode == "compat"
     llm_enabled = bool(getattr(dj_settings, "CONCIERGE_USE_LLM", False))
 
-    route = resolve_llm_route(
-        query=query or "",
-        valid_candidates=valid_candidates,
+    rank_kwargs = dict(
+        public_mode=public_mode,
+        birthdate=birthdate,
         need_tags=need_tags,
-        llm_enabled=llm_enabled,
+        weights=weights,
+        astro_bonus_enabled=astro_bonus_enabled,
+        soft_signal_tags=soft_signal_tags,
+        sort_tags=sort_tags,
     )
 
+    if preview and llm_enabled:
+        # LLM を待たずに need で絞った種の並びだけ先に出す（採点はしない。最終順位とは違いうる）
+        with profiler.phase("reco.preview"):
+            seed = resolve_llm_route(
+                query=query or "",
+                valid_candidates=valid_candidates,
+                need_tags=need_tags,
+                llm_enabled=False,
+            )
+        yield "ranked", {"recommendations": ranked_preview(seed["recs"]), "provisional": True}
+
+    with profiler.phase("reco.route"):
+        route = resolve_llm_route(
+            query=query or "",
+            valid_candidates=valid_candidates,
+            need_tags=need_tags,
+            llm_enabled=llm_enabled,
+        )
+
     recs = route["recs"]
     requested_llm_enabled = bool(route["requested_llm_enabled"])
     effective_llm_enabled = bool(route["effective_llm_enabled"])
@@ -244,67 +372,19 @@ def build_chat_recommendations(
         len(valid_candidates),
     )
 
-    recs = _ensure_pool_size(
-        recs,
-        candidates=valid_candidates,
-        size=12,
-    )
-    recs = _merge_candidate_fields(
-        recs,
-        candidates=valid_candidates,
-    )
-
-    log.info(
-        "[dbg] pool_after_merge size=%d top_names=%r",
-        len(recs.get("recommendations") or []),
-        [r.get("name") for r in (recs.get("recommendations") or [])[:5] if isinstance(r, dict)],
-    )
-
-    recs = _attach_chat_rec_enrichment(
-        recs,
-        public_mode=public_mode,
-        birthdate=birthdate,
-        need_tags=need_tags,
-        weights=weights,
-        astro_bonus_enabled=astro_bonus_enabled,
-        soft_signal_tags=soft_signal_tags,
-    )
+    recs = _rank_pool(recs, valid_candidates=valid_candidates, **rank_kwargs)
 
-    recs = attach_explanation_payload(recs)
+    if preview and not llm_enabled:
+        yield "ranked", {"recommendations": ranked_preview(recs), "provisional": False}
 
-    try:
-        log.info(
-            "[dbg] explanation_payload_after=%r",
-            [
-                {
-                    "shrine_id": r.get("shrine_id"),
-                    "name": r.get("name"),
-                    "breakdown_matched_need_tags": (r.get("breakdown") or {}).get(
-                        "matched_need_tags"
-                    ),
-                    "breakdown_score_need": (r.get("breakdown") or {}).get("score_need"),
-                    "explanation_payload": r.get("_explanation_payload"),
-                }
-                for r in (recs.get("recommendations") or [])
-                if isinstance(r, dict)
-            ],
+    with profiler.phase("reco.location"):
+        _fill_location_from_existing_address(recs)
+        _backfill_location_from_name(
+            recs,
+            bias=bias,
+            language=language,
         )
-    except Exception:
-        pass
-
-    recs = _sort_chat_recommendations(
-        recs,
-        sort_tags=sort_tags,
-    )
-    recs["recommendations"] = _attach_rank_comparison(recs.get("recommendations") or [])
-
-    _fill_location_from_existing_address(recs)
-    _backfill_location_from_name(
-        recs,
-        bias=bias,
-        language=language,
-    )
-    _trim_to_top3_and_fill_message(recs)
+        _trim_to_top3_and_fill_message(recs)
 
     try:
         log.info(
@@ -329,34 +409,75 @@ def build_chat_recommendations(
     if llm_error:
         log.warning("[build_chat_recommendations] LLM error: %s", llm_error)
 
-    recs = _attach_astro_meta(
-        recs,
-        astro_profile=astro_profile,
-    )
+    with profiler.phase("reco.explain"):
+        recs = _attach_astro_meta(
+            recs,
+            astro_profile=astro_profile,
+        )
 
-    recs["_need"] = need_payload
+        recs["_need"] = need_payload
 
-    recs = attach_response_meta(
-        recs,
-        public_mode=public_mode,
-        flow=flow,
-        weights=weights,
-        astro_bonus_enabled=astro_bonus_enabled,
-        effective_llm_enabled=effective_llm_enabled,
-        llm_used=llm_used,
-        llm_error=llm_error,
-        valid_candidates=valid_candidates,
-        extra_condition=extra_condition,
-        goriyaku_tag_ids=goriyaku_tag_ids,
-        hard_filter_tags=hard_filter_tags,
-    )
+        recs = attach_response_meta(
+            recs,
+            public_mode=public_mode,
+            flow=flow,
+            weights=weights,
+            astro_bonus_enabled=astro_bonus_enabled,
+            effective_llm_enabled=effective_llm_enabled,
+            llm_used=llm_used,
+            llm_error=llm_error,
+            valid_candidates=valid_candidates,
+            extra_condition=extra_condition,
+            goriyaku_tag_ids=goriyaku_tag_ids,
+            hard_filter_tags=hard_filter_tags,
+        )
+
+        recs = attach_explanations_for_chat(
+            recs,
+            query=query or "",
+            bias=bias,
+            birthdate=birthdate,
+            extra_condition=extra_condition,
+        )
+
+    yield "final", recs
+
+
+def build_chat_recommendations(
+    *,
+    query: str,
+    language: str,
+    candidates: list[dict],
+    bias=None,
+    birthdate=None,
+    goriyaku_tag_ids=None,
+    extra_condition=None,
+    public_mode="need",
+    flow="A",
+    need_tags: list[str] | None = None,
+    llm_enabled: bool | None = None,
+) -> Dict[str, Any]:
+    """
+    候補リストからおすすめ神社を選んで返す関数。
 
-    recs = attach_explanations_for_chat(
-        recs,
-        query=query or "",
+    facade はこのファイルに残し、
+    ranking / pool / presentation の責務は各モジュールへ分離する。
+    段階ごとに結果が欲しい場合（ストリーミング）は iter_chat_recommendations を使う。
+    """
+    recs: Dict[str, Any] = {}
+    for event, payload in iter_chat_recommendations(
+        query=query,
+        language=language,
+        candidates=candidates,
         bias=bias,
         birthdate=birthdate,
+        goriyaku_tag_ids=goriyaku_tag_ids,
         extra_condition=extra_condition,
-    )
-
+        public_mode=public_mode,
+        flow=flow,
+        need_tags=need_tags,
+        llm_enabled=llm_enabled,
+    ):
+        if event == "final":
+            recs = payload
     return recs
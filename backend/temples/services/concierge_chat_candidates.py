@@ -4,18 +4,30 @@ import logging
 import math
 from typing import Any, Dict, List, Optional
 
-from django.db.models import Q
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Abs
 
 from temples.models import Shrine
+from temples.queries import bbox_q, nearest_queryset
 from temples.services.concierge_candidate_utils import (
     _dedupe_candidates,
     _to_float,
 )
+from temples.services.shrine_need_features import NEED_FEATURES_KEY, to_compact_row
 
 log = logging.getLogger(__name__)
 
 DEFAULT_LIMIT = 12
 
+# 座標ありのときの近傍ティア（半径と件数倍率）
+DEFAULT_RADIUS_M = 30_000
+NEAR_POOL_FACTOR = 2
+# limit のうち人気ティアに残す枠（半径内が埋まっていても人気上位が候補に入るように）
+POPULAR_TIER_SHARE = 0.25
+# 距離を SQL で計算できない環境で、矩形内から読む件数の上限（limit に対する倍率）
+BBOX_SCAN_FACTOR = 4
+
 
 def _distance_m(
     lat1: Optional[float],
@@ -41,6 +53,215 @@ def _distance_m(
     return int(2 * r * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
 
 
+# values() で取る列（モデルインスタンスは作らない）
+_CANDIDATE_FIELDS = (
+    "id",
+    "name_jp",
+    "name_romaji",
+    "address",
+    "latitude",
+    "longitude",
+    "goriyaku",
+    "description",
+    "astro_elements",
+    "popular_score",
+    "place_ref__place_id",
+)
+
+_NEED_FEATURE_FIELDS = (
+    "spec_hash",
+    "text_mask",
+    "gid_mask",
+    "study_hint",
+    "has_material",
+    "text_hits",
+    "text_scores",
+    "goriyaku_tag_ids",
+)
+
+# GoriyakuTag.Meta.ordering と同じ並び（従来の values_list と同順を保つ）
+_TAG_ORDERING = ("category", "name", "id")
+
+
+def _goriyaku_tag_ids_by_shrine(shrine_ids: List[int]) -> Dict[int, List[int]]:
+    """through テーブルを 1 クエリで引いて shrine_id -> [tag_id, ...] にまとめる。"""
+    out: Dict[int, List[int]] = {sid: [] for sid in shrine_ids}
+    if not shrine_ids:
+        return out
+
+    through = Shrine.goriyaku_tags.through.objects.filter(shrine_id__in=shrine_ids)
+    through = through.order_by(*[f"goriyakutag__{f}" for f in _TAG_ORDERING])
+    for sid, tid in through.values_list("shrine_id", "goriyakutag_id"):
+        out[sid].append(tid)
+    return out
+
+
+def _tag_ids_subquery():
+    """PostgreSQL 用: 神社ごとの goriyaku_tags を ARRAY_AGG した相関サブクエリ。"""
+    from django.contrib.postgres.aggregates import ArrayAgg
+
+    through = Shrine.goriyaku_tags.through.objects.filter(shrine_id=OuterRef("pk"))
+    return Subquery(
+        through.order_by()
+        .values("shrine_id")
+        .annotate(ids=ArrayAgg("goriyakutag_id", order_by=[f"goriyakutag__{f}" for f in _TAG_ORDERING]))
+        .values("ids")
+    )
+
+
+def _fetch_rows(qs, limit: Optional[int], extra: tuple = ()) -> List[Dict[str, Any]]:
+    """
+    候補行を values() で取得する。
+
+    - PostgreSQL: goriyaku_tags は相関サブクエリで同じ SELECT に載せる
+    - それ以外（sqlite など）: 後で _attach_tag_ids が through テーブルを 1 回引く
+    """
+    fields = _CANDIDATE_FIELDS + tuple(f"need_features__{f}" for f in _NEED_FEATURE_FIELDS) + extra
+
+    if connection.vendor == "postgresql":
+        qs = qs.annotate(tag_ids=_tag_ids_subquery())
+        fields += ("tag_ids",)
+
+    qs = qs.values(*fields)
+    if limit is not None:
+        qs = qs[:limit]
+    return list(qs)
+
+
+def _attach_tag_ids(rows: List[Dict[str, Any]]) -> None:
+    pending = [r["id"] for r in rows if "tag_ids" not in r]
+    tag_map = _goriyaku_tag_ids_by_shrine(pending) if pending else {}
+    for r in rows:
+        r["tag_ids"] = list(r.get("tag_ids") or tag_map.get(r["id"]) or [])
+
+
+def _sql_distance(value: Any) -> Optional[int]:
+    # Spatialite は Distance オブジェクトで返る
+    value = getattr(value, "m", value)
+    f = _to_float(value)
+    return int(f) if f is not None else None
+
+
+def _load_nearby_rows(qs, *, lat: float, lng: float, radius_m: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    近傍ティア: 半径内を距離昇順で limit 件。
+
+    PostgreSQL / GIS 環境は nearest_queryset（KNN or ハバースイン）で SQL 側で並べる。
+    それ以外は矩形条件で DB 側を絞ってから Python で距離を計算する。
+    """
+    near = nearest_queryset(lng, lat, radius_m=radius_m, base_qs=qs)
+    if not near.query.is_empty():
+        rows = _fetch_rows(near, limit, extra=("d_m",))
+        for r in rows:
+            r["distance_m"] = _sql_distance(r.pop("d_m", None))
+        return rows
+
+    # 経度方向を緯度で縮めたマンハッタン距離で近い順に limit * BBOX_SCAN_FACTOR 件だけ読む
+    lng_scale = math.cos(math.radians(lat))
+    approx = Abs(F("latitude") - lat) + Abs(F("longitude") - lng) * lng_scale
+    in_box = qs.filter(bbox_q(lng, lat, radius_m)).annotate(_approx=approx).order_by("_approx", "id")
+    rows = _fetch_rows(in_box, limit * BBOX_SCAN_FACTOR)
+    for r in rows:
+        r["distance_m"] = _distance_m(lat, lng, r.get("latitude"), r.get("longitude"))
+    rows = [r for r in rows if r["distance_m"] is not None and r["distance_m"] <= radius_m]
+    rows.sort(key=lambda r: (r["distance_m"], r["id"]))
+    return rows[:limit]
+
+
+def _load_candidate_rows(
+    qs,
+    *,
+    lat: Optional[float],
+    lng: Optional[float],
+    radius_m: int,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    候補母集団を set-based に取得する（母集団サイズに依らずクエリ数は一定）。
+
+    座標あり: 近傍ティア（limit * NEAR_POOL_FACTOR 件）+ 人気ティア（limit 件）
+    座標なし: 人気順に max(limit * 5, 50) 件
+    人気ティアから来た行には _popular_tier=True を付ける。
+    """
+    popular_qs = qs.order_by("-popular_score", "id")
+
+    if lat is None or lng is None:
+        rows = _fetch_rows(popular_qs, max(limit * 5, 50))
+    else:
+        rows = _load_nearby_rows(qs, lat=lat, lng=lng, radius_m=radius_m, limit=limit * NEAR_POOL_FACTOR)
+        # 人気ティア: 半径内が少ない地域でも候補が痩せないよう混ぜる
+        seen = {r["id"] for r in rows}
+        for r in _fetch_rows(popular_qs, limit):
+            if r["id"] not in seen:
+                r["_popular_tier"] = True
+                rows.append(r)
+
+    _attach_tag_ids(rows)
+    return rows
+
+
+def _candidate_from_row(r: Dict[str, Any], lat: Optional[float], lng: Optional[float]) -> Dict[str, Any]:
+    need_features = to_compact_row({f: r.get(f"need_features__{f}") for f in _NEED_FEATURE_FIELDS})
+
+    row: Dict[str, Any] = {
+        "id": r["id"],
+        "shrine_id": r["id"],
+        "place_id": r.get("place_ref__place_id"),
+        "name": r.get("name_jp") or r.get("name_romaji"),
+        "address": r.get("address"),
+        "lat": r.get("latitude"),
+        "lng": r.get("longitude"),
+        "distance_m": r["distance_m"]
+        if "distance_m" in r
+        else _distance_m(lat, lng, r.get("latitude"), r.get("longitude")),
+        "goriyaku": r.get("goriyaku"),
+        "description": r.get("description"),
+        # Shrine に列が無いものは従来どおり None
+        "astro_tags": None,
+        "astro_elements": r.get("astro_elements"),
+        "astro_priority": None,
+        "goriyaku_tag_ids": r.get("tag_ids") or [],
+        "popular_score": r.get("popular_score"),
+    }
+    if need_features is not None:
+        row[NEED_FEATURES_KEY] = need_features
+    return row
+
+
+def _distance_key(c: Dict[str, Any]):
+    d = c.get("distance_m")
+    return (
+        float(d) if d is not None else 1e12,
+        -float(c.get("popular_score") or 0),
+        str(c.get("name") or ""),
+    )
+
+
+def _popular_key(c: Dict[str, Any]):
+    return (
+        -float(c.get("popular_score") or 0),
+        str(c.get("name") or ""),
+    )
+
+
+def _merge_popular_tier(
+    near: List[Dict[str, Any]],
+    popular: List[Dict[str, Any]],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    近傍ティアと人気ティアを limit 件にまとめる（距離順）。
+    人気ティアには limit * POPULAR_TIER_SHARE 件（最低 1 件）の枠を残し、近傍が足りなければ残りも人気で埋める。
+    """
+    near = sorted(near, key=_distance_key)
+    popular = sorted(popular, key=_popular_key)
+    reserved = min(len(popular), max(1, int(limit * POPULAR_TIER_SHARE))) if limit > 1 else 0
+    picked = near[: limit - reserved]
+    picked += popular[: limit - len(picked)]
+    picked.sort(key=_distance_key)
+    return picked
+
+
 def build_chat_candidates(
     *,
     goriyaku_tag_ids: Optional[List[int]] = None,
@@ -48,12 +269,15 @@ def build_chat_candidates(
     lat: Optional[float] = None,
     lng: Optional[float] = None,
     limit: int = DEFAULT_LIMIT,
+    radius_m: Optional[int] = None,
     trace_id: str | None = None,
 ) -> List[Dict[str, Any]]:
     qs = Shrine.objects.all()
 
     if goriyaku_tag_ids:
-        qs = qs.filter(goriyaku_tags__id__in=goriyaku_tag_ids).distinct()
+        # JOIN + distinct だと集約対象のタグまで絞られるので、サブクエリで絞る
+        tagged = Shrine.goriyaku_tags.through.objects.filter(goriyakutag_id__in=goriyaku_tag_ids)
+        qs = qs.filter(id__in=tagged.values("shrine_id"))
 
     # area文字列フィルタは、座標が取れていない時だけ使う
     if area and (lat is None or lng is None):
@@ -79,66 +303,25 @@ def build_chat_candidates(
     qs = qs.exclude(name_jp__startswith="テスト")
     qs = qs.exclude(name_jp__istartswith="test")
 
-    qs = qs.select_related("place_ref")
     qs = qs.filter(latitude__isnull=False, longitude__isnull=False)
     qs = qs.exclude(address="")
 
-    # 候補母集団は少し広めに取る
-    if hasattr(Shrine, "popular_score"):
-        qs = qs.order_by("-popular_score", "id")
-    else:
-        qs = qs.order_by("id")
-
-    pool_limit = max(limit * 5, 50)
-    qs = qs[:pool_limit]
-
-    candidates: List[Dict[str, Any]] = []
-    for s in qs:
-        dist = _distance_m(lat, lng, s.latitude, s.longitude)
-
-        pref = getattr(s, "place_ref", None)
-        place_id = getattr(pref, "place_id", None) if pref else None
-
-        candidates.append(
-            {
-                "id": s.id,
-                "shrine_id": s.id,
-                "place_id": place_id,
-                "name": s.name_jp or s.name_romaji,
-                "address": s.address,
-                "lat": s.latitude,
-                "lng": s.longitude,
-                "distance_m": dist,
-                "goriyaku": getattr(s, "goriyaku", None),
-                "description": getattr(s, "description", None),
-                "astro_tags": getattr(s, "astro_tags", None),
-                "astro_elements": getattr(s, "astro_elements", None),
-                "astro_priority": getattr(s, "astro_priority", None),
-                "goriyaku_tag_ids": list(s.goriyaku_tags.values_list("id", flat=True))
-                if hasattr(s, "goriyaku_tags")
-                else [],
-                "popular_score": getattr(s, "popular_score", None),
-            }
-        )
-
+    rows = _load_candidate_rows(
+        qs,
+        lat=lat,
+        lng=lng,
+        radius_m=int(radius_m or DEFAULT_RADIUS_M),
+        limit=limit,
+    )
     # 座標がある場合は距離優先、ない場合は人気順
     if lat is not None and lng is not None:
-        candidates.sort(
-            key=lambda c: (
-                float(c.get("distance_m") or 1e12),
-                -float(c.get("popular_score") or 0),
-                str(c.get("name") or ""),
-            )
-        )
+        near = [_candidate_from_row(r, lat, lng) for r in rows if not r.get("_popular_tier")]
+        popular = [_candidate_from_row(r, lat, lng) for r in rows if r.get("_popular_tier")]
+        candidates = _merge_popular_tier(near, popular, limit)
     else:
-        candidates.sort(
-            key=lambda c: (
-                -float(c.get("popular_score") or 0),
-                str(c.get("name") or ""),
-            )
-        )
-
-    candidates = candidates[:limit]
+        candidates = [_candidate_from_row(r, lat, lng) for r in rows]
+        candidates.sort(key=_popular_key)
+        candidates = candidates[:limit]
     candidates = _dedupe_candidates(candidates)
 
     with_pid = sum(1 for c in candidates if c.get("place_id"))
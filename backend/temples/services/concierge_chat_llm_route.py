@@ -7,6 +7,8 @@ from django.conf import settings
 
 from temples.services.concierge_chat_pool import _seed_recs_from_candidates
 from temples.services.concierge_chat_ranking import _prefilter_candidates_for_need
+from temples.services.shrine_need_features import NEED_FEATURES_KEY
+from temples.upstream.deadline import deadline_scope
 
 log = logging.getLogger(__name__)
 
@@ -37,26 +39,34 @@ def resolve_llm_route(
 
     llm_used = False
     llm_error: Optional[str] = None
+    recs: Optional[Dict[str, Any]] = None
 
     if effective_llm_enabled:
-        try:
-            from temples.llm import orchestrator as orch_mod  # type: ignore
+        from temples.llm.executor import llm_circuit_open
 
-            llm_used = True
-            recs = orch_mod.ConciergeOrchestrator().suggest(
-                query=query,
-                candidates=valid_candidates,
-            )
-        except Exception as e:
-            llm_error = f"{type(e).__name__}: {e}"
-            log.exception("[resolve_llm_route] LLM exception traceback")
+        if llm_circuit_open():
+            # 上流が落ちている間は待たずに決定的なフォールバックへ
+            llm_error = "UpstreamUnavailable: circuit open: llm"
+        else:
+            try:
+                from temples.llm import orchestrator as orch_mod  # type: ignore
 
-            prefiltered = _prefilter_candidates_for_need(
-                valid_candidates,
-                need_tags=need_tags,
-            )
-            recs = _seed_recs_from_candidates(prefiltered, size=12)
-    else:
+                llm_used = True
+                # 推薦全体の締め切り。中の LLM 呼び出し（再試行込み）はこの残り時間しか待たない
+                with deadline_scope(float(getattr(settings, "CONCIERGE_LLM_BUDGET_S", 8.0))):
+                    # need 特徴量インデックスは内部用なのでプロンプトには載せない
+                    recs = orch_mod.ConciergeOrchestrator().suggest(
+                        query=query,
+                        candidates=[
+                            {k: v for k, v in c.items() if k != NEED_FEATURES_KEY}
+                            for c in valid_candidates
+                        ],
+                    )
+            except Exception as e:
+                llm_error = f"{type(e).__name__}: {e}"
+                log.exception("[resolve_llm_route] LLM exception traceback")
+
+    if recs is None:
         prefiltered = _prefilter_candidates_for_need(
             valid_candidates,
             need_tags=need_tags,
@@ -3,6 +3,9 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional
 
 from temples.services.concierge_candidate_utils import _normalize_candidate_fields
+from temples.services.shrine_need_features import NEED_FEATURES_KEY
+
+_NEED_MATERIAL_KEYS = ("goriyaku", "description", "goriyaku_tag_ids")
 
 
 def _seed_recs_from_candidates(
@@ -119,6 +122,9 @@ def _merge_candidate_fields(
             for k, v in row_input.items():
                 if v is not None:
                     row[k] = v
+            # 上書きで素材が変わったら事前計算済みの need 特徴量は使えない
+            if any(row.get(k) != base.get(k) for k in _NEED_MATERIAL_KEYS):
+                row.pop(NEED_FEATURES_KEY, None)
             merged.append(row)
         else:
             merged.append(row_input)
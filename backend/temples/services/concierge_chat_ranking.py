@@ -359,244 +359,19 @@ def _attach_breakdown(
     内部ランキング用:
       - rec["_score_total"]
       - breakdown_detail.features.need.rank_weighted
-    """
-
-    astro_elements = rec.get("astro_elements")
-    if isinstance(astro_elements, list):
-        rec["astro_elements"] = [e for e in astro_elements if isinstance(e, str) and e.strip()]
-
-    pri_raw = rec.get("astro_priority")
-    pri = int(pri_raw) if isinstance(pri_raw, int) else 0
-
-    if birthdate:
-        try:
-            from temples.domain.astrology import element_priority, sun_sign_and_element  # type: ignore
-
-            prof = sun_sign_and_element(birthdate)
-            if prof:
-                shrine_elems = rec.get("astro_elements") or []
-                pri = int(element_priority(prof.element, shrine_elems))
-        except Exception:
-            pass
-
-    score_element = int(pri)
-
-    shrine_tags = rec.get("astro_tags") or []
-    if not isinstance(shrine_tags, list):
-        shrine_tags = []
-    shrine_tags = [t for t in shrine_tags if isinstance(t, str) and t.strip()]
-    shrine_tag_set = set(shrine_tags)
-
-    need_tags_clean = _normalize_need_tags(need_tags, max_tags=10)
-    matched_by_tag = [t for t in need_tags_clean if t in shrine_tag_set]
-
-    goriyaku_text = str(rec.get("goriyaku") or "")
-    description_text = str(rec.get("description") or "")
-    material = f"{goriyaku_text} {description_text}".replace("　", " ")
-
-    matched_by_text: List[str] = []
-    text_score_by_tag: Dict[str, int] = {}
-
-    for tag in need_tags_clean:
-        text_weights = NEED_TEXT_WEIGHTS.get(tag, {})
-        score = 0
-
-        for hint, weight in text_weights.items():
-            if hint in material:
-                score += int(weight)
-
-        if score > 0:
-            text_score_by_tag[tag] = score
-            matched_by_text.append(tag)
-
-    candidate_gid_set = {
-        int(x)
-        for x in (rec.get("goriyaku_tag_ids") or [])
-        if isinstance(x, int) or (isinstance(x, str) and str(x).strip().isdigit())
-    }
-
-    matched_by_gid: List[str] = []
-    for tag in need_tags_clean:
-        expected_gids = need_tags_to_goriyaku_ids([tag])
-        if expected_gids and (candidate_gid_set & expected_gids):
-            matched_by_gid.append(tag)
-
-    is_study_need = "study" in need_tags_clean
-    study_bonus = 0
-    if is_study_need and any(h in material for h in STUDY_SHRINE_HINTS):
-        study_bonus = 1
-
-    matched_all: List[str] = []
-    seen: set[str] = set()
-    for t in matched_by_tag + matched_by_text + matched_by_gid:
-        if t not in seen:
-            matched_all.append(t)
-            seen.add(t)
-
-    score_need = len(matched_all)
-
-    score_need_rank = (
-        len(matched_by_tag) * 2
-        + len(matched_by_gid) * 2
-        + sum(text_score_by_tag.values())
-        + study_bonus
-    )
-
-    score_need_rank_weighted = (
-        len(matched_by_tag) * 2.0
-        + len(matched_by_gid) * 2.0
-        + sum(text_score_by_tag.values()) * 1.2
-        + study_bonus
-    )
-
-    w1 = float(weights.get("element", 0.0))
-    w2 = float(weights.get("need", 0.0))
-    w3 = float(weights.get("popular", 0.0))
-    w4 = float(weights.get("distance", 0.0))
-
-    astro_bonus = 0.0
-    if astro_bonus_enabled:
-        if pri == 2:
-            astro_bonus = 0.6
-        elif pri == 1:
-            astro_bonus = 0.3
-
-    try:
-        popular_f = float(rec.get("popular_score") or 0.0)
-    except Exception:
-        popular_f = 0.0
-    score_popular = _clamp01(popular_f / 10.0)
 
-    raw_distance = rec.get("distance_m")
-    try:
-        distance_m = float(raw_distance) if raw_distance is not None else None
-    except Exception:
-        distance_m = None
-    score_distance = _distance_decay(distance_m)
-
-    # score_total:
-    #   API 契約用の公開スコア。
-    #   画面表示や explanation の基本値として使う。
-    # _score_total:
-    #   実際の並び順に使う内部ランキング用スコア。
-    #   need の強一致・距離減衰まで含めた ranked score を入れる。
-    score_total = score_element * w1 + score_need * w2 + score_popular * w3 + astro_bonus
-
-    score_total_ranked = (
-        score_element * w1
-        + score_need_rank_weighted * w2
-        + score_popular * w3
-        + score_distance * w4
-        + astro_bonus
-    )
-
-    rec["_score_total"] = float(score_total_ranked)
-
-    rec["breakdown"] = {
-        "score_element": int(score_element),
-        "score_need": int(score_need),
-        "score_popular": float(score_popular),
-        "score_total": float(score_total),
-        "weights": {
-            "element": float(w1),
-            "need": float(w2),
-            "popular": float(w3),
-        },
-        "matched_need_tags": matched_all,
-    }
-
-    rec["breakdown_detail"] = {
-        "version": 1,
-        "features": {
-            "element": {
-                "raw": int(score_element),
-                "weight": float(w1),
-                "contribution": float(score_element * w1),
-            },
-            "need": {
-                "raw": int(score_need),
-                "rank_raw": int(score_need_rank),
-                "rank_weighted": float(score_need_rank_weighted),
-                "weight": float(w2),
-                "matched_tags": matched_all,
-                "matched_by_tag_count": len(matched_by_tag),
-                "matched_by_text_count": len(matched_by_text),
-                "matched_by_gid_count": len(matched_by_gid),
-                "contribution": float(score_need * w2),
-                "rank_contribution": float(score_need_rank * w2),
-                "rank_weighted_contribution": float(score_need_rank_weighted * w2),
-            },
-            "popular": {
-                "raw": float(score_popular),
-                "weight": float(w3),
-                "contribution": float(score_popular * w3),
-            },
-            "distance": {
-                "raw": float(score_distance),
-                "weight": float(w4),
-                "contribution": float(score_distance * w4),
-            },
-            "astro_bonus": float(astro_bonus) if astro_bonus_enabled else 0.0,
-            "score_total_ranked": float(score_total_ranked),
-        },
-    }
+    計算本体は concierge_chat_scoring のバッチエンジン。
+    プール全体を扱う場合は attach_breakdowns を直接使うこと。
+    """
+    from temples.services.concierge_chat_scoring import attach_breakdowns
 
-    reason_facts = _build_reason_facts(
-        matched_by_tag=matched_by_tag,
-        matched_by_gid=matched_by_gid,
-        matched_by_text=matched_by_text,
-        text_score_by_tag=text_score_by_tag,
-        score_element=score_element,
+    attach_breakdowns(
+        [rec],
+        birthdate=birthdate,
+        need_tags=need_tags,
+        weights=weights,
         astro_bonus_enabled=astro_bonus_enabled,
     )
-    primary_reason = _resolve_primary_reason(reason_facts)
-
-    if reason_facts:
-        for fact in reason_facts:
-            if (
-                str(fact.get("type") or "") == str(primary_reason.get("type") or "")
-                and str(fact.get("label") or "") == str(primary_reason.get("label") or "")
-                and list(fact.get("evidence") or []) == list(primary_reason.get("evidence") or [])
-            ):
-                fact["is_primary"] = True
-                break
-    else:
-        reason_facts = [primary_reason]
-
-    rec["_reason_facts"] = reason_facts
-    rec["_primary_reason_source"] = str(primary_reason.get("type") or "")
-    rec["_primary_reason_label"] = str(primary_reason.get("label") or "")
-    rec["rank_explanation"] = _to_rank_explanation(rec=rec)
-
-    need_score_reason = "normal_scored"
-    if not need_tags_clean:
-        need_score_reason = "no_need_tags"
-    elif not matched_all:
-        if not candidate_gid_set and not shrine_tag_set and not material.strip():
-            need_score_reason = "no_candidate_material"
-        elif matched_by_tag or matched_by_text or matched_by_gid:
-            need_score_reason = "unexpected_empty_after_match"
-        else:
-            need_score_reason = "no_overlap"
-
-    try:
-        log.info(
-            "[dbg] attach_breakdown shrine_id=%r name=%r need_tags=%r prefilter_matched=%r matched_by_tag=%r matched_by_text=%r matched_by_gid=%r matched_all=%r score_need=%r need_score_reason=%r primary_reason_source=%r primary_reason_label=%r",
-            rec.get("shrine_id"),
-            rec.get("name"),
-            need_tags_clean,
-            (rec.get("_prefilter_debug") or {}).get("matched"),
-            matched_by_tag,
-            matched_by_text,
-            matched_by_gid,
-            matched_all,
-            score_need,
-            need_score_reason,
-            rec.get("_primary_reason_source"),
-            rec.get("_primary_reason_label"),
-        )
-    except Exception:
-        pass
 
 
 def _prefilter_candidates_for_need(
@@ -604,10 +379,13 @@ def _prefilter_candidates_for_need(
     *,
     need_tags: List[str],
 ) -> List[Dict[str, Any]]:
+    from temples.services.shrine_need_features import need_bit, usable_need_features
+
     scored: List[tuple[int, float, str, Dict[str, Any]]] = []
 
     need_tags_clean = _normalize_need_tags(need_tags, max_tags=10)
     is_study_need = "study" in need_tags_clean
+    expected_gids_by_tag = {tag: need_tags_to_goriyaku_ids([tag]) for tag in need_tags_clean}
 
     for c in candidates:
         if not isinstance(c, dict):
@@ -620,13 +398,18 @@ def _prefilter_candidates_for_need(
             str(t).strip() for t in astro_tags if isinstance(t, str) and str(t).strip()
         }
 
-        candidate_gid_set = {
-            int(x)
-            for x in (c.get("goriyaku_tag_ids") or [])
-            if isinstance(x, int) or (isinstance(x, str) and str(x).strip().isdigit())
-        }
+        # 事前計算済みの need 特徴量があればテキスト走査を省く
+        nf = usable_need_features(c)
 
-        material = f"{c.get('goriyaku') or ''} {c.get('description') or ''}".replace("　", " ")
+        candidate_gid_set: set[int] = set()
+        material = ""
+        if nf is None:
+            candidate_gid_set = {
+                int(x)
+                for x in (c.get("goriyaku_tag_ids") or [])
+                if isinstance(x, int) or (isinstance(x, str) and str(x).strip().isdigit())
+            }
+            material = f"{c.get('goriyaku') or ''} {c.get('description') or ''}".replace("　", " ")
 
         score = 0
         matched: List[str] = []
@@ -639,14 +422,21 @@ def _prefilter_candidates_for_need(
                 score += 2
                 matched.append(f"{tag}:astro")
 
-            expected_gids = need_tags_to_goriyaku_ids([tag])
-            if expected_gids and (candidate_gid_set & expected_gids):
+            if nf is not None:
+                gid_hit = bool(int(nf.get("gid_mask") or 0) & need_bit(tag))
+            else:
+                expected_gids = expected_gids_by_tag[tag]
+                gid_hit = bool(expected_gids and (candidate_gid_set & expected_gids))
+            if gid_hit:
                 score += 2
                 matched.append(f"{tag}:gid")
                 matched_gid_tags.append(tag)
 
             text_weights = NEED_TEXT_WEIGHTS.get(tag, {})
-            tag_matched_hints = [hint for hint in text_weights.keys() if hint in material]
+            if nf is not None:
+                tag_matched_hints = list((nf.get("text_hits") or {}).get(tag) or [])
+            else:
+                tag_matched_hints = [hint for hint in text_weights.keys() if hint in material]
 
             if tag_matched_hints:
                 score += 1
@@ -654,7 +444,11 @@ def _prefilter_candidates_for_need(
                 matched_text_hints_by_tag[tag] = tag_matched_hints
                 text_score_by_tag[tag] = sum(text_weights[h] for h in tag_matched_hints)
 
-        if is_study_need and any(h in material for h in STUDY_SHRINE_HINTS):
+        if nf is not None:
+            study_hit = bool(nf.get("study_hint"))
+        else:
+            study_hit = any(h in material for h in STUDY_SHRINE_HINTS)
+        if is_study_need and study_hit:
             score += 2
             matched.append("study:text_bonus")
 
@@ -0,0 +1,465 @@
+"""
+concierge chat の候補プールをまとめてスコアリングするバッチエンジン。
+
+クエリ側の文脈（need_tags / weights / 星座プロファイル）は 1 回だけ解決し、
+候補ごとの特徴量を NumPy 配列に詰めてから element / need / popular / distance の
+寄与と _score_total を一括で計算する。
+
+breakdown / breakdown_detail / reason_facts の出力は従来の 1 件ずつの計算
+（_attach_breakdown）とビット単位で一致させる。そのため:
+  - 加算の順序は従来の式と同じに保つ
+  - popular の clamp と distance の指数減衰は math ベースの関数をそのまま使う
+    （np.exp は libm と最終桁がずれることがあるため）
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from temples.domain.need_to_goriyaku_tag_ids import need_tags_to_goriyaku_ids
+from temples.services.concierge_chat_ranking import (
+    NEED_TEXT_WEIGHTS,
+    STUDY_SHRINE_HINTS,
+    _build_reason_facts,
+    _clamp01,
+    _distance_decay,
+    _normalize_need_tags,
+    _resolve_primary_reason,
+    _to_rank_explanation,
+)
+from temples.services.shrine_need_features import NEED_FEATURES_KEY, need_bit
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class BreakdownContext:
+    """1 リクエスト分のクエリ側文脈。候補プール全体で共有する。"""
+
+    need_tags: Tuple[str, ...]
+    need_bits: Tuple[int, ...]
+    need_gids: Tuple[FrozenSet[int], ...]
+    need_text_weights: Tuple[Tuple[Tuple[str, int], ...], ...]
+    is_study_need: bool
+    w_element: float
+    w_need: float
+    w_popular: float
+    w_distance: float
+    astro_bonus_enabled: bool
+    user_element: Optional[str] = None
+
+
+@dataclass
+class _RowFeatures:
+    score_element: int = 0
+    pri: int = 0
+    matched_by_tag: List[str] = field(default_factory=list)
+    matched_by_text: List[str] = field(default_factory=list)
+    matched_by_gid: List[str] = field(default_factory=list)
+    matched_all: List[str] = field(default_factory=list)
+    text_score_by_tag: Dict[str, int] = field(default_factory=dict)
+    study_bonus: int = 0
+    score_popular: float = 0.0
+    score_distance: float = 0.0
+    has_material: bool = False
+    has_gids: bool = False
+    has_shrine_tags: bool = False
+
+
+@dataclass
+class PoolScores:
+    """候補プール全体の特徴量とスコア（行は入力 recs と同じ並び）。"""
+
+    rows: List[_RowFeatures]
+    score_element: np.ndarray
+    score_need: np.ndarray
+    score_need_rank: np.ndarray
+    score_need_rank_weighted: np.ndarray
+    score_popular: np.ndarray
+    score_distance: np.ndarray
+    astro_bonus: np.ndarray
+    score_total: np.ndarray
+    score_total_ranked: np.ndarray
+
+
+def build_breakdown_context(
+    *,
+    birthdate: Optional[str],
+    need_tags: List[str],
+    weights: Dict[str, float],
+    astro_bonus_enabled: bool,
+) -> BreakdownContext:
+    need_tags_clean = _normalize_need_tags(need_tags, max_tags=10)
+
+    user_element: Optional[str] = None
+    if birthdate:
+        try:
+            from temples.domain.astrology import sun_sign_and_element  # type: ignore
+
+            prof = sun_sign_and_element(birthdate)
+            if prof:
+                user_element = prof.element
+        except Exception:
+            user_element = None
+
+    return BreakdownContext(
+        need_tags=tuple(need_tags_clean),
+        need_bits=tuple(need_bit(t) for t in need_tags_clean),
+        need_gids=tuple(frozenset(need_tags_to_goriyaku_ids([t])) for t in need_tags_clean),
+        need_text_weights=tuple(
+            tuple(NEED_TEXT_WEIGHTS.get(t, {}).items()) for t in need_tags_clean
+        ),
+        is_study_need="study" in need_tags_clean,
+        w_element=float(weights.get("element", 0.0)),
+        w_need=float(weights.get("need", 0.0)),
+        w_popular=float(weights.get("popular", 0.0)),
+        w_distance=float(weights.get("distance", 0.0)),
+        astro_bonus_enabled=bool(astro_bonus_enabled),
+        user_element=user_element,
+    )
+
+
+def _apply_indexed_need_features(
+    f: _RowFeatures,
+    nf: Dict[str, Any],
+    ctx: BreakdownContext,
+) -> None:
+    text_mask = int(nf.get("text_mask") or 0)
+    gid_mask = int(nf.get("gid_mask") or 0)
+    text_scores = nf.get("text_scores") or {}
+
+    f.has_material = bool(nf.get("has_material"))
+    f.has_gids = bool(nf.get("has_gids"))
+
+    for tag, bit in zip(ctx.need_tags, ctx.need_bits, strict=True):
+        if text_mask & bit:
+            f.text_score_by_tag[tag] = int(text_scores.get(tag) or 0)
+            f.matched_by_text.append(tag)
+
+    for tag, bit in zip(ctx.need_tags, ctx.need_bits, strict=True):
+        if gid_mask & bit:
+            f.matched_by_gid.append(tag)
+
+    if ctx.is_study_need and nf.get("study_hint"):
+        f.study_bonus = 1
+
+
+def _scan_need_features(
+    f: _RowFeatures,
+    rec: Dict[str, Any],
+    ctx: BreakdownContext,
+) -> None:
+    material = f"{rec.get('goriyaku') or ''} {rec.get('description') or ''}".replace("　", " ")
+    f.has_material = bool(material.strip())
+
+    candidate_gid_set = {
+        int(x)
+        for x in (rec.get("goriyaku_tag_ids") or [])
+        if isinstance(x, int) or (isinstance(x, str) and str(x).strip().isdigit())
+    }
+    f.has_gids = bool(candidate_gid_set)
+
+    for tag, text_weights in zip(ctx.need_tags, ctx.need_text_weights, strict=True):
+        score = 0
+        for hint, weight in text_weights:
+            if hint in material:
+                score += int(weight)
+        if score > 0:
+            f.text_score_by_tag[tag] = score
+            f.matched_by_text.append(tag)
+
+    for tag, expected_gids in zip(ctx.need_tags, ctx.need_gids, strict=True):
+        if expected_gids and (candidate_gid_set & expected_gids):
+            f.matched_by_gid.append(tag)
+
+    if ctx.is_study_need and any(h in material for h in STUDY_SHRINE_HINTS):
+        f.study_bonus = 1
+
+
+def _extract_row_features(rec: Dict[str, Any], ctx: BreakdownContext) -> _RowFeatures:
+    f = _RowFeatures()
+
+    astro_elements = rec.get("astro_elements")
+    if isinstance(astro_elements, list):
+        rec["astro_elements"] = [e for e in astro_elements if isinstance(e, str) and e.strip()]
+
+    pri_raw = rec.get("astro_priority")
+    pri = int(pri_raw) if isinstance(pri_raw, int) else 0
+
+    if ctx.user_element:
+        try:
+            from temples.domain.astrology import element_priority  # type: ignore
+
+            pri = int(element_priority(ctx.user_element, rec.get("astro_elements") or []))  # type: ignore[arg-type]
+        except Exception:
+            pass
+
+    f.pri = pri
+    f.score_element = int(pri)
+
+    shrine_tags = rec.get("astro_tags") or []
+    if not isinstance(shrine_tags, list):
+        shrine_tags = []
+    shrine_tag_set = {t for t in shrine_tags if isinstance(t, str) and t.strip()}
+    f.has_shrine_tags = bool(shrine_tag_set)
+
+    for tag in ctx.need_tags:
+        if tag in shrine_tag_set:
+            f.matched_by_tag.append(tag)
+
+    # 事前計算済みインデックスがあればビット演算だけで済ませる
+    nf = rec.pop(NEED_FEATURES_KEY, None)
+    if isinstance(nf, dict) and "text_mask" in nf:
+        _apply_indexed_need_features(f, nf, ctx)
+    else:
+        _scan_need_features(f, rec, ctx)
+
+    seen: set[str] = set()
+    for t in f.matched_by_tag + f.matched_by_text + f.matched_by_gid:
+        if t not in seen:
+            f.matched_all.append(t)
+            seen.add(t)
+
+    try:
+        popular_f = float(rec.get("popular_score") or 0.0)
+    except Exception:
+        popular_f = 0.0
+    f.score_popular = _clamp01(popular_f / 10.0)
+
+    raw_distance = rec.get("distance_m")
+    try:
+        distance_m = float(raw_distance) if raw_distance is not None else None
+    except Exception:
+        distance_m = None
+    f.score_distance = _distance_decay(distance_m)
+
+    return f
+
+
+def score_candidate_pool(
+    recs: List[Dict[str, Any]],
+    ctx: BreakdownContext,
+) -> PoolScores:
+    """
+    候補プール全体の特徴量を抽出し、スコアを配列演算でまとめて計算する。
+
+    astro_elements の正規化だけは従来どおり rec 側に書き戻す。
+    """
+    rows = [_extract_row_features(rec, ctx) for rec in recs]
+    n = len(rows)
+
+    def _col(getter, dtype=np.float64) -> np.ndarray:
+        return np.fromiter((getter(r) for r in rows), dtype=dtype, count=n)
+
+    score_element = _col(lambda r: r.score_element)
+    score_need = _col(lambda r: len(r.matched_all))
+    by_tag = _col(lambda r: len(r.matched_by_tag))
+    by_gid = _col(lambda r: len(r.matched_by_gid))
+    text_sum = _col(lambda r: sum(r.text_score_by_tag.values()))
+    study_bonus = _col(lambda r: r.study_bonus)
+    score_popular = _col(lambda r: r.score_popular)
+    score_distance = _col(lambda r: r.score_distance)
+    pri = _col(lambda r: r.pri, dtype=np.int64)
+
+    if ctx.astro_bonus_enabled:
+        astro_bonus = np.where(pri == 2, 0.6, np.where(pri == 1, 0.3, 0.0))
+    else:
+        astro_bonus = np.zeros(n, dtype=np.float64)
+
+    score_need_rank = by_tag * 2 + by_gid * 2 + text_sum + study_bonus
+    score_need_rank_weighted = by_tag * 2.0 + by_gid * 2.0 + text_sum * 1.2 + study_bonus
+
+    # 加算順は従来の 1 件ずつの式と揃える（浮動小数の結果を一致させるため）
+    score_total = (
+        score_element * ctx.w_element
+        + score_need * ctx.w_need
+        + score_popular * ctx.w_popular
+        + astro_bonus
+    )
+    score_total_ranked = (
+        score_element * ctx.w_element
+        + score_need_rank_weighted * ctx.w_need
+        + score_popular * ctx.w_popular
+        + score_distance * ctx.w_distance
+        + astro_bonus
+    )
+
+    return PoolScores(
+        rows=rows,
+        score_element=score_element,
+        score_need=score_need,
+        score_need_rank=score_need_rank,
+        score_need_rank_weighted=score_need_rank_weighted,
+        score_popular=score_popular,
+        score_distance=score_distance,
+        astro_bonus=astro_bonus,
+        score_total=score_total,
+        score_total_ranked=score_total_ranked,
+    )
+
+
+def _write_breakdown(
+    rec: Dict[str, Any],
+    *,
+    i: int,
+    scores: PoolScores,
+    ctx: BreakdownContext,
+) -> None:
+    f = scores.rows[i]
+    w1, w2, w3, w4 = ctx.w_element, ctx.w_need, ctx.w_popular, ctx.w_distance
+
+    score_element = f.score_element
+    score_need = len(f.matched_all)
+    score_need_rank = int(scores.score_need_rank[i])
+    score_need_rank_weighted = float(scores.score_need_rank_weighted[i])
+    score_popular = float(scores.score_popular[i])
+    score_distance = float(scores.score_distance[i])
+    astro_bonus = float(scores.astro_bonus[i])
+    score_total_ranked = float(scores.score_total_ranked[i])
+
+    rec["_score_total"] = score_total_ranked
+
+    rec["breakdown"] = {
+        "score_element": int(score_element),
+        "score_need": int(score_need),
+        "score_popular": score_popular,
+        "score_total": float(scores.score_total[i]),
+        "weights": {
+            "element": float(w1),
+            "need": float(w2),
+            "popular": float(w3),
+        },
+        "matched_need_tags": f.matched_all,
+    }
+
+    rec["breakdown_detail"] = {
+        "version": 1,
+        "features": {
+            "element": {
+                "raw": int(score_element),
+                "weight": float(w1),
+                "contribution": float(score_element * w1),
+            },
+            "need": {
+                "raw": int(score_need),
+                "rank_raw": score_need_rank,
+                "rank_weighted": score_need_rank_weighted,
+                "weight": float(w2),
+                "matched_tags": f.matched_all,
+                "matched_by_tag_count": len(f.matched_by_tag),
+                "matched_by_text_count": len(f.matched_by_text),
+                "matched_by_gid_count": len(f.matched_by_gid),
+                "contribution": float(score_need * w2),
+                "rank_contribution": float(score_need_rank * w2),
+                "rank_weighted_contribution": float(score_need_rank_weighted * w2),
+            },
+            "popular": {
+                "raw": score_popular,
+                "weight": float(w3),
+                "contribution": float(score_popular * w3),
+            },
+            "distance": {
+                "raw": score_distance,
+                "weight": float(w4),
+                "contribution": float(score_distance * w4),
+            },
+            "astro_bonus": astro_bonus if ctx.astro_bonus_enabled else 0.0,
+            "score_total_ranked": score_total_ranked,
+        },
+    }
+
+    reason_facts = _build_reason_facts(
+        matched_by_tag=f.matched_by_tag,
+        matched_by_gid=f.matched_by_gid,
+        matched_by_text=f.matched_by_text,
+        text_score_by_tag=f.text_score_by_tag,
+        score_element=score_element,
+        astro_bonus_enabled=ctx.astro_bonus_enabled,
+    )
+    primary_reason = _resolve_primary_reason(reason_facts)
+
+    if reason_facts:
+        for fact in reason_facts:
+            if (
+                str(fact.get("type") or "") == str(primary_reason.get("type") or "")
+                and str(fact.get("label") or "") == str(primary_reason.get("label") or "")
+                and list(fact.get("evidence") or []) == list(primary_reason.get("evidence") or [])
+            ):
+                fact["is_primary"] = True
+                break
+    else:
+        reason_facts = [primary_reason]
+
+    rec["_reason_facts"] = reason_facts
+    rec["_primary_reason_source"] = str(primary_reason.get("type") or "")
+    rec["_primary_reason_label"] = str(primary_reason.get("label") or "")
+    rec["rank_explanation"] = _to_rank_explanation(rec=rec)
+
+    need_score_reason = "normal_scored"
+    if not ctx.need_tags:
+        need_score_reason = "no_need_tags"
+    elif not f.matched_all:
+        if not f.has_gids and not f.has_shrine_tags and not f.has_material:
+            need_score_reason = "no_candidate_material"
+        elif f.matched_by_tag or f.matched_by_text or f.matched_by_gid:
+            need_score_reason = "unexpected_empty_after_match"
+        else:
+            need_score_reason = "no_overlap"
+
+    try:
+        log.info(
+            "[dbg] attach_breakdown shrine_id=%r name=%r need_tags=%r prefilter_matched=%r matched_by_tag=%r matched_by_text=%r matched_by_gid=%r matched_all=%r score_need=%r need_score_reason=%r primary_reason_source=%r primary_reason_label=%r",
+            rec.get("shrine_id"),
+            rec.get("name"),
+            list(ctx.need_tags),
+            (rec.get("_prefilter_debug") or {}).get("matched"),
+            f.matched_by_tag,
+            f.matched_by_text,
+            f.matched_by_gid,
+            f.matched_all,
+            score_need,
+            need_score_reason,
+            rec.get("_primary_reason_source"),
+            rec.get("_primary_reason_label"),
+        )
+    except Exception:
+        pass
+
+
+def attach_breakdowns(
+    recs: List[Dict[str, Any]],
+    *,
+    birthdate: Optional[str],
+    need_tags: List[str],
+    weights: Dict[str, float],
+    astro_bonus_enabled: bool,
+) -> PoolScores:
+    """
+    候補プール全体に breakdown / breakdown_detail / reason_facts を付与する。
+
+    dict 以外の要素は無視する。戻り値の配列は dict の要素だけを対象にした並び。
+    """
+    rows = [r for r in (recs or []) if isinstance(r, dict)]
+    ctx = build_breakdown_context(
+        birthdate=birthdate,
+        need_tags=need_tags,
+        weights=weights,
+        astro_bonus_enabled=astro_bonus_enabled,
+    )
+    scores = score_candidate_pool(rows, ctx)
+
+    for i, rec in enumerate(rows):
+        _write_breakdown(rec, i=i, scores=scores, ctx=ctx)
+
+    return scores
+
+
+__all__ = [
+    "BreakdownContext",
+    "PoolScores",
+    "attach_breakdowns",
+    "build_breakdown_context",
+    "score_candidate_pool",
+]
@@ -0,0 +1,86 @@
+# backend/temples/services/concierge_chat_stream.py
+"""
+/concierge/chat のストリーミング応答（SSE / NDJSON）の部品。
+
+イベントの順序:
+  need    → 解決した need タグ
+  ranked  → DB 由来のスコアで並べた上位 3 件（LLM を待たない）
+  result  → 通常の JSON 応答と同じ body（LLM の理由・説明文まで入った最終結果）
+  thread  → 保存したスレッドの id
+  done    → 終了
+失敗時は error を送って閉じる。
+
+観測ログなど応答に載らない後処理は ChatStreamResponse.call_on_close で登録し、
+WSGI サーバがストリームを閉じた後に実行する。
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable, List, Optional
+
+from django.http import StreamingHttpResponse
+
+log = logging.getLogger(__name__)
+
+FORMAT_SSE = "sse"
+FORMAT_NDJSON = "ndjson"
+CONTENT_TYPES = {
+    FORMAT_SSE: "text/event-stream; charset=utf-8",
+    FORMAT_NDJSON: "application/x-ndjson; charset=utf-8",
+}
+
+
+def resolve_stream_format(value: Any) -> Optional[str]:
+    """リクエストの stream 指定（?stream= / body.stream）を形式名に。ストリームしないなら None。"""
+    if value is None or value is False:
+        return None
+    s = str(value).strip().lower()
+    if s in ("", "0", "false", "no", "off"):
+        return None
+    if s == FORMAT_NDJSON:
+        return FORMAT_NDJSON
+    return FORMAT_SSE
+
+
+def format_event(fmt: str, event: str, payload: Any) -> bytes:
+    if fmt == FORMAT_NDJSON:
+        line = json.dumps({"event": event, "data": payload}, ensure_ascii=False, separators=(",", ":"), default=str)
+        return f"{line}\n".encode("utf-8")
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+class ChatStreamResponse(StreamingHttpResponse):
+    """ストリームを閉じた後に後処理を走らせる StreamingHttpResponse。"""
+
+    def __init__(self, streaming_content, *, fmt: str = FORMAT_SSE, **kwargs: Any) -> None:
+        super().__init__(streaming_content, content_type=CONTENT_TYPES[fmt], **kwargs)
+        self["Cache-Control"] = "no-cache"
+        # nginx などのプロキシにバッファさせない
+        self["X-Accel-Buffering"] = "no"
+        self._after_close: List[Callable[[], None]] = []
+
+    def call_on_close(self, fn: Callable[[], None]) -> None:
+        self._after_close.append(fn)
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            callbacks, self._after_close = self._after_close, []
+            for fn in callbacks:
+                try:
+                    fn()
+                except Exception:
+                    log.exception("[concierge/stream] after-close task failed")
+
+
+__all__ = [
+    "CONTENT_TYPES",
+    "ChatStreamResponse",
+    "FORMAT_NDJSON",
+    "FORMAT_SSE",
+    "format_event",
+    "resolve_stream_format",
+]
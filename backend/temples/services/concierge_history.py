@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional, Any
+from typing import Any, Iterable, Optional
 
 from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery
 from django.utils import timezone
 
 from temples.models import ConciergeMessage, ConciergeThread
+from temples.services.concierge_snapshot import build_snapshot
+
+PREVIEW_MAX_LEN = 120
+# append_chat 後に読み直す列（スナップショット JSON は含めない）
+_THREAD_LIGHT_FIELDS = [
+    "user",
+    "anonymous_id",
+    "title",
+    "created_at",
+    "updated_at",
+    "last_message_at",
+    "message_count",
+    "last_message_preview",
+    "snapshot_version",
+]
+DEFAULT_REFRESH_BATCH_SIZE = 500
 
 
 @dataclass
@@ -23,6 +40,12 @@ def _short_title(text: str, max_len: int = 40) -> str:
     return text[:max_len]
 
 
+def message_preview(text: Optional[str], max_len: int = PREVIEW_MAX_LEN) -> str:
+    """一覧に出す最終メッセージの抜粋（改行は詰める）。"""
+    s = " ".join((text or "").split())
+    return s if len(s) <= max_len else s[: max_len - 1] + "…"
+
+
 @transaction.atomic
 def append_chat(
     *,
@@ -40,13 +63,15 @@ def append_chat(
         raise ValueError("user または anonymous_id のどちらかが必要です")
 
     if thread_id is not None:
+        # スナップショット列（大きい JSON）は読まずにロックだけ取る
+        locked = ConciergeThread.objects.select_for_update().only("id", "user_id", "anonymous_id")
         if user is not None:
-            thread = ConciergeThread.objects.select_for_update().get(
+            thread = locked.get(
                 id=thread_id,
                 user=user,
             )
         else:
-            thread = ConciergeThread.objects.select_for_update().get(
+            thread = locked.get(
                 id=thread_id,
                 anonymous_id=anonymous_id,
             )
@@ -56,8 +81,6 @@ def append_chat(
             anonymous_id=anonymous_id,
             title=_short_title(query),
             last_message_at=now,
-            recommendations=recommendations,
-            recommendations_v2=recommendations_v2,
         )
     user_msg = ConciergeMessage.objects.create(
         thread=thread,
@@ -74,13 +97,65 @@ def append_chat(
             content=reply_text,
         )
 
-    last_at = assistant_msg.created_at if assistant_msg else user_msg.created_at
+    last_msg = assistant_msg or user_msg
 
     ConciergeThread.objects.filter(pk=thread.pk).update(
-        last_message_at=last_at,
-        recommendations=recommendations,
-        recommendations_v2=recommendations_v2,
+        last_message_at=last_msg.created_at,
+        message_count=F("message_count") + (2 if assistant_msg else 1),
+        last_message_preview=message_preview(last_msg.content),
+        **build_snapshot(recommendations, recommendations_v2),
     )
 
-    thread.refresh_from_db()
+    thread.refresh_from_db(fields=_THREAD_LIGHT_FIELDS)
     return ChatSaveResult(thread=thread, user_message=user_msg, assistant_message=assistant_msg)
+
+
+def refresh_thread_stats(
+    thread_ids: Optional[Iterable[int]] = None,
+    *,
+    batch_size: int = DEFAULT_REFRESH_BATCH_SIZE,
+) -> int:
+    """
+    message_count / last_message_preview / last_message_at をメッセージから数え直す（バックフィル用）。
+    1 バッチあたり集計 SELECT 1 本 + bulk_update。メッセージの無いスレッドは created_at を使う。
+    """
+    qs = ConciergeThread.objects.order_by("id")
+    if thread_ids is not None:
+        qs = qs.filter(id__in=list(thread_ids))
+
+    last_content = Subquery(
+        ConciergeMessage.objects.filter(thread=OuterRef("pk"))
+        .order_by("-created_at", "-id")
+        .values("content")[:1]
+    )
+
+    updated = 0
+    last_id = 0
+    batch_size = max(1, int(batch_size))
+    while True:
+        rows = list(
+            qs.filter(id__gt=last_id)
+            .annotate(
+                _count=Count("messages"),
+                _last_at=Max("messages__created_at"),
+                _last_content=last_content,
+            )
+            .only("id", "created_at", "last_message_at", "message_count", "last_message_preview")[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for t in rows:
+            t.message_count = int(t._count or 0)
+            t.last_message_preview = message_preview(t._last_content)
+            t.last_message_at = t._last_at or t.last_message_at or t.created_at
+
+        with transaction.atomic():
+            ConciergeThread.objects.bulk_update(
+                rows,
+                ["message_count", "last_message_preview", "last_message_at"],
+            )
+        updated += len(rows)
+
+    return updated
@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import logging
 from typing import Any, Dict, List, Optional
-from temples.models_concierge_analytics import ConciergeRecommendationLog
+from temples.services import write_behind
 
 logger = logging.getLogger("concierge.observability")
 
@@ -89,20 +89,24 @@ def save_concierge_recommendation_log(
     lng=None,
     radius_m=None,
 ):
+    # 応答を待たせないよう write-behind に積む（実際の INSERT は worker がまとめて行う）
     try:
-        ConciergeRecommendationLog.objects.create(
-            user=user,
-            thread=thread,
-            query=query or "",
-            need_tags=need_tags or [],
-            flow=flow or "",
-            llm_enabled=bool(llm_enabled),
-            llm_used=bool(llm_used),
-            recommendations=recommendations or [],
-            result_state=result_state or {},
-            lat=lat,
-            lng=lng,
-            radius_m=radius_m,
+        write_behind.enqueue(
+            "recommendation_log",
+            {
+                "user_id": getattr(user, "pk", None),
+                "thread_id": getattr(thread, "pk", None),
+                "query": query or "",
+                "need_tags": need_tags or [],
+                "flow": flow or "",
+                "llm_enabled": bool(llm_enabled),
+                "llm_used": bool(llm_used),
+                "recommendations": recommendations or [],
+                "result_state": result_state or {},
+                "lat": lat,
+                "lng": lng,
+                "radius_m": radius_m,
+            },
         )
     except Exception:
         logger.exception("failed_to_save_concierge_log")
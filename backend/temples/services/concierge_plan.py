@@ -7,17 +7,18 @@ from __future__ import annotations
 import logging
 import os
 import re
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from django.conf import settings
+from django.utils import timezone
 from temples.domain.fortune import fortune_profile
 from temples.domain.match import bonus_score
 from temples.domain.wish_map import get_hints_for_wish, match_wish_from_query
-from temples.geocoding.client import geocode_google_point
+from temples.geocoding.area_cache import geocode_area_point
 from temples.llm import backfill as bf
-from temples.services import places as Places
 from temples.services.billing_state import recommend_limit_for_user
 from temples.services.concierge_explanations import attach_explanations_for_plan
+from temples.services.place_resolver import bias_from_locationbias, resolve_names
 
 logger = logging.getLogger(__name__)
 
@@ -65,9 +66,9 @@ def _build_bias(data: Dict[str, Any]) -> Optional[Dict[str, float]]:
     lng = data.get("lng")
     area_text = (data.get("area_resolved") or "").strip()
 
-    # area がある & lat/lng が無いなら geocoding client で解決する
+    # area がある & lat/lng が無いなら area キャッシュ経由で解決する
     if area_text and (lat is None or lng is None):
-        pt = geocode_google_point(area_text, language="ja", region="jp", timeout=6.0)
+        pt = geocode_area_point(area_text, language="ja", region="jp", timeout=6.0)
         if pt:
             lat, lng = pt
 
@@ -110,6 +111,7 @@ def _apply_cost_guarded_place_enrichment(
     """
     Plan向け Places 最終補完（課金防衛版）。
     - disable時は何もしない
+    - 既知の名前（記憶・DB）は上流を呼ばずに埋める
     - 最大 lookup 数を制限
     - 1件座標を確保したら追加 lookup を止める
     """
@@ -117,89 +119,55 @@ def _apply_cost_guarded_place_enrichment(
         return filled
 
     try:
-        patched: list[dict] = []
+        recs = list(filled.get("recommendations") or [])
+        max_place_lookups = max(0, int(os.getenv("PLAN_MAX_PLACE_LOOKUPS", "2")))
 
-        max_place_lookups = int(os.getenv("PLAN_MAX_PLACE_LOOKUPS", "2"))
-        if max_place_lookups <= 0:
-            logger.info("[plan] places_budget max=%d done=0 got_coords=0", max_place_lookups)
-            return filled
-        lookups_done = 0
-        cache: dict[str, dict] = {}
-        got_coords = 0
-
-        for r in filled.get("recommendations") or []:
-            # 🔒 文字列locationを固定したいrecは補完対象外
-            if r.get("_lock_text_loc") and isinstance(r.get("location"), str):
-                patched.append(r)
-                continue
-
-            # すでに座標あり
+        def _has_coords(r: dict) -> bool:
             loc = r.get("location")
-            if isinstance(loc, dict) and loc.get("lat") is not None and loc.get("lng") is not None:
-                got_coords += 1
-                patched.append(r)
-                continue
-
-            # 既に1件座標確保済みなら追加lookupしない（最低1stop運用）
-            if got_coords >= 1:
-                patched.append(r)
-                continue
-
-            # lookup上限超過なら叩かない
-            if lookups_done >= max_place_lookups:
-                patched.append(r)
-                continue
-
-            probe = (r.get("name") or "").strip()
-            if area:
-                probe = f"{probe} {area}".strip()
+            return isinstance(loc, dict) and loc.get("lat") is not None and loc.get("lng") is not None
+
+        got_coords = sum(1 for r in recs if _has_coords(r))
+        # 🔒 文字列locationを固定したいrecと、座標済みのrecは補完対象外
+        targets = [
+            r
+            for r in recs
+            if not (r.get("_lock_text_loc") and isinstance(r.get("location"), str))
+            and not _has_coords(r)
+            and (r.get("name") or "").strip()
+        ]
+
+        trace: Dict[str, int] = {}
+        resolved = resolve_names(
+            [r["name"] for r in targets],
+            bias=bias_from_locationbias(locbias),
+            locationbias=locbias,
+            area=area,
+            language=language,
+            max_upstream=max_place_lookups,
+            # 座標は 1 件確保できれば十分（最低1stop運用）
+            stop_after_points=max(0, 1 - got_coords),
+            trace=trace,
+        )
 
-            if not probe:
-                patched.append(r)
+        for r in targets:
+            place = resolved.get(r["name"].strip())
+            if not place:
                 continue
-
-            # キャッシュヒット
-            if probe in cache:
-                res = cache[probe]
-            else:
-                try:
-                    res = Places.findplacefromtext(
-                        input=probe,
-                        language=language,
-                        locationbias=locbias,
-                        fields="place_id,name,formatted_address,geometry",
-                    )
-                    cache[probe] = res
-                    lookups_done += 1
-                except Exception:
-                    res = None
-
-            try:
-                cand = (res.get("candidates") or [{}])[0] if isinstance(res, dict) else {}
-                g2 = (cand.get("geometry") or {}).get("location") or {}
-                lat2, lng2 = g2.get("lat"), g2.get("lng")
-
-                if lat2 is not None and lng2 is not None:
-                    r["location"] = {"lat": float(lat2), "lng": float(lng2)}
-                    got_coords += 1
-
-                if not r.get("display_address"):
-                    addr = cand.get("formatted_address")
-                    if addr:
-                        r["display_address"] = bf._shorten_japanese_address(addr) or addr
-            except Exception:
-                pass
-
-            patched.append(r)
+            if place.has_point:
+                r["location"] = {"lat": float(place.lat), "lng": float(place.lng)}
+                got_coords += 1
+            if not r.get("display_address") and place.address:
+                r["display_address"] = bf._shorten_japanese_address(place.address) or place.address
 
         logger.info(
-            "[plan] places_budget max=%d done=%d got_coords=%d",
+            "[plan] places_budget max=%d done=%d known=%d got_coords=%d",
             max_place_lookups,
-            lookups_done,
+            trace.get("upstream", 0),
+            trace.get("memo", 0) + trace.get("db", 0),
             got_coords,
         )
         out = dict(filled)
-        out["recommendations"] = patched
+        out["recommendations"] = recs
         return out
     except Exception:
         return filled
@@ -379,6 +347,80 @@ def dedupe_recommendations(recs: list[dict]) -> list[dict]:
 # =========================================================
 # Main: build response
 # =========================================================
+def _rec_point(rec: dict) -> Optional[Tuple[float, float]]:
+    loc = rec.get("location")
+    if isinstance(loc, dict) and loc.get("lat") is not None and loc.get("lng") is not None:
+        try:
+            return float(loc["lat"]), float(loc["lng"])
+        except Exception:
+            return None
+    return None
+
+
+def _optimize_stop_sequence(
+    recs: list[dict],
+    *,
+    bias: Optional[Dict[str, float]],
+    transportation: str,
+    start_time: Optional[str],
+) -> Tuple[list[dict], Dict[int, int], Optional[Dict[str, Any]]]:
+    """
+    座標のある候補の訪問順をハバースイン行列で最適化する（プロバイダは呼ばない）。
+    bias があればそこを出発点に固定し、opening_hours.periods があれば今日の時間窓に使う。
+    戻り値: (並べ替えた recs, 並べ替え後の添字 → 移動分, 要約)
+    """
+    from temples.services.route_optimizer import (
+        MAX_NODES,
+        haversine_matrix,
+        optimize_order,
+        parse_hhmm,
+        window_from_opening_hours,
+    )
+
+    with_pt = [(r, _rec_point(r)) for r in recs]
+    located = [(r, pt) for r, pt in with_pt if pt is not None]
+    others = [r for r, pt in with_pt if pt is None]
+    if len(located) < 2:
+        return recs, {}, None
+
+    has_start = bias is not None and bias.get("lat") is not None and bias.get("lng") is not None
+    located = located[: MAX_NODES - (1 if has_start else 0)]
+    points = [pt for _r, pt in located]
+    if has_start:
+        points = [(float(bias["lat"]), float(bias["lng"])), *points]
+    offset = 1 if has_start else 0
+
+    now = timezone.localtime()
+    start_min = parse_hhmm(start_time)
+    if start_min is None:
+        start_min = now.hour * 60 + now.minute
+    google_weekday = (now.weekday() + 1) % 7  # Google は日曜 = 0
+
+    windows: list = [None] * offset
+    for r, _pt in located:
+        w = window_from_opening_hours(r.get("opening_hours"), google_weekday)
+        windows.append(((w[0] - start_min) * 60.0, (w[1] - start_min) * 60.0) if w else None)
+
+    mode = "driving" if transportation == "car" else "walking"
+    matrix = haversine_matrix(points, mode)
+    result = optimize_order(
+        matrix,
+        start=0 if has_start else None,
+        windows=windows if any(windows) else None,
+        service_s=[0.0] * offset + [30 * 60.0] * len(located),
+    )
+
+    path = [i for i in result.order if i >= offset]
+    ordered = [located[i - offset][0] for i in path]
+    travel: Dict[int, int] = {}
+    prev = 0 if has_start else None
+    for pos, node in enumerate(path):
+        if prev is not None:
+            travel[pos] = max(1, int(round(matrix[prev][node] / 60.0)))
+        prev = node
+    return ordered + others, travel, {**result.summary(), "matrix": "haversine"}
+
+
 def build_plan_response(  # noqa: C901
     *,
     request_data: Dict[str, Any],
@@ -596,14 +638,24 @@ def build_plan_response(  # noqa: C901
         logger.exception("[plan] attach_explanations failed: %s", e)
         pass
 
-    # 簡易 stops 生成（徒歩3分 + 滞在30分）
+    # 簡易 stops 生成（徒歩3分 + 滞在30分）。optimize なら訪問順と移動分を最適化結果で置き換える
     stops = []
+    optimization = None
     try:
         eta = 0
         order = 0
         recs_limited = filled.get("recommendations") or []
+        travel_by_idx: Dict[int, int] = {}
+
+        if serializer_validated.get("optimize"):
+            recs_limited, travel_by_idx, optimization = _optimize_stop_sequence(
+                recs_limited,
+                bias=bias,
+                transportation=transportation,
+                start_time=serializer_validated.get("start_time"),
+            )
 
-        for rec in recs_limited:
+        for idx, rec in enumerate(recs_limited):
             name = rec.get("display_name") or _clean_display_name(rec.get("name") or "Spot")
             loc = rec.get("location")
             rlat = loc.get("lat") if isinstance(loc, dict) else None
@@ -614,7 +666,7 @@ def build_plan_response(  # noqa: C901
                 continue
 
             order += 1
-            travel_minutes = 3
+            travel_minutes = travel_by_idx.get(idx, 3)
             eta += travel_minutes
 
             disp = rec.get("display_address") or f"{rlat:.3f}, {rlng:.3f}"
@@ -693,7 +745,7 @@ def build_plan_response(  # noqa: C901
             "location": main_loc,
         },
         "alternatives": [],
-        "route_hints": {"mode": transportation},
+        "route_hints": {"mode": transportation, **({"optimized": optimization} if optimization else {})},
         "stops": stops,
     }
 
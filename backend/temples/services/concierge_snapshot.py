@@ -0,0 +1,171 @@
+# backend/temples/services/concierge_snapshot.py
+"""
+ConciergeThread に保存するおすすめのスナップショット。
+
+- SNAPSHOT_VERSION 2: recommendations には画面が描く項目だけの compact 形を入れ、
+  breakdown_detail / _explanation_payload / _prefilter_debug などを含む全量は recommendations_detail に分ける。
+  recommendations_detail は通常 recommendations の全量（list）。recommendations_v2 が別物のときだけ
+  {"recommendations": [...], "recommendations_v2": [...]} の形で両方の全量を持つ
+- version 1（旧形式）: recommendations に全量がそのまま入っている
+
+スレッド詳細は既定で compact 形を返し、?detail=1 のときだけ全量を読む。
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+SNAPSHOT_VERSION = 2
+LEGACY_SNAPSHOT_VERSION = 1
+
+# compact 形に残すキー（web の shrines/[id] と concierge 画面が参照するもの）
+COMPACT_FIELDS = (
+    "id",
+    "shrine_id",
+    "place_id",
+    "name",
+    "display_name",
+    "address",
+    "location",
+    "lat",
+    "lng",
+    "distance_m",
+    "goriyaku",
+    "popular_score",
+    "reason",
+    "fallback_mode",
+    "astro_elements",
+    "astro_priority",
+    "rank",
+    "breakdown",
+    "explanation",
+    "rank_comparison",
+)
+
+# rank_explanation は contributors などの内訳を落として見出しだけ残す
+RANK_EXPLANATION_FIELDS = (
+    "version",
+    "summary",
+    "primary_axis",
+    "primary_axis_ja",
+    "primary_label",
+    "primary_label_ja",
+    "matched_need_tags",
+)
+
+
+def compact_recommendation(rec: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: rec[k] for k in COMPACT_FIELDS if k in rec}
+
+    rank_explanation = rec.get("rank_explanation")
+    if isinstance(rank_explanation, dict):
+        out["rank_explanation"] = {k: rank_explanation[k] for k in RANK_EXPLANATION_FIELDS if k in rank_explanation}
+
+    reason_facts = rec.get("reason_facts", rec.get("_reason_facts"))
+    if reason_facts is not None:
+        out["reason_facts"] = reason_facts
+    return out
+
+
+def compact_recommendations(recs: Optional[List[Any]]) -> Optional[List[Dict[str, Any]]]:
+    if recs is None:
+        return None
+    return [compact_recommendation(r) for r in recs if isinstance(r, dict)]
+
+
+def build_snapshot(
+    recommendations: Optional[List[Dict[str, Any]]],
+    recommendations_v2: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    ConciergeThread に書くフィールド一式を返す。
+    v2 が recommendations と同じ内容（chat の既定）なら二重に持たない。
+    """
+    separate_v2 = (
+        recommendations_v2 is not None
+        and recommendations_v2 is not recommendations
+        and recommendations_v2 != recommendations
+    )
+    detail: Any = recommendations
+    if separate_v2:
+        detail = {"recommendations": recommendations, "recommendations_v2": recommendations_v2}
+    return {
+        "snapshot_version": SNAPSHOT_VERSION,
+        "recommendations": compact_recommendations(recommendations),
+        "recommendations_v2": compact_recommendations(recommendations_v2) if separate_v2 else None,
+        "recommendations_detail": detail,
+    }
+
+
+def read_snapshot(thread, *, detail: bool = False) -> Dict[str, Any]:
+    """
+    詳細 API 用に recommendations / recommendations_v2 を取り出す。
+    detail=False のときは recommendations_detail を読まない（defer したままでよい）。
+    """
+    version = getattr(thread, "snapshot_version", LEGACY_SNAPSHOT_VERSION) or LEGACY_SNAPSHOT_VERSION
+
+    if version >= SNAPSHOT_VERSION:
+        recs = thread.recommendations
+        recs_v2 = thread.recommendations_v2
+        if detail:
+            full = thread.recommendations_detail
+            if isinstance(full, dict):
+                recs, recs_v2 = full.get("recommendations"), full.get("recommendations_v2")
+            else:
+                recs = full
+        if recs_v2 is None:
+            recs_v2 = recs
+    else:
+        # 旧形式は全量が入っているので、既定では読んだ後に compact 化する
+        recs = thread.recommendations
+        recs_v2 = thread.recommendations_v2
+        if not detail:
+            recs = compact_recommendations(recs)
+            recs_v2 = compact_recommendations(recs_v2)
+
+    return {"snapshot_version": version, "recommendations": recs, "recommendations_v2": recs_v2}
+
+
+def upgrade_legacy_snapshots(thread_ids=None, *, batch_size: int = 200) -> int:
+    """
+    version 1 のスレッドを version 2（compact + detail 分離）へ書き換える。更新件数を返す。
+    """
+    from temples.models import ConciergeThread
+
+    qs = ConciergeThread.objects.filter(snapshot_version__lt=SNAPSHOT_VERSION)
+    if thread_ids is not None:
+        qs = qs.filter(id__in=list(thread_ids))
+
+    updated = 0
+    last_id = 0
+    fields = ["snapshot_version", "recommendations", "recommendations_v2", "recommendations_detail"]
+    while True:
+        batch = list(
+            qs.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", "snapshot_version", "recommendations", "recommendations_v2")[:batch_size]
+        )
+        if not batch:
+            break
+        for t in batch:
+            recs = t.recommendations
+            recs_v2 = t.recommendations_v2
+            if recs_v2 == recs:
+                recs_v2 = recs
+            for k, v in build_snapshot(recs, recs_v2).items():
+                setattr(t, k, v)
+        ConciergeThread.objects.bulk_update(batch, fields)
+        updated += len(batch)
+        last_id = batch[-1].id
+    return updated
+
+
+__all__ = [
+    "COMPACT_FIELDS",
+    "LEGACY_SNAPSHOT_VERSION",
+    "SNAPSHOT_VERSION",
+    "build_snapshot",
+    "compact_recommendation",
+    "compact_recommendations",
+    "read_snapshot",
+    "upgrade_legacy_snapshots",
+]
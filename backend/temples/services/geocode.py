@@ -2,29 +2,25 @@
 
 import hashlib
 import json
-import time
 from urllib.parse import urlencode
-from typing import List
 
-import requests
 from django.conf import settings
 from django.core.cache import cache
 
+from temples.services.rate_limit import TokenBucketLimiter
+from temples.services.request_profiler import record_upstream
+from temples.upstream import session as upstream_session
+
 
 TTL = int(getattr(settings, "GEOCODE_CACHE_TTL_S", 60 * 60 * 24 * 30))
 RATE = int(getattr(settings, "GEOCODE_RATE_PER_MIN", 60))
 WINDOW = 60
-_calls: List[float] = []  # ★ 型を明示（time.time() の float）
+# Nominatim への呼び出しはワーカー間で共有するトークンバケットで平準化する
+_bucket = TokenBucketLimiter("geocode-nominatim", RATE, WINDOW)
 
 
 def _allow() -> bool:
-    now = time.time()
-    while _calls and now - _calls[0] > WINDOW:
-        _calls.pop(0)
-    if len(_calls) >= RATE:
-        return False
-    _calls.append(now)
-    return True
+    return _bucket.hit().allowed
 
 
 def _ck(prefix: str, payload: dict) -> str:
@@ -54,7 +50,8 @@ def geocode_search(q: str, limit: int = 5, lang: str = "ja"):
         "accept-language": lang,
     }
     url = f"{base}/search?{urlencode(params)}"
-    r = requests.get(url, headers=_ua_headers(), timeout=10)
+    record_upstream("nominatim")
+    r = upstream_session("nominatim").get(url, headers=_ua_headers(), timeout=10)
     r.raise_for_status()
     js = r.json()
 
@@ -91,7 +88,8 @@ def geocode_reverse(lat: float, lng: float, lang: str = "ja"):
         "accept-language": lang,
     }
     url = f"{base}/reverse?{urlencode(params)}"
-    r = requests.get(url, headers=_ua_headers(), timeout=10)
+    record_upstream("nominatim")
+    r = upstream_session("nominatim").get(url, headers=_ua_headers(), timeout=10)
     r.raise_for_status()
     it = r.json()
     item = {
@@ -9,6 +9,9 @@ import requests
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
+from temples.services.request_profiler import record_upstream
+from temples.upstream import session as upstream_session
+
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +40,12 @@ def _push_req_history(url: str, params: dict) -> None:
     if "key" in masked:
         masked["key"] = "****"
     req_history.append((url, masked))
+    record_upstream("google_places")
+
+
+def _http() -> requests.Session:
+    """Places 用の共有 Session（接続プール・再試行・ブレーカは temples.upstream の方針）。"""
+    return upstream_session("google_places")
 
 
 # ------------------------------------------------------------
@@ -91,7 +100,7 @@ class GooglePlacesClient:
 
         _push_req_history(url, q)  # 履歴へ（キーは伏字）
 
-        resp = requests.get(url, params=q, timeout=self.timeout)
+        resp = _http().get(url, params=q, timeout=self.timeout)
 
         # ログ（キーは伏字）
         try:
@@ -324,7 +333,8 @@ class GooglePlacesClient:
     ) -> Tuple[bytes, str]:
         url = f"{self.BASE_URL}/photo"
         params = self.build_photo_params(photo_reference, maxwidth=maxwidth, maxheight=maxheight)
-        resp = requests.get(url, params=params, timeout=self.timeout, stream=True)
+        record_upstream("google_places")
+        resp = _http().get(url, params=params, timeout=self.timeout, stream=True)
 
         # マスクしてログ
         try:
@@ -386,7 +396,7 @@ def textsearch(
     _log_upstream("textsearch", url, params)
     clean = {k: v for k, v in params.items() if v is not None}
     _push_req_history(url, clean)
-    resp = requests.get(url, params=clean, timeout=_TIMEOUT)
+    resp = _http().get(url, params=clean, timeout=_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
@@ -420,7 +430,7 @@ def details(
     _log_upstream("details", url, params2)
     clean = {k: v for k, v in params2.items() if v is not None}
     _push_req_history(url, clean)
-    resp = requests.get(url, params=clean, timeout=_TIMEOUT)
+    resp = _http().get(url, params=clean, timeout=_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
@@ -446,7 +456,7 @@ def findplacefromtext(
     _log_upstream("findplacefromtext", url, params)
     clean = {k: v for k, v in params.items() if v is not None}
     _push_req_history(url, clean)
-    resp = requests.get(url, params=clean, timeout=_TIMEOUT)
+    resp = _http().get(url, params=clean, timeout=_TIMEOUT)
     resp.raise_for_status()
     return resp.json()
 
@@ -652,7 +662,8 @@ def nearby_search_new(
         
     }
 
-    resp = requests.post(url, headers=headers, json=body, timeout=8)
+    record_upstream("google_places")
+    resp = _http().post(url, headers=headers, json=body, timeout=8)
     if not resp.ok:
         raise RuntimeError(f"Places(New) searchText error: {resp.status_code} {resp.text[:300]}")
 
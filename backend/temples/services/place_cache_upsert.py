@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import hashlib
+import json
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from django.db import transaction
 from django.utils import timezone
 
-from temples.models import PlaceCache
+from temples.models import PlaceCache, PlaceRef
+
+DEFAULT_BATCH_SIZE = 500
 
 
 @dataclass(frozen=True)
@@ -22,19 +26,127 @@ class PlaceCacheInput:
     raw: Optional[dict] = None
 
 
+@dataclass(frozen=True)
+class PlaceRefInput:
+    place_id: str
+    name: str = ""
+    address: str = ""
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    snapshot_json: Optional[dict] = None
+
+
+@dataclass(frozen=True)
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    def __add__(self, other: "UpsertResult") -> "UpsertResult":
+        return UpsertResult(
+            inserted=self.inserted + other.inserted,
+            updated=self.updated + other.updated,
+            unchanged=self.unchanged + other.unchanged,
+        )
+
+
+def snapshot_hash(values: Dict[str, Any]) -> str:
+    """書き込む内容の指紋（キー順・型ゆれに依存しない）。"""
+    raw = json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _place_cache_values(i: PlaceCacheInput) -> Dict[str, Any]:
+    return {
+        "name": i.name or "",
+        "address": i.address or "",
+        "lat": i.lat,
+        "lng": i.lng,
+        "rating": i.rating,
+        "user_ratings_total": i.user_ratings_total,
+        "types": i.types or [],
+        "raw": i.raw or {},
+    }
+
+
+def _place_ref_values(i: PlaceRefInput) -> Dict[str, Any]:
+    return {
+        "name": i.name or "",
+        "address": i.address or "",
+        "latitude": i.latitude,
+        "longitude": i.longitude,
+        "snapshot_json": i.snapshot_json,
+    }
+
+
+def _bulk_upsert(
+    model,
+    rows: Dict[str, Dict[str, Any]],
+    *,
+    update_fields: List[str],
+    touch: Dict[str, Any],
+    batch_size: int,
+) -> UpsertResult:
+    """
+    place_id をキーに bulk_create(update_conflicts=True) で upsert する。
+    snapshot_hash が既存行と同じものは書き込まない。
+    1 バッチあたり SELECT 1 本 + INSERT ... ON CONFLICT 1 本。
+    """
+    result = UpsertResult()
+    ids = list(rows)
+
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        hashes = {pid: snapshot_hash(rows[pid]) for pid in chunk}
+        existing = dict(model.objects.filter(place_id__in=chunk).values_list("place_id", "snapshot_hash"))
+
+        objs = []
+        inserted = updated = unchanged = 0
+        for pid in chunk:
+            h = hashes[pid]
+            if pid not in existing:
+                inserted += 1
+            elif existing[pid] != h:
+                updated += 1
+            else:
+                unchanged += 1
+                continue
+            objs.append(model(place_id=pid, snapshot_hash=h, **rows[pid], **touch))
+
+        if objs:
+            model.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=["place_id"],
+                update_fields=update_fields + ["snapshot_hash"] + list(touch),
+            )
+        result = result + UpsertResult(inserted=inserted, updated=updated, unchanged=unchanged)
+
+    return result
+
+
+def _dedupe(items: Iterable[Any], to_values) -> Dict[str, Dict[str, Any]]:
+    # 同じ place_id が複数来たら後勝ち
+    rows: Dict[str, Dict[str, Any]] = {}
+    for i in items:
+        if i is None or not i.place_id:
+            continue
+        rows[str(i.place_id)] = to_values(i)
+    return rows
+
+
 @transaction.atomic
 def upsert_place_cache(i: PlaceCacheInput) -> PlaceCache:
+    values = _place_cache_values(i)
     obj, _created = PlaceCache.objects.update_or_create(
         place_id=i.place_id,
         defaults={
-            "name": i.name or "",
-            "address": i.address or "",
-            "lat": i.lat,
-            "lng": i.lng,
-            "rating": i.rating,
-            "user_ratings_total": i.user_ratings_total,
-            "types": i.types or [],
-            "raw": i.raw or {},
+            **values,
+            "snapshot_hash": snapshot_hash(values),
             # fetched_at は auto_now=True なので自動更新される
             "updated_at": timezone.now(),
         },
@@ -42,9 +154,47 @@ def upsert_place_cache(i: PlaceCacheInput) -> PlaceCache:
     return obj
 
 
-def upsert_place_cache_many(items: Iterable[PlaceCacheInput]) -> int:
-    n = 0
-    for i in items:
-        upsert_place_cache(i)
-        n += 1
-    return n
+@transaction.atomic
+def upsert_place_cache_many(
+    items: Iterable[PlaceCacheInput],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> UpsertResult:
+    """PlaceCache をまとめて upsert する（fetched_at / updated_at は変更行だけ進む）。"""
+    rows = _dedupe(items, _place_cache_values)
+    return _bulk_upsert(
+        PlaceCache,
+        rows,
+        # fetched_at / updated_at は auto_now（INSERT 時に pre_save で埋まる）
+        update_fields=list(_place_cache_values(PlaceCacheInput(place_id=""))) + ["fetched_at", "updated_at"],
+        touch={},
+        batch_size=max(1, int(batch_size)),
+    )
+
+
+@transaction.atomic
+def upsert_place_refs_many(
+    items: Iterable[PlaceRefInput],
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> UpsertResult:
+    """PlaceRef をまとめて upsert する（synced_at は変更行だけ進む）。"""
+    rows = _dedupe(items, _place_ref_values)
+    return _bulk_upsert(
+        PlaceRef,
+        rows,
+        update_fields=list(_place_ref_values(PlaceRefInput(place_id=""))),
+        touch={"synced_at": timezone.now()},
+        batch_size=max(1, int(batch_size)),
+    )
+
+
+__all__ = [
+    "PlaceCacheInput",
+    "PlaceRefInput",
+    "UpsertResult",
+    "snapshot_hash",
+    "upsert_place_cache",
+    "upsert_place_cache_many",
+    "upsert_place_refs_many",
+]
@@ -0,0 +1,447 @@
+# backend/temples/services/place_resolver.py
+"""
+神社名 → 場所（place_id / 座標 / 住所）の一括解決。
+
+1. 記憶（places 名前空間）を (正規化名, 丸めた bias) でまとめて引く（get_many 1 回）
+2. 残りを DB（Shrine / PlaceRef / PlaceCache）と名前で突き合わせる。bias があれば半径内だけ、
+   無ければ同名が 1 か所に決まるときだけ採る
+3. それでも無い名前だけ Find Place From Text を並行に投げる
+   （プロセス間共有の UpstreamBudget と、呼び出しごとの max_upstream で上限を掛ける）
+4. 結果を記憶に書く（見つからなかった名前は短い TTL）
+
+DB 照合は名前の表記ゆれ（空白・全角半角）を吸収した候補を name IN (...) で引き、
+places_heuristics.norm_name が一致するものだけ採る。
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import logging
+import math
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from shrine_project.cache_tiers import namespace_cache
+from temples.services.places_heuristics import norm_name
+from temples.services.upstream_budget import BudgetExhausted, UpstreamBudget
+
+log = logging.getLogger(__name__)
+
+cache = namespace_cache("places")
+
+RESOLVE_TTL = int(getattr(settings, "PLACE_RESOLVER_TTL_S", 30 * 24 * 3600))
+RESOLVE_NEGATIVE_TTL = int(getattr(settings, "PLACE_RESOLVER_NEGATIVE_TTL_S", 6 * 3600))
+# bias の丸め桁（2 桁 ≒ 1km）。同じ界隈の要求は同じ記憶を使う
+BIAS_ROUND = int(getattr(settings, "PLACE_RESOLVER_BIAS_ROUND", 2))
+MAX_WORKERS = int(getattr(settings, "PLACE_RESOLVER_MAX_WORKERS", 4))
+DEFAULT_RADIUS_M = 8000
+MAX_RADIUS_M = 50_000
+FIND_FIELDS = "place_id,name,formatted_address,geometry"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_budget: Optional[UpstreamBudget] = None
+
+_stats_lock = threading.Lock()
+_stats = {"memo_hits": 0, "db_hits": 0, "upstream": 0, "upstream_misses": 0, "budget_skips": 0}
+
+
+@dataclass(frozen=True)
+class ResolvedPlace:
+    name: str
+    place_id: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    address: Optional[str] = None
+    source: str = ""  # "shrine" / "place_ref" / "place_cache" / "upstream"
+
+    @property
+    def has_point(self) -> bool:
+        return self.lat is not None and self.lng is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _bump(name: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[name] += n
+
+
+def resolver_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS), thread_name_prefix="place-resolve")
+        return _executor
+
+
+def _shared_budget() -> UpstreamBudget:
+    global _budget
+    with _executor_lock:
+        if _budget is None:
+            _budget = UpstreamBudget(
+                "places-resolve",
+                qps=float(getattr(settings, "PLACE_RESOLVER_QPS", 10)),
+                daily_limit=int(getattr(settings, "PLACE_RESOLVER_DAILY_LIMIT", 0)),
+            )
+        return _budget
+
+
+# ---- bias ----
+def bias_radius_m(bias: Optional[Dict[str, Any]]) -> int:
+    if not bias:
+        return DEFAULT_RADIUS_M
+    r = bias.get("radius") or bias.get("radius_m")
+    if r is None and bias.get("radius_km") is not None:
+        try:
+            r = float(bias["radius_km"]) * 1000
+        except (TypeError, ValueError):
+            r = None
+    try:
+        r_int = int(float(r)) if r is not None else DEFAULT_RADIUS_M
+    except (TypeError, ValueError):
+        r_int = DEFAULT_RADIUS_M
+    return max(1, min(MAX_RADIUS_M, r_int))
+
+
+_LB = re.compile(r"^circle:(\d+(?:\.\d+)?)@(-?\d+(?:\.\d+)?),\s*(-?\d+(?:\.\d+)?)$")
+
+
+def bias_from_locationbias(lb: Optional[str]) -> Optional[Dict[str, float]]:
+    """'circle:5000@35.68,139.76' → {"lat", "lng", "radius"}。"""
+    m = _LB.match(str(lb or "").strip())
+    if not m:
+        return None
+    return {"lat": float(m.group(2)), "lng": float(m.group(3)), "radius": float(m.group(1))}
+
+
+def _bias_point(bias: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    try:
+        return float(bias["lat"]), float(bias["lng"])  # type: ignore[index]
+    except (TypeError, KeyError, ValueError):
+        return None
+
+
+def _haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    R = 6371000.0
+    dlat = math.radians(b[0] - a[0])
+    dlng = math.radians(b[1] - a[1])
+    x = math.sin(dlat / 2) ** 2 + math.cos(math.radians(a[0])) * math.cos(math.radians(b[0])) * math.sin(
+        dlng / 2
+    ) ** 2
+    return 2 * R * math.atan2(math.sqrt(x), math.sqrt(1 - x))
+
+
+def memo_key(name: str, bias: Optional[Dict[str, Any]], area: Optional[str] = None) -> str:
+    pt = _bias_point(bias)
+    if pt:
+        where = f"{round(pt[0], BIAS_ROUND)},{round(pt[1], BIAS_ROUND)}"
+    else:
+        where = norm_name(area) or "-"
+    raw = f"{norm_name(name)}|{where}"
+    return "resolve:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ---- DB 照合 ----
+def _raw_variants(name: str) -> List[str]:
+    s = str(name or "").strip()
+    nfkc = unicodedata.normalize("NFKC", s)
+    return list({s, nfkc, re.sub(r"\s+", "", nfkc), s.replace(" ", "　")} - {""})
+
+
+def _db_candidates(names: Iterable[str]) -> Dict[str, List[ResolvedPlace]]:
+    """正規化名 → DB 上の候補（Shrine > PlaceRef > PlaceCache の順）。"""
+    from temples.models import PlaceCache, PlaceRef, Shrine
+
+    variants = sorted({v for n in names for v in _raw_variants(n)})
+    out: Dict[str, List[ResolvedPlace]] = {}
+    if not variants:
+        return out
+
+    def add(name, **kw):
+        if name:
+            out.setdefault(norm_name(name), []).append(ResolvedPlace(name=name, **kw))
+
+    for s in Shrine.objects.filter(name_jp__in=variants).values(
+        "name_jp", "latitude", "longitude", "address", "place_ref_id"
+    ):
+        add(s["name_jp"], place_id=s["place_ref_id"], lat=s["latitude"], lng=s["longitude"],
+            address=s["address"] or None, source="shrine")
+    for p in PlaceRef.objects.filter(name__in=variants).values("place_id", "name", "latitude", "longitude", "address"):
+        add(p["name"], place_id=p["place_id"], lat=p["latitude"], lng=p["longitude"],
+            address=p["address"] or None, source="place_ref")
+    for c in PlaceCache.objects.filter(name__in=variants).values("place_id", "name", "lat", "lng", "address"):
+        add(c["name"], place_id=c["place_id"], lat=c["lat"], lng=c["lng"], address=c["address"] or None,
+            source="place_cache")
+    return out
+
+
+def _identity(c: ResolvedPlace) -> Tuple[Any, ...]:
+    if c.place_id:
+        return ("id", c.place_id)
+    return ("pt", round(float(c.lat), 3), round(float(c.lng), 3))
+
+
+def _pick(cands: List[ResolvedPlace], bias: Optional[Dict[str, Any]]) -> Optional[ResolvedPlace]:
+    """
+    bias があれば半径内で最も近い候補。無ければ同名が 1 か所に決まるときだけ採る
+    （全国の同名社の先頭を勝手に選ばない。決まらなければ上流に回す）。
+    """
+    pointed = [c for c in cands if c.has_point]
+    center = _bias_point(bias)
+    if center is None:
+        # Shrine と PlaceRef が同じ place_id を指すのは 1 か所と数える
+        if len({_identity(c) for c in pointed}) == 1:
+            return pointed[0]
+        return None
+    radius = bias_radius_m(bias)
+    best = None
+    for c in pointed:
+        d = _haversine_m(center, (float(c.lat), float(c.lng)))
+        if d <= radius and (best is None or d < best[0]):
+            best = (d, c)
+    return best[1] if best else None
+
+
+# ---- 上流 ----
+def _find_place(query: str, *, language: str, locationbias: Optional[str]) -> Optional[ResolvedPlace]:
+    from temples.services import places as Places
+
+    res = Places.findplacefromtext(
+        input=query,
+        language=language,
+        locationbias=locationbias,
+        fields=FIND_FIELDS,
+    )
+    cands = (res.get("candidates") or res.get("results") or []) if isinstance(res, dict) else []
+    if not cands:
+        return None
+    c = cands[0] or {}
+    loc = (c.get("geometry") or {}).get("location") or {}
+    place = ResolvedPlace(
+        name=c.get("name") or query,
+        place_id=c.get("place_id"),
+        lat=loc.get("lat"),
+        lng=loc.get("lng"),
+        address=c.get("formatted_address"),
+        source="upstream",
+    )
+    if not (place.place_id or place.has_point or place.address):
+        return None
+    return place
+
+
+def _default_locationbias(bias: Optional[Dict[str, Any]]) -> Optional[str]:
+    pt = _bias_point(bias)
+    if pt is None:
+        return None
+    return f"circle:{bias_radius_m(bias)}@{pt[0]},{pt[1]}"
+
+
+def _memo_stage(
+    ordered: List[str],
+    keys: Dict[str, str],
+    out: Dict[str, Optional[ResolvedPlace]],
+    counts: Dict[str, int],
+) -> List[str]:
+    """記憶を get_many 1 回で引き、残りの名前を返す。"""
+    try:
+        found = cache.get_many(list(keys.values()))
+    except Exception as e:
+        log.info("[place_resolver] memo lookup failed: %s", e)
+        found = {}
+    pending = []
+    for n in ordered:
+        hit = found.get(keys[n])
+        if not isinstance(hit, dict):
+            pending.append(n)
+            continue
+        _bump("memo_hits")
+        counts["memo"] += 1
+        out[n] = None if hit.get("miss") else ResolvedPlace(**hit)
+    return pending
+
+
+def _db_stage(
+    pending: List[str],
+    bias: Optional[Dict[str, Any]],
+    keys: Dict[str, str],
+    out: Dict[str, Optional[ResolvedPlace]],
+    to_store: Dict[str, Dict[str, Any]],
+    counts: Dict[str, int],
+) -> List[str]:
+    """DB の候補から決まる名前を埋め、残りの名前を返す。"""
+    try:
+        db = _db_candidates(pending)
+    except Exception as e:  # DB の無い文脈では上流だけで解く
+        log.info("[place_resolver] db lookup skipped: %s", e)
+        return pending
+    rest = []
+    for n in pending:
+        place = _pick(db.get(norm_name(n), []), bias)
+        if not place:
+            rest.append(n)
+            continue
+        out[n] = place
+        to_store[keys[n]] = place.to_dict()
+        _bump("db_hits")
+        counts["db"] += 1
+    return rest
+
+
+def _admit(batch: List[str]) -> List[str]:
+    admitted = []
+    for n in batch:
+        try:
+            _shared_budget().acquire(timeout=1.0)
+            admitted.append(n)
+        except BudgetExhausted as e:
+            _bump("budget_skips")
+            log.info("[place_resolver] budget exhausted: %s", e)
+    return admitted
+
+
+def _fetch_wave(admitted: List[str], run) -> Dict[str, Tuple[bool, Optional[ResolvedPlace]]]:
+    if len(admitted) == 1:
+        return {admitted[0]: _safe(run, admitted[0])}
+    futures = {n: _pool().submit(contextvars.copy_context().run, _safe, run, n) for n in admitted}
+    return {n: f.result() for n, f in futures.items()}
+
+
+def _upstream_stage(
+    pending: List[str],
+    *,
+    run,
+    budget_left: int,
+    stop_after_points: Optional[int],
+    keys: Dict[str, str],
+    out: Dict[str, Optional[ResolvedPlace]],
+    to_store: Dict[str, Dict[str, Any]],
+    misses: Dict[str, Dict[str, Any]],
+    counts: Dict[str, int],
+) -> None:
+    """残りを並行に上流へ。座標付きの結果が stop_after_points 件そろったら打ち切る。"""
+    points = sum(1 for p in out.values() if p and p.has_point)
+    while pending and budget_left > 0:
+        if stop_after_points is not None and points >= stop_after_points:
+            break
+        width = budget_left
+        if stop_after_points is not None:
+            width = min(width, stop_after_points - points)
+        batch, pending = pending[:width], pending[width:]
+        budget_left -= len(batch)
+
+        admitted = _admit(batch)
+        if not admitted:
+            break
+        results = _fetch_wave(admitted, run)
+
+        _bump("upstream", len(admitted))
+        counts["upstream"] += len(admitted)
+        for n, (ok, place) in results.items():
+            if not ok:
+                continue  # 通信失敗は記憶しない
+            out[n] = place
+            if place:
+                to_store[keys[n]] = place.to_dict()
+                points += 1 if place.has_point else 0
+            else:
+                misses[keys[n]] = {"miss": True}
+                _bump("upstream_misses")
+
+
+def resolve_names(
+    names: Sequence[str],
+    *,
+    bias: Optional[Dict[str, Any]] = None,
+    locationbias: Optional[str] = None,
+    area: Optional[str] = None,
+    language: str = "ja",
+    max_upstream: Optional[int] = None,
+    stop_after_points: Optional[int] = None,
+    offline: bool = True,
+    trace: Optional[Dict[str, int]] = None,
+) -> Dict[str, Optional[ResolvedPlace]]:
+    """
+    names をまとめて解決し {元の名前: ResolvedPlace or None} を返す。
+    area があれば上流の検索語を「名前 area」にする。
+    max_upstream: この呼び出しで上流に投げる上限（None なら無制限、0 なら上流なし）
+    stop_after_points: 座標付きの結果がこの件数そろったら残りは上流に投げない
+      （並行数も「あと何件要るか」に合わせて絞る）
+    trace: 渡すと {"memo", "db", "upstream"} の件数を書き込む（ログ用）
+    """
+    ordered = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+    out: Dict[str, Optional[ResolvedPlace]] = {n: None for n in ordered}
+    counts = trace if trace is not None else {}
+    counts.update(memo=0, db=0, upstream=0)
+    if not ordered:
+        return out
+
+    keys = {n: memo_key(n, bias, area) for n in ordered}
+    to_store: Dict[str, Dict[str, Any]] = {}
+    misses: Dict[str, Dict[str, Any]] = {}
+
+    # 1) 記憶
+    pending = _memo_stage(ordered, keys, out, counts)
+
+    # 2) DB
+    if pending and offline:
+        pending = _db_stage(pending, bias, keys, out, to_store, counts)
+
+    # 3) 上流（並行・予算付き）
+    lb = locationbias if locationbias is not None else _default_locationbias(bias)
+
+    def run(n: str) -> Optional[ResolvedPlace]:
+        q = f"{n} {area}".strip() if area else n
+        return _find_place(q, language=language, locationbias=lb)
+
+    _upstream_stage(
+        pending,
+        run=run,
+        budget_left=len(pending) if max_upstream is None else max(0, int(max_upstream)),
+        stop_after_points=stop_after_points,
+        keys=keys,
+        out=out,
+        to_store=to_store,
+        misses=misses,
+        counts=counts,
+    )
+
+    # 4) 記憶へ
+    try:
+        if to_store:
+            cache.set_many(to_store, RESOLVE_TTL)
+        if misses:
+            cache.set_many(misses, RESOLVE_NEGATIVE_TTL)
+    except Exception as e:
+        log.info("[place_resolver] memo store failed: %s", e)
+    return out
+
+
+def _safe(fn, n: str) -> Tuple[bool, Optional[ResolvedPlace]]:
+    try:
+        return True, fn(n)
+    except Exception as e:
+        log.info("[place_resolver] find place failed name=%r err=%s", n, e)
+        return False, None
+
+
+__all__ = [
+    "ResolvedPlace",
+    "bias_from_locationbias",
+    "bias_radius_m",
+    "memo_key",
+    "resolve_names",
+    "resolver_stats",
+]
@@ -3,6 +3,8 @@ from __future__ import annotations
 import hashlib
 import json
 import logging
+import threading
+from datetime import timedelta
 
 import os
 from hashlib import md5
@@ -12,11 +14,16 @@ from urllib.parse import urlencode
 
 import requests
 from django.conf import settings
-from django.core.cache import cache
 from django.utils import timezone
 
-from ..models import PlaceRef, Shrine
+from shrine_project.cache_tiers import namespace_cache
+from temples.services.request_profiler import record_upstream
+from temples.upstream import session as upstream_session
+
+from ..models import PlacePhotoAsset, PlaceRef, Shrine
+from . import asset_store
 from . import google_places  # 低レベルHTTPクライアント（関数型）に統一
+from .tiered_cache import TieredCache
 
 from rest_framework import serializers
 
@@ -72,9 +79,26 @@ def _dbg(msg: str, **kv):
         logger.info("places.rank %s | %s", msg, kv)
 
 
+# 共有キャッシュ層の places 名前空間（settings.CACHES["places"]）
+cache = namespace_cache("places")
+
 # 環境変数からTTL
 DEFAULT_TTL = int(os.getenv("PLACES_CACHE_TTL_SECONDS", "90"))
-PHOTO_TTL = int(os.getenv("PLACES_PHOTO_CACHE_TTL_SECONDS", "86400"))
+# 期限切れ後も古い値を返しつつ裏で取り直す猶予
+PLACES_STALE_TTL = int(os.getenv("PLACES_CACHE_STALE_SECONDS", "600"))
+
+# L1（プロセス内 LRU）+ L2（places 名前空間）
+_places_tier = TieredCache(
+    cache,
+    name="places",
+    l1_max_entries=int(os.getenv("PLACES_L1_MAX_ENTRIES", "512")),
+)
+
+# 写真のバイト列はキャッシュに載せず asset_store に置く（PlacePhotoAsset が参照を持つ）
+_photo_stats = {"hits": 0, "ingested": 0, "variants": 0, "coalesced": 0}
+_photo_stats_lock = threading.Lock()
+_ingest_locks: Dict[str, threading.Lock] = {}
+_ingest_locks_guard = threading.Lock()
 
 __all__ = [
     # 新API
@@ -82,8 +106,10 @@ __all__ = [
     "places_nearby_search",
     "places_details",
     "places_photo",
+    "places_photo_asset",
     "get_or_sync_place",
     "build_photo_params",
+    "places_cache_stats",
     # 旧API互換シム
     "text_search",
     "nearby_search",
@@ -117,7 +143,8 @@ class PlacesService:
             "language": "ja",
             "key": GOOGLE_MAPS_API_KEY,
         }
-        r = requests.get(url, params=params, timeout=10)
+        record_upstream("google_places")
+        r = upstream_session("google_places").get(url, params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         return data.get("results", [])
@@ -133,26 +160,10 @@ def _cache_key(ns: str, payload: Dict[str, Any]) -> str:
 
 ERROR_STATUSES = {"OVER_QUERY_LIMIT", "REQUEST_DENIED", "INVALID_REQUEST"}
 
-def _get_or_set_bytes(
-    ns: str,
-    payload: Dict[str, Any],
-    fetcher: Callable[[], Tuple[bytes, str]],
-    ttl: int,
-) -> tuple[Tuple[bytes, str], bool]:
-    key = _cache_key(ns, payload)
-
-    cached = cache.get(key)
-    if (
-        isinstance(cached, tuple)
-        and len(cached) == 2
-        and isinstance(cached[0], (bytes, bytearray))
-        and isinstance(cached[1], str)
-    ):
-        return (bytes(cached[0]), cached[1]), True
+def _is_cacheable_dict(v: Any) -> bool:
+    # 正常な dict だけ採用（upstream エラーは返すがキャッシュしない）
+    return isinstance(v, dict) and v.get("status") not in ERROR_STATUSES
 
-    content, content_type = fetcher()
-    cache.set(key, (content, content_type), ttl)
-    return (content, content_type), False
 
 def _get_or_set(
     ns: str,
@@ -162,31 +173,22 @@ def _get_or_set(
 ) -> tuple[dict | None, bool]:
     key = _cache_key(ns, payload)
 
-    cached = cache.get(key)
-
-    # 正常な dict キャッシュだけ採用
-    if isinstance(cached, dict):
-        if cached.get("status") in ERROR_STATUSES:
-            cache.delete(key)
-        else:
-            return cached, True
-
-    # dict 以外が入ってたら壊れてるので消す
-    if cached is not None:
-        cache.delete(key)
-
-    data = fetcher()
+    data, hit = _places_tier.get_or_fetch(
+        key, fetcher, ttl=ttl, stale_ttl=PLACES_STALE_TTL, accept=_is_cacheable_dict
+    )
 
     # dict 以外は採用しない
     if not isinstance(data, dict):
         return None, False
 
-    # upstream エラーは返すがキャッシュしない
-    if data.get("status") in ERROR_STATUSES:
-        return data, False
+    return data, hit
+
 
-    cache.set(key, data, ttl)
-    return data, False
+def places_cache_stats() -> Dict[str, Dict[str, int]]:
+    """L1/L2 キャッシュの hit / miss / coalesced などの計数（プロセス単位）。"""
+    with _photo_stats_lock:
+        photo = dict(_photo_stats)
+    return {"places": _places_tier.stats(), "photo": photo}
 
 
 class PlacesError(Exception):
@@ -426,53 +428,218 @@ def places_nearby_search(params: Dict[str, Any]) -> Dict[str, Any]:
     data["results"] = sorted_results
     return data
 
+_DETAIL_DEFAULT_FIELDS = "place_id,name,formatted_address,geometry,types,photos,icon"
+
+
+def _field_set(fields: Any) -> set:
+    return {f.strip() for f in str(fields or "").split(",") if f.strip()}
+
+
+def _detail_snapshot(place_id: str, fields: set, *, max_age: int) -> Optional[Dict[str, Any]]:
+    """PlaceRef.snapshot_json が max_age 秒以内に同期済みなら、要求 fields だけ返す。"""
+    try:
+        pr = PlaceRef.objects.filter(pk=place_id).only("snapshot_json", "synced_at").first()
+    except Exception as e:  # DB が使えない文脈（一部のテストやスクリプト）ではキャッシュだけで動く
+        logger.debug("places.details snapshot lookup skipped: %s", e)
+        return None
+    if not pr or not isinstance(pr.snapshot_json, dict) or not pr.synced_at:
+        return None
+    if pr.synced_at < timezone.now() - timedelta(seconds=max_age):
+        return None
+    return {k: v for k, v in pr.snapshot_json.items() if k in fields}
+
+
+def _upsert_place_ref(place_id: str, result: Dict[str, Any]) -> PlaceRef:
+    """Details の result を PlaceRef に書く（snapshot_hash は bulk upsert と同じ計算）。"""
+    from .place_cache_upsert import snapshot_hash
+
+    loc = (result.get("geometry") or {}).get("location") or {}
+    values = {
+        "name": result.get("name") or "",
+        "address": result.get("formatted_address") or result.get("vicinity") or "",
+        "latitude": loc.get("lat"),
+        "longitude": loc.get("lng"),
+        "snapshot_json": result,
+    }
+    pr, _ = PlaceRef.objects.update_or_create(
+        pk=place_id,
+        defaults={**values, "snapshot_hash": snapshot_hash(values), "synced_at": timezone.now()},
+    )
+    return pr
+
+
 def places_details(place_id: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    キャッシュを先に見る。無ければ、既定の fields / 言語のときは PlaceRef.snapshot_json を使い、
+    PLACES_DETAIL_FRESH_SECONDS 以内の同期なら上流を呼ばない。
+    上流が失敗したときは PLACES_DETAIL_STALE_SECONDS 以内の snapshot で代用する。
+    """
     params = dict(params or {})
-    params.setdefault("language", _lang_or_default(params.get("language")))
-    params.setdefault("fields", "place_id,name,formatted_address,geometry,types,photos,icon")
+    params["language"] = _lang_or_default(params.get("language"))
+    params["fields"] = params.get("fields") or _DETAIL_DEFAULT_FIELDS
+
+    fields = _field_set(params["fields"])
+    default_fields = _field_set(_DETAIL_DEFAULT_FIELDS)
+    default_lang = params["language"] == _lang_or_default(None)
+    from_snapshot = default_lang and fields <= default_fields
+    write_through = default_lang and default_fields <= fields
 
     payload = {"endpoint": "details", "place_id": place_id, "language": params["language"], "fields": params["fields"]}
+    fetched_upstream = False
 
     def fetch():
+        # キャッシュに無いときだけ DB の snapshot を見て、それも古ければ上流へ
+        nonlocal fetched_upstream
+        if from_snapshot:
+            snap = _detail_snapshot(
+                place_id, fields, max_age=int(getattr(settings, "PLACES_DETAIL_FRESH_SECONDS", 7 * 24 * 3600))
+            )
+            if snap:
+                return {"status": "OK", "result": snap}
+        fetched_upstream = True
         return _wrap_call(google_places.details, place_id=place_id, **params)
 
-    data, _ = _get_or_set("details", payload, fetch, DEFAULT_TTL)
-    if not isinstance(data, dict):
+    def stale_or_empty() -> Dict[str, Any]:
+        if from_snapshot:
+            snap = _detail_snapshot(
+                place_id, fields, max_age=int(getattr(settings, "PLACES_DETAIL_STALE_SECONDS", 90 * 24 * 3600))
+            )
+            if snap:
+                logger.info("places.details serving stale snapshot place_id=%s", place_id)
+                return snap
         return {}
 
-    if data.get("status") in ERROR_STATUSES:
-        return {}
+    try:
+        data, _ = _get_or_set("details", payload, fetch, DEFAULT_TTL)
+    except PlacesError:
+        snap = stale_or_empty()
+        if snap:
+            return snap
+        raise
 
-    return (data.get("result") or {})
+    if not isinstance(data, dict) or data.get("status") in ERROR_STATUSES:
+        return stale_or_empty()
 
-def places_photo(photo_reference: str, maxwidth: int = 800) -> Tuple[bytes, str, int]:
-    if not photo_reference:
-        raise PlacesError("photo_reference is required", status=400)
+    result = data.get("result") or {}
+    if write_through and fetched_upstream and result.get("name"):
+        try:
+            _upsert_place_ref(place_id, {k: v for k, v in result.items() if k in default_fields})
+        except Exception as e:
+            logger.debug("places.details write-through skipped: %s", e)
+    return result
 
-    payload = {"endpoint": "photo", "ref": photo_reference, "w": maxwidth}
 
-    def fetch():
-        content, content_type = _wrap_call(
-            google_places.photo, photo_reference, maxwidth=maxwidth
-        )
+# ----------------------------
+# 写真（内容ハッシュの永続置き場）
+# ----------------------------
+def _photo_ref_key(photo_reference: str, maxwidth: int) -> str:
+    return hashlib.sha256(f"{photo_reference}|{int(maxwidth)}".encode("utf-8")).hexdigest()
+
+
+def _count_photo(name: str, n: int = 1) -> None:
+    with _photo_stats_lock:
+        _photo_stats[name] += n
 
-        # content-type を素の mime に正規化（`; charset=...` など除去）
-        ct = (content_type or "image/jpeg").split(";", 1)[0].strip().lower()
 
-        if not content or not ct.startswith("image/"):
-            raise PlacesError(f"invalid photo response: content_type={ct}", status=502)
+def _stored_photo(ref_key: str) -> Optional[asset_store.StoredAsset]:
+    row = PlacePhotoAsset.objects.filter(pk=ref_key).first()
+    if not row:
+        return None
+    asset = asset_store.StoredAsset(row.sha256, row.content_type, row.size, row.width, row.height)
+    # 行を正とする。ローカル置き場だけは stat が安いので、実体が消えていたら取り直す
+    # （R2 などリモートは毎回 HEAD を打つことになるので確かめない）
+    if asset_store.local_path(asset) is not None and not asset_store.exists(asset):
+        return None
+    return asset
+
 
-        return (content, ct)
+def _ingest_photo(photo_reference: str, maxwidth: int, ref_key: str) -> asset_store.StoredAsset:
+    content, content_type = _wrap_call(google_places.photo, photo_reference, maxwidth=maxwidth)
 
+    # content-type を素の mime に正規化（`; charset=...` など除去）
+    ct = (content_type or "image/jpeg").split(";", 1)[0].strip().lower()
+    if not content or not ct.startswith("image/"):
+        raise PlacesError(f"invalid photo response: content_type={ct}", status=502)
+
+    content = bytes(content)
+    asset = asset_store.put_blob(content, ct)
+    PlacePhotoAsset.objects.update_or_create(
+        ref_key=ref_key,
+        defaults={
+            "max_width": maxwidth,
+            "sha256": asset.sha256,
+            "content_type": asset.content_type,
+            "size": asset.size,
+            "width": asset.width,
+            "height": asset.height,
+            "is_variant": False,
+        },
+    )
+    _count_photo("ingested")
+
+    # 狭い幅の要求は縮小版で応える（同じ photo_reference の再取得を省く）
+    widths = [w for w in getattr(settings, "PLACE_PHOTO_VARIANT_WIDTHS", []) if w < maxwidth]
+    for v in asset_store.make_variants(content, ct, widths):
+        _, created = PlacePhotoAsset.objects.get_or_create(
+            ref_key=_photo_ref_key(photo_reference, v.width),
+            defaults={
+                "max_width": v.width,
+                "sha256": v.sha256,
+                "content_type": v.content_type,
+                "size": v.size,
+                "width": v.width,
+                "height": v.height,
+                "is_variant": True,
+            },
+        )
+        if created:
+            _count_photo("variants")
+    return asset
+
+
+def places_photo_asset(photo_reference: str, maxwidth: int = 800) -> asset_store.StoredAsset:
+    """
+    photo_reference + 幅 に対応する保存済み画像を返す。無ければ上流から 1 回だけ取り込む。
+    同じキーの同時要求はプロセス内で 1 本にまとめる。
+    """
+    if not photo_reference:
+        raise PlacesError("photo_reference is required", status=400)
+    maxwidth = int(maxwidth)
+    ref_key = _photo_ref_key(photo_reference, maxwidth)
+
+    asset = _stored_photo(ref_key)
+    if asset:
+        _count_photo("hits")
+        return asset
+
+    with _ingest_locks_guard:
+        lock = _ingest_locks.setdefault(ref_key, threading.Lock())
+    if not lock.acquire(blocking=False):
+        _count_photo("coalesced")
+        lock.acquire()
     try:
-        (content, content_type), _ = _get_or_set_bytes("photo", payload, fetch, PHOTO_TTL)
-        return content, content_type, PHOTO_TTL
+        asset = _stored_photo(ref_key)
+        if asset:
+            _count_photo("hits")
+            return asset
+        return _ingest_photo(photo_reference, maxwidth, ref_key)
     except PlacesError:
-        # 上に投げる。ビューが 502 にしてくれる想定ならこれでOK
         raise
     except Exception as e:
         # 予期せぬ型の壊れ方は 502 に丸める（画像は “外部依存” なので妥当）
         raise PlacesError(str(e), status=502) from e
+    finally:
+        lock.release()
+        with _ingest_locks_guard:
+            if _ingest_locks.get(ref_key) is lock and not lock.locked():
+                del _ingest_locks[ref_key]
+
+
+def places_photo(photo_reference: str, maxwidth: int = 800) -> Tuple[bytes, str, int]:
+    """旧契約 (bytes, content_type, max_age)。新しい配信は places_photo_asset + asset_response。"""
+    asset = places_photo_asset(photo_reference, maxwidth)
+    max_age = int(getattr(settings, "PLACE_PHOTO_MAX_AGE", 30 * 24 * 3600))
+    return asset_store.read_blob(asset), asset.content_type, max_age
 
 # ----------------------------
 # 付帯ユースケース（DB同期など）
@@ -486,7 +653,7 @@ def get_or_sync_place(place_id: str, force: bool = False) -> PlaceRef:
         google_places.details,
         place_id=place_id,
         language=_lang_or_default(None),
-        fields="place_id,name,formatted_address,geometry,types,photos,icon",
+        fields=_DETAIL_DEFAULT_FIELDS,
     )
 
     status_ = (data or {}).get("status")
@@ -496,29 +663,11 @@ def get_or_sync_place(place_id: str, force: bool = False) -> PlaceRef:
         raise PlacesError(msg, status=502)
 
     result = (data or {}).get("result") or {}
-    name = result.get("name")
-    if not name:
+    if not result.get("name"):
         # ここは「nameが本当に無い」時だけ落とす
         raise PlacesError("place details missing name", status=502)
 
-
-    address = result.get("formatted_address") or result.get("vicinity")
-    loc = ((result.get("geometry") or {}).get("location") or {})
-    lat = loc.get("lat")
-    lng = loc.get("lng")
-
-    pr, _ = PlaceRef.objects.update_or_create(
-        pk=place_id,  # ← PKで統一（place_id=...でも同じ意味だけど意図が明確）
-        defaults={
-            "name": name,
-            "address": address or "",
-            "latitude": lat,
-            "longitude": lng,
-            "snapshot_json": result,
-            "synced_at": timezone.now(),
-        },
-    )
-    return pr
+    return _upsert_place_ref(place_id, result)
 
 
 def build_photo_params(
@@ -5,10 +5,15 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
 from django.db import transaction
-from django.utils import timezone
 
-from temples.models import PlaceRef, PlaceCache
 from temples.services import places as places_service
+from temples.services.place_cache_upsert import (
+    PlaceCacheInput,
+    PlaceRefInput,
+    UpsertResult,
+    upsert_place_cache_many,
+    upsert_place_refs_many,
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 外部I/O（Google Places呼び出し）はここから “1箇所” に閉じ込める
@@ -99,84 +104,35 @@ def _normalize_place_item(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     }
 
 
-@transaction.atomic
-def _upsert_place_ref(norm: Dict[str, Any], *, dry_run: bool) -> bool:
-    """
-    PlaceRef へ upsert。戻り値は upsert(=更新/作成)が行われたか。
-    """
-    if dry_run:
-        return True
-
-    place_id = norm["place_id"]
-    defaults = {
-        "name": norm.get("name", ""),
-        "address": norm.get("address", ""),
-        "latitude": norm.get("latitude"),
-        "longitude": norm.get("longitude"),
-        "snapshot_json": norm.get("snapshot_json"),
-        "synced_at": timezone.now(),
-    }
-
-    # update_or_create は “単一窓口” としては分かりやすくて正義
-    PlaceRef.objects.update_or_create(place_id=place_id, defaults=defaults)
-    return True
+def _place_ref_input(norm: Dict[str, Any]) -> PlaceRefInput:
+    """PlaceRef の upsert 入力（_normalize_place_item の結果から）。"""
+    return PlaceRefInput(
+        place_id=norm["place_id"],
+        name=norm.get("name", ""),
+        address=norm.get("address", ""),
+        latitude=norm.get("latitude"),
+        longitude=norm.get("longitude"),
+        snapshot_json=norm.get("snapshot_json"),
+    )
 
 
-@transaction.atomic
-def _upsert_place_cache(
-    place_id: str,
-    raw_item: Dict[str, Any],
-    *,
-    dry_run: bool,
-) -> bool:
+def _place_cache_input(norm: Dict[str, Any], raw_item: Dict[str, Any]) -> PlaceCacheInput:
     """
     PlaceCache は “rawを厚めに保持” したいときの保険。
+    名前・住所・位置は _normalize_place_item と同じ規則で取る。
     """
-    if dry_run:
-        return True
-
-    # PlaceCache のフィールドに合わせて薄く詰める（無理しない）
-    name = raw_item.get("name") or ""
-    address = (
-        raw_item.get("vicinity")
-        or raw_item.get("formatted_address")
-        or raw_item.get("address")
-        or ""
+    return PlaceCacheInput(
+        place_id=norm["place_id"],
+        name=norm.get("name", ""),
+        address=norm.get("address", ""),
+        lat=norm.get("latitude"),
+        lng=norm.get("longitude"),
+        rating=raw_item.get("rating"),
+        user_ratings_total=raw_item.get("user_ratings_total"),
+        types=raw_item.get("types") or [],
+        raw=raw_item,
     )
 
-    # 位置
-    lat = None
-    lng = None
-    geom = raw_item.get("geometry") or {}
-    loc = geom.get("location") or {}
-    if isinstance(loc, dict):
-        lat = loc.get("lat")
-        lng = loc.get("lng")
-    if lat is None:
-        lat = raw_item.get("lat")
-    if lng is None:
-        lng = raw_item.get("lng")
-
-    try:
-        lat_f = float(lat) if lat is not None else None
-        lng_f = float(lng) if lng is not None else None
-    except Exception:
-        lat_f = None
-        lng_f = None
-
-    defaults = {
-        "name": str(name)[:255],
-        "address": str(address)[:255],
-        "lat": lat_f,
-        "lng": lng_f,
-        "rating": raw_item.get("rating"),
-        "user_ratings_total": raw_item.get("user_ratings_total"),
-        "types": raw_item.get("types") or [],
-        "raw": raw_item,
-    }
-    PlaceCache.objects.update_or_create(place_id=place_id, defaults=defaults)
-    return True
-
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 公開API：seed 1点の同期（あなたが欲しいやつ）
@@ -199,6 +155,7 @@ def sync_nearby_seed(
       {
         "requests_used": int,
         "upserted": int,
+        "inserted": int, "updated": int, "unchanged": int,  # upserted の内訳
         "errors": [ ... ],
         "fetched": int,
       }
@@ -226,32 +183,37 @@ def sync_nearby_seed(
     items = _extract_place_items(raw)
     fetched = len(items)
 
+    refs: List[PlaceRefInput] = []
+    cache_rows: List[PlaceCacheInput] = []
     for item in items[: max(0, int(limit))]:
         norm = _normalize_place_item(item)
         if not norm:
             errors.append({"type": "invalid_item", "error": "missing place_id", "item": item})
             continue
+        refs.append(_place_ref_input(norm))
+        if store_cache:
+            cache_rows.append(_place_cache_input(norm, item))
 
+    result = UpsertResult()
+    if dry_run:
+        upserted = len(refs)
+    elif refs:
+        # seed 1 点分をまとめて upsert（数本の SQL で済ませる）
         try:
-            ok = _upsert_place_ref(norm, dry_run=dry_run)
-            if ok:
-                upserted += 1
-
-            if store_cache:
-                _upsert_place_cache(norm["place_id"], item, dry_run=dry_run)
-
+            with transaction.atomic():
+                result = upsert_place_refs_many(refs)
+                if cache_rows:
+                    upsert_place_cache_many(cache_rows)
+            upserted = result.total
         except Exception as e:
-            errors.append(
-                {
-                    "type": "upsert_failed",
-                    "place_id": norm.get("place_id"),
-                    "error": str(e),
-                }
-            )
+            errors.append({"type": "upsert_failed", "place_ids": [r.place_id for r in refs], "error": str(e)})
 
     return {
         "requests_used": requests_used,
         "upserted": upserted,
+        "inserted": result.inserted,
+        "updated": result.updated,
+        "unchanged": result.unchanged,
         "errors": errors,
         "fetched": fetched,
     }
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import logging
+import threading
+import time
 
+from contextlib import nullcontext
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from django.db import transaction
 from django.conf import settings
+from django.db import connection, transaction
 from django.utils import timezone
 
 from temples.models import FeatureUsage, ConciergeUsage
@@ -16,6 +19,14 @@ from temples.services.quota_policy import get_feature_policy
 
 log = logging.getLogger(__name__)
 
+# 匿名の共有キャッシュカウンタ（QUOTA_ANON_CACHE_COUNTER=1 のときだけ使う）
+ANON_COUNTER_TTL = 60 * 60 * 24
+DEFAULT_FLUSH_INTERVAL_SEC = 30.0
+
+_pending_lock = threading.Lock()
+_pending: Dict[Tuple[str, str], int] = {}
+_last_flush = 0.0
+
 
 @dataclass(frozen=True)
 class QuotaStatus:
@@ -29,198 +40,381 @@ class QuotaStatus:
     reason_code: Optional[str] = None
 
 
-def get_used_count(plan_context: PlanContext, feature: str) -> int:
-    current_count = 0
-    feature_obj = None
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+def _limit_for(plan_context: PlanContext, feature: str, policy: dict) -> int:
+    limit = policy["limit"]
+    if feature == "concierge" and plan_context.plan == "free":
+        limit = int(getattr(settings, "CONCIERGE_DAILY_FREE_LIMIT", limit))
+    return int(limit or 0)
+
+
+def _uses_legacy(plan_context: PlanContext, feature: str) -> bool:
+    # 旧 concierge 日次usage（ConciergeUsage）との互換はログインユーザーの concierge だけ
+    return feature == "concierge" and bool(plan_context.user_id)
+
 
+def _legacy_limit() -> int:
+    return int(getattr(settings, "CONCIERGE_DAILY_FREE_LIMIT", 5))
+
+
+def _unlimited_status(plan_context: PlanContext, feature: str) -> QuotaStatus:
+    return QuotaStatus(
+        allowed=True,
+        feature=feature,
+        plan=plan_context.plan,
+        used=0,
+        limit=None,
+        remaining=None,
+        unlimited=True,
+    )
+
+
+def _status(plan_context: PlanContext, feature: str, *, used: int, limit: int, allowed: bool) -> QuotaStatus:
+    return QuotaStatus(
+        allowed=allowed,
+        feature=feature,
+        plan=plan_context.plan,
+        used=used,
+        limit=limit,
+        remaining=max(limit - used, 0),
+        unlimited=False,
+        reason_code=None if allowed else "LIMIT_REACHED",
+    )
+
+
+# ---------------------------------------------------------------------------
+# DB（1 文で読む / 1 文で増やす）
+# ---------------------------------------------------------------------------
+
+
+def _target(plan_context: PlanContext) -> Tuple[str, Optional[int], str]:
     if plan_context.plan == "anonymous":
-        obj, created = FeatureUsage.objects.get_or_create(
-            scope="anonymous",
-            anon_id=plan_context.anon_id,
-            feature=feature,
-            defaults={"count": 0},
-        )
-        feature_obj = obj
-        current_count = obj.count
-
-        log.warning(
-            "[quota/read][feature] created=%s scope=%s anon_id=%r user_id=%r feature=%s count=%r id=%r",
-            created,
-            obj.scope,
-            getattr(obj, "anon_id", None),
-            getattr(obj, "user_id", None),
-            obj.feature,
-            obj.count,
-            getattr(obj, "id", None),
-        )
+        return FeatureUsage.Scope.ANONYMOUS, None, plan_context.anon_id or ""
+    return FeatureUsage.Scope.USER, plan_context.user_id, ""
+
+
+def _conflict_clause(scope: str) -> str:
+    # 部分ユニークインデックス（uq_feature_usage_*）の条件と一致させる
+    if scope == FeatureUsage.Scope.ANONYMOUS:
+        return f"({_qn('anon_id')}, {_qn('feature')}) WHERE {_qn('scope')} = 'anonymous' AND {_qn('anon_id')} > ''"
+    return f"({_qn('user_id')}, {_qn('feature')}) WHERE {_qn('scope')} = 'user' AND {_qn('user_id')} IS NOT NULL"
+
+
+def _legacy_count_sql() -> str:
+    cu = _qn(ConciergeUsage._meta.db_table)
+    return (
+        f"COALESCE((SELECT {cu}.{_qn('count')} FROM {cu} "
+        f"WHERE {cu}.{_qn('user_id')} = %s AND {cu}.{_qn('date')} = %s), 0)"
+    )
+
+
+def _read_used_db(plan_context: PlanContext, feature: str) -> int:
+    """FeatureUsage と（互換の）ConciergeUsage を SELECT 1 本で読む。行が無ければ 0。"""
+    fu = _qn(FeatureUsage._meta.db_table)
+    scope, user_id, anon_id = _target(plan_context)
+    if scope == FeatureUsage.Scope.ANONYMOUS:
+        where, params = f"{_qn('scope')} = %s AND {_qn('anon_id')} = %s", [scope, anon_id]
     else:
-        obj, created = FeatureUsage.objects.get_or_create(
-            scope="user",
-            user_id=plan_context.user_id,
-            feature=feature,
-            defaults={"count": 0},
-        )
-        feature_obj = obj
-        current_count = obj.count
-
-        log.warning(
-            "[quota/read][feature] created=%s scope=%s anon_id=%r user_id=%r feature=%s count=%r id=%r",
-            created,
-            obj.scope,
-            getattr(obj, "anon_id", None),
-            getattr(obj, "user_id", None),
-            obj.feature,
-            obj.count,
-            getattr(obj, "id", None),
-        )
-
-    legacy = None
-
-    # 旧 concierge 日次usageとの互換
-    if feature == "concierge" and plan_context.user_id:
-        legacy = (
-            ConciergeUsage.objects.filter(
-                user_id=plan_context.user_id,
-                date=timezone.localdate(),
-            )
-            .values_list("count", flat=True)
-            .first()
-        )
-        if legacy is not None:
-            current_count = max(current_count, legacy)
-
-    log.warning(
-        "[quota/read][final] plan=%s feature=%s user_id=%r anon_id=%r feature_count=%r legacy_count=%r used=%r",
-        plan_context.plan,
-        feature,
+        where, params = f"{_qn('scope')} = %s AND {_qn('user_id')} = %s", [scope, user_id]
+
+    sql = (
+        f"SELECT COALESCE((SELECT {_qn('count')} FROM {fu} WHERE {where} AND {_qn('feature')} = %s), 0)"
+    )
+    params.append(feature)
+    if _uses_legacy(plan_context, feature):
+        sql += ", " + _legacy_count_sql()
+        params += [plan_context.user_id, connection.ops.adapt_datefield_value(timezone.localdate())]
+
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    return max(int(v or 0) for v in row)
+
+
+def _upsert_feature_count(
+    plan_context: PlanContext,
+    feature: str,
+    amount: int,
+    *,
+    cap: Optional[int] = None,
+) -> Optional[int]:
+    """
+    INSERT ... ON CONFLICT DO UPDATE ... RETURNING で count を amount 増やし、増やした後の値を返す。
+    cap を渡すと「増やした後の使用数（互換の日次 count 含む）が cap 以下」のときだけ増やし、
+    超える場合は何も書かずに None を返す（check と consume を 1 文で行う）。
+    """
+    fu = _qn(FeatureUsage._meta.db_table)
+    cnt = _qn("count")
+    scope, user_id, anon_id = _target(plan_context)
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    # cap なし: 無条件に加算（SQLite の INSERT ... SELECT ... ON CONFLICT は WHERE 句が必須）
+    insert_cond = " WHERE 1 = 1"
+    update_cond = ""
+    cond_params: list = []
+    if cap is not None:
+        legacy = ""
+        if _uses_legacy(plan_context, feature):
+            legacy = f" AND {_legacy_count_sql()} + %s <= %s"
+        insert_cond = f" WHERE %s <= %s{legacy}"
+        update_cond = f" WHERE {fu}.{cnt} + %s <= %s{legacy}"
+        cond_params = [amount, cap]
+        if legacy:
+            cond_params += [
+                plan_context.user_id,
+                connection.ops.adapt_datefield_value(timezone.localdate()),
+                amount,
+                cap,
+            ]
+
+    columns = ", ".join(
+        _qn(c) for c in ("scope", "user_id", "anon_id", "feature", "count", "created_at", "updated_at")
+    )
+    sql = (
+        # SELECT 句の NULL は型が付かない（Postgres では text 扱い）ので user_id はキャストする
+        f"INSERT INTO {fu} ({columns}) SELECT %s, CAST(%s AS INTEGER), %s, %s, %s, %s, %s{insert_cond}"
+        f" ON CONFLICT {_conflict_clause(scope)}"
+        f" DO UPDATE SET {cnt} = {fu}.{cnt} + %s, {_qn('updated_at')} = %s{update_cond}"
+        f" RETURNING {cnt}"
+    )
+    params = [scope, user_id, anon_id, feature, amount, now, now, *cond_params, amount, now, *cond_params]
+
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        row = cur.fetchone()
+    return int(row[0]) if row else None
+
+
+def _upsert_legacy_count(plan_context: PlanContext, amount: int) -> int:
+    """ConciergeUsage（日次）を min(count + amount, 上限) に更新して返す。"""
+    cu = _qn(ConciergeUsage._meta.db_table)
+    cnt = _qn("count")
+    lim = _legacy_limit()
+    sql = (
+        f"INSERT INTO {cu} ({_qn('user_id')}, {_qn('date')}, {cnt}) VALUES (%s, %s, %s)"
+        f" ON CONFLICT ({_qn('user_id')}, {_qn('date')})"
+        f" DO UPDATE SET {cnt} = CASE WHEN {cu}.{cnt} + %s > %s THEN %s ELSE {cu}.{cnt} + %s END"
+        f" RETURNING {cnt}"
+    )
+    params = [
         plan_context.user_id,
-        plan_context.anon_id,
-        getattr(feature_obj, "count", None),
-        legacy,
-        current_count,
+        connection.ops.adapt_datefield_value(timezone.localdate()),
+        min(amount, lim),
+        amount,
+        lim,
+        lim,
+        amount,
+    ]
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return int(cur.fetchone()[0])
+
+
+# ---------------------------------------------------------------------------
+# 匿名: 共有キャッシュカウンタ + 定期フラッシュ
+# ---------------------------------------------------------------------------
+
+
+def _anon_cache_enabled(plan_context: PlanContext) -> bool:
+    return (
+        plan_context.plan == "anonymous"
+        and bool(plan_context.anon_id)
+        and bool(getattr(settings, "QUOTA_ANON_CACHE_COUNTER", False))
     )
 
-    return current_count
+
+def _counter_cache():
+    from shrine_project.cache_tiers import namespace_cache
+
+    return namespace_cache("throttle")
+
+
+def _counter_key(anon_id: str, feature: str) -> str:
+    return f"throttle:quota:anon:{feature}:{anon_id}"
+
+
+def _cached_used(plan_context: PlanContext, feature: str) -> int:
+    cache = _counter_cache()
+    key = _counter_key(plan_context.anon_id, feature)
+    used = cache.get(key)
+    if used is None:
+        # 未ロードなら DB の値で種を撒く（他ワーカーが先に撒いていればそちらを使う）
+        cache.add(key, _read_used_db(plan_context, feature), ANON_COUNTER_TTL)
+        used = cache.get(key) or 0
+    return int(used)
+
+
+def _cached_incr(plan_context: PlanContext, feature: str, amount: int) -> int:
+    _cached_used(plan_context, feature)
+    cache = _counter_cache()
+    key = _counter_key(plan_context.anon_id, feature)
+    try:
+        return int(cache.incr(key, amount))
+    except ValueError:
+        # 種撒きと incr の間で期限切れした場合
+        cache.set(key, _read_used_db(plan_context, feature) + amount, ANON_COUNTER_TTL)
+        return int(cache.get(key))
+
+
+def _mark_dirty(anon_id: str, feature: str, count: int) -> None:
+    global _last_flush
+    interval = float(getattr(settings, "QUOTA_CACHE_FLUSH_SECONDS", DEFAULT_FLUSH_INTERVAL_SEC))
+    with _pending_lock:
+        key = (anon_id, feature)
+        _pending[key] = max(count, _pending.get(key, 0))
+        due = time.monotonic() - _last_flush >= interval
+    if due:
+        flush_quota_counters()
+
+
+def flush_quota_counters() -> int:
+    """
+    キャッシュで数えた匿名カウンタを FeatureUsage へ書き戻す。書いた行数を返す。
+    他ワーカーの書き込みと競合しても減らないよう、大きい方を残す。
+    """
+    global _last_flush
+    with _pending_lock:
+        items = list(_pending.items())
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not items:
+        return 0
+
+    fu = _qn(FeatureUsage._meta.db_table)
+    cnt = _qn("count")
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    columns = ", ".join(
+        _qn(c) for c in ("scope", "user_id", "anon_id", "feature", "count", "created_at", "updated_at")
+    )
+    sql = (
+        f"INSERT INTO {fu} ({columns}) VALUES (%s, NULL, %s, %s, %s, %s, %s)"
+        f" ON CONFLICT {_conflict_clause(FeatureUsage.Scope.ANONYMOUS)}"
+        f" DO UPDATE SET {cnt} = CASE WHEN excluded.{cnt} > {fu}.{cnt} THEN excluded.{cnt} ELSE {fu}.{cnt} END,"
+        f" {_qn('updated_at')} = excluded.{_qn('updated_at')}"
+    )
+    try:
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.executemany(
+                sql,
+                [
+                    (FeatureUsage.Scope.ANONYMOUS, anon_id, feature, count, now, now)
+                    for (anon_id, feature), count in items
+                ],
+            )
+    except Exception:
+        # 次回フラッシュで再送する
+        with _pending_lock:
+            for key, count in items:
+                _pending[key] = max(count, _pending.get(key, 0))
+        log.exception("[quota/flush] failed rows=%s", len(items))
+        raise
+    return len(items)
+
+
+# ---------------------------------------------------------------------------
+# public API
+# ---------------------------------------------------------------------------
+
+
+def get_used_count(plan_context: PlanContext, feature: str) -> int:
+    if _anon_cache_enabled(plan_context):
+        return _cached_used(plan_context, feature)
+    return _read_used_db(plan_context, feature)
 
 
 def check_quota(plan_context: PlanContext, feature: str) -> QuotaStatus:
     policy = get_feature_policy(plan_context.plan, feature)
-
     if policy.get("unlimited"):
-        log.warning(
-            "[quota/check] plan=%s feature=%s unlimited=1 user_id=%r anon_id=%r",
-            plan_context.plan,
-            feature,
-            plan_context.user_id,
-            plan_context.anon_id,
-        )
-        return QuotaStatus(
-            allowed=True,
-            feature=feature,
-            plan=plan_context.plan,
-            used=0,
-            limit=None,
-            remaining=None,
-            unlimited=True,
-        )
+        return _unlimited_status(plan_context, feature)
 
     used = get_used_count(plan_context, feature)
+    limit = _limit_for(plan_context, feature, policy)
+    status = _status(plan_context, feature, used=used, limit=limit, allowed=used < limit)
 
-    limit = policy["limit"]
-    if feature == "concierge" and plan_context.plan == "free":
-        limit = int(getattr(settings, "CONCIERGE_DAILY_FREE_LIMIT", limit))
-
-    remaining = max(limit - used, 0)
-
-    log.warning(
-        "[quota/check] plan=%s feature=%s user_id=%r anon_id=%r used=%r limit=%r remaining=%r allowed=%s",
+    log.debug(
+        "[quota/check] plan=%s feature=%s user_id=%r anon_id=%r used=%r limit=%r allowed=%s",
         plan_context.plan,
         feature,
         plan_context.user_id,
         plan_context.anon_id,
         used,
         limit,
-        remaining,
-        used < limit,
-    )
-
-    return QuotaStatus(
-        allowed=used < limit,
-        feature=feature,
-        plan=plan_context.plan,
-        used=used,
-        limit=limit,
-        remaining=remaining,
-        unlimited=False,
-        reason_code=None if used < limit else "LIMIT_REACHED",
+        status.allowed,
     )
+    return status
 
 
-@transaction.atomic
-def consume_quota(plan_context: PlanContext, feature: str, amount: int = 1) -> None:
+def consume_quota(plan_context: PlanContext, feature: str, amount: int = 1) -> QuotaStatus:
+    """
+    使用数を amount 増やし、増やした後の QuotaStatus を返す（上限は見ない）。
+    FeatureUsage は 1 文の upsert。ログインユーザーの concierge は互換の日次 count も 1 文で更新する。
+    """
     policy = get_feature_policy(plan_context.plan, feature)
-
     if policy.get("unlimited"):
-        log.warning(
-            "[quota/consume] skipped_unlimited=1 plan=%s feature=%s user_id=%r anon_id=%r",
-            plan_context.plan,
-            feature,
-            plan_context.user_id,
-            plan_context.anon_id,
-        )
-        return
+        return _unlimited_status(plan_context, feature)
 
-    if plan_context.plan == "anonymous":
-        obj, created = FeatureUsage.objects.select_for_update().get_or_create(
-            scope="anonymous",
-            anon_id=plan_context.anon_id,
-            feature=feature,
-            defaults={"count": 0},
-        )
+    limit = _limit_for(plan_context, feature, policy)
+
+    if _anon_cache_enabled(plan_context):
+        used = _cached_incr(plan_context, feature, amount)
+        _mark_dirty(plan_context.anon_id, feature, used)
+    elif _uses_legacy(plan_context, feature):
+        with transaction.atomic():
+            used = _upsert_feature_count(plan_context, feature, amount) or 0
+            used = max(used, _upsert_legacy_count(plan_context, amount))
     else:
-        obj, created = FeatureUsage.objects.select_for_update().get_or_create(
-            scope="user",
-            user_id=plan_context.user_id,
-            feature=feature,
-            defaults={"count": 0},
-        )
-
-    before_count = obj.count
-    obj.count += amount
-    obj.save(update_fields=["count", "updated_at"])
-    obj.refresh_from_db()
-
-    log.warning(
-        "[quota/consume][feature] created=%s scope=%s anon_id=%r user_id=%r feature=%s before=%r after=%r id=%r",
-        created,
-        obj.scope,
-        getattr(obj, "anon_id", None),
-        getattr(obj, "user_id", None),
-        obj.feature,
-        before_count,
-        obj.count,
-        getattr(obj, "id", None),
+        # 単文なので明示トランザクションは張らない（SAVEPOINT の往復も省く）
+        used = _upsert_feature_count(plan_context, feature, amount) or 0
+
+    log.debug(
+        "[quota/consume] plan=%s feature=%s user_id=%r anon_id=%r used=%r",
+        plan_context.plan,
+        feature,
+        plan_context.user_id,
+        plan_context.anon_id,
+        used,
     )
+    return _status(plan_context, feature, used=used, limit=limit, allowed=used <= limit)
+
 
-    # 旧 concierge 日次usageとの互換書き込み
-    if feature == "concierge" and plan_context.user_id:
-        legacy_usage, legacy_created = ConciergeUsage.objects.select_for_update().get_or_create(
-            user_id=plan_context.user_id,
-            date=timezone.localdate(),
-            defaults={"count": 0},
-        )
-
-        legacy_before = legacy_usage.count
-        legacy_limit = int(getattr(settings, "CONCIERGE_DAILY_FREE_LIMIT", 5))
-        legacy_usage.count = min(legacy_usage.count + amount, legacy_limit)
-        legacy_usage.save(update_fields=["count"])
-        legacy_usage.refresh_from_db()
-
-        log.warning(
-            "[quota/consume][legacy] created=%s user_id=%r date=%s before=%r after=%r",
-            legacy_created,
-            plan_context.user_id,
-            timezone.localdate(),
-            legacy_before,
-            legacy_usage.count,
-        )
+def try_consume_quota(plan_context: PlanContext, feature: str, amount: int = 1) -> QuotaStatus:
+    """
+    上限内なら amount 消費して allowed=True、超えるなら何も書かずに allowed=False を返す。
+    判定と加算は条件付き upsert 1 文で行うので、同時リクエストでも上限を超えない。
+    """
+    policy = get_feature_policy(plan_context.plan, feature)
+    if policy.get("unlimited"):
+        return _unlimited_status(plan_context, feature)
+
+    limit = _limit_for(plan_context, feature, policy)
+
+    if _anon_cache_enabled(plan_context):
+        used = _cached_incr(plan_context, feature, amount)
+        if used > limit:
+            _counter_cache().decr(_counter_key(plan_context.anon_id, feature), amount)
+            return _status(plan_context, feature, used=used - amount, limit=limit, allowed=False)
+        _mark_dirty(plan_context.anon_id, feature, used)
+        return _status(plan_context, feature, used=used, limit=limit, allowed=True)
+
+    with transaction.atomic() if _uses_legacy(plan_context, feature) else nullcontext():
+        used = _upsert_feature_count(plan_context, feature, amount, cap=limit)
+        if used is None:
+            return _status(
+                plan_context, feature, used=_read_used_db(plan_context, feature), limit=limit, allowed=False
+            )
+        if _uses_legacy(plan_context, feature):
+            used = max(used, _upsert_legacy_count(plan_context, amount))
+    return _status(plan_context, feature, used=used, limit=limit, allowed=True)
+
+
+__all__ = [
+    "QuotaStatus",
+    "check_quota",
+    "consume_quota",
+    "flush_quota_counters",
+    "get_used_count",
+    "try_consume_quota",
+]
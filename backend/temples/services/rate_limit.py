@@ -0,0 +1,274 @@
+# backend/temples/services/rate_limit.py
+"""
+共有キャッシュ（throttle 名前空間）上のレート制限。キーごとの状態は整数 1〜2 個で、
+cache.add + cache.incr / decr だけで進める（redis / locmem ではアトミック）。
+
+- FixedWindowLimiter: 固定窓カウンタ。拒否された試行も数える（上流の日次予算など）
+- SlidingWindowLimiter: 直前の窓を経過率で減衰させて足す近似スライディング窓。
+  窓の境目で 2 倍通ってしまう固定窓の弱点を抑える（API のクライアント向けスロットル）
+- TokenBucketLimiter: GCRA 形式のトークンバケット。「次に空く時刻」1 個だけを持ち、
+  capacity までのバーストを許して rate で平準化する（上流 API 呼び出し）
+
+判定結果は RateDecision で返し、record_decision でリクエストに載せると
+RateLimitHeadersMiddleware が X-RateLimit-* ヘッダに出す。
+"""
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from shrine_project.cache_tiers import namespace_cache
+
+_PERIODS = {
+    "s": 1,
+    "sec": 1,
+    "second": 1,
+    "m": 60,
+    "min": 60,
+    "minute": 60,
+    "h": 3600,
+    "hour": 3600,
+    "d": 86400,
+    "day": 86400,
+}
+
+_REQUEST_ATTR = "_rate_limit_decisions"
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """'30/min' → (30, 60)。DRF の rate 表記（'5/s', '100/hour' など）と同じ。"""
+    num, _, period = str(rate).partition("/")
+    seconds = _PERIODS.get(period.strip().lower()) or _PERIODS.get(period.strip().lower()[:1])
+    if not seconds:
+        raise ValueError(f"invalid rate: {rate!r}")
+    return int(num), seconds
+
+
+@dataclass(frozen=True)
+class RateDecision:
+    allowed: bool
+    name: str
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: Optional[float] = None
+
+    def headers(self) -> Dict[str, str]:
+        h = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(max(int(math.ceil(self.reset_after)), 0)),
+            "X-RateLimit-Scope": self.name,
+        }
+        if not self.allowed and self.retry_after is not None:
+            h["Retry-After"] = str(max(int(math.ceil(self.retry_after)), 1))
+        return h
+
+
+def _bump(cache, key: str, delta: int, ttl: int, initial: int = 0) -> int:
+    cache.add(key, initial, ttl)
+    try:
+        return int(cache.incr(key, delta))
+    except ValueError:
+        # add と incr の間で期限切れした場合
+        cache.set(key, initial + delta, ttl)
+        return initial + delta
+
+
+def _unbump(cache, key: str, delta: int) -> None:
+    try:
+        cache.decr(key, delta)
+    except ValueError:
+        pass
+
+
+class _Limiter:
+    def __init__(self, name: str, *, cache: Any = None, clock: Callable[[], float] = time.time) -> None:
+        self.name = name
+        self.cache = cache if cache is not None else namespace_cache("throttle")
+        self._clock = clock
+
+    def _key(self, ident: str, suffix: Any = "") -> str:
+        return f"throttle:rl:{self.name}:{ident}:{suffix}"
+
+
+class FixedWindowLimiter(_Limiter):
+    def __init__(self, name: str, limit: int, window: int, **kw: Any) -> None:
+        super().__init__(name, **kw)
+        self.limit = max(0, int(limit))
+        self.window = max(1, int(window))
+
+    def _bucket(self, now: float) -> int:
+        return int(now // self.window)
+
+    def peek(self, ident: str = "") -> int:
+        return int(self.cache.get(self._key(ident, self._bucket(self._clock()))) or 0)
+
+    def hit(self, ident: str = "", cost: int = 1) -> RateDecision:
+        now = self._clock()
+        bucket = self._bucket(now)
+        used = _bump(self.cache, self._key(ident, bucket), cost, self.window + 1)
+        reset_after = (bucket + 1) * self.window - now
+        allowed = used <= self.limit
+        return RateDecision(
+            allowed=allowed,
+            name=self.name,
+            limit=self.limit,
+            remaining=self.limit - used,
+            reset_after=reset_after,
+            retry_after=None if allowed else reset_after,
+        )
+
+
+class SlidingWindowLimiter(FixedWindowLimiter):
+    def hit(self, ident: str = "", cost: int = 1) -> RateDecision:
+        now = self._clock()
+        bucket = self._bucket(now)
+        offset = now - bucket * self.window
+        weight = 1.0 - offset / self.window
+        cur_key = self._key(ident, bucket)
+
+        cur = _bump(self.cache, cur_key, cost, self.window * 2)
+        prev = int(self.cache.get(self._key(ident, bucket - 1)) or 0)
+        # 直前窓の残りは切り上げて数える（境目で 1 回多く通さない）
+        used = math.ceil(prev * weight) + cur
+        reset_after = self.window - offset
+
+        if used <= self.limit:
+            return RateDecision(True, self.name, self.limit, self.limit - used, reset_after)
+
+        # 拒否した試行は数えない（叩き続けても回復できるように）
+        _unbump(self.cache, cur_key, cost)
+        cur -= cost
+        room = self.limit - cur - cost
+        if room < 0:
+            # 今の窓だけで溢れている: 次の窓で今の窓ぶんが減衰するまで待つ
+            need = 1.0 - (self.limit - cost) / cur if cur > 0 else 0.0
+            retry = reset_after + self.window * max(need, 0.0)
+        else:
+            retry = self.window * (1.0 - room / prev) - offset if prev else 0.0
+        return RateDecision(False, self.name, self.limit, 0, reset_after, max(retry, 0.0))
+
+
+class TokenBucketLimiter(_Limiter):
+    """
+    rate 個 / window 秒で補充、最大 capacity 個のトークンバケット。
+    キャッシュには「理論上の到着時刻（TAT, ミリ秒）」だけを持つ。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: int,
+        window: int,
+        *,
+        capacity: Optional[int] = None,
+        **kw: Any,
+    ) -> None:
+        super().__init__(name, **kw)
+        self.rate = max(1, int(rate))
+        self.window = max(1, int(window))
+        self.capacity = max(1, int(capacity if capacity is not None else rate))
+        self.interval_ms = max(1, int(round(self.window * 1000 / self.rate)))
+        self.burst_ms = self.capacity * self.interval_ms
+        self._ttl = int(math.ceil(self.burst_ms / 1000)) + 60
+
+    def hit(self, ident: str = "", cost: int = 1) -> RateDecision:
+        now_ms = int(self._clock() * 1000)
+        key = self._key(ident, "tat")
+        inc = self.interval_ms * cost
+
+        tat = _bump(self.cache, key, inc, self._ttl, initial=now_ms)
+        if tat - inc < now_ms:
+            # しばらく空いていてバケットが満タン: TAT を今に寄せる（同時刻の取り合いは後勝ち）
+            tat = now_ms + inc
+            self.cache.set(key, tat, self._ttl)
+
+        ahead = tat - now_ms
+        if ahead <= self.burst_ms:
+            remaining = (self.burst_ms - ahead) // self.interval_ms
+            return RateDecision(True, self.name, self.capacity, int(remaining), ahead / 1000)
+
+        _unbump(self.cache, key, inc)
+        return RateDecision(
+            False,
+            self.name,
+            self.capacity,
+            0,
+            (ahead - inc) / 1000,
+            retry_after=(ahead - self.burst_ms) / 1000,
+        )
+
+    def acquire(
+        self,
+        ident: str = "",
+        *,
+        timeout: Optional[float] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> RateDecision:
+        """取れるまで待つ。timeout を超えそうなら拒否の判定をそのまま返す。"""
+        deadline = None if timeout is None else self._clock() + float(timeout)
+        while True:
+            decision = self.hit(ident)
+            if decision.allowed:
+                return decision
+            wait = decision.retry_after or 0.001
+            if deadline is not None and self._clock() + wait > deadline:
+                return decision
+            sleep(max(wait, 0.001))
+
+
+def record_decision(request: Any, decision: RateDecision) -> None:
+    """レスポンスヘッダ用にリクエストへ判定を載せる（DRF Request なら元の HttpRequest に）。"""
+    raw = getattr(request, "_request", request)
+    decisions = getattr(raw, _REQUEST_ATTR, None)
+    if decisions is None:
+        decisions = []
+        setattr(raw, _REQUEST_ATTR, decisions)
+    decisions.append(decision)
+
+
+def most_restrictive(request: Any) -> Optional[RateDecision]:
+    raw = getattr(request, "_request", request)
+    decisions = getattr(raw, _REQUEST_ATTR, None) or []
+    if not decisions:
+        return None
+    denied = [d for d in decisions if not d.allowed]
+    if denied:
+        return max(denied, key=lambda d: d.retry_after or 0)
+    return min(decisions, key=lambda d: (d.remaining, -d.reset_after))
+
+
+def apply_headers(response: Any, request: Any) -> Any:
+    decision = most_restrictive(request)
+    if decision is not None:
+        for k, v in decision.headers().items():
+            if k == "Retry-After" and response.has_header(k):
+                continue
+            response[k] = v
+    return response
+
+
+class RateLimitHeadersMiddleware:
+    """record_decision された判定のうち一番厳しいものを X-RateLimit-* に出す。"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return apply_headers(self.get_response(request), request)
+
+
+__all__ = [
+    "FixedWindowLimiter",
+    "RateDecision",
+    "RateLimitHeadersMiddleware",
+    "SlidingWindowLimiter",
+    "TokenBucketLimiter",
+    "apply_headers",
+    "most_restrictive",
+    "parse_rate",
+    "record_decision",
+]
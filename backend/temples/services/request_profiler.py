@@ -0,0 +1,318 @@
+# backend/temples/services/request_profiler.py
+"""
+リクエスト内のフェーズ計測。
+
+- profile_request(endpoint): 1 リクエストの計測範囲。contextvar に現在のプロファイルを置き、
+  connection.execute_wrapper で SQL の本数・時間を数える（DEBUG / connection.queries に依存しない）
+- phase(name) / profiled(name): フェーズ区間の計測（with / デコレータ）。SQL はフェーズごとにも振り分ける
+- record_upstream(service): 上流 API（Google Places / Geocoding / LLM など）の呼び出し件数
+
+リクエスト終了時に endpoint ごとのヒストグラムへ積み、metrics_snapshot() で p50 / p95 / p99 を読む。
+ヒストグラムはワーカープロセス単位（gunicorn の各ワーカーで別々に持つ）。
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import functools
+import heapq
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.db import connections
+
+log = logging.getLogger(__name__)
+
+SLOW_SQL_KEEP = 5
+PERCENTILES = (50, 95, 99)
+
+# 0.1ms 〜 約 90 秒を 1.25 倍刻み（相対誤差 25% 以内）で持つ。件数（SQL 本数）にもそのまま使う
+_BUCKET_BOUNDS: Tuple[float, ...] = tuple(0.1 * (1.25**i) for i in range(62))
+
+
+class Histogram:
+    """固定バケットのヒストグラム（件数・合計・最大と、バケット内線形補間のパーセンタイル）。"""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        v = max(0.0, float(value))
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, v)] += 1
+        self.count += 1
+        self.total += v
+        if v > self.max:
+            self.max = v
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if not n:
+                continue
+            if seen + n >= rank:
+                lo = _BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                hi = _BUCKET_BOUNDS[i] if i < len(_BUCKET_BOUNDS) else self.max
+                est = lo + (hi - lo) * (rank - seen) / n
+                return round(min(est, self.max), 3)
+            seen += n
+        return round(self.max, 3)
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.max, 3) if self.count else None,
+        }
+        for p in PERCENTILES:
+            out[f"p{p}"] = self.percentile(p)
+        return out
+
+
+class _EndpointMetrics:
+    __slots__ = ("requests", "statuses", "total_ms", "sql_count", "sql_ms", "phases", "phase_sql", "upstream")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.statuses: Dict[str, int] = {}
+        self.total_ms = Histogram()
+        self.sql_count = Histogram()
+        self.sql_ms = Histogram()
+        self.phases: Dict[str, Histogram] = {}
+        # phase -> [sql 本数合計, sql 時間合計(ms)]
+        self.phase_sql: Dict[str, List[float]] = {}
+        self.upstream: Dict[str, int] = {}
+
+
+_metrics: Dict[str, _EndpointMetrics] = {}
+_metrics_lock = threading.Lock()
+_started_at = time.time()
+
+
+class PhaseTimer:
+    """phase() が返す計測結果。with を抜けた後に elapsed（秒）が確定する。"""
+
+    __slots__ = ("name", "started", "elapsed", "sql_count", "sql_ms")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+
+
+class RequestProfile:
+    def __init__(self, endpoint: str, *, rid: Optional[str] = None) -> None:
+        self.endpoint = endpoint
+        self.rid = rid
+        self.started = time.perf_counter()
+        self.status: Optional[int] = None
+        self.phases: Dict[str, float] = {}  # phase -> ms（同名は合算）
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.upstream: Dict[str, int] = {}
+        self.phase_sql: Dict[str, Tuple[int, float]] = {}  # phase -> (sql 本数, sql 時間 ms)
+        self._stack: List[PhaseTimer] = []
+        # (ms, 連番, sql) の最小ヒープで遅い上位だけ持つ
+        self._slow: List[Tuple[float, int, str]] = []
+        self._seq = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def slow_queries(self) -> List[Tuple[float, str]]:
+        return [(ms, sql) for ms, _, sql in sorted(self._slow, reverse=True)]
+
+    def _record_sql(self, sql: str, ms: float) -> None:
+        self.sql_count += 1
+        self.sql_ms += ms
+        for t in self._stack:
+            t.sql_count += 1
+            t.sql_ms += ms
+        self._seq += 1
+        item = (ms, self._seq, sql)
+        if len(self._slow) < SLOW_SQL_KEEP:
+            heapq.heappush(self._slow, item)
+        elif ms > self._slow[0][0]:
+            heapq.heapreplace(self._slow, item)
+
+    def _sql_wrapper(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._record_sql(str(sql), (time.perf_counter() - t0) * 1000)
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+def _enabled() -> bool:
+    return os.getenv("REQUEST_PROFILER_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _commit(prof: RequestProfile) -> None:
+    with _metrics_lock:
+        m = _metrics.get(prof.endpoint)
+        if m is None:
+            m = _metrics[prof.endpoint] = _EndpointMetrics()
+        m.requests += 1
+        status_key = str(prof.status) if prof.status is not None else "error"
+        m.statuses[status_key] = m.statuses.get(status_key, 0) + 1
+        m.total_ms.add(prof.elapsed_ms())
+        m.sql_count.add(prof.sql_count)
+        m.sql_ms.add(prof.sql_ms)
+        for name, ms in prof.phases.items():
+            h = m.phases.get(name)
+            if h is None:
+                h = m.phases[name] = Histogram()
+            h.add(ms)
+        for name, (n, ms) in prof.phase_sql.items():
+            acc = m.phase_sql.setdefault(name, [0, 0.0])
+            acc[0] += n
+            acc[1] += ms
+        for service, n in prof.upstream.items():
+            m.upstream[service] = m.upstream.get(service, 0) + n
+
+
+@contextmanager
+def profile_request(endpoint: str, *, rid: Optional[str] = None) -> Iterator[RequestProfile]:
+    """
+    1 リクエストの計測範囲。抜けるときにヒストグラムへ積む。
+    prof.status にレスポンスのステータスを入れておくと、ステータス別の件数も数える。
+    """
+    prof = RequestProfile(endpoint, rid=rid)
+    if not _enabled():
+        yield prof
+        return
+
+    token = _current.set(prof)
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all(initialized_only=False):
+                stack.enter_context(conn.execute_wrapper(prof._sql_wrapper))
+            yield prof
+    finally:
+        _current.reset(token)
+        try:
+            _commit(prof)
+        except Exception:
+            log.exception("[profiler] commit failed endpoint=%s", endpoint)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[PhaseTimer]:
+    """
+    フェーズ区間を計る。プロファイル外でも elapsed は取れる（ヒストグラムには積まない）。
+
+        with phase("candidates") as ph:
+            ...
+        log.info("elapsed=%.3f", ph.elapsed)
+    """
+    timer = PhaseTimer(name)
+    prof = _current.get()
+    if prof is not None:
+        prof._stack.append(timer)
+    try:
+        yield timer
+    finally:
+        timer.elapsed = time.perf_counter() - timer.started
+        if prof is not None:
+            try:
+                prof._stack.remove(timer)
+            except ValueError:
+                pass
+            prof.phases[name] = prof.phases.get(name, 0.0) + timer.elapsed * 1000
+            n, ms = prof.phase_sql.get(name, (0, 0.0))
+            prof.phase_sql[name] = (n + timer.sql_count, ms + timer.sql_ms)
+
+
+def profiled(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """関数全体を 1 フェーズとして計るデコレータ（name 省略時は関数名）。"""
+
+    def deco(fn: Callable[..., Any]) -> Callable[..., Any]:
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with phase(label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def record_upstream(service: str, n: int = 1) -> None:
+    """上流 API を呼んだことを現在のプロファイルに記録する（プロファイル外では何もしない）。"""
+    prof = _current.get()
+    if prof is not None:
+        prof.upstream[service] = prof.upstream.get(service, 0) + int(n)
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """endpoint ごとの集計（パーセンタイルは ms、sql_count は本数）。"""
+    with _metrics_lock:
+        endpoints: Dict[str, Any] = {}
+        for endpoint, m in sorted(_metrics.items()):
+            endpoints[endpoint] = {
+                "requests": m.requests,
+                "statuses": dict(m.statuses),
+                "total_ms": m.total_ms.summary(),
+                "sql_count": m.sql_count.summary(),
+                "sql_ms": m.sql_ms.summary(),
+                "phases": {
+                    name: {
+                        **h.summary(),
+                        "sql_count": int(m.phase_sql.get(name, (0, 0.0))[0]),
+                        "sql_ms": round(m.phase_sql.get(name, (0, 0.0))[1], 3),
+                    }
+                    for name, h in m.phases.items()
+                },
+                "upstream_calls": dict(m.upstream),
+            }
+    return {
+        "pid": os.getpid(),
+        "since": round(_started_at, 3),
+        "endpoints": endpoints,
+    }
+
+
+def reset_metrics() -> None:
+    global _started_at
+    with _metrics_lock:
+        _metrics.clear()
+        _started_at = time.time()
+
+
+__all__ = [
+    "Histogram",
+    "PhaseTimer",
+    "RequestProfile",
+    "current_profile",
+    "metrics_snapshot",
+    "phase",
+    "profile_request",
+    "profiled",
+    "record_upstream",
+    "reset_metrics",
+]
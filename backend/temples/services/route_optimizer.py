@@ -0,0 +1,322 @@
+# backend/temples/services/route_optimizer.py
+"""
+複数の神社をめぐる順番の最適化（2〜15 か所程度）。
+
+- 入力は所要時間の行列（秒）。既定はハバースイン距離 ÷ 速度でオフラインに作り、
+  ルート区間キャッシュやプロバイダの行列が揃っていればそちらを使う
+- 始点・終点の固定、各地点の時間窓（開門〜閉門）、滞在時間に対応
+- 地点数が EXACT_MAX_NODES 以下は Held-Karp の DP で厳密解、
+  それより多い場合は最近傍法で作った初期解を 2-opt / Or-opt で改善する
+
+評価値は「最後の地点を出るまでの経過秒」（移動 + 開門待ち + 滞在）。
+時間窓が無ければ移動時間の合計を最小化するのと同じになる。
+"""
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+EXACT_MAX_NODES = 10
+MAX_NODES = 16  # 始点 + 15 か所
+
+# 直線距離 → 道のりの補正と移動速度（m/s）
+DETOUR_FACTOR = 1.3
+SPEED_MPS = {"walking": 1.25, "walk": 1.25, "driving": 8.33, "car": 8.33}
+
+# 時間窓に間に合わない 1 秒あたりの罰則（実行可能解を常に優先させる）
+_LATE_PENALTY = 1000.0
+
+Window = Tuple[float, float]  # (開く秒, 閉まる秒)。出発時刻からの相対秒
+
+
+@dataclass
+class OptimizedRoute:
+    order: List[int]  # 訪問順のノード番号（始点を含む）
+    cost_s: float
+    travel_s: float
+    method: str  # "exact" / "heuristic" / "trivial"
+    feasible: bool = True
+    arrivals_s: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "feasible": self.feasible,
+            "cost_s": int(round(self.cost_s)),
+            "travel_s": int(round(self.travel_s)),
+        }
+
+
+# ---- 行列 ----
+def haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    R = 6371000.0
+    dlat = math.radians(b[0] - a[0])
+    dlng = math.radians(b[1] - a[1])
+    x = math.sin(dlat / 2) ** 2 + math.cos(math.radians(a[0])) * math.cos(math.radians(b[0])) * math.sin(
+        dlng / 2
+    ) ** 2
+    return 2 * R * math.atan2(math.sqrt(x), math.sqrt(1 - x))
+
+
+def haversine_matrix(points: Sequence[Tuple[float, float]], mode: str = "walking") -> List[List[float]]:
+    """(lat, lng) 列から所要秒の行列を作る（プロバイダを呼ばない）。"""
+    speed = SPEED_MPS.get(mode, SPEED_MPS["walking"])
+    n = len(points)
+    m = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            s = haversine_m(points[i], points[j]) * DETOUR_FACTOR / speed
+            m[i][j] = m[j][i] = s
+    return m
+
+
+_HHMM = re.compile(r"^(\d{1,2}):?(\d{2})$")
+
+
+def parse_hhmm(value: Any) -> Optional[int]:
+    """'09:30' / '0930' → 570（分）。解釈できなければ None。"""
+    m = _HHMM.match(str(value or "").strip())
+    if not m:
+        return None
+    h, mi = int(m.group(1)), int(m.group(2))
+    if h > 48 or mi >= 60:
+        return None
+    return h * 60 + mi
+
+
+def window_from_opening_hours(opening_hours: Any, weekday: int) -> Optional[Tuple[int, int]]:
+    """
+    Google Places の opening_hours.periods から、その曜日（0=日曜, Google 準拠）の
+    (開く分, 閉まる分) を返す。24 時間営業や情報なしは None（制約なし）。
+    """
+    periods = (opening_hours or {}).get("periods") if isinstance(opening_hours, dict) else None
+    if not periods:
+        return None
+    for p in periods:
+        o = p.get("open") or {}
+        c = p.get("close")
+        if o.get("day") != weekday:
+            continue
+        if not c:
+            return None  # close が無い period は 24 時間営業
+        start = parse_hhmm(o.get("time"))
+        end = parse_hhmm(c.get("time"))
+        if start is None or end is None:
+            return None
+        if c.get("day") != weekday:
+            end += 24 * 60
+        return start, end
+    return None
+
+
+# ---- 評価 ----
+def _simulate(
+    path: Sequence[int],
+    matrix: Sequence[Sequence[float]],
+    windows: Optional[Sequence[Optional[Window]]],
+    service_s: Sequence[float],
+) -> Tuple[float, float, float, List[float]]:
+    """(罰則込みの評価値, 経過秒, 移動秒, 各地点の到着秒)。"""
+    t = 0.0
+    travel = 0.0
+    late = 0.0
+    arrivals = [0.0]
+    first = path[0]
+    if windows and windows[first]:
+        t = max(t, windows[first][0])
+    t += service_s[first]
+    for a, b in zip(path, path[1:], strict=False):
+        d = matrix[a][b]
+        travel += d
+        t += d
+        w = windows[b] if windows else None
+        if w:
+            if t < w[0]:
+                t = w[0]
+            elif t > w[1]:
+                late += t - w[1]
+        arrivals.append(t)
+        t += service_s[b]
+    return t + late * _LATE_PENALTY, t, travel, arrivals
+
+
+def _result(path, matrix, windows, service_s, method) -> OptimizedRoute:
+    score, elapsed, travel, arrivals = _simulate(path, matrix, windows, service_s)
+    return OptimizedRoute(
+        order=list(path),
+        cost_s=elapsed,
+        travel_s=travel,
+        method=method,
+        feasible=score <= elapsed + 1e-6,
+        arrivals_s=arrivals,
+    )
+
+
+# ---- 厳密解（Held-Karp） ----
+def _exact(n, matrix, start, end, windows, service_s) -> Optional[List[int]]:
+    starts = [start] if start is not None else list(range(n))
+    full = (1 << n) - 1
+    INF = float("inf")
+    # dp[mask][j] = j で滞在を終えた時点の最小経過秒（時間窓は待ち込み）
+    dp = [[INF] * n for _ in range(1 << n)]
+    parent: List[List[int]] = [[-1] * n for _ in range(1 << n)]
+
+    for s in starts:
+        if end is not None and s == end and n > 1:
+            continue
+        t0 = windows[s][0] if windows and windows[s] else 0.0
+        dp[1 << s][s] = max(0.0, t0) + service_s[s]
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(n):
+            t = row[j]
+            if t == INF:
+                continue
+            for k in range(n):
+                if mask & (1 << k):
+                    continue
+                nmask = mask | (1 << k)
+                if end is not None and k == end and nmask != full:
+                    continue  # 終点は最後にだけ入る
+                arr = t + matrix[j][k]
+                w = windows[k] if windows else None
+                if w:
+                    if arr > w[1]:
+                        continue
+                    arr = max(arr, w[0])
+                arr += service_s[k]
+                if arr < dp[nmask][k]:
+                    dp[nmask][k] = arr
+                    parent[nmask][k] = j
+
+    ends = [end] if end is not None else list(range(n))
+    best = min(ends, key=lambda j: dp[full][j])
+    if dp[full][best] == INF:
+        return None
+
+    path = [best]
+    mask = full
+    while True:
+        p = parent[mask][path[-1]]
+        if p < 0:
+            break
+        mask ^= 1 << path[-1]
+        path.append(p)
+    return path[::-1]
+
+
+# ---- ヒューリスティック ----
+def _nearest_neighbour(n, matrix, start, end) -> List[int]:
+    if start is None:
+        # 始点が自由でも終点は最後に置くので、終点以外から歩き始める
+        start = next(i for i in range(n) if i != end)
+    cur = start
+    path = [cur]
+    left = set(range(n)) - {cur}
+    if end is not None and end != cur:
+        left.discard(end)
+    while left:
+        nxt = min(left, key=lambda k: matrix[cur][k])
+        path.append(nxt)
+        left.remove(nxt)
+        cur = nxt
+    if end is not None and end != path[0]:
+        path.append(end)
+    return path
+
+
+def _improve(path, matrix, windows, service_s, start_fixed, end_fixed, max_rounds=50) -> List[int]:
+    def score(p):
+        return _simulate(p, matrix, windows, service_s)[0]
+
+    best = list(path)
+    best_score = score(best)
+    lo = 1 if start_fixed else 0
+    hi = len(best) - (1 if end_fixed else 0)  # 動かしてよいのは [lo, hi)
+
+    for _ in range(max_rounds):
+        improved = False
+        # 2-opt: 区間を反転
+        for i in range(lo, hi - 1):
+            for j in range(i + 1, hi):
+                cand = best[:i] + best[i : j + 1][::-1] + best[j + 1 :]
+                s = score(cand)
+                if s + 1e-9 < best_score:
+                    best, best_score, improved = cand, s, True
+        # Or-opt: 長さ 1〜3 の区間を別の位置へ移す
+        for seg_len in (1, 2, 3):
+            for i in range(lo, hi - seg_len + 1):
+                seg = best[i : i + seg_len]
+                rest = best[:i] + best[i + seg_len :]
+                rest_hi = hi - seg_len
+                for pos in range(lo, rest_hi + 1):
+                    if pos == i:
+                        continue
+                    cand = rest[:pos] + seg + rest[pos:]
+                    s = score(cand)
+                    if s + 1e-9 < best_score:
+                        best, best_score, improved = cand, s, True
+                        break
+        if not improved:
+            break
+    return best
+
+
+def optimize_order(
+    matrix: Sequence[Sequence[float]],
+    *,
+    start: Optional[int] = 0,
+    end: Optional[int] = None,
+    windows: Optional[Sequence[Optional[Window]]] = None,
+    service_s: Optional[Sequence[float]] = None,
+    exact_max: int = EXACT_MAX_NODES,
+) -> OptimizedRoute:
+    """
+    全ノードを 1 回ずつ通る経路（閉路ではない）を返す。
+    start / end: 固定するノード番号（None なら自由）。
+    windows: ノードごとの時間窓（出発からの相対秒）、service_s: ノードごとの滞在秒。
+    """
+    n = len(matrix)
+    if n > MAX_NODES:
+        raise ValueError(f"too many stops: {n} > {MAX_NODES}")
+    if n > 1 and start is not None and start == end:
+        # 始点と終点が同じノードの経路（閉路）は作れない: 終点の指定を外して解き feasible=False
+        route = optimize_order(
+            matrix, start=start, end=None, windows=windows, service_s=service_s, exact_max=exact_max
+        )
+        route.feasible = False
+        return route
+    service = list(service_s) if service_s is not None else [0.0] * n
+    if n <= 2:
+        path = list(range(n))
+        if n == 2 and start is not None:
+            path = [start, 1 - start]
+        elif n == 2 and end is not None:
+            path = [1 - end, end]
+        return _result(path, matrix, windows, service, "trivial")
+
+    if n <= exact_max:
+        path = _exact(n, matrix, start, end, windows, service)
+        if path is None and windows:
+            # 時間窓をすべて満たす順番が無い: 窓を無視した最短順で返し feasible=False
+            path = _exact(n, matrix, start, end, None, service)
+        if path is not None:
+            return _result(path, matrix, windows, service, "exact")
+
+    path = _nearest_neighbour(n, matrix, start, end)
+    path = _improve(path, matrix, windows, service, start is not None, end is not None)
+    return _result(path, matrix, windows, service, "heuristic")
+
+
+__all__ = [
+    "EXACT_MAX_NODES",
+    "MAX_NODES",
+    "OptimizedRoute",
+    "haversine_matrix",
+    "optimize_order",
+    "parse_hhmm",
+    "window_from_opening_hours",
+]
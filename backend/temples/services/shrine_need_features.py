@@ -0,0 +1,221 @@
+"""
+神社側の need 特徴量インデックス（ShrineNeedFeature）の計算・保存・参照。
+
+concierge ランキングは候補ごとに goriyaku / description への部分文字列走査と
+goriyaku_tag_ids の照合を繰り返していた。ここでは NEED_TAGS 全 15 タグ分の
+判定結果を 1 神社 1 行のビットマスクとして事前計算しておき、
+リクエスト時はビット演算と辞書参照だけで済むようにする。
+
+- 全件再構築: manage.py rebuild_need_features
+- 差分更新: temples/signals.py（Shrine 保存 / goriyaku_tags 変更）
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from temples.domain.need_tags import NEED_TAGS
+from temples.domain.need_to_goriyaku_tag_ids import NEED_TO_GORIYAKU_IDS
+from temples.services.concierge_chat_ranking import NEED_TEXT_WEIGHTS, STUDY_SHRINE_HINTS
+
+log = logging.getLogger(__name__)
+
+NEED_TAG_BITS: Dict[str, int] = {tag: 1 << i for i, tag in enumerate(NEED_TAGS)}
+
+# 候補 dict に載せる compact row のキー
+NEED_FEATURES_KEY = "_need_features"
+
+DEFAULT_BATCH_SIZE = 500
+
+# 特徴量の材料になる Shrine の列（goriyaku_tags は m2m_changed で追う）
+NEED_SOURCE_FIELDS = frozenset({"goriyaku", "description"})
+
+
+def _spec_hash() -> str:
+    """判定表が変わったら既存インデックスを無効にするための指紋。"""
+    spec = [
+        list(NEED_TAGS),
+        NEED_TEXT_WEIGHTS,
+        list(STUDY_SHRINE_HINTS),
+        {k: sorted(v) for k, v in NEED_TO_GORIYAKU_IDS.items()},
+    ]
+    raw = json.dumps(spec, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+NEED_FEATURE_SPEC = _spec_hash()
+
+
+def need_bit(tag: str) -> int:
+    return NEED_TAG_BITS.get(tag, 0)
+
+
+def _clean_gids(values: Any) -> List[int]:
+    out: set[int] = set()
+    for x in values or []:
+        if isinstance(x, int) or (isinstance(x, str) and str(x).strip().isdigit()):
+            out.add(int(x))
+    return sorted(out)
+
+
+def compute_need_features(
+    *,
+    goriyaku: Optional[str],
+    description: Optional[str],
+    goriyaku_tag_ids: Iterable[Any] = (),
+) -> Dict[str, Any]:
+    """
+    1 神社分の特徴量を計算する（DB には触らない）。
+
+    判定は concierge_chat_ranking のテキスト走査と同じ規則:
+      - material = "{goriyaku} {description}"（全角スペースは半角へ）
+      - hint は NEED_TEXT_WEIGHTS の定義順で記録する
+    """
+    material = f"{goriyaku or ''} {description or ''}".replace("　", " ")
+    gids = _clean_gids(goriyaku_tag_ids)
+    gid_set = set(gids)
+
+    text_mask = 0
+    gid_mask = 0
+    text_hits: Dict[str, List[str]] = {}
+    text_scores: Dict[str, int] = {}
+
+    for tag in NEED_TAGS:
+        bit = NEED_TAG_BITS[tag]
+
+        weights = NEED_TEXT_WEIGHTS.get(tag, {})
+        hits = [hint for hint in weights if hint in material]
+        if hits:
+            text_mask |= bit
+            text_hits[tag] = hits
+            text_scores[tag] = sum(int(weights[h]) for h in hits)
+
+        expected = NEED_TO_GORIYAKU_IDS.get(tag) or set()
+        if expected and (gid_set & expected):
+            gid_mask |= bit
+
+    return {
+        "spec_hash": NEED_FEATURE_SPEC,
+        "text_mask": text_mask,
+        "gid_mask": gid_mask,
+        "study_hint": any(h in material for h in STUDY_SHRINE_HINTS),
+        "has_material": bool(material.strip()),
+        "text_hits": text_hits,
+        "text_scores": text_scores,
+        "goriyaku_tag_ids": gids,
+    }
+
+
+def to_compact_row(feature: Any) -> Optional[Dict[str, Any]]:
+    """ShrineNeedFeature（または同じキーを持つ dict）を候補 dict 用の compact row にする。"""
+    if feature is None:
+        return None
+
+    get = feature.get if isinstance(feature, dict) else (lambda k: getattr(feature, k, None))
+    if get("spec_hash") != NEED_FEATURE_SPEC:
+        return None
+
+    return {
+        "text_mask": int(get("text_mask") or 0),
+        "gid_mask": int(get("gid_mask") or 0),
+        "study_hint": bool(get("study_hint")),
+        "has_material": bool(get("has_material")),
+        "has_gids": bool(get("goriyaku_tag_ids")),
+        "text_hits": dict(get("text_hits") or {}),
+        "text_scores": dict(get("text_scores") or {}),
+    }
+
+
+def usable_need_features(rec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    nf = rec.get(NEED_FEATURES_KEY)
+    if isinstance(nf, dict) and "text_mask" in nf:
+        return nf
+    return None
+
+
+def _features_for_shrines(shrines: Iterable[Any]) -> List[Any]:
+    from temples.models import ShrineNeedFeature
+
+    rows = []
+    for s in shrines:
+        tag_ids = [t.id for t in s.goriyaku_tags.all()]
+        f = compute_need_features(
+            goriyaku=s.goriyaku,
+            description=s.description,
+            goriyaku_tag_ids=tag_ids,
+        )
+        rows.append(ShrineNeedFeature(shrine_id=s.id, **f))
+    return rows
+
+
+def _upsert(rows: List[Any]) -> None:
+    from temples.models import ShrineNeedFeature
+
+    if not rows:
+        return
+    ShrineNeedFeature.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["shrine"],
+        update_fields=[
+            "spec_hash",
+            "text_mask",
+            "gid_mask",
+            "study_hint",
+            "has_material",
+            "text_hits",
+            "text_scores",
+            "goriyaku_tag_ids",
+            "updated_at",
+        ],
+    )
+
+
+def refresh_need_features(shrine_ids: Iterable[int]) -> int:
+    """指定 Shrine の特徴量行を作り直す。戻り値は書き込んだ行数。"""
+    from temples.models import Shrine
+
+    ids = sorted({int(x) for x in shrine_ids if x is not None})
+    if not ids:
+        return 0
+
+    shrines = (
+        Shrine.objects.filter(id__in=ids)
+        .only("id", "goriyaku", "description")
+        .prefetch_related("goriyaku_tags")
+    )
+    rows = _features_for_shrines(shrines)
+    _upsert(rows)
+    return len(rows)
+
+
+def rebuild_need_features(*, batch_size: int = DEFAULT_BATCH_SIZE, stale_only: bool = False) -> Dict[str, int]:
+    """全 Shrine の特徴量を再構築する（manage.py rebuild_need_features 用）。"""
+    from temples.models import Shrine
+
+    qs = Shrine.objects.order_by("id")
+    if stale_only:
+        qs = qs.exclude(need_features__spec_hash=NEED_FEATURE_SPEC)
+
+    ids = list(qs.values_list("id", flat=True))
+    written = 0
+    for start in range(0, len(ids), batch_size):
+        written += refresh_need_features(ids[start : start + batch_size])
+
+    return {"total": len(ids), "written": written}
+
+
+__all__ = [
+    "NEED_FEATURE_SPEC",
+    "NEED_FEATURES_KEY",
+    "NEED_SOURCE_FIELDS",
+    "NEED_TAG_BITS",
+    "compute_need_features",
+    "need_bit",
+    "rebuild_need_features",
+    "refresh_need_features",
+    "to_compact_row",
+    "usable_need_features",
+]
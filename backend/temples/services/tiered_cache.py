@@ -0,0 +1,289 @@
+# backend/temples/services/tiered_cache.py
+"""
+L1（プロセス内 LRU）+ L2（共有キャッシュ）の 2 段キャッシュ。
+
+- L1: ワーカー内の小さな LRU。L2 への往復を省く（値は pickle で持ち、取り出すたびに複製する）
+- L2: settings.CACHES の名前空間 alias（redis / file / locmem）。全ワーカーで共有
+- single-flight: 同一キーの取得はプロセス内で 1 本に束ね、後続は結果を待って受け取る
+- stale-while-revalidate: 期限切れでも stale_ttl 内なら古い値を即返し、裏で 1 本だけ取り直す
+
+L2 には (タグ, fresh_until, value) の封筒で保存する。封筒でない値は壊れたものとして捨てる。
+"""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+_ENVELOPE_TAG = "tc1"
+
+STAT_KEYS = (
+    "l1_hits",
+    "l2_hits",
+    "misses",
+    "coalesced",
+    "stale_hits",
+    "refreshes",
+    "refresh_errors",
+)
+
+_REGISTRY: List["TieredCache"] = []
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+
+
+def _default_executor() -> Executor:
+    global _refresh_executor
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            workers = int(os.getenv("CACHE_REFRESH_WORKERS", "2"))
+            _refresh_executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="cache-refresh")
+        return _refresh_executor
+
+
+class _Flight:
+    __slots__ = ("event", "blob", "error", "stored")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.blob: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+        self.stored = False  # 先行が値をキャッシュに保存したか（保存しない値は後続でも hit にしない）
+
+
+class TieredCache:
+    def __init__(
+        self,
+        l2: Any,
+        *,
+        name: str,
+        l1_max_entries: int = 256,
+        l1_ttl: float = 60.0,
+        wait_timeout: float = 15.0,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        self.l2 = l2
+        self.name = name
+        self.l1_max_entries = max(0, int(l1_max_entries))
+        self.l1_ttl = float(l1_ttl)
+        self.wait_timeout = float(wait_timeout)
+        self._executor = executor
+
+        # key -> (l1_expires, fresh_until, blob)
+        self._l1: "OrderedDict[str, Tuple[float, float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._refreshing: set[str] = set()
+        self._stats: Dict[str, int] = dict.fromkeys(STAT_KEYS, 0)
+
+        _REGISTRY.append(self)
+
+    # ---- stats ----
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._stats)
+            out["l1_size"] = len(self._l1)
+        return out
+
+    def clear_local(self) -> None:
+        """L1 と統計を消す（L2 は触らない）。"""
+        with self._lock:
+            self._l1.clear()
+            self._stats = dict.fromkeys(STAT_KEYS, 0)
+
+    # ---- L1 ----
+    def _l1_get(self, key: str, now: float) -> Optional[Tuple[float, bytes]]:
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            l1_expires, fresh_until, blob = entry
+            if now >= l1_expires:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return fresh_until, blob
+
+    def _l1_put(self, key: str, fresh_until: float, stale_until: float, blob: bytes, now: float) -> None:
+        if self.l1_max_entries <= 0:
+            return
+        l1_expires = min(now + self.l1_ttl, stale_until)
+        with self._lock:
+            self._l1[key] = (l1_expires, fresh_until, blob)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    # ---- store ----
+    def _store(self, key: str, value: Any, ttl: int, stale_ttl: int) -> bytes:
+        now = time.time()
+        fresh_until = now + ttl
+        stale_until = fresh_until + stale_ttl
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            self.l2.set(key, (_ENVELOPE_TAG, fresh_until, value), ttl + stale_ttl)
+        except Exception as e:
+            log.warning("[tiered_cache:%s] l2 set failed key=%s err=%s", self.name, key, e)
+        self._l1_put(key, fresh_until, stale_until, blob, now)
+        return blob
+
+    def _l2_get(self, key: str, accept: Callable[[Any], bool]) -> Optional[Tuple[float, Any]]:
+        try:
+            raw = self.l2.get(key)
+        except Exception as e:
+            log.warning("[tiered_cache:%s] l2 get failed key=%s err=%s", self.name, key, e)
+            return None
+        if raw is None:
+            return None
+
+        if isinstance(raw, tuple) and len(raw) == 3 and raw[0] == _ENVELOPE_TAG and accept(raw[2]):
+            return float(raw[1]), raw[2]
+
+        # 旧形式・壊れた値・受け付けない値は捨てる
+        try:
+            self.l2.delete(key)
+        except Exception:
+            pass
+        return None
+
+    # ---- refresh ----
+    def _schedule_refresh(
+        self,
+        key: str,
+        fetcher: Callable[[], Any],
+        ttl_of: Callable[[Any], int],
+        stale_ttl: int,
+        cacheable: Callable[[Any], bool],
+    ) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _run() -> None:
+            try:
+                value = fetcher()
+                if cacheable(value):
+                    self._store(key, value, ttl_of(value), stale_ttl)
+                self._bump("refreshes")
+            except Exception as e:
+                self._bump("refresh_errors")
+                log.warning("[tiered_cache:%s] refresh failed key=%s err=%s", self.name, key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        try:
+            (self._executor or _default_executor()).submit(_run)
+        except Exception as e:
+            with self._lock:
+                self._refreshing.discard(key)
+            log.warning("[tiered_cache:%s] refresh submit failed key=%s err=%s", self.name, key, e)
+
+    # ---- main ----
+    def get_or_fetch(
+        self,
+        key: str,
+        fetcher: Callable[[], Any],
+        *,
+        ttl: int,
+        stale_ttl: int = 0,
+        accept: Callable[[Any], bool] = lambda v: v is not None,
+        cacheable: Optional[Callable[[Any], bool]] = None,
+        ttl_for: Optional[Callable[[Any], int]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        (value, hit) を返す。hit は上流を呼ばずに返せたとき True。
+
+        accept: キャッシュ上の値を採用してよいか
+        cacheable: 取得した値を保存してよいか（既定は accept と同じ）
+        ttl_for: 値ごとに TTL を変える場合（否定結果だけ短くするなど）。既定は ttl
+        """
+        cacheable = cacheable or accept
+        ttl_of = ttl_for or (lambda _v: ttl)
+        now = time.time()
+
+        # L1
+        l1 = self._l1_get(key, now)
+        if l1 is not None:
+            fresh_until, blob = l1
+            if now >= fresh_until:
+                self._bump("stale_hits")
+                self._schedule_refresh(key, fetcher, ttl_of, stale_ttl, cacheable)
+            else:
+                self._bump("l1_hits")
+            return pickle.loads(blob), True
+
+        # L2
+        l2 = self._l2_get(key, accept)
+        if l2 is not None:
+            fresh_until, value = l2
+            self._l1_put(
+                key,
+                fresh_until,
+                fresh_until + stale_ttl,
+                pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                now,
+            )
+            if now >= fresh_until:
+                self._bump("stale_hits")
+                self._schedule_refresh(key, fetcher, ttl_of, stale_ttl, cacheable)
+            else:
+                self._bump("l2_hits")
+            return value, True
+
+        # miss: single-flight
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            self._bump("coalesced")
+            if flight.event.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                if flight.blob is not None:
+                    return pickle.loads(flight.blob), flight.stored
+            # 先行が時間切れになった場合は自分で取りに行く
+            return fetcher(), False
+
+        self._bump("misses")
+        try:
+            value = fetcher()
+            if cacheable(value):
+                flight.blob = self._store(key, value, ttl_of(value), stale_ttl)
+                flight.stored = True
+            else:
+                # 保存しない値（上流エラー等）も待っていた後続にはそのまま渡す
+                flight.blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            return value, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+
+def clear_local_tiers() -> None:
+    """全 TieredCache の L1 と統計を消す（テスト用）。"""
+    for tc in list(_REGISTRY):
+        tc.clear_local()
+
+
+__all__ = ["STAT_KEYS", "TieredCache", "clear_local_tiers"]
@@ -0,0 +1,80 @@
+# backend/temples/services/upstream_budget.py
+"""
+上流 API（Google Places など）への呼び出し予算。
+
+throttle 名前空間の共有キャッシュ上に「1 秒窓」と「1 日窓」のカウンタを置き、
+スレッド・プロセス・ホストをまたいで QPS と日次リクエスト数を揃えて制限する。
+1 秒窓の枠が毎秒補充されるトークンに相当し、枠が尽きたら次の秒まで待つ。
+
+カウンタは temples.services.rate_limit.FixedWindowLimiter（cache.add + cache.incr）で進める。
+日次窓は UTC の日付で切り替わる。
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from typing import Any, Callable, Optional
+
+from shrine_project.cache_tiers import namespace_cache
+from temples.services.rate_limit import FixedWindowLimiter, RateDecision
+
+log = logging.getLogger(__name__)
+
+
+class BudgetExhausted(Exception):
+    """日次予算を使い切った（または待ち時間の上限を超えた）。"""
+
+
+class UpstreamBudget:
+    def __init__(
+        self,
+        name: str,
+        *,
+        qps: float,
+        daily_limit: int = 0,
+        cache: Any = None,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.name = name
+        # 1 秒窓に載せるので整数枠（0.5 qps などは 1 にする）
+        self.per_second = max(1, int(math.ceil(float(qps)))) if qps and qps > 0 else 0
+        self.daily_limit = max(0, int(daily_limit or 0))
+        self.cache = cache if cache is not None else namespace_cache("throttle")
+        self._clock = clock
+        self._sleep = sleep
+
+        self._sec = FixedWindowLimiter(f"upstream:{name}", self.per_second, 1, cache=self.cache, clock=clock)
+        self._day = FixedWindowLimiter(f"upstream:{name}", self.daily_limit, 86400, cache=self.cache, clock=clock)
+        self.last_decision: Optional[RateDecision] = None
+
+    def used_today(self) -> int:
+        return self._day.peek("day")
+
+    def acquire(self, *, timeout: Optional[float] = None) -> None:
+        """
+        1 リクエスト分の枠を取る。取れるまで待つ。
+        日次予算切れ・timeout 超過は BudgetExhausted。
+        """
+        deadline = None if timeout is None else self._clock() + float(timeout)
+
+        if self.per_second:
+            while True:
+                decision = self._sec.hit("sec")
+                self.last_decision = decision
+                if decision.allowed:
+                    break
+                wait = decision.retry_after or 0.0
+                if deadline is not None and self._clock() + wait > deadline:
+                    raise BudgetExhausted(f"{self.name}: qps wait exceeded timeout")
+                self._sleep(max(wait, 0.001))
+
+        if self.daily_limit:
+            decision = self._day.hit("day")
+            self.last_decision = decision
+            if not decision.allowed:
+                raise BudgetExhausted(f"{self.name}: daily budget {self.daily_limit} exhausted")
+
+
+__all__ = ["BudgetExhausted", "UpstreamBudget"]
@@ -0,0 +1,390 @@
+# backend/temples/services/write_behind.py
+"""
+観測ログの write-behind（応答を返した後にまとめて INSERT する）。
+
+enqueue(kind, fields) は行をプロセス内の有界キューに積むだけで戻る。バックグラウンドの
+worker スレッドがキューを取り出し、件数（WRITE_BEHIND_BATCH_SIZE）か時間
+（WRITE_BEHIND_FLUSH_SECONDS）のどちらかに達したら kind ごとに bulk_create する。
+
+- WRITE_BEHIND_ENABLED=0（pytest の既定）: キューを使わずその場で書く
+- WRITE_BEHIND_OUTBOX=1: 受け付け時に ConciergeWriteOutbox へ 1 行書き、本体へ移せたら消す。
+  プロセスが落ちても行は残り、WRITE_BEHIND_OUTBOX_REPLAY_SECONDS より古いものを worker が再送する
+- キューが満杯なら捨てて dropped を数える（リクエストを待たせない）。outbox 有効時は行が残るので失わない
+- 1 行でも壊れた行があると bulk_create 全体が失敗するので、そのときは 1 行ずつ入れ直して壊れた行だけ捨てる
+  （遅延 FK も savepoint の中で検査するので、外側の COMMIT でバッチごと巻き戻らない）
+
+created_at（auto_now_add）は書き込み時刻になる。遅れは最大でフラッシュ間隔ぶん。
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    DataError,
+    IntegrityError,
+    close_old_connections,
+    connection,
+    transaction,
+)
+from django.utils import timezone
+
+log = logging.getLogger(__name__)
+
+# kind → temples のモデル名
+MODELS = {
+    "recommendation_log": "ConciergeRecommendationLog",
+    "recommendation_click": "ConciergeRecommendationClickLog",
+}
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_SECONDS = 2.0
+DEFAULT_QUEUE_MAX = 10000
+DEFAULT_OUTBOX_REPLAY_SECONDS = 300.0
+
+# (kind, fields, outbox_id)
+Item = Tuple[str, Dict[str, Any], Optional[int]]
+
+
+def _cfg(name: str, default):
+    return type(default)(getattr(settings, name, default))
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "WRITE_BEHIND_ENABLED", False))
+
+
+def outbox_enabled() -> bool:
+    return bool(getattr(settings, "WRITE_BEHIND_OUTBOX", False))
+
+
+def _model(kind: str):
+    return apps.get_model("temples", MODELS[kind])
+
+
+def _build(model, kind: str, rows: List[Dict[str, Any]]) -> Tuple[list, List[Dict[str, Any]], int]:
+    """行ごとにモデルを組み立てる。列名・型が合わない行はここで捨てる。"""
+    objs, ok, bad = [], [], 0
+    for fields in rows:
+        try:
+            objs.append(model(**fields))
+            ok.append(fields)
+        except (TypeError, ValueError):
+            bad += 1
+            log.exception("[write_behind] dropped malformed row kind=%s", kind)
+    return objs, ok, bad
+
+
+def _check_fks(model) -> None:
+    """
+    遅延 FK（DEFERRABLE INITIALLY DEFERRED）をこの savepoint の中で検査する。
+    外側の COMMIT まで持ち越すと 1 行のぶら下がり FK でバッチ全体が巻き戻るため。
+    """
+    connection.check_constraints(table_names=[model._meta.db_table])
+
+
+def _insert_rows(items: Iterable[Item]) -> Tuple[int, int]:
+    """kind ごとに bulk_create する。(書いた行数, 捨てた行数) を返す。"""
+    by_kind: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for kind, fields, _ in items:
+        by_kind[kind].append(fields)
+
+    written = dropped = 0
+    for kind, rows in by_kind.items():
+        model = _model(kind)
+        objs, rows, bad = _build(model, kind, rows)
+        dropped += bad
+        if not objs:
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objs)
+                _check_fks(model)
+            written += len(objs)
+            continue
+        except (IntegrityError, DataError):
+            log.warning("[write_behind] bulk insert failed kind=%s rows=%d, retrying one by one", kind, len(objs))
+        for fields in rows:
+            try:
+                with transaction.atomic():
+                    model.objects.create(**fields)
+                    _check_fks(model)
+                written += 1
+            except (IntegrityError, DataError):
+                dropped += 1
+                log.exception("[write_behind] dropped bad row kind=%s", kind)
+    return written, dropped
+
+
+def _drain_outbox(ids: Optional[List[int]] = None, *, older_than: Optional[float] = None, limit: int) -> Tuple[int, int]:
+    """
+    outbox の行を本体テーブルへ移して消す（1 トランザクション）。
+    他プロセスが処理中の行はロックを取れないので飛ばす（skip_locked が使える DB のみ）。
+    """
+    Outbox = apps.get_model("temples", "ConciergeWriteOutbox")
+    qs = Outbox.objects.order_by("id")
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    if older_than is not None:
+        qs = qs.filter(created_at__lt=timezone.now() - timedelta(seconds=older_than))
+    if connection.features.has_select_for_update_skip_locked:
+        qs = qs.select_for_update(skip_locked=True)
+    else:
+        qs = qs.select_for_update()
+
+    with transaction.atomic():
+        rows = list(qs.only("id", "kind", "payload")[:limit])
+        if not rows:
+            return 0, 0
+        items = [(r.kind, r.payload, r.id) for r in rows if r.kind in MODELS]
+        written, dropped = _insert_rows(items)
+        Outbox.objects.filter(id__in=[r.id for r in rows]).delete()
+    return written, dropped + (len(rows) - len(items))
+
+
+class WriteBehindQueue:
+    def __init__(self, *, max_size: int, batch_size: int, flush_seconds: float, replay_seconds: float) -> None:
+        self.batch_size = max(1, int(batch_size))
+        self.flush_seconds = max(0.01, float(flush_seconds))
+        self.replay_seconds = float(replay_seconds)
+        self._q: "queue.Queue[Item]" = queue.Queue(maxsize=max(1, int(max_size)))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "replayed": 0}
+
+    # ---- producer ----
+
+    def put(self, item: Item) -> bool:
+        self._ensure_worker()
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            # outbox の行は残るので、後で replay される
+            self._bump("dropped" if item[2] is None else "failed")
+            log.warning("[write_behind] queue full, kind=%s outbox=%s", item[0], item[2] is not None)
+            return False
+        self._bump("enqueued")
+        return True
+
+    # ---- consumer ----
+
+    def _ensure_worker(self) -> None:
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._start_lock:
+            # fork 後の子プロセスにはスレッドが引き継がれないので作り直す
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            self._stop.clear()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _collect(self, timeout: float) -> List[Item]:
+        """最初の 1 件を待ち、そこから batch_size 件か flush_seconds 経過まで集める。"""
+        try:
+            batch = [self._q.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        due = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            left = due - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        next_replay = time.monotonic()
+        while not self._stop.is_set():
+            if outbox_enabled() and time.monotonic() >= next_replay:
+                close_old_connections()
+                self.replay()
+                next_replay = time.monotonic() + self.replay_seconds
+            batch = self._collect(self.flush_seconds)
+            if batch:
+                # worker スレッドの接続も CONN_MAX_AGE に従って張り直す
+                close_old_connections()
+                self._write(batch)
+        connection.close()
+
+    def _write(self, batch: List[Item]) -> int:
+        outbox_ids = [oid for _, _, oid in batch if oid is not None]
+        plain = [item for item in batch if item[2] is None]
+        written = dropped = 0
+        try:
+            if plain:
+                w, d = _insert_rows(plain)
+                written, dropped = written + w, dropped + d
+            if outbox_ids:
+                w, d = _drain_outbox(outbox_ids, limit=len(outbox_ids))
+                written, dropped = written + w, dropped + d
+        except DatabaseError:
+            # DB に届かない。outbox の行は残るので replay に任せる
+            self._bump("failed", len(batch) - written)
+            log.exception("[write_behind] batch failed rows=%d", len(batch))
+            return written
+        self._bump("batches")
+        self._bump("written", written)
+        self._bump("dropped", dropped)
+        return written
+
+    def flush(self) -> int:
+        """キューに残っている分を呼び出し元スレッドで書き切る。書いた行数を返す。"""
+        total = 0
+        while True:
+            batch: List[Item] = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._q.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                return total
+            total += self._write(batch)
+
+    def replay(self, older_than: Optional[float] = None) -> int:
+        """落ちたプロセスが残した outbox の行（既定は replay_seconds より古いもの）を書き直す。"""
+        if older_than is None:
+            older_than = self.replay_seconds
+        total = 0
+        try:
+            while True:
+                written, dropped = _drain_outbox(older_than=older_than, limit=self.batch_size)
+                if not written and not dropped:
+                    break
+                total += written
+                self._bump("replayed", written)
+                self._bump("dropped", dropped)
+        except DatabaseError:
+            log.exception("[write_behind] outbox replay failed")
+        if total:
+            log.info("[write_behind] replayed outbox rows=%d", total)
+        return total
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        t = self._thread
+        if t is not None and t.is_alive() and self._pid == os.getpid():
+            t.join(timeout)
+        self._thread = None
+
+    # ---- stats ----
+
+    def _bump(self, name: str, n: int = 1) -> None:
+        if n:
+            with self._stats_lock:
+                self._stats[name] += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        out["queue_depth"] = self._q.qsize()
+        out["worker_alive"] = bool(self._thread is not None and self._thread.is_alive())
+        return out
+
+
+_queue: Optional[WriteBehindQueue] = None
+_queue_lock = threading.Lock()
+
+
+def _get_queue() -> WriteBehindQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteBehindQueue(
+                max_size=_cfg("WRITE_BEHIND_QUEUE_MAX", DEFAULT_QUEUE_MAX),
+                batch_size=_cfg("WRITE_BEHIND_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+                flush_seconds=_cfg("WRITE_BEHIND_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS),
+                replay_seconds=_cfg("WRITE_BEHIND_OUTBOX_REPLAY_SECONDS", DEFAULT_OUTBOX_REPLAY_SECONDS),
+            )
+        return _queue
+
+
+def enqueue(kind: str, fields: Dict[str, Any]) -> None:
+    """
+    1 行を後で書くよう積む。fields は列名 → 値（FK は user_id / thread_id のように id で渡す）。
+    outbox を使うときは JSON にできる値だけにすること。
+    """
+    if kind not in MODELS:
+        raise ValueError(f"unknown write-behind kind: {kind}")
+    if not enabled():
+        _insert_rows([(kind, fields, None)])
+        return
+
+    outbox_id: Optional[int] = None
+    if outbox_enabled():
+        Outbox = apps.get_model("temples", "ConciergeWriteOutbox")
+        outbox_id = Outbox.objects.create(kind=kind, payload=fields).id
+    _get_queue().put((kind, fields, outbox_id))
+
+
+def flush_write_behind() -> int:
+    """キューを今すぐ書き切る（テスト・シャットダウン用）。"""
+    return _queue.flush() if _queue is not None else 0
+
+
+def replay_outbox(older_than_s: Optional[float] = None) -> int:
+    """outbox に残った古い行を書き直す。older_than_s=0 なら全部。"""
+    return _get_queue().replay(older_than_s)
+
+
+def write_behind_stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"enabled": enabled(), "outbox": outbox_enabled()}
+    if _queue is not None:
+        out.update(_queue.stats())
+    return out
+
+
+def reset_write_behind() -> None:
+    """worker を止めてキューを捨てる（テスト用）。"""
+    global _queue
+    with _queue_lock:
+        q, _queue = _queue, None
+    if q is not None:
+        q.stop(timeout=1.0)
+
+
+def _shutdown() -> None:
+    q = _queue
+    if q is None:
+        return
+    q.stop()
+    try:
+        q.flush()
+    except Exception:
+        log.exception("[write_behind] flush at exit failed")
+
+
+# gunicorn の graceful shutdown などで残りを書き切る
+atexit.register(_shutdown)
+
+
+__all__ = [
+    "MODELS",
+    "WriteBehindQueue",
+    "enqueue",
+    "enabled",
+    "flush_write_behind",
+    "outbox_enabled",
+    "replay_outbox",
+    "reset_write_behind",
+    "write_behind_stats",
+]
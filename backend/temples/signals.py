@@ -72,6 +72,57 @@ def on_shrine_saved(sender, instance, created, **kwargs):
     return
 
 
+def _refresh_need_features_safe(shrine_ids) -> None:
+    """need 特徴量インデックスの差分更新。失敗しても保存処理は止めない。"""
+    ids = [i for i in (shrine_ids or []) if i is not None]
+    if not ids:
+        return
+    try:
+        from django.db import transaction
+
+        from .services.shrine_need_features import refresh_need_features
+
+        with transaction.atomic():
+            refresh_need_features(ids)
+    except Exception:
+        logger.exception("need_features: refresh failed shrine_ids=%r", ids[:20])
+
+
+def refresh_need_features_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    # fixture ロード（raw=True）時は rebuild_need_features に任せる
+    if raw:
+        return
+    # popular_score などだけの save(update_fields=...) では材料が変わらないので作り直さない
+    if update_fields is not None:
+        from .services.shrine_need_features import NEED_SOURCE_FIELDS
+
+        if NEED_SOURCE_FIELDS.isdisjoint(update_fields):
+            return
+    _refresh_need_features_safe([instance.pk])
+
+
+def refresh_need_features_on_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Shrine.goriyaku_tags の変更に追従する。
+
+    reverse=True（GoriyakuTag 側から操作）の clear は pk_set が来ないので、
+    pre_clear の時点で対象 Shrine を控えておく。
+    """
+    if reverse and action == "pre_clear":
+        instance._need_features_shrine_ids = list(instance.shrines.values_list("id", flat=True))
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        _refresh_need_features_safe([instance.pk])
+    elif action == "post_clear":
+        _refresh_need_features_safe(getattr(instance, "_need_features_shrine_ids", None))
+    else:
+        _refresh_need_features_safe(list(pk_set or []))
+
+
 def auto_geocode_on_save(sender, instance, **kwargs):
     # 1) フラグOFFなら何もしない
     if not getattr(settings, "AUTO_GEOCODE_ON_SAVE", False):
@@ -21,7 +21,7 @@ def patch_chat_dependencies(monkeypatch):
             anon_id="anon-test-id",
         )
 
-    def fake_check_quota(plan_context, feature):
+    def fake_try_consume_quota(plan_context, feature):
         return SimpleNamespace(
             allowed=True,
             unlimited=False,
@@ -29,9 +29,6 @@ def patch_chat_dependencies(monkeypatch):
             limit=5,
         )
 
-    def fake_consume_quota(plan_context, feature):
-        return None
-
     def fake_build_chat_candidates(**kwargs):
         return [
             {
@@ -137,12 +134,8 @@ def patch_chat_dependencies(monkeypatch):
         fake_resolve_plan_context,
     )
     monkeypatch.setattr(
-        "temples.api_views_concierge.check_quota",
-        fake_check_quota,
-    )
-    monkeypatch.setattr(
-        "temples.api_views_concierge.consume_quota",
-        fake_consume_quota,
+        "temples.api_views_concierge.try_consume_quota",
+        fake_try_consume_quota,
     )
     monkeypatch.setattr(
         "temples.api_views_concierge.build_chat_candidates",
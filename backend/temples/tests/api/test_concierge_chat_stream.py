@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+from temples.models import ConciergeRecommendationLog, ConciergeThread
+
+URL = "/api/concierge/chat/"
+
+CANDIDATES = [
+    {"name": "東京大神宮", "formatted_address": "東京都千代田区富士見2-4-1", "lat": 35.6997, "lng": 139.7466},
+    {"name": "赤坂氷川神社", "formatted_address": "東京都港区赤坂6-10-12", "lat": 35.6696, "lng": 139.7363},
+]
+
+
+def _sse_events(chunks):
+    out = []
+    for chunk in chunks:
+        for block in chunk.decode("utf-8").split("\n\n"):
+            if not block.strip():
+                continue
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def _post(client, query="?stream=1", **extra):
+    return client.post(
+        URL + query,
+        data=json.dumps({"query": "縁結び", "lat": 35.68, "lng": 139.76, "candidates": CANDIDATES, **extra}),
+        content_type="application/json",
+    )
+
+
+@pytest.mark.django_db
+def test_stream_emits_stages_in_order(client, settings):
+    settings.CONCIERGE_USE_LLM = False
+    res = _post(client)
+
+    assert res.status_code == 200 and res.streaming
+    assert res["Content-Type"].startswith("text/event-stream")
+    events = _sse_events(res.streaming_content)
+
+    assert [e for e, _ in events] == ["need", "ranked", "result", "thread", "done"]
+    need, ranked, result, thread = (p for _, p in events[:4])
+    assert need["tags"] == ["love"]
+    assert 1 <= len(ranked["recommendations"]) <= 3 and ranked["provisional"] is False
+    assert all(not k.startswith("_") for r in ranked["recommendations"] for k in r)
+    assert result["ok"] is True and result["data"]["recommendations"]
+    assert ConciergeThread.objects.filter(pk=int(thread["thread_id"])).exists()
+
+
+@pytest.mark.django_db
+def test_observability_runs_after_stream_closes(client):
+    res = _post(client)
+    it = iter(res.streaming_content)
+    for _ in range(4):
+        next(it)  # need / ranked / result / thread
+    assert ConciergeRecommendationLog.objects.count() == 0
+
+    list(it)  # done → テストクライアントが close() を呼ぶ
+    assert ConciergeRecommendationLog.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_ranked_is_sent_before_llm_runs(client, settings, monkeypatch):
+    settings.CONCIERGE_USE_LLM = True
+    calls = []
+
+    from temples.llm.orchestrator import ConciergeOrchestrator
+
+    def fake_suggest(self, query, candidates):
+        calls.append(query)
+        return {"recommendations": [{"name": "赤坂氷川神社", "reason": "LLM の理由"}]}
+
+    monkeypatch.setattr(ConciergeOrchestrator, "suggest", fake_suggest)
+
+    it = iter(_post(client).streaming_content)
+    first_two = _sse_events([next(it), next(it)])
+    assert [e for e, _ in first_two] == ["need", "ranked"] and calls == []
+    assert first_two[1][1]["provisional"] is True
+
+    rest = _sse_events(list(it))
+    assert calls == ["縁結び"]
+    assert [e for e, _ in rest] == ["result", "thread", "done"]
+    assert dict(rest)["result"]["data"]["_signals"]["llm"]["used"] is True
+
+
+@pytest.mark.django_db
+def test_quota_is_consumed_once_before_streaming(client, monkeypatch):
+    from temples import api_views_concierge as views
+
+    consumed = []
+    real = views.try_consume_quota
+    monkeypatch.setattr(views, "try_consume_quota", lambda *a, **kw: consumed.append(1) or real(*a, **kw))
+
+    res = _post(client)
+    assert consumed == [1]  # 判定と消費はストリームを開く前に 1 回だけ
+
+    events = _sse_events(res.streaming_content)
+    assert consumed == [1]
+    result = dict(events)["result"]
+    assert result["remaining"] == result["limit"] - 1
+
+
+@pytest.mark.django_db
+def test_ndjson_format(client):
+    res = _post(client, query="", stream="ndjson")
+
+    assert res["Content-Type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in b"".join(res.streaming_content).decode("utf-8").splitlines()]
+    assert [x["event"] for x in lines] == ["need", "ranked", "result", "thread", "done"]
+
+
+@pytest.mark.django_db
+def test_validation_errors_are_plain_json(client):
+    res = client.post(URL + "?stream=1", data=json.dumps({"query": ""}), content_type="application/json")
+    assert res.status_code == 400 and not res.streaming
@@ -0,0 +1,126 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from temples.models import ConciergeThread
+from temples.services.concierge_history import append_chat
+from temples.services.concierge_snapshot import LEGACY_SNAPSHOT_VERSION, SNAPSHOT_VERSION
+
+
+def _rec(name: str) -> dict:
+    return {
+        "name": name,
+        "place_id": f"pid-{name}",
+        "reason": "縁結びで有名",
+        "distance_m": 1200,
+        "popular_score": 0.8,
+        "breakdown": {"score_total": 1.5},
+        "breakdown_detail": {"terms": [{"k": "need", "v": 1.0}] * 20},
+        "rank_explanation": {
+            "version": 1,
+            "primary_label_ja": "ご利益一致",
+            "contributors": [{"axis": "need", "weight": 0.5}] * 10,
+        },
+        "_reason_facts": ["縁結び"],
+        "_explanation_payload": {"long": "x" * 500},
+        "_prefilter_debug": {"dropped": 3},
+    }
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(username="detail", password="x")
+
+
+@pytest.fixture
+def client(user):
+    c = APIClient()
+    c.force_authenticate(user)
+    return c
+
+
+@pytest.mark.django_db
+def test_thread_detail_returns_compact_snapshot_by_default(user, client):
+    recs = [_rec("出雲大社"), _rec("東京大神宮")]
+    thread = append_chat(user=user, query="縁結び", reply_text="候補です", recommendations=recs).thread
+    assert thread.snapshot_version == SNAPSHOT_VERSION
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(f"/api/concierge-threads/{thread.id}/")
+    assert resp.status_code == 200
+    sqls = [q["sql"] for q in ctx.captured_queries]
+    assert len([s for s in sqls if "temples_conciergethread" in s]) == 1
+    assert len([s for s in sqls if "temples_conciergemessage" in s]) == 1
+    assert not [s for s in sqls if "recommendations_detail" in s]
+
+    body = resp.json()
+    assert body["snapshot_version"] == SNAPSHOT_VERSION
+    assert body["message_count"] == 2
+    assert body["last_message"] == "候補です"
+    assert [m["role"] for m in body["messages"]] == ["user", "assistant"]
+
+    first = body["recommendations"][0]
+    assert first["name"] == "出雲大社"
+    assert first["breakdown"] == {"score_total": 1.5}
+    assert first["reason_facts"] == ["縁結び"]
+    assert first["rank_explanation"] == {"version": 1, "primary_label_ja": "ご利益一致"}
+    assert "breakdown_detail" not in first
+    assert "_explanation_payload" not in first
+    assert body["recommendations_v2"] == body["recommendations"]
+
+
+@pytest.mark.django_db
+def test_thread_detail_opt_in_full_snapshot(user, client):
+    recs = [_rec("出雲大社")]
+    thread = append_chat(user=user, query="縁結び", recommendations=recs).thread
+
+    body = client.get(f"/api/concierge-threads/{thread.id}/", {"detail": "1"}).json()
+    assert body["recommendations"] == recs
+
+
+@pytest.mark.django_db
+def test_thread_detail_keeps_full_distinct_v2(user, client):
+    recs = [_rec("出雲大社")]
+    recs_v2 = [_rec("東京大神宮")]
+    thread = append_chat(user=user, query="縁結び", recommendations=recs, recommendations_v2=recs_v2).thread
+
+    compact = client.get(f"/api/concierge-threads/{thread.id}/").json()
+    assert compact["recommendations_v2"][0]["name"] == "東京大神宮"
+    assert "breakdown_detail" not in compact["recommendations_v2"][0]
+
+    full = client.get(f"/api/concierge-threads/{thread.id}/", {"detail": "1"}).json()
+    assert full["recommendations"] == recs
+    assert full["recommendations_v2"] == recs_v2
+
+
+@pytest.mark.django_db
+def test_thread_detail_compacts_legacy_rows(user, client):
+    recs = [_rec("明治神宮")]
+    thread = ConciergeThread.objects.create(user=user, title="old", recommendations=recs)
+    assert thread.snapshot_version == LEGACY_SNAPSHOT_VERSION
+
+    body = client.get(f"/api/concierge-threads/{thread.id}/").json()
+    assert body["snapshot_version"] == LEGACY_SNAPSHOT_VERSION
+    assert "breakdown_detail" not in body["recommendations"][0]
+    assert client.get(f"/api/concierge-threads/{thread.id}/?detail=1").json()["recommendations"] == recs
+
+    call_command("backfill_concierge_thread_stats", "--compact-snapshots")
+    thread.refresh_from_db()
+    assert thread.snapshot_version == SNAPSHOT_VERSION
+    assert thread.recommendations_detail == recs
+    assert "breakdown_detail" not in thread.recommendations[0]
+
+
+@pytest.mark.django_db
+def test_thread_detail_hides_other_owners(user):
+    thread = append_chat(user=user, query="縁結び").thread
+
+    anon = APIClient()
+    assert anon.get(f"/api/concierge-threads/{thread.id}/").status_code == 404
+
+    other = APIClient()
+    other.force_authenticate(get_user_model().objects.create_user(username="other", password="x"))
+    assert other.get(f"/api/concierge-threads/{thread.id}/").status_code == 404
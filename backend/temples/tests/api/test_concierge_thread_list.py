@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from temples.models import ConciergeMessage, ConciergeThread
+from temples.services.concierge_history import append_chat
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(username="threads", password="x")
+
+
+@pytest.fixture
+def client(user):
+    c = APIClient()
+    c.force_authenticate(user)
+    return c
+
+
+@pytest.mark.django_db
+def test_append_chat_maintains_count_and_preview(user):
+    saved = append_chat(user=user, query="縁結びの神社", reply_text="候補: 出雲大社")
+    thread = saved.thread
+    assert thread.message_count == 2
+    assert thread.last_message_preview == "候補: 出雲大社"
+
+    saved = append_chat(user=user, query="もっと近くで\n探して", thread_id=thread.id)
+    assert saved.thread.message_count == 3
+    assert saved.thread.last_message_preview == "もっと近くで 探して"
+    assert ConciergeMessage.objects.filter(thread=thread).count() == 3
+
+
+@pytest.mark.django_db
+def test_thread_list_is_one_query_with_keyset_pages(user, client):
+    base = timezone.now() - timedelta(days=1)
+    threads = []
+    for i in range(5):
+        threads.append(append_chat(user=user, query=f"相談{i}", reply_text=f"返答{i}").thread)
+    # 同時刻の 2 件を含めて順序を固定する
+    for i, t in enumerate(threads):
+        ConciergeThread.objects.filter(pk=t.pk).update(last_message_at=base + timedelta(minutes=i // 2 * 10))
+
+    other = get_user_model().objects.create_user(username="other", password="x")
+    append_chat(user=other, query="他人の相談")
+
+    expected = list(
+        ConciergeThread.objects.filter(user=user).order_by("-last_message_at", "-id").values_list("id", flat=True)
+    )
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        with CaptureQueriesContext(connection) as ctx:
+            resp = client.get("/api/concierge-threads/", params)
+        assert resp.status_code == 200
+        thread_selects = [q for q in ctx.captured_queries if "temples_conciergethread" in q["sql"]]
+        assert len(thread_selects) == 1
+        assert not [q for q in ctx.captured_queries if "temples_conciergemessage" in q["sql"]]
+
+        body = resp.json()
+        seen.extend(r["id"] for r in body["results"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == expected
+    first = client.get("/api/concierge-threads/").json()["results"][0]
+    assert first["message_count"] == 2
+    assert first["last_message"].startswith("返答")
+
+
+@pytest.mark.django_db
+def test_thread_list_rejects_bad_cursor(client):
+    assert client.get("/api/concierge-threads/", {"cursor": "not-a-cursor"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_backfill_command_recomputes_stats(user):
+    thread = ConciergeThread.objects.create(user=user, title="old")
+    t0 = timezone.now() - timedelta(hours=2)
+    ConciergeMessage.objects.create(thread=thread, role="user", content="古い相談", created_at=t0)
+    ConciergeMessage.objects.create(
+        thread=thread, role="assistant", content="古い返答", created_at=t0 + timedelta(minutes=1)
+    )
+    empty = ConciergeThread.objects.create(user=user, title="empty")
+    ConciergeThread.objects.filter(pk=empty.pk).update(last_message_at=None)
+
+    call_command("backfill_concierge_thread_stats", "--batch-size", "1")
+
+    thread.refresh_from_db()
+    empty.refresh_from_db()
+    assert thread.message_count == 2
+    assert thread.last_message_preview == "古い返答"
+    assert thread.last_message_at == t0 + timedelta(minutes=1)
+    assert empty.message_count == 0
+    assert empty.last_message_preview == ""
+    assert empty.last_message_at == empty.created_at
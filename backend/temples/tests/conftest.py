@@ -12,7 +12,7 @@ from django.conf import settings as dj_settings
 from django.db.models.signals import pre_save
 from rest_framework.test import APIClient
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import caches
 
 
 
@@ -332,6 +332,29 @@ def _force_dummy_route_provider(monkeypatch, settings):
 
 @pytest.fixture(autouse=True)
 def _clear_cache_between_tests():
-    cache.clear()
+    # places / route / throttle / lock の名前空間 alias と、プロセス内 L1 もまとめて消す
+    from temples.services.tiered_cache import clear_local_tiers
+
+    for c in caches.all():
+        c.clear()
+    clear_local_tiers()
+    yield
+    for c in caches.all():
+        c.clear()
+    clear_local_tiers()
+
+
+# Places 写真の置き場はテストごとの一時ディレクトリに
+@pytest.fixture(autouse=True)
+def _isolated_place_assets(settings, tmp_path):
+    settings.PLACE_ASSET_ROOT = str(tmp_path / "place-assets")
+
+
+# 上流のブレーカ状態をテスト間で持ち越さない
+@pytest.fixture(autouse=True)
+def _reset_upstream_breakers():
+    from temples import upstream
+
+    upstream.reset_breakers()
     yield
-    cache.clear()
+    upstream.reset_breakers()
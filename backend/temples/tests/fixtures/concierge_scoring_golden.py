@@ -0,0 +1,611 @@
+# backend/temples/tests/fixtures/concierge_scoring_golden.py
+"""
+concierge chat のスコア計算の golden。
+バッチスコアラ導入前の _attach_breakdown（行ごとの実装）で出した breakdown / breakdown_detail /
+_score_total を固定したもの。スコア計算を変えたら差分を確認したうえで作り直すこと。
+"""
+
+
+def scoring_pool():
+    return [
+        {
+            "shrine_id": 1,
+            "name": "学業神社",
+            "astro_tags": ["study"],
+            "astro_elements": ["fire", ""],
+            "goriyaku": "学業成就・合格祈願",
+            "description": "",
+            "goriyaku_tag_ids": [],
+            "popular_score": 8,
+            "distance_m": 1200,
+        },
+        {
+            "shrine_id": 2,
+            "name": "厄除神社",
+            "astro_tags": [],
+            "astro_elements": ["water"],
+            "goriyaku": "厄除",
+            "description": "静かな杜",
+            "goriyaku_tag_ids": [2],
+            "popular_score": 15,
+            "distance_m": None,
+        },
+        {
+            "shrine_id": 3,
+            "name": "素材なし神社",
+            "astro_tags": None,
+            "goriyaku": "",
+            "description": "",
+            "popular_score": "x",
+            "distance_m": "bad",
+        },
+    ]
+
+
+GOLDEN_CASES = [
+    {
+        "public_mode": "need",
+        "birthdate": None,
+        "need_tags": ["study", "mental", "protection"],
+        "expected": [
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 1,
+                    "score_popular": 0.8,
+                    "score_total": 0.38,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": ["study"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 1,
+                            "rank_raw": 9,
+                            "rank_weighted": 10.2,
+                            "weight": 0.3,
+                            "matched_tags": ["study"],
+                            "matched_by_tag_count": 1,
+                            "matched_by_text_count": 1,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.3,
+                            "rank_contribution": 2.6999999999999997,
+                            "rank_weighted_contribution": 3.0599999999999996,
+                        },
+                        "popular": {"raw": 0.8, "weight": 0.1, "contribution": 0.08000000000000002},
+                        "distance": {
+                            "raw": 0.6187833918061408,
+                            "weight": 0.35,
+                            "contribution": 0.2165741871321493,
+                        },
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 3.356574187132149,
+                    },
+                },
+                "_score_total": 3.356574187132149,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 2,
+                    "score_popular": 1.0,
+                    "score_total": 0.7,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": ["mental", "protection"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 2,
+                            "rank_raw": 5,
+                            "rank_weighted": 5.6,
+                            "weight": 0.3,
+                            "matched_tags": ["mental", "protection"],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 1,
+                            "matched_by_gid_count": 1,
+                            "contribution": 0.6,
+                            "rank_contribution": 1.5,
+                            "rank_weighted_contribution": 1.68,
+                        },
+                        "popular": {"raw": 1.0, "weight": 0.1, "contribution": 0.1},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 1.78,
+                    },
+                },
+                "_score_total": 1.78,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.3,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.0, "weight": 0.1, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+        ],
+    },
+    {
+        "public_mode": "need",
+        "birthdate": "1994-04-01",
+        "need_tags": ["study", "protection"],
+        "expected": [
+            {
+                "breakdown": {
+                    "score_element": 2,
+                    "score_need": 1,
+                    "score_popular": 0.8,
+                    "score_total": 1.58,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": ["study"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 2, "weight": 0.6, "contribution": 1.2},
+                        "need": {
+                            "raw": 1,
+                            "rank_raw": 9,
+                            "rank_weighted": 10.2,
+                            "weight": 0.3,
+                            "matched_tags": ["study"],
+                            "matched_by_tag_count": 1,
+                            "matched_by_text_count": 1,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.3,
+                            "rank_contribution": 2.6999999999999997,
+                            "rank_weighted_contribution": 3.0599999999999996,
+                        },
+                        "popular": {"raw": 0.8, "weight": 0.1, "contribution": 0.08000000000000002},
+                        "distance": {
+                            "raw": 0.6187833918061408,
+                            "weight": 0.35,
+                            "contribution": 0.2165741871321493,
+                        },
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 4.556574187132149,
+                    },
+                },
+                "_score_total": 4.556574187132149,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 1,
+                    "score_popular": 1.0,
+                    "score_total": 0.4,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": ["protection"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 1,
+                            "rank_raw": 2,
+                            "rank_weighted": 2.0,
+                            "weight": 0.3,
+                            "matched_tags": ["protection"],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 1,
+                            "contribution": 0.3,
+                            "rank_contribution": 0.6,
+                            "rank_weighted_contribution": 0.6,
+                        },
+                        "popular": {"raw": 1.0, "weight": 0.1, "contribution": 0.1},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.7,
+                    },
+                },
+                "_score_total": 0.7,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.3,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.0, "weight": 0.1, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+        ],
+    },
+    {
+        "public_mode": "compat",
+        "birthdate": "1994-04-01",
+        "need_tags": ["study", "mental", "protection"],
+        "expected": [
+            {
+                "breakdown": {
+                    "score_element": 2,
+                    "score_need": 1,
+                    "score_popular": 0.8,
+                    "score_total": 2.4,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": ["study"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 2, "weight": 0.8, "contribution": 1.6},
+                        "need": {
+                            "raw": 1,
+                            "rank_raw": 9,
+                            "rank_weighted": 10.2,
+                            "weight": 0.2,
+                            "matched_tags": ["study"],
+                            "matched_by_tag_count": 1,
+                            "matched_by_text_count": 1,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.2,
+                            "rank_contribution": 1.8,
+                            "rank_weighted_contribution": 2.04,
+                        },
+                        "popular": {"raw": 0.8, "weight": 0.0, "contribution": 0.0},
+                        "distance": {
+                            "raw": 0.6187833918061408,
+                            "weight": 0.15,
+                            "contribution": 0.09281750877092113,
+                        },
+                        "astro_bonus": 0.6,
+                        "score_total_ranked": 4.332817508770921,
+                    },
+                },
+                "_score_total": 4.332817508770921,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 2,
+                    "score_popular": 1.0,
+                    "score_total": 0.4,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": ["mental", "protection"],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.8, "contribution": 0.0},
+                        "need": {
+                            "raw": 2,
+                            "rank_raw": 5,
+                            "rank_weighted": 5.6,
+                            "weight": 0.2,
+                            "matched_tags": ["mental", "protection"],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 1,
+                            "matched_by_gid_count": 1,
+                            "contribution": 0.4,
+                            "rank_contribution": 1.0,
+                            "rank_weighted_contribution": 1.1199999999999999,
+                        },
+                        "popular": {"raw": 1.0, "weight": 0.0, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.15, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 1.1199999999999999,
+                    },
+                },
+                "_score_total": 1.1199999999999999,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.8, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.2,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.0, "weight": 0.0, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.15, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+        ],
+    },
+    {
+        "public_mode": "compat",
+        "birthdate": None,
+        "need_tags": [],
+        "expected": [
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.8,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.8, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.2,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.8, "weight": 0.0, "contribution": 0.0},
+                        "distance": {
+                            "raw": 0.6187833918061408,
+                            "weight": 0.15,
+                            "contribution": 0.09281750877092113,
+                        },
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.09281750877092113,
+                    },
+                },
+                "_score_total": 0.09281750877092113,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 1.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.8, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.2,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 1.0, "weight": 0.0, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.15, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.8, "need": 0.2, "popular": 0.0},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.8, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.2,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.0, "weight": 0.0, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.15, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+        ],
+    },
+    {
+        "public_mode": "need",
+        "birthdate": "1988-11-20",
+        "need_tags": ["love", "money"],
+        "expected": [
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.8,
+                    "score_total": 0.08000000000000002,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.3,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.8, "weight": 0.1, "contribution": 0.08000000000000002},
+                        "distance": {
+                            "raw": 0.6187833918061408,
+                            "weight": 0.35,
+                            "contribution": 0.2165741871321493,
+                        },
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.29657418713214934,
+                    },
+                },
+                "_score_total": 0.29657418713214934,
+            },
+            {
+                "breakdown": {
+                    "score_element": 2,
+                    "score_need": 0,
+                    "score_popular": 1.0,
+                    "score_total": 1.3,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 2, "weight": 0.6, "contribution": 1.2},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.3,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 1.0, "weight": 0.1, "contribution": 0.1},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 1.3,
+                    },
+                },
+                "_score_total": 1.3,
+            },
+            {
+                "breakdown": {
+                    "score_element": 0,
+                    "score_need": 0,
+                    "score_popular": 0.0,
+                    "score_total": 0.0,
+                    "weights": {"element": 0.6, "need": 0.3, "popular": 0.1},
+                    "matched_need_tags": [],
+                },
+                "breakdown_detail": {
+                    "version": 1,
+                    "features": {
+                        "element": {"raw": 0, "weight": 0.6, "contribution": 0.0},
+                        "need": {
+                            "raw": 0,
+                            "rank_raw": 0,
+                            "rank_weighted": 0.0,
+                            "weight": 0.3,
+                            "matched_tags": [],
+                            "matched_by_tag_count": 0,
+                            "matched_by_text_count": 0,
+                            "matched_by_gid_count": 0,
+                            "contribution": 0.0,
+                            "rank_contribution": 0.0,
+                            "rank_weighted_contribution": 0.0,
+                        },
+                        "popular": {"raw": 0.0, "weight": 0.1, "contribution": 0.0},
+                        "distance": {"raw": 0.0, "weight": 0.35, "contribution": 0.0},
+                        "astro_bonus": 0.0,
+                        "score_total_ranked": 0.0,
+                    },
+                },
+                "_score_total": 0.0,
+            },
+        ],
+    },
+]
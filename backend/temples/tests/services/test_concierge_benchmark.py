@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from temples.services.concierge_benchmark import (
+    compare_reports,
+    load_query_corpus,
+    load_seed_candidates,
+    ndcg_at_k,
+    recall_at_k,
+    run_benchmark,
+    synthesize_pool,
+)
+
+
+def test_recall_and_ndcg_at_k():
+    relevant = ["A", "B", "C", "D"]
+
+    assert recall_at_k(["A", "x", "B"], relevant, 3) == pytest.approx(2 / 3)
+    assert recall_at_k(["x", "y", "z"], relevant, 3) == 0
+    assert recall_at_k(["A"], [], 3) is None
+
+    assert ndcg_at_k(["A", "B", "C"], relevant, 3) == pytest.approx(1.0)
+    # 同じ 1 件ヒットでも上位ほど高い
+    assert ndcg_at_k(["A", "x", "y"], relevant, 3) > ndcg_at_k(["x", "y", "A"], relevant, 3)
+
+
+def test_synthesize_pool_is_deterministic_and_keeps_seed_first():
+    seed = load_seed_candidates()
+    assert len(seed) >= 80
+
+    pool = synthesize_pool(seed, 300, rng_seed=7)
+    assert len(pool) == 300
+    assert [c["name"] for c in pool[: len(seed)]] == [c["name"] for c in seed]
+    assert len({c["place_id"] for c in pool}) == 300
+    assert not {c["name"] for c in pool[len(seed) :]} & {c["name"] for c in seed}
+    assert pool == synthesize_pool(seed, 300, rng_seed=7)
+
+    assert len(synthesize_pool(seed, 10)) == 10
+
+
+@pytest.mark.django_db
+def test_run_benchmark_reports_speed_and_quality():
+    cases = load_query_corpus()[:3]
+    report = run_benchmark(
+        cases=cases,
+        seed_candidates=load_seed_candidates(),
+        pool_sizes=[80, 150],
+        repeats=1,
+        warmup=0,
+        measure_alloc=True,
+    )
+
+    assert set(report["pools"]) == {"80", "150"}
+    pool = report["pools"]["150"]
+    assert pool["pool_size"] == 150
+    assert pool["runs"] == 3
+    assert pool["throughput_qps"] > 0
+    assert pool["latency_ms"]["p95"] >= pool["latency_ms"]["p50"] > 0
+    assert {"reco.route", "reco.score", "reco.sort"} <= set(pool["stages_ms"])
+    assert pool["alloc"]["peak_kib"]["p95"] > 0
+    assert pool["quality"]["need_accuracy"] == 1.0
+    assert 0.0 <= pool["quality"]["recall@k"] <= 1.0
+    assert [c["id"] for c in pool["cases"]] == [c.id for c in cases]
+
+    rows = compare_reports(report, report)
+    assert rows and all(r["delta"] in (0, None) for r in rows)
+
+
+@pytest.mark.django_db
+def test_benchmark_command_writes_json(tmp_path):
+    out = tmp_path / "bench.json"
+    call_command(
+        "benchmark_concierge_ranking",
+        "--pool-sizes",
+        "80",
+        "--repeats",
+        "1",
+        "--warmup",
+        "0",
+        "--no-alloc",
+        "--output",
+        str(out),
+    )
+
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert report["config"]["pool_sizes"] == [80]
+    assert report["pools"]["80"]["alloc"] is None
+    assert report["pools"]["80"]["queries"] == len(load_query_corpus())
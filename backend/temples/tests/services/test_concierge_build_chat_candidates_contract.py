@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from temples.models import PlaceRef, Shrine
+from temples.models import GoriyakuTag, PlaceRef, Shrine
 from temples.services.concierge_chat_candidates import build_chat_candidates
 
 
@@ -188,3 +190,98 @@ def test_candidates_are_sorted_by_popular_score_desc(shrine_factory):
     names = [c["name"] for c in cands]
 
     assert names.index("人気高") < names.index("人気低")
+
+
+def _seed_tagged_shrines(n: int, tags) -> None:
+    for i in range(n):
+        s = Shrine.objects.create(
+            name_jp=f"母集団神社{i}",
+            address="東京都千代田区",
+            latitude=35.0 + i * 0.001,
+            longitude=139.0,
+            popular_score=float(i),
+            place_ref=PlaceRef.objects.create(place_id=f"pid_{i}", name=f"p{i}", address="x"),
+        )
+        s.goriyaku_tags.add(*tags)
+
+
+def _count_candidate_queries(limit: int) -> tuple[int, list]:
+    with CaptureQueriesContext(connection) as ctx:
+        cands = build_chat_candidates(lat=35.0, lng=139.0, limit=limit, trace_id="test")
+    return len(ctx.captured_queries), cands
+
+
+@pytest.mark.django_db
+def test_candidate_loader_query_count_is_constant():
+    """
+    候補ロードのクエリ数は母集団サイズに依らず一定（N+1 にならない）。
+    """
+    tags = [
+        GoriyakuTag.objects.create(name="縁結び", category="ご利益"),
+        GoriyakuTag.objects.create(name="厄除け", category="ご利益"),
+    ]
+    _seed_tagged_shrines(60, tags)
+
+    small_n, small = _count_candidate_queries(limit=1)
+    large_n, large = _count_candidate_queries(limit=20)
+
+    assert len(small) == 1 and len(large) == 20
+    assert small_n == large_n
+    # 近傍ティア + 人気ティア + タグ集約
+    assert large_n <= 3
+    assert all(c["place_id"] for c in large)
+    assert all(c["goriyaku_tag_ids"] == [t.id for t in sorted(tags, key=lambda t: t.name)] for c in large)
+
+
+@pytest.mark.django_db
+def test_candidates_tag_filter_keeps_all_tag_ids(shrine_factory):
+    """
+    goriyaku_tag_ids で絞っても、候補の goriyaku_tag_ids は神社の全タグを返す。
+    """
+    love = GoriyakuTag.objects.create(name="縁結び", category="ご利益")
+    money = GoriyakuTag.objects.create(name="金運", category="ご利益")
+    hit = shrine_factory(name="両方神社", latitude=35.0, longitude=139.0)
+    hit.goriyaku_tags.add(love, money)
+    miss = shrine_factory(name="金運神社", latitude=35.0, longitude=139.0)
+    miss.goriyaku_tags.add(money)
+
+    cands = build_chat_candidates(lat=35.0, lng=139.0, goriyaku_tag_ids=[love.id], trace_id="test")
+
+    assert [c["name"] for c in cands] == ["両方神社"]
+    assert sorted(cands[0]["goriyaku_tag_ids"]) == sorted([love.id, money.id])
+
+
+@pytest.mark.django_db
+def test_candidates_include_nearby_low_popularity_shrine(shrine_factory):
+    """
+    座標ありの場合、人気上位に入らない近所の神社も近傍ティアから候補に入る。
+    """
+    for i in range(80):
+        shrine_factory(name=f"遠方人気{i}", latitude=34.0, longitude=135.0, popular_score=100 + i)
+    shrine_factory(name="近所神社", latitude=35.001, longitude=139.001, popular_score=0)
+
+    cands = build_chat_candidates(lat=35.0, lng=139.0, limit=5, trace_id="test")
+
+    assert cands[0]["name"] == "近所神社"
+    assert 0 < cands[0]["distance_m"] < 500
+    # 半径内が 1 件しかなくても人気ティアで埋まる
+    assert len(cands) == 5
+
+
+@pytest.mark.django_db
+def test_popular_tier_keeps_reserved_slots_when_radius_is_full(shrine_factory):
+    """
+    半径内だけで limit 件を超えても、人気ティアの枠は近傍で押し出されない。
+    """
+    for i in range(30):
+        shrine_factory(name=f"近所{i}", latitude=35.0 + i * 0.0005, longitude=139.0, popular_score=0)
+    for i in range(3):
+        shrine_factory(name=f"遠方人気{i}", latitude=34.0, longitude=135.0, popular_score=100 + i)
+
+    cands = build_chat_candidates(lat=35.0, lng=139.0, limit=8, trace_id="test")
+    names = [c["name"] for c in cands]
+
+    assert len(cands) == 8
+    # 8 * 0.25 = 2 枠。人気の高い順
+    assert [n for n in names if n.startswith("遠方")] == ["遠方人気2", "遠方人気1"]
+    assert names[:6] == [f"近所{i}" for i in range(6)]
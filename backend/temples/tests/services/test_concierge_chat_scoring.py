@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from temples.services.concierge_chat_ranking import _attach_breakdown, _resolve_mode_weights
+from temples.services.concierge_chat_scoring import attach_breakdowns
+from temples.tests.fixtures.concierge_scoring_golden import GOLDEN_CASES, scoring_pool
+
+
+def _frozen(rec):
+    return {k: rec[k] for k in ("breakdown", "breakdown_detail", "_score_total") if k in rec}
+
+
+@pytest.mark.parametrize("case", GOLDEN_CASES, ids=lambda c: f"{c['public_mode']}-{','.join(c['need_tags']) or 'none'}")
+def test_breakdowns_match_pre_batch_golden(case):
+    weights = _resolve_mode_weights(public_mode=case["public_mode"], flow="A", weights=None)
+    kwargs = dict(
+        birthdate=case["birthdate"],
+        need_tags=case["need_tags"],
+        weights=weights,
+        astro_bonus_enabled=case["public_mode"] == "compat",
+    )
+
+    batch = scoring_pool()
+    attach_breakdowns(batch, **kwargs)
+    assert [_frozen(r) for r in batch] == case["expected"]
+
+    single = scoring_pool()
+    for rec in single:
+        _attach_breakdown(rec, **kwargs)
+    assert [_frozen(r) for r in single] == case["expected"]
+
+
+def test_batch_scores_are_row_aligned_arrays():
+    weights = _resolve_mode_weights(public_mode="need", flow="A", weights=None)
+    pool = scoring_pool()
+
+    scores = attach_breakdowns(
+        pool + ["not-a-dict"],  # type: ignore[list-item]
+        birthdate=None,
+        need_tags=["study", "protection"],
+        weights=weights,
+        astro_bonus_enabled=False,
+    )
+
+    assert scores.score_total_ranked.shape == (3,)
+    assert [r["_score_total"] for r in pool] == scores.score_total_ranked.tolist()
+    assert [r["breakdown"]["score_need"] for r in pool] == [1, 1, 0]
+
+    # study の text 一致 + 学業ヒントのボーナス
+    need = pool[0]["breakdown_detail"]["features"]["need"]
+    assert need["rank_raw"] == 2 + 3 + 3 + 1
+    # protection は goriyaku_tag_ids 経由で一致
+    assert pool[1]["breakdown"]["matched_need_tags"] == ["protection"]
+    assert pool[1]["breakdown"]["score_popular"] == 1.0
+    assert pool[2]["breakdown_detail"]["features"]["distance"]["raw"] == 0.0
@@ -4,6 +4,7 @@ import os
 import pytest
 
 from temples.services import concierge_plan as plan
+from temples.services import places as places_svc
 
 
 @pytest.mark.parametrize(
@@ -27,7 +28,7 @@ def test_plan_places_budget_respects_plan_max_place_lookups(monkeypatch, max_loo
         # 座標は返さない（got_coords が立たない状態で上限まで叩かせる）
         return {"candidates": [{"geometry": {"location": {}}}]}
 
-    monkeypatch.setattr(plan.Places, "findplacefromtext", fake_findplacefromtext)
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake_findplacefromtext)
 
     filled = {
         "recommendations": [
@@ -68,7 +69,7 @@ def test_plan_places_budget_stops_after_getting_one_coord(monkeypatch):
         # ここに来たらおかしい（止まってない）
         return {"candidates": [{"geometry": {"location": {"lat": 0.0, "lng": 0.0}}}]}
 
-    monkeypatch.setattr(plan.Places, "findplacefromtext", fake_findplacefromtext)
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake_findplacefromtext)
 
     filled = {
         "recommendations": [
@@ -97,7 +98,7 @@ def test_plan_places_budget_disable_places_skips_all(monkeypatch):
         calls["n"] += 1
         return {"candidates": [{"geometry": {"location": {"lat": 1.0, "lng": 1.0}}}]}
 
-    monkeypatch.setattr(plan.Places, "findplacefromtext", fake_findplacefromtext)
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake_findplacefromtext)
 
     out = plan._apply_cost_guarded_place_enrichment(
         filled={"recommendations": [{"name": "神社A"}]},
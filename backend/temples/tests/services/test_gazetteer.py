@@ -0,0 +1,63 @@
+import pytest
+from django.core.management import call_command
+
+from temples.geocoding import gazetteer
+from temples.geocoding.gazetteer import Gazetteer, GazetteerError, build_index, load_source
+
+
+@pytest.fixture(scope="module")
+def gz():
+    return Gazetteer(build_index(load_source()))
+
+
+def test_lookup_names_aliases_and_derived_keys(gz):
+    tokyo = gz.lookup("東京都")
+    assert tokyo.kind == "prefecture" and tokyo.point == pytest.approx((35.6895, 139.6917))
+    assert gz.lookup("東京") == tokyo  # 接尾辞なしの派生キー
+    assert gz.lookup("東京都港区").name == "港区"
+    assert gz.lookup("港区").pref == "東京都"
+    assert gz.lookup("梅田").name == "大阪駅"
+    assert gz.lookup(" 渋谷駅 周辺 ").name == "渋谷駅"
+    assert gz.lookup("京都").kind == "city"  # 別名は派生キーより優先
+
+
+def test_lookup_is_exact_not_partial(gz):
+    assert gz.lookup("港区赤坂") is None
+    assert gz.lookup("") is None
+    assert gz.lookup("存在しない町") is None
+
+
+def test_prefix_returns_shortest_keys_first(gz):
+    names = [e.name for e in gz.prefix("新宿", limit=5)]
+    assert names[0] == "新宿駅"  # 「新宿」は新宿駅の別名
+    assert "新宿区" in names
+    assert gz.prefix("x-none") == []
+
+
+def test_bbox_contains_point(gz):
+    for area in ("北海道", "鎌倉市", "東京駅"):
+        e = gz.lookup(area)
+        s, w, n, east = e.bbox
+        assert s < e.lat < n and w < e.lng < east
+    assert gz.lookup("北海道").radius_m > gz.lookup("鎌倉市").radius_m > gz.lookup("東京駅").radius_m
+
+
+def test_rejects_corrupt_index():
+    with pytest.raises(GazetteerError):
+        Gazetteer(b"nope")
+    blob = build_index(load_source())
+    with pytest.raises(GazetteerError):
+        Gazetteer(blob[:-1])
+
+
+def test_build_command_writes_mmapped_index(tmp_path, settings):
+    out = tmp_path / "gz.idx"
+    settings.GAZETTEER_INDEX_PATH = str(out)
+    try:
+        call_command("build_gazetteer")
+        g = gazetteer.get_gazetteer()
+        assert out.exists()
+        assert len(g) == len(load_source())
+        assert g.lookup("伊勢").name == "伊勢市"
+    finally:
+        gazetteer.reset_gazetteer()
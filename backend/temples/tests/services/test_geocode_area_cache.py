@@ -0,0 +1,96 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from temples.geocoding import area_cache
+from temples.geocoding.area_cache import geocode_area_point, normalize_area
+
+
+class _R:
+    def __init__(self, payload):
+        self._p = payload
+
+    def json(self):
+        return self._p
+
+    def raise_for_status(self):
+        return None
+
+
+@pytest.fixture
+def upstream(monkeypatch, settings):
+    settings.GOOGLE_MAPS_API_KEY = "dummy"
+    calls = []
+    state = {"payload": {"status": "OK", "results": [{"geometry": {"location": {"lat": 35.671, "lng": 139.736}}}]}}
+
+    def fake_get(url, params=None, timeout=None, **kw):
+        calls.append(params.get("address"))
+        if state.get("delay"):
+            time.sleep(state["delay"])
+        if state.get("error"):
+            raise ConnectionError("boom")
+        return _R(state["payload"])
+
+    monkeypatch.setattr("temples.geocoding.client._shared_session", lambda: SimpleNamespace(get=fake_get))
+    return SimpleNamespace(calls=calls, state=state)
+
+
+def test_normalize_area_folds_width_spaces_and_suffixes():
+    assert normalize_area(" 港区　赤坂 周辺 ") == "港区赤坂"
+    assert normalize_area("ＳＨＩＢＵＹＡ付近") == "shibuya"
+    assert normalize_area("周辺") == "周辺"
+    assert normalize_area("") == ""
+
+
+def test_gazetteer_areas_skip_upstream(upstream):
+    assert geocode_area_point("渋谷駅あたり") == geocode_area_point("渋谷")
+    assert geocode_area_point("東京都") == pytest.approx((35.6895, 139.6917))
+    assert geocode_area_point("梅田周辺") is not None
+    assert upstream.calls == []
+    assert area_cache.geocode_area_stats()["gazetteer_hits"] >= 4
+
+
+def test_positive_result_is_cached_across_spellings(upstream):
+    assert geocode_area_point("港区赤坂") == (35.671, 139.736)
+    assert geocode_area_point("港区　赤坂 周辺") == (35.671, 139.736)
+    assert upstream.calls == ["港区赤坂"]
+
+
+def test_zero_results_cached_with_short_ttl(upstream, monkeypatch):
+    upstream.state["payload"] = {"status": "ZERO_RESULTS", "results": []}
+    stored = []
+    real_store = area_cache._tier._store
+    monkeypatch.setattr(
+        area_cache._tier, "_store", lambda k, v, ttl, st: stored.append(ttl) or real_store(k, v, ttl, st)
+    )
+
+    assert geocode_area_point("存在しない町") is None
+    assert geocode_area_point("存在しない町") is None
+    assert upstream.calls == ["存在しない町"]
+    assert stored == [area_cache.GEOCODE_AREA_NEGATIVE_TTL]
+
+
+def test_transient_errors_are_not_cached(upstream):
+    upstream.state["error"] = True
+    assert geocode_area_point("港区赤坂") is None
+    upstream.state["error"] = False
+    assert geocode_area_point("港区赤坂") == (35.671, 139.736)
+    assert len(upstream.calls) == 2
+
+
+def test_concurrent_lookups_are_coalesced(upstream):
+    upstream.state["delay"] = 0.2
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(geocode_area_point("港区赤坂"))) for _ in range(5)
+    ]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+
+    assert results == [(35.671, 139.736)] * 5
+    assert upstream.calls == ["港区赤坂"]
+    assert area_cache.geocode_area_stats()["coalesced"] >= 1
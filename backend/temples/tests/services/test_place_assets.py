@@ -0,0 +1,160 @@
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from temples.models import PlacePhotoAsset, PlaceRef
+from temples.services import asset_store
+from temples.services import places as places_svc
+from temples.services.tiered_cache import clear_local_tiers
+
+
+def _jpeg(width=800, height=600):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def _drop_details_cache():
+    clear_local_tiers()
+    places_svc.cache.clear()
+
+
+def _body(resp):
+    return b"".join(resp.streaming_content) if resp.streaming else resp.content
+
+
+def test_put_blob_is_write_once_and_content_addressed(tmp_path, settings):
+    settings.PLACE_ASSET_ROOT = str(tmp_path)
+    a = asset_store.put_blob(b"same-bytes", "image/jpeg")
+    b = asset_store.put_blob(b"same-bytes", "image/jpeg")
+
+    assert a == b and a.name.startswith(f"{a.sha256[:2]}/{a.sha256[2:4]}/")
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [f"{a.sha256}.jpg"]
+    assert asset_store.read_blob(a) == b"same-bytes"
+
+
+@pytest.mark.django_db
+def test_photo_ingest_creates_variants_and_serves_narrow_widths_locally():
+    with patch("temples.services.google_places.photo", return_value=(_jpeg(), "image/jpeg; charset=binary")) as up:
+        original = places_svc.places_photo_asset("REF", 800)
+        small = places_svc.places_photo_asset("REF", 320)
+        again = places_svc.places_photo_asset("REF", 800)
+
+    assert up.call_count == 1
+    assert original == again and original.width == 800 and original.content_type == "image/jpeg"
+    assert small.width == 320 and small.height == 240
+    assert set(PlacePhotoAsset.objects.values_list("max_width", "is_variant")) == {
+        (800, False),
+        (640, True),
+        (320, True),
+    }
+
+
+@pytest.mark.django_db
+def test_photo_endpoint_etag_and_range():
+    data = _jpeg(400, 300)
+    client = APIClient()
+    with patch("temples.services.google_places.photo", return_value=(data, "image/jpeg")):
+        r1 = client.get("/api/places/photo/", {"photo_reference": "R", "maxwidth": 400})
+
+    assert r1.status_code == 200 and _body(r1) == data
+    etag = r1["ETag"]
+    assert r1["Accept-Ranges"] == "bytes"
+    assert r1["Cache-Control"].startswith("public, max-age=")
+
+    r2 = client.get("/api/places/photo/", {"photo_reference": "R", "maxwidth": 400}, HTTP_IF_NONE_MATCH=etag)
+    assert r2.status_code == 304 and r2["ETag"] == etag
+
+    r3 = client.get("/api/places/photo/", {"photo_reference": "R", "maxwidth": 400}, HTTP_RANGE="bytes=10-19")
+    assert r3.status_code == 206
+    assert r3["Content-Range"] == f"bytes 10-19/{len(data)}"
+    assert _body(r3) == data[10:20]
+
+    r4 = client.get("/api/places/photo/", {"photo_reference": "R", "maxwidth": 400}, HTTP_RANGE=f"bytes={len(data)}-")
+    assert r4.status_code == 416
+
+
+@pytest.mark.django_db
+def test_non_image_upstream_is_rejected():
+    with patch("temples.services.google_places.photo", return_value=(b"<html>", "text/html")):
+        with pytest.raises(places_svc.PlacesError):
+            places_svc.places_photo_asset("BAD", 800)
+    assert not PlacePhotoAsset.objects.exists()
+
+
+@pytest.mark.django_db
+def test_details_served_from_fresh_snapshot_and_written_through():
+    result = {"place_id": "P1", "name": "赤坂氷川神社", "formatted_address": "港区", "geometry": {"location": {"lat": 35.67, "lng": 139.73}}}
+    with patch("temples.services.google_places.details", return_value={"status": "OK", "result": result}) as up:
+        first = places_svc.places_details("P1", None)
+        _drop_details_cache()
+        second = places_svc.places_details("P1", {"fields": "name,geometry"})
+
+    assert up.call_count == 1
+    assert first["name"] == second["name"] == "赤坂氷川神社"
+    assert set(second) == {"name", "geometry"}
+    pr = PlaceRef.objects.get(pk="P1")
+    assert pr.latitude == 35.67 and pr.snapshot_hash
+
+
+@pytest.mark.django_db
+def test_details_refetch_when_stale_and_fallback_on_upstream_error():
+    old = timezone.now() - timedelta(days=30)
+    PlaceRef.objects.create(place_id="P2", name="古い", snapshot_json={"place_id": "P2", "name": "古い"}, synced_at=old)
+
+    with patch("temples.services.google_places.details", return_value={"status": "OK", "result": {"place_id": "P2", "name": "新しい"}}):
+        assert places_svc.places_details("P2", None)["name"] == "新しい"
+
+    PlaceRef.objects.filter(pk="P2").update(synced_at=old)
+    _drop_details_cache()
+    with patch("temples.services.google_places.details", side_effect=RuntimeError("down")):
+        assert places_svc.places_details("P2", None)["name"] == "新しい"
+
+
+@pytest.mark.django_db
+def test_details_cache_hit_skips_snapshot_query():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    result = {"place_id": "P3", "name": "日枝神社", "formatted_address": "千代田区"}
+    with patch("temples.services.google_places.details", return_value={"status": "OK", "result": result}) as up:
+        places_svc.places_details("P3", None)
+        with CaptureQueriesContext(connection) as ctx:
+            again = places_svc.places_details("P3", None)
+
+    assert up.call_count == 1 and again["name"] == "日枝神社"
+    assert ctx.captured_queries == []
+
+
+class _RemoteStorage:
+    def path(self, name):
+        raise NotImplementedError
+
+    def url(self, name):
+        return f"https://assets.example.com/{name}"
+
+    def exists(self, name):
+        raise AssertionError("remote storage must not be probed per request")
+
+
+@pytest.mark.django_db
+def test_remote_storage_trusts_row_and_redirects(monkeypatch):
+    from django.test import RequestFactory
+
+    monkeypatch.setattr(asset_store, "asset_storage", lambda: (_RemoteStorage(), "place-assets/"))
+    sha = "ab" * 32
+    PlacePhotoAsset.objects.create(
+        ref_key=places_svc._photo_ref_key("REF", 400), max_width=400, sha256=sha, content_type="image/jpeg", size=10
+    )
+
+    asset = places_svc.places_photo_asset("REF", 400)
+    resp = asset_store.asset_response(RequestFactory().get("/"), asset, max_age=60)
+
+    assert resp.status_code == 302
+    assert resp["Location"] == f"https://assets.example.com/place-assets/{asset.name}"
+    assert resp["ETag"] == asset.etag and "immutable" in resp["Cache-Control"]
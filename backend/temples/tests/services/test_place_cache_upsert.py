@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from temples.models import PlaceCache, PlaceRef
+from temples.services.place_cache_upsert import (
+    PlaceCacheInput,
+    PlaceRefInput,
+    upsert_place_cache_many,
+    upsert_place_refs_many,
+)
+
+
+def _cache_items(n: int, *, name: str = "神社"):
+    return [
+        PlaceCacheInput(place_id=f"pid_{i}", name=f"{name}{i}", lat=35.0, lng=139.0, types=["place_of_worship"])
+        for i in range(n)
+    ]
+
+
+@pytest.mark.django_db
+def test_place_cache_bulk_upsert_reports_inserted_updated_unchanged():
+    first = upsert_place_cache_many(_cache_items(3))
+    assert (first.inserted, first.updated, first.unchanged) == (3, 0, 0)
+
+    before = PlaceCache.objects.get(place_id="pid_0").fetched_at
+    items = _cache_items(3)
+    items[2] = PlaceCacheInput(place_id="pid_2", name="改名神社", lat=35.0, lng=139.0)
+    items.append(PlaceCacheInput(place_id="pid_9", name="新規"))
+
+    second = upsert_place_cache_many(items)
+
+    assert (second.inserted, second.updated, second.unchanged) == (1, 1, 2)
+    assert PlaceCache.objects.get(place_id="pid_2").name == "改名神社"
+    assert PlaceCache.objects.get(place_id="pid_0").fetched_at == before
+    assert PlaceCache.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_place_cache_bulk_upsert_uses_constant_queries():
+    with CaptureQueriesContext(connection) as small:
+        upsert_place_cache_many(_cache_items(3, name="a"))
+    with CaptureQueriesContext(connection) as large:
+        upsert_place_cache_many(_cache_items(60, name="b"))
+
+    assert len(large.captured_queries) == len(small.captured_queries)
+
+
+@pytest.mark.django_db
+def test_place_ref_bulk_upsert_skips_unchanged_rows():
+    refs = [PlaceRefInput(place_id="r1", name="A", latitude=35.0, longitude=139.0, snapshot_json={"x": 1})]
+
+    assert upsert_place_refs_many(refs).inserted == 1
+    synced = PlaceRef.objects.get(pk="r1").synced_at
+
+    again = upsert_place_refs_many(refs)
+    assert (again.inserted, again.updated, again.unchanged) == (0, 0, 1)
+    assert PlaceRef.objects.get(pk="r1").synced_at == synced
+
+    changed = upsert_place_refs_many([PlaceRefInput(place_id="r1", name="B")])
+    assert changed.updated == 1
+    assert PlaceRef.objects.get(pk="r1").name == "B"
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from temples.models import Shrine
+from temples.services import place_resolver
+from temples.services import places as places_svc
+from temples.services.tiered_cache import clear_local_tiers
+
+BIAS = {"lat": 35.68, "lng": 139.76, "radius": 5000}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_memo():
+    clear_local_tiers()
+    place_resolver.cache.clear()
+    yield
+    clear_local_tiers()
+    place_resolver.cache.clear()
+
+
+def _candidate(name, lat=35.68, lng=139.76):
+    return {
+        "candidates": [
+            {
+                "place_id": f"pid-{name}",
+                "name": name,
+                "formatted_address": f"東京都 {name}",
+                "geometry": {"location": {"lat": lat, "lng": lng}},
+            }
+        ]
+    }
+
+
+@pytest.mark.django_db
+def test_db_hit_needs_no_upstream(monkeypatch):
+    Shrine.objects.create(name_jp="赤坂氷川神社", address="東京都港区赤坂6-10-12", latitude=35.669, longitude=139.736)
+
+    def boom(**kw):
+        raise AssertionError("upstream must not be called")
+
+    monkeypatch.setattr(places_svc, "findplacefromtext", boom)
+    trace = {}
+    out = place_resolver.resolve_names(["赤坂氷川神社 "], bias=BIAS, trace=trace)
+
+    place = out["赤坂氷川神社"]
+    assert place.source == "shrine" and place.has_point
+    assert trace == {"memo": 0, "db": 1, "upstream": 0}
+
+
+@pytest.mark.django_db
+def test_upstream_results_are_memoized_including_misses(monkeypatch):
+    calls = []
+
+    def fake(input, **kw):
+        calls.append(input)
+        return _candidate(input) if input == "架空神社" else {"candidates": []}
+
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake)
+    first = place_resolver.resolve_names(["架空神社", "存在しない宮"], bias=BIAS)
+    assert first["架空神社"].place_id == "pid-架空神社" and first["存在しない宮"] is None
+
+    trace = {}
+    again = place_resolver.resolve_names(["架空神社", "存在しない宮"], bias=BIAS, trace=trace)
+    assert again == first
+    assert sorted(calls) == ["存在しない宮", "架空神社"]
+    assert trace["memo"] == 2 and trace["upstream"] == 0
+
+
+@pytest.mark.django_db
+def test_misses_go_upstream_concurrently(monkeypatch):
+    names = [f"並行{i}神社" for i in range(3)]
+    barrier = threading.Barrier(len(names), timeout=5)
+
+    def fake(input, **kw):
+        barrier.wait()  # 直列に呼ばれるとここで timeout する
+        return _candidate(input)
+
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake)
+    t0 = time.monotonic()
+    out = place_resolver.resolve_names(names, bias=BIAS)
+
+    assert all(out[n] and out[n].has_point for n in names)
+    assert time.monotonic() - t0 < 5
+
+
+@pytest.mark.django_db
+def test_stop_after_points_limits_upstream(monkeypatch):
+    calls = []
+
+    def fake(input, **kw):
+        calls.append(input)
+        return _candidate(input)
+
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake)
+    out = place_resolver.resolve_names(["一の宮", "二の宮", "三の宮"], max_upstream=2, stop_after_points=1)
+
+    assert calls == ["一の宮"]
+    assert out["一の宮"].has_point and out["二の宮"] is None
+
+
+@pytest.mark.django_db
+def test_ambiguous_name_without_bias_goes_upstream(monkeypatch):
+    Shrine.objects.create(name_jp="八幡神社", address="東京都", latitude=35.68, longitude=139.76)
+    Shrine.objects.create(name_jp="八幡神社", address="大阪府", latitude=34.69, longitude=135.50)
+    Shrine.objects.create(name_jp="明治神宮", address="東京都渋谷区", latitude=35.676, longitude=139.699)
+    calls = []
+
+    def fake(input, **kw):
+        calls.append(input)
+        return _candidate(input, lat=33.59, lng=130.40)
+
+    monkeypatch.setattr(places_svc, "findplacefromtext", fake)
+    out = place_resolver.resolve_names(["八幡神社", "明治神宮"], area="福岡市")
+
+    assert out["明治神宮"].source == "shrine"
+    assert out["八幡神社"].source == "upstream" and calls == ["八幡神社 福岡市"]
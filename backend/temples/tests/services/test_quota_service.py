@@ -0,0 +1,128 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from temples.models import ConciergeUsage, FeatureUsage
+from temples.services import quota_service
+from temples.services.plan_service import PlanContext
+from temples.services.quota_service import (
+    check_quota,
+    consume_quota,
+    flush_quota_counters,
+    get_used_count,
+    try_consume_quota,
+)
+
+
+def _anon(anon_id="anon-1"):
+    return PlanContext(plan="anonymous", user_id=None, anon_id=anon_id, is_authenticated=False)
+
+
+def _free(user):
+    return PlanContext(plan="free", user_id=user.id, anon_id=None, is_authenticated=True)
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(username="quota", password="x")
+
+
+@pytest.fixture(autouse=True)
+def _clear_counters():
+    caches["throttle"].clear()
+    quota_service._pending.clear()
+    yield
+    caches["throttle"].clear()
+    quota_service._pending.clear()
+
+
+@pytest.mark.django_db
+def test_check_is_one_select_without_writes():
+    ctx = _anon()
+    with CaptureQueriesContext(connection) as q:
+        status = check_quota(ctx, "concierge")
+    assert len(q.captured_queries) == 1
+    assert q.captured_queries[0]["sql"].lstrip().upper().startswith("SELECT")
+    assert status.allowed and status.used == 0 and status.remaining == 3
+    assert not FeatureUsage.objects.exists()
+
+
+@pytest.mark.django_db
+def test_consume_is_one_upsert_and_returns_status():
+    ctx = _anon()
+    with CaptureQueriesContext(connection) as q:
+        status = consume_quota(ctx, "concierge")
+    assert len([x for x in q.captured_queries if "temples_featureusage" in x["sql"]]) == 1
+    assert (status.used, status.remaining, status.allowed) == (1, 2, True)
+
+    consume_quota(ctx, "concierge", amount=2)
+    assert FeatureUsage.objects.get(anon_id="anon-1", feature="concierge").count == 3
+    assert check_quota(ctx, "concierge").reason_code == "LIMIT_REACHED"
+
+
+@pytest.mark.django_db
+def test_try_consume_never_exceeds_limit():
+    ctx = _anon()
+    results = [try_consume_quota(ctx, "concierge") for _ in range(5)]
+
+    assert [r.allowed for r in results] == [True, True, True, False, False]
+    assert [r.remaining for r in results] == [2, 1, 0, 0, 0]
+    assert results[-1].reason_code == "LIMIT_REACHED"
+    assert FeatureUsage.objects.get(anon_id="anon-1", feature="concierge").count == 3
+
+
+@pytest.mark.django_db
+def test_user_concierge_mirrors_legacy_daily_usage(user, settings):
+    settings.CONCIERGE_DAILY_FREE_LIMIT = 2
+    ctx = _free(user)
+
+    assert try_consume_quota(ctx, "concierge").allowed
+    assert try_consume_quota(ctx, "concierge").allowed
+    denied = try_consume_quota(ctx, "concierge")
+    assert not denied.allowed and denied.used == 2
+
+    assert ConciergeUsage.objects.get(user=user, date=timezone.localdate()).count == 2
+    assert FeatureUsage.objects.get(user=user, feature="concierge").count == 2
+
+
+@pytest.mark.django_db
+def test_legacy_count_alone_blocks_try_consume(user, settings):
+    settings.CONCIERGE_DAILY_FREE_LIMIT = 5
+    ConciergeUsage.objects.create(user=user, date=timezone.localdate(), count=5)
+    ctx = _free(user)
+
+    assert get_used_count(ctx, "concierge") == 5
+    assert not try_consume_quota(ctx, "concierge").allowed
+    assert not FeatureUsage.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_premium_is_unlimited_without_queries(user):
+    ctx = PlanContext(plan="premium", user_id=user.id, anon_id=None, is_authenticated=True)
+    with CaptureQueriesContext(connection) as q:
+        assert try_consume_quota(ctx, "concierge").unlimited
+        assert consume_quota(ctx, "concierge").unlimited
+    assert not q.captured_queries
+
+
+@pytest.mark.django_db
+def test_anonymous_cache_counter_flushes_to_db(settings):
+    settings.QUOTA_ANON_CACHE_COUNTER = True
+    settings.QUOTA_CACHE_FLUSH_SECONDS = 3600
+    quota_service._last_flush = float("inf")  # 自動フラッシュさせない
+    ctx = _anon("anon-cache")
+    FeatureUsage.objects.create(scope="anonymous", anon_id="anon-cache", feature="concierge", count=1)
+
+    assert try_consume_quota(ctx, "concierge").used == 2
+    with CaptureQueriesContext(connection) as q:
+        assert try_consume_quota(ctx, "concierge").used == 3
+        assert not try_consume_quota(ctx, "concierge").allowed
+    assert not q.captured_queries
+    assert FeatureUsage.objects.get(anon_id="anon-cache").count == 1
+
+    assert flush_quota_counters() == 1
+    assert FeatureUsage.objects.get(anon_id="anon-cache").count == 3
+    assert flush_quota_counters() == 0
@@ -0,0 +1,123 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIClient
+
+from temples.services.rate_limit import (
+    FixedWindowLimiter,
+    SlidingWindowLimiter,
+    TokenBucketLimiter,
+    parse_rate,
+)
+
+
+class _Clock:
+    def __init__(self, t: float) -> None:
+        self.t = t
+
+    def __call__(self) -> float:
+        return self.t
+
+
+@pytest.fixture(autouse=True)
+def _clear_throttle_cache():
+    caches["throttle"].clear()
+    yield
+    caches["throttle"].clear()
+
+
+def test_parse_rate():
+    assert parse_rate("30/min") == (30, 60)
+    assert parse_rate("5/s") == (5, 1)
+    assert parse_rate("100/hour") == (100, 3600)
+    with pytest.raises(ValueError):
+        parse_rate("10/fortnight")
+
+
+def test_fixed_window_counts_every_attempt_and_resets():
+    clock = _Clock(1_000_040.0)  # 窓の 20 秒目
+    lim = FixedWindowLimiter("t-fixed", 2, 60, cache=caches["throttle"], clock=clock)
+
+    assert [lim.hit("a").allowed for _ in range(3)] == [True, True, False]
+    assert lim.peek("a") == 3
+    denied = lim.hit("a")
+    assert denied.retry_after == pytest.approx(40.0)
+    assert denied.headers()["Retry-After"] == "40"
+    assert lim.hit("b").allowed  # キーごとに独立
+
+    clock.t += 40
+    assert lim.hit("a").remaining == 1
+
+
+def test_sliding_window_weights_previous_window():
+    clock = _Clock(1_000_040.0)  # 窓の 1/3 経過地点
+    lim = SlidingWindowLimiter("t-slide", 4, 60, cache=caches["throttle"], clock=clock)
+    for _ in range(4):
+        assert lim.hit("k").allowed
+    denied = lim.hit("k")
+    assert not denied.allowed and denied.remaining == 0
+
+    # 次の窓の頭: 直前窓の 4 件がほぼ丸ごと残っているので通さない
+    clock.t = 1_000_081.0
+    assert not lim.hit("k").allowed
+
+    # 窓の半分: 4 * 0.5 = 2 件ぶん空く（拒否した試行は数えていない）
+    clock.t = 1_000_110.0
+    assert lim.hit("k").allowed
+    assert lim.hit("k").allowed
+    assert not lim.hit("k").allowed
+
+
+def test_token_bucket_allows_burst_then_refills():
+    clock = _Clock(2_000_000.0)
+    lim = TokenBucketLimiter("t-bucket", 2, 1, capacity=3, cache=caches["throttle"], clock=clock)
+
+    assert [lim.hit().allowed for _ in range(4)] == [True, True, True, False]
+    denied = lim.hit()
+    assert denied.retry_after == pytest.approx(0.5)
+
+    clock.t += 0.5
+    assert lim.hit().allowed
+    assert not lim.hit().allowed
+
+    clock.t += 60  # 長く空いたら満タンに戻る（それ以上は貯まらない）
+    assert lim.hit().remaining == 2
+
+
+def test_token_bucket_acquire_sleeps_until_token():
+    clock = _Clock(3_000_000.0)
+    slept = []
+
+    def sleep(s):
+        slept.append(s)
+        clock.t += s
+
+    lim = TokenBucketLimiter("t-acquire", 1, 1, cache=caches["throttle"], clock=clock)
+    assert lim.acquire(sleep=sleep).allowed
+    assert lim.acquire(sleep=sleep).allowed
+    assert slept == [pytest.approx(1.0)]
+    assert not lim.acquire(timeout=0.1, sleep=sleep).allowed
+
+
+@pytest.mark.django_db
+def test_throttled_endpoint_exposes_rate_limit_headers(settings):
+    settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]["places-nearby"] = "2/min"
+    client = APIClient()
+    params = {"lat": 35.0, "lng": 139.0, "radius": 1000}
+
+    with patch("temples.services.google_places.nearby_search") as mock_call:
+        mock_call.return_value = {"status": "OK", "results": [], "next_page_token": None}
+
+        first = client.get("/api/places/nearby/", params)
+        assert first.status_code == 200
+        assert first["X-RateLimit-Limit"] == "2"
+        assert first["X-RateLimit-Remaining"] == "1"
+        assert 0 < int(first["X-RateLimit-Reset"]) <= 60
+
+        client.get("/api/places/nearby/", params)
+        third = client.get("/api/places/nearby/", params)
+
+    assert third.status_code == 429
+    assert third["X-RateLimit-Remaining"] == "0"
+    assert int(third["Retry-After"]) >= 1
@@ -0,0 +1,104 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from temples.models import Shrine
+from temples.services import request_profiler as profiler
+
+
+@pytest.fixture(autouse=True)
+def _reset_profiler_metrics():
+    profiler.reset_metrics()
+    yield
+    profiler.reset_metrics()
+
+
+def test_histogram_percentiles_are_close_to_exact():
+    h = profiler.Histogram()
+    for v in range(1, 1001):
+        h.add(v)
+
+    s = h.summary()
+    assert s["count"] == 1000
+    assert s["max"] == 1000
+    # バケット幅 1.25 倍なので 25% 以内
+    assert 500 * 0.8 <= s["p50"] <= 500 * 1.25
+    assert 950 * 0.8 <= s["p95"] <= 1000
+    assert profiler.Histogram().percentile(95) is None
+
+
+@pytest.mark.django_db
+def test_profile_request_counts_sql_per_phase_and_upstream():
+    with profiler.profile_request("test.endpoint", rid="r1") as prof:
+        with profiler.phase("load") as ph:
+            list(Shrine.objects.all())
+            list(Shrine.objects.all())
+        with profiler.phase("score"):
+            profiler.record_upstream("google_places")
+            profiler.record_upstream("google_places")
+            profiler.record_upstream("llm")
+        prof.status = 200
+
+    assert ph.elapsed > 0
+    assert ph.sql_count == 2
+    assert prof.sql_count == 2
+    assert len(prof.slow_queries()) == 2
+
+    ep = profiler.metrics_snapshot()["endpoints"]["test.endpoint"]
+    assert ep["requests"] == 1
+    assert ep["statuses"] == {"200": 1}
+    assert ep["phases"]["load"]["sql_count"] == 2
+    assert ep["phases"]["score"]["sql_count"] == 0
+    assert ep["phases"]["load"]["p95"] is not None
+    assert ep["upstream_calls"] == {"google_places": 2, "llm": 1}
+
+    # プロファイル外では何も積まない
+    with profiler.phase("outside"):
+        profiler.record_upstream("google_places")
+    assert set(profiler.metrics_snapshot()["endpoints"]) == {"test.endpoint"}
+
+
+@pytest.mark.django_db
+def test_profiled_decorator_records_phase():
+    @profiler.profiled("decorated")
+    def work():
+        return Shrine.objects.count()
+
+    with profiler.profile_request("test.deco"):
+        work()
+
+    ep = profiler.metrics_snapshot()["endpoints"]["test.deco"]
+    assert ep["phases"]["decorated"]["count"] == 1
+    assert ep["phases"]["decorated"]["sql_count"] == 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_admin_only_and_reports_chat_phases():
+    c = APIClient()
+    resp = c.post("/api/concierge/chat/", {"query": "近場で縁結び"}, format="json")
+    assert resp.status_code == 200
+
+    assert c.get("/api/metrics/profiler/").status_code in (401, 403)
+
+    User = get_user_model()
+    user = User.objects.create_user(username="plain", password="x")
+    c.force_authenticate(user)
+    assert c.get("/api/metrics/profiler/").status_code == 403
+
+    admin = User.objects.create_user(username="admin", password="x", is_staff=True)
+    c.force_authenticate(admin)
+    resp = c.get("/api/metrics/profiler/")
+    assert resp.status_code == 200
+
+    chat = resp.json()["endpoints"]["concierge.chat"]
+    assert chat["requests"] == 1
+    assert chat["statuses"] == {"200": 1}
+    # quota は quota_check の中で判定と消費を 1 文で行う（別の consume フェーズは無い）
+    for name in ("resolve_inputs", "quota_check", "candidates", "recommend", "append_chat"):
+        assert chat["phases"][name]["count"] == 1
+        assert chat["phases"][name]["p95"] is not None
+    assert chat["sql_count"]["max"] >= 1
+    assert "places" in resp.json()["caches"]
+
+    assert c.delete("/api/metrics/profiler/").status_code == 204
+    assert c.get("/api/metrics/profiler/").json()["endpoints"] == {}
@@ -0,0 +1,137 @@
+import itertools
+import random
+
+import pytest
+
+from temples.services.concierge_plan import _optimize_stop_sequence
+from temples.services.route_optimizer import (
+    haversine_matrix,
+    optimize_order,
+    parse_hhmm,
+    window_from_opening_hours,
+)
+
+
+def _path_cost(matrix, path):
+    return sum(matrix[a][b] for a, b in zip(path, path[1:], strict=False))
+
+
+def _brute_force(matrix, start=0, end=None):
+    n = len(matrix)
+    middle = [i for i in range(n) if i != start and i != end]
+    best = None
+    for perm in itertools.permutations(middle):
+        path = [start, *perm] + ([end] if end is not None else [])
+        c = _path_cost(matrix, path)
+        best = c if best is None or c < best else best
+    return best
+
+
+def _random_points(n, seed):
+    rnd = random.Random(seed)
+    return [(35.6 + rnd.random() * 0.1, 139.6 + rnd.random() * 0.1) for _ in range(n)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_matches_brute_force(seed):
+    m = haversine_matrix(_random_points(8, seed))
+    res = optimize_order(m, start=0)
+    assert res.method == "exact"
+    assert sorted(res.order) == list(range(8)) and res.order[0] == 0
+    assert res.travel_s == pytest.approx(_brute_force(m))
+
+
+def test_fixed_end_is_last():
+    m = haversine_matrix(_random_points(7, 42))
+    res = optimize_order(m, start=0, end=3)
+    assert res.order[0] == 0 and res.order[-1] == 3
+    assert res.travel_s == pytest.approx(_brute_force(m, end=3))
+
+
+def test_two_stops_honor_fixed_end():
+    m = [[0, 1], [1, 0]]
+    assert optimize_order(m, start=None, end=0).order == [1, 0]
+    assert optimize_order(m, start=1).order == [1, 0]
+    assert optimize_order(m, start=0, end=1).feasible
+
+    same = optimize_order(m, start=0, end=0)
+    assert same.order == [0, 1] and not same.feasible
+
+
+
+@pytest.mark.parametrize("start,end", [(None, 0), (None, 3), (2, 0), (0, 4)])
+def test_heuristic_honors_fixed_endpoints(start, end):
+    m = haversine_matrix(_random_points(6, 7))
+    res = optimize_order(m, start=start, end=end, exact_max=0)
+    assert res.method == "heuristic" and sorted(res.order) == list(range(6))
+    assert res.order[-1] == end
+    if start is not None:
+        assert res.order[0] == start
+
+
+def test_same_start_and_end_is_infeasible_on_every_path():
+    m = haversine_matrix(_random_points(5, 3))
+    for exact_max in (0, 12):
+        res = optimize_order(m, start=1, end=1, exact_max=exact_max)
+        assert res.order[0] == 1 and sorted(res.order) == list(range(5)) and not res.feasible
+
+def test_heuristic_is_close_to_exact_and_beats_given_order():
+    m = haversine_matrix(_random_points(10, 7))
+    exact = optimize_order(m, start=0)
+    heur = optimize_order(m, start=0, exact_max=0)
+    assert heur.method == "heuristic"
+    assert sorted(heur.order) == list(range(10)) and heur.order[0] == 0
+    assert heur.travel_s <= exact.travel_s * 1.1
+    assert heur.travel_s <= _path_cost(m, list(range(10)))
+
+
+def test_fifteen_stops_uses_heuristic():
+    m = haversine_matrix(_random_points(16, 3))
+    res = optimize_order(m, start=0)
+    assert res.method == "heuristic" and len(res.order) == 16
+    with pytest.raises(ValueError):
+        optimize_order(haversine_matrix(_random_points(17, 3)))
+
+
+def test_time_windows_reorder_and_wait():
+    # 0 → 1 → 2 が最短だが、2 は早く閉まり 1 は遅く開く
+    m = [[0, 100, 200], [100, 0, 100], [200, 100, 0]]
+    free = optimize_order(m, start=0)
+    assert free.order == [0, 1, 2]
+
+    windows = [None, (500, 10_000), (0, 250)]
+    res = optimize_order(m, start=0, windows=windows)
+    assert res.order == [0, 2, 1] and res.feasible
+    assert res.arrivals_s == [0, 200, 500]  # 1 は開門まで待つ
+
+    impossible = optimize_order(m, start=0, windows=[None, (0, 10), (0, 10)])
+    assert not impossible.feasible and sorted(impossible.order) == [0, 1, 2]
+
+
+def test_opening_hours_and_hhmm_parsing():
+    assert parse_hhmm("09:30") == 570 and parse_hhmm("1700") == 1020 and parse_hhmm("x") is None
+    periods = {
+        "periods": [
+            {"open": {"day": 1, "time": "0900"}, "close": {"day": 1, "time": "1700"}},
+            {"open": {"day": 5, "time": "2200"}, "close": {"day": 6, "time": "0200"}},
+        ]
+    }
+    assert window_from_opening_hours(periods, 1) == (540, 1020)
+    assert window_from_opening_hours(periods, 5) == (1320, 1560)
+    assert window_from_opening_hours(periods, 2) is None
+    assert window_from_opening_hours({"periods": [{"open": {"day": 0, "time": "0000"}}]}, 0) is None
+
+
+def test_plan_stop_sequence_starts_near_bias():
+    recs = [
+        {"name": "far", "location": {"lat": 35.70, "lng": 139.70}},
+        {"name": "none"},
+        {"name": "near", "location": {"lat": 35.601, "lng": 139.601}},
+        {"name": "mid", "location": {"lat": 35.65, "lng": 139.65}},
+    ]
+    ordered, travel, summary = _optimize_stop_sequence(
+        recs, bias={"lat": 35.6, "lng": 139.6}, transportation="walk", start_time="10:00"
+    )
+    assert [r["name"] for r in ordered] == ["near", "mid", "far", "none"]
+    assert set(travel) == {0, 1, 2} and all(v >= 1 for v in travel.values())
+    assert summary["method"] == "exact" and summary["matrix"] == "haversine"
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import copy
+
+import pytest
+from django.core.management import call_command
+
+from temples.models import GoriyakuTag, Shrine, ShrineNeedFeature
+from temples.services.concierge_chat import build_chat_recommendations
+from temples.services.concierge_chat_candidates import build_chat_candidates
+from temples.services.shrine_need_features import (
+    NEED_FEATURE_SPEC,
+    NEED_FEATURES_KEY,
+    NEED_TAG_BITS,
+    compute_need_features,
+)
+
+
+def test_compute_need_features_sets_bits_and_hits():
+    f = compute_need_features(
+        goriyaku="学業成就・合格祈願",
+        description="金運のご利益",
+        goriyaku_tag_ids=[2, "3", None],
+    )
+
+    assert f["spec_hash"] == NEED_FEATURE_SPEC
+    assert f["text_mask"] & NEED_TAG_BITS["study"]
+    assert f["text_mask"] & NEED_TAG_BITS["money"]
+    assert not f["text_mask"] & NEED_TAG_BITS["love"]
+    assert f["gid_mask"] == NEED_TAG_BITS["protection"]
+    assert f["text_hits"]["study"] == ["合格祈願", "学業成就"]
+    assert f["text_scores"]["study"] == 6
+    assert f["study_hint"] is True
+    assert f["goriyaku_tag_ids"] == [2, 3]
+
+
+@pytest.mark.django_db
+def test_signals_keep_index_in_sync():
+    s = Shrine.objects.create(
+        name_jp="索引神社",
+        address="東京都",
+        latitude=35.0,
+        longitude=139.0,
+        goriyaku="縁結び",
+    )
+    row = ShrineNeedFeature.objects.get(shrine=s)
+    assert row.text_mask == NEED_TAG_BITS["love"]
+
+    s.goriyaku = "商売繁盛"
+    s.save()
+    row.refresh_from_db()
+    assert row.text_mask == NEED_TAG_BITS["money"]
+
+    tag = GoriyakuTag.objects.create(id=2, name="厄除け")
+    s.goriyaku_tags.add(tag)
+    row.refresh_from_db()
+    assert row.gid_mask == NEED_TAG_BITS["protection"]
+
+    tag.shrines.clear()
+    row.refresh_from_db()
+    assert row.gid_mask == 0
+
+
+
+@pytest.mark.django_db
+def test_save_with_unrelated_update_fields_skips_refresh(django_assert_num_queries):
+    s = Shrine.objects.create(name_jp="人気神社", address="東京都", latitude=35.0, longitude=139.0, goriyaku="縁結び")
+
+    s.popular_score = 9.5
+    with django_assert_num_queries(1):  # UPDATE だけ
+        s.save(update_fields=["popular_score"])
+
+    s.goriyaku = "商売繁盛"
+    s.save(update_fields=["goriyaku", "popular_score"])
+    assert ShrineNeedFeature.objects.get(shrine=s).text_mask == NEED_TAG_BITS["money"]
+
+@pytest.mark.django_db
+def test_rebuild_command_repairs_missing_and_stale_rows():
+    a = Shrine.objects.create(name_jp="A", address="x", latitude=35.0, longitude=139.0, goriyaku="金運")
+    b = Shrine.objects.create(name_jp="B", address="x", latitude=35.0, longitude=139.0, goriyaku="良縁")
+    ShrineNeedFeature.objects.filter(shrine=a).delete()
+    ShrineNeedFeature.objects.filter(shrine=b).update(spec_hash="old", text_mask=0)
+
+    call_command("rebuild_need_features", "--stale-only")
+
+    assert ShrineNeedFeature.objects.get(shrine=a).text_mask == NEED_TAG_BITS["money"]
+    b_row = ShrineNeedFeature.objects.get(shrine=b)
+    assert b_row.spec_hash == NEED_FEATURE_SPEC
+    assert b_row.text_mask == NEED_TAG_BITS["love"]
+
+
+@pytest.mark.django_db
+def test_indexed_ranking_matches_text_scan():
+    tag = GoriyakuTag.objects.create(id=2, name="厄除け")
+    rows = [
+        ("学業神社", "学業成就・合格祈願", "静かな杜", 3.0),
+        ("厄除神社", "厄除", "", 5.0),
+        ("縁結神社", "縁結び・良縁", "恋愛成就で知られる", 8.0),
+        ("無地神社", "", "", 1.0),
+    ]
+    for name, goriyaku, desc, pop in rows:
+        s = Shrine.objects.create(
+            name_jp=name,
+            address="東京都",
+            latitude=35.0,
+            longitude=139.0,
+            goriyaku=goriyaku,
+            description=desc,
+            popular_score=pop,
+        )
+        if name == "厄除神社":
+            s.goriyaku_tags.add(tag)
+
+    candidates = build_chat_candidates(lat=35.0, lng=139.0, limit=10)
+    assert all(NEED_FEATURES_KEY in c for c in candidates)
+
+    scanned = [{k: v for k, v in c.items() if k != NEED_FEATURES_KEY} for c in candidates]
+
+    kwargs = dict(
+        query="試験に合格したいし不安もある",
+        language="ja",
+        bias=None,
+        birthdate="1990-08-01",
+        need_tags=["study", "mental", "protection", "love"],
+        llm_enabled=False,
+    )
+    indexed_out = build_chat_recommendations(candidates=copy.deepcopy(candidates), **kwargs)
+    scanned_out = build_chat_recommendations(candidates=scanned, **kwargs)
+
+    assert indexed_out["recommendations"] == scanned_out["recommendations"]
+    assert all(NEED_FEATURES_KEY not in r for r in indexed_out["recommendations"])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+from django.core.cache import caches
+
+from temples.services.tiered_cache import TieredCache
+
+
+class _InlineExecutor:
+    def submit(self, fn):
+        fn()
+
+
+@pytest.fixture
+def l2():
+    c = caches["places"]
+    c.clear()
+    yield c
+    c.clear()
+
+
+def test_l1_then_l2_hits_and_copies_values(l2):
+    tc = TieredCache(l2, name="t")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"status": "OK", "results": [1]}
+
+    v1, hit1 = tc.get_or_fetch("k", fetch, ttl=60)
+    v1["results"].append(2)  # 呼び出し側の破壊的変更がキャッシュに漏れない
+    v2, hit2 = tc.get_or_fetch("k", fetch, ttl=60)
+
+    tc.clear_local()
+    v3, hit3 = tc.get_or_fetch("k", fetch, ttl=60)
+
+    assert (hit1, hit2, hit3) == (False, True, True)
+    assert v2 == v3 == {"status": "OK", "results": [1]}
+    assert len(calls) == 1
+    assert tc.stats()["l2_hits"] == 1
+
+
+def test_single_flight_coalesces_concurrent_misses(l2):
+    tc = TieredCache(l2, name="t")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"status": "OK"}
+
+    results = []
+
+    def worker():
+        results.append(tc.get_or_fetch("k", slow_fetch, ttl=60))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=worker) for _ in range(4)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert [v for v, _ in results] == [{"status": "OK"}] * 5
+    assert sorted(h for _, h in results) == [False, True, True, True, True]
+    assert tc.stats()["coalesced"] == 4
+    assert tc.stats()["misses"] == 1
+
+
+def test_followers_of_an_uncacheable_leader_are_not_hits(l2):
+    tc = TieredCache(l2, name="t")
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_fetch():
+        started.set()
+        release.wait(5)
+        return {"status": "UNKNOWN_ERROR"}
+
+    results = []
+
+    def worker():
+        results.append(
+            tc.get_or_fetch("k", failing_fetch, ttl=60, cacheable=lambda v: v.get("status") == "OK")
+        )
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=worker) for _ in range(3)]
+    for t in followers:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert results == [({"status": "UNKNOWN_ERROR"}, False)] * 4
+    assert tc.stats()["coalesced"] == 3
+
+
+def test_stale_value_is_served_while_refreshing(l2):
+    tc = TieredCache(l2, name="t", executor=_InlineExecutor())
+    values = iter([{"v": 1}, {"v": 2}])
+
+    tc.get_or_fetch("k", lambda: next(values), ttl=0, stale_ttl=60)
+    stale, hit = tc.get_or_fetch("k", lambda: next(values), ttl=60, stale_ttl=60)
+    fresh, _ = tc.get_or_fetch("k", lambda: pytest.fail("should be fresh"), ttl=60)
+
+    assert (stale, hit) == ({"v": 1}, True)
+    assert fresh == {"v": 2}
+    assert tc.stats()["stale_hits"] == 1
+    assert tc.stats()["refreshes"] == 1
+
+
+def test_uncacheable_values_are_not_stored(l2):
+    tc = TieredCache(l2, name="t")
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"status": "OVER_QUERY_LIMIT"}
+
+    ok = lambda v: v.get("status") == "OK"  # noqa: E731
+    tc.get_or_fetch("k", fetch, ttl=60, accept=ok)
+    tc.get_or_fetch("k", fetch, ttl=60, accept=ok)
+
+    assert len(calls) == 2
+    assert l2.get("k") is None
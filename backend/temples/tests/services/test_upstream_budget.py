@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+from django.core.cache import caches
+
+from temples.services.upstream_budget import BudgetExhausted, UpstreamBudget
+
+
+class _Clock:
+    def __init__(self, t: float) -> None:
+        self.t = t
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.t
+
+    def sleep(self, s: float) -> None:
+        self.slept.append(s)
+        self.t += s
+
+
+def test_qps_window_waits_for_next_second():
+    clock = _Clock(1_000_000.25)
+    budget = UpstreamBudget("t-qps", qps=2, cache=caches["throttle"], clock=clock, sleep=clock.sleep)
+
+    budget.acquire()
+    budget.acquire()
+    budget.acquire()  # 3 本目は次の秒まで待つ
+
+    assert clock.slept == [pytest.approx(0.75)]
+
+
+def test_budget_is_shared_between_instances_and_daily_limit_applies():
+    clock = _Clock(2_000_000.0)
+    a = UpstreamBudget("t-day", qps=0, daily_limit=2, cache=caches["throttle"], clock=clock)
+    b = UpstreamBudget("t-day", qps=0, daily_limit=2, cache=caches["throttle"], clock=clock)
+
+    a.acquire()
+    b.acquire()
+    with pytest.raises(BudgetExhausted):
+        a.acquire()
+    assert b.used_today() == 3
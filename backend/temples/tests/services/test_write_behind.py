@@ -0,0 +1,171 @@
+import time
+
+import pytest
+
+from temples.models import ConciergeRecommendationLog, ConciergeThread, ConciergeWriteOutbox
+from temples.models_concierge_analytics import ConciergeRecommendationClickLog
+from temples.services import write_behind
+from temples.services.concierge_observability import save_concierge_recommendation_log
+
+
+@pytest.fixture(autouse=True)
+def _fresh_queue(settings):
+    settings.WRITE_BEHIND_ENABLED = True
+    settings.WRITE_BEHIND_OUTBOX = False
+    write_behind.reset_write_behind()
+    yield
+    write_behind.reset_write_behind()
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """worker スレッドから DB に触らないよう、書き込みを記録だけに差し替える。"""
+    out = []
+
+    def fake_insert(items):
+        items = list(items)
+        out.append(items)
+        return len(items), 0
+
+    monkeypatch.setattr(write_behind, "_insert_rows", fake_insert)
+    return out
+
+
+def _row(i=0):
+    return {"query": f"q{i}", "flow": "A"}
+
+
+def _wait_for(pred, timeout=2.0):
+    t0 = time.monotonic()
+    while not pred():
+        if time.monotonic() - t0 > timeout:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_worker_flushes_on_batch_size(settings, batches):
+    settings.WRITE_BEHIND_BATCH_SIZE = 3
+    settings.WRITE_BEHIND_FLUSH_SECONDS = 30
+
+    for i in range(3):
+        write_behind.enqueue("recommendation_log", _row(i))
+
+    assert _wait_for(lambda: batches)
+    assert [f["query"] for _, f, _ in batches[0]] == ["q0", "q1", "q2"]
+    assert write_behind.write_behind_stats()["written"] == 3
+
+
+def test_worker_flushes_on_interval(settings, batches):
+    settings.WRITE_BEHIND_BATCH_SIZE = 100
+    settings.WRITE_BEHIND_FLUSH_SECONDS = 0.1
+
+    t0 = time.monotonic()
+    write_behind.enqueue("recommendation_log", _row())
+
+    assert _wait_for(lambda: batches)
+    assert time.monotonic() - t0 < 1.0 and len(batches[0]) == 1
+
+
+def test_full_queue_drops_instead_of_blocking(settings, monkeypatch):
+    settings.WRITE_BEHIND_QUEUE_MAX = 1
+    monkeypatch.setattr(write_behind.WriteBehindQueue, "_ensure_worker", lambda self: None)
+
+    write_behind.enqueue("recommendation_log", _row(0))
+    write_behind.enqueue("recommendation_log", _row(1))
+
+    stats = write_behind.write_behind_stats()
+    assert stats["enqueued"] == 1 and stats["dropped"] == 1 and stats["queue_depth"] == 1
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        write_behind.enqueue("nope", {})
+
+
+@pytest.mark.django_db
+def test_disabled_writes_immediately(settings, user):
+    settings.WRITE_BEHIND_ENABLED = False
+    thread = ConciergeThread.objects.create(user=user, title="t")
+
+    save_concierge_recommendation_log(
+        user=user,
+        thread=thread,
+        query="縁結び",
+        need_tags=["love"],
+        flow="A",
+        llm_enabled=False,
+        llm_used=False,
+        recommendations=[{"name": "東京大神宮"}],
+        result_state={},
+    )
+
+    log = ConciergeRecommendationLog.objects.get()
+    assert log.user_id == user.pk and log.thread_id == thread.pk and log.need_tags == ["love"]
+
+
+@pytest.mark.django_db
+def test_bad_row_is_dropped_without_losing_the_batch(settings):
+    settings.WRITE_BEHIND_ENABLED = False
+    reco = ConciergeRecommendationLog.objects.create(query="q")
+
+    written, dropped = write_behind._insert_rows(
+        [
+            ("recommendation_click", {"recommendation_log_id": reco.pk, "rank": 1}, None),
+            ("recommendation_click", {"recommendation_log_id": None, "rank": 2}, None),
+        ]
+    )
+
+    assert (written, dropped) == (1, 1)
+    assert list(ConciergeRecommendationClickLog.objects.values_list("rank", flat=True)) == [1]
+
+
+@pytest.mark.django_db
+def test_outbox_rows_move_on_flush(settings, monkeypatch):
+    settings.WRITE_BEHIND_OUTBOX = True
+    monkeypatch.setattr(write_behind.WriteBehindQueue, "_ensure_worker", lambda self: None)
+
+    write_behind.enqueue("recommendation_log", _row())
+    assert ConciergeWriteOutbox.objects.count() == 1
+    assert ConciergeRecommendationLog.objects.count() == 0
+
+    assert write_behind.flush_write_behind() == 1
+    assert ConciergeWriteOutbox.objects.count() == 0
+    assert ConciergeRecommendationLog.objects.get().query == "q0"
+
+
+@pytest.mark.django_db
+def test_outbox_left_by_crashed_process_is_replayed(settings):
+    settings.WRITE_BEHIND_OUTBOX = True
+    ConciergeWriteOutbox.objects.create(kind="recommendation_log", payload=_row(7))
+
+    assert write_behind.replay_outbox(older_than_s=0) == 1
+    assert ConciergeWriteOutbox.objects.count() == 0
+    assert ConciergeRecommendationLog.objects.get().query == "q7"
+
+
+@pytest.mark.django_db
+def test_dangling_fk_is_dropped_instead_of_blocking_the_outbox(settings):
+    settings.WRITE_BEHIND_OUTBOX = True
+    ConciergeWriteOutbox.objects.create(kind="recommendation_log", payload={**_row(1), "thread_id": 987654})
+    ConciergeWriteOutbox.objects.create(kind="recommendation_log", payload=_row(2))
+
+    assert write_behind.replay_outbox(older_than_s=0) == 1
+    assert ConciergeWriteOutbox.objects.count() == 0
+    assert list(ConciergeRecommendationLog.objects.values_list("query", flat=True)) == ["q2"]
+    assert write_behind.write_behind_stats()["dropped"] == 1
+
+
+@pytest.mark.django_db
+def test_malformed_row_is_dropped_per_row(settings):
+    settings.WRITE_BEHIND_ENABLED = False
+
+    written, dropped = write_behind._insert_rows(
+        [
+            ("recommendation_log", {**_row(1), "no_such_column": 1}, None),
+            ("recommendation_log", _row(2), None),
+        ]
+    )
+
+    assert (written, dropped) == (1, 1)
+    assert ConciergeRecommendationLog.objects.get().query == "q2"
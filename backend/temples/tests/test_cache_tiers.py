@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import override_settings
+
+from shrine_project.cache_tiers import NAMESPACES, build_caches, namespace_cache
+
+
+def test_build_caches_defaults_to_locmem_per_namespace(tmp_path):
+    conf = build_caches({}, file_dir=str(tmp_path))
+
+    assert set(conf) == {"default", *NAMESPACES}
+    assert conf["default"]["LOCATION"] == "throttle-cache"
+    assert conf["places"]["LOCATION"] == "places-cache"
+    assert conf["route"]["TIMEOUT"] == 60 * 60 * 24 * 30
+    assert conf["lock"]["OPTIONS"]["CULL_FREQUENCY"] == 100
+
+
+def test_build_caches_redis_with_namespace_overrides(tmp_path):
+    env = {
+        "REDIS_URL": "redis://redis:6379/0",
+        "CACHE_REDIS_URL_LOCK": "redis://redis:6379/1",
+        "CACHE_TTL_PLACES": "120",
+    }
+    conf = build_caches(env, file_dir=str(tmp_path))
+
+    assert conf["places"]["BACKEND"] == "django_redis.cache.RedisCache"
+    assert conf["places"]["TIMEOUT"] == 120
+    assert conf["places"]["OPTIONS"]["IGNORE_EXCEPTIONS"] is True
+    assert conf["lock"]["LOCATION"] == "redis://redis:6379/1"
+    assert conf["lock"]["OPTIONS"]["IGNORE_EXCEPTIONS"] is False
+
+    # pytest 中は REDIS_URL だけでは redis に切り替えない
+    assert build_caches(env, file_dir=str(tmp_path), is_pytest=True)["places"]["BACKEND"].endswith("LocMemCache")
+
+
+def test_file_backend_is_shared_between_cache_instances(tmp_path):
+    conf = build_caches({"CACHE_BACKEND": "file"}, file_dir=str(tmp_path))
+    assert conf["route"]["LOCATION"] == str(tmp_path / "route")
+
+    with override_settings(CACHES=conf):
+        namespace_cache("route").set("route:abc", {"legs": 1})
+
+        # 別プロセス（別インスタンス）から同じディレクトリを読む想定
+        other = FileBasedCache(conf["route"]["LOCATION"], {})
+        assert other.get("route:abc") == {"legs": 1}
+        assert caches["places"].get("route:abc") is None
+
+
+def test_namespace_cache_falls_back_to_default():
+    with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+        namespace_cache("places").set("k", 1)
+        assert caches["default"].get("k") == 1
@@ -40,11 +40,27 @@ def test_fill_locations_backfills_and_shortens(req_history):
     loc = out["recommendations"][0]["location"]
 
     assert loc == "港区赤坂"
-    # findplace → details の両方が呼ばれていること
+    # findplace が住所を返したので details は呼ばない
     assert any("findplacefromtext" in url for url, _ in req_history), \
         "findplacefromtext が呼ばれていません"
-    assert any("place/details" in url for url, _ in req_history), \
-        "place/details が呼ばれていません"
+    assert not any("place/details" in url for url, _ in req_history), \
+        "住所が取れているのに place/details が呼ばれました"
+
+
+def test_fill_locations_resolves_known_names_without_requests(req_history):
+    """一度解決した名前は同じ界隈なら記憶から埋める（外部 API を呼ばない）"""
+    bias = {"lat": 35.6812, "lng": 139.7671, "radius": 5000}
+    fill_locations({"recommendations": [{"name": "赤坂氷川神社"}]}, candidates=[], bias=bias)
+    before = len(req_history)
+
+    out = fill_locations(
+        {"recommendations": [{"name": "赤坂氷川神社"}]},
+        candidates=[],
+        bias={"lat": 35.6813, "lng": 139.7672, "radius": 5000},
+    )
+
+    assert out["recommendations"][0]["location"] == "港区赤坂"
+    assert len(req_history) == before
 
 
 def test_fill_locations_prefers_candidate_address_without_requests(req_history):
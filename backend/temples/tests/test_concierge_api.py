@@ -1,4 +1,6 @@
 import json
+from types import SimpleNamespace
+
 import pytest
 
 
@@ -50,6 +52,11 @@ def test_chat_backfills_short_location(client, settings, monkeypatch):
 
     monkeypatch.setattr("temples.llm.backfill.requests.get", fake_get)
     monkeypatch.setattr("temples.api_views_concierge.requests.get", fake_get)
+    # area の geocode / Places は上流ごとの共有 Session 経由
+    monkeypatch.setattr(
+        "temples.geocoding.client._shared_session", lambda: SimpleNamespace(get=fake_get)
+    )
+    monkeypatch.setattr("temples.services.google_places._http", lambda: SimpleNamespace(get=fake_get))
 
     res = client.post(
         "/api/concierge/chat/",
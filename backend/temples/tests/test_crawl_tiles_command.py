@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+from django.core.management import call_command
+
+from temples.management.commands import crawl_tiles
+from temples.models import CrawlTile, PlaceCache
+
+
+def _tiles(n: int):
+    for i in range(n):
+        CrawlTile.objects.create(
+            step_km=2.0,
+            min_lat=35.0 + i,
+            min_lng=139.0,
+            max_lat=35.01 + i,
+            max_lng=139.01,
+            center_lat=35.005 + i,
+            center_lng=139.005,
+        )
+
+
+@pytest.mark.django_db
+def test_crawl_tiles_runs_workers_concurrently(monkeypatch):
+    _tiles(4)
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_nearby(params):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.1)
+        with lock:
+            state["active"] -= 1
+        return {"status": "OK", "results": [{"place_id": f"p{params['lat']}", "name": "n", "lat": 1, "lng": 2}]}
+
+    monkeypatch.setattr(crawl_tiles.places_service, "places_nearby_search", fake_nearby)
+
+    call_command("crawl_tiles", "--step-km", "2", "--workers", "4", "--qps", "100", "--sleep", "0")
+
+    assert state["peak"] > 1
+    assert CrawlTile.objects.filter(status=CrawlTile.Status.DONE).count() == 4
+    assert PlaceCache.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_crawl_tiles_schedules_next_page_after_delay(monkeypatch):
+    _tiles(1)
+    monkeypatch.setattr(crawl_tiles, "PAGE_TOKEN_DELAY_S", 0.2)
+    calls = []
+
+    def fake_nearby(params):
+        calls.append((time.monotonic(), params.get("pagetoken")))
+        if "pagetoken" not in params:
+            return {"status": "OK", "results": [], "next_page_token": "tok"}
+        return {"status": "OK", "results": []}
+
+    monkeypatch.setattr(crawl_tiles.places_service, "places_nearby_search", fake_nearby)
+
+    call_command("crawl_tiles", "--step-km", "2", "--qps", "100", "--sleep", "0")
+
+    assert [t for _, t in calls] == [None, "tok"]
+    assert calls[1][0] - calls[0][0] >= 0.2
+    tile = CrawlTile.objects.get()
+    assert tile.status == CrawlTile.Status.DONE
+    assert tile.not_before is None
+
+
+@pytest.mark.django_db
+def test_crawl_tiles_stops_when_daily_budget_is_used(monkeypatch):
+    _tiles(3)
+    monkeypatch.setattr(
+        crawl_tiles.places_service,
+        "places_nearby_search",
+        lambda params: {"status": "OK", "results": []},
+    )
+
+    call_command("crawl_tiles", "--step-km", "2", "--qps", "100", "--sleep", "0", "--daily-budget", "2")
+
+    assert CrawlTile.objects.filter(status=CrawlTile.Status.DONE).count() == 2
+    left = CrawlTile.objects.exclude(status=CrawlTile.Status.DONE).get()
+    assert left.status == CrawlTile.Status.PENDING
+    assert left.tries == 0
@@ -0,0 +1,126 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from temples import upstream
+from temples.llm import executor
+from temples.llm import orchestrator
+from temples.services.concierge_chat_llm_route import resolve_llm_route
+from temples.upstream import DeadlineExceeded, UpstreamUnavailable, deadline_scope
+
+
+@pytest.fixture(autouse=True)
+def _fresh_executor(settings):
+    settings.UPSTREAM_POLICIES = {"llm": {"breaker_failures": 3, "backoff_base_s": 0.0}}
+    upstream.reset()
+    executor.reset_llm_executor()
+    yield
+    upstream.reset()
+    executor.reset_llm_executor()
+
+
+def test_retries_until_success_and_caps_backoff_to_deadline(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("temples.llm.executor.time.sleep", sleeps.append)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise RuntimeError("503")
+        return "ok"
+
+    assert executor.call_llm(fn, budget_s=5, retries=2, backoff_s=100) == "ok"
+    assert len(calls) == 3
+    assert all(0 < t <= 5 for t in calls)
+    assert all(s <= 5 for s in sleeps)
+
+
+def test_slow_call_is_abandoned_at_deadline():
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        executor.call_llm(lambda timeout: time.sleep(1.0), budget_s=0.3, retries=2)
+    assert time.monotonic() - t0 < 0.8
+    assert executor.llm_executor_stats()["deadline_exceeded"] == 1
+
+
+def test_outer_scope_shortens_budget():
+    with deadline_scope(0.25):
+        with pytest.raises(DeadlineExceeded):
+            executor.call_llm(lambda timeout: time.sleep(1.0), budget_s=30)
+
+
+def test_open_breaker_short_circuits_without_calling(monkeypatch):
+    monkeypatch.setattr("temples.llm.executor.time.sleep", lambda s: None)
+
+    def boom(timeout):
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        executor.call_llm(boom, retries=2)
+    assert executor.llm_circuit_open()
+
+    called = []
+    with pytest.raises(UpstreamUnavailable):
+        executor.call_llm(lambda timeout: called.append(1), retries=2)
+    assert called == []
+
+
+def test_hedges_after_p95_and_takes_first_result(settings):
+    settings.LLM_HEDGE_MIN_S = 0.05
+    for _ in range(executor.HEDGE_MIN_SAMPLES):
+        executor._observe(0.01)
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            time.sleep(1.0)
+            return "slow"
+        return "fast"
+
+    t0 = time.monotonic()
+    assert executor.call_llm(fn, budget_s=5, hedge=True) == "fast"
+    assert time.monotonic() - t0 < 0.8
+    assert executor.llm_executor_stats()["hedged"] == 1
+
+
+def test_generate_plan_falls_back_while_breaker_open(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    created = []
+    monkeypatch.setattr(
+        orchestrator,
+        "make_openai_client",
+        lambda cfg: SimpleNamespace(responses=SimpleNamespace(create=lambda **kw: created.append(kw))),
+    )
+    br = upstream.breaker_for("llm")
+    for _ in range(3):
+        br.record_failure()
+
+    out = orchestrator.generate_plan("縁結び", lat=35.0, lng=135.7)
+
+    assert created == []
+    assert out["spots"][0]["name"] == "近隣の神社A" and "circuit open" in out["_error"]
+
+
+def test_resolve_llm_route_skips_llm_while_breaker_open(settings, monkeypatch):
+    settings.CONCIERGE_USE_LLM = True
+    monkeypatch.setattr(
+        orchestrator.ConciergeOrchestrator,
+        "suggest",
+        lambda self, **kw: pytest.fail("LLM must not be called while the breaker is open"),
+    )
+    br = upstream.breaker_for("llm")
+    for _ in range(3):
+        br.record_failure()
+
+    route = resolve_llm_route(
+        query="縁結び",
+        valid_candidates=[{"name": "東京大神宮"}],
+        need_tags=[],
+        llm_enabled=True,
+    )
+
+    assert route["llm_used"] is False and "circuit open" in route["llm_error"]
+    assert [r["name"] for r in route["recs"]["recommendations"]] == ["東京大神宮"]
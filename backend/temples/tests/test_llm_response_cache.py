@@ -0,0 +1,125 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from temples.llm import orchestrator
+from temples.llm import response_cache as rc
+from temples.llm.client import PLACEHOLDER, LLMClient
+from temples.llm.intent_extractor import extract_intent
+
+
+class _StubCompletions:
+    """chat.completions.create だけを持つ手元のスタブ。呼ばれた回数を数える。"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+def _client(replies):
+    stub = _StubCompletions(replies)
+    llm = LLMClient()
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=stub), responses=None)
+    llm._mode = "chat"
+    return llm, stub
+
+
+@pytest.fixture(autouse=True)
+def _clean_llm_cache():
+    rc.clear_llm_cache()
+    yield
+    rc.clear_llm_cache()
+
+
+def test_cache_key_normalizes_user_prompt_only():
+    base = dict(model="m", system="sys", schema={"a": 1})
+    assert rc.cache_key(user="金運を上げたい  京都駅", **base) == rc.cache_key(user=" 金運を上げたい　京都駅\n", **base)
+    assert rc.cache_key(user="金運", **base) != rc.cache_key(user="金運", **{**base, "model": "other"})
+    assert rc.cache_key(user="金運", **base) != rc.cache_key(user="金運", **{**base, "schema": {"a": 2}})
+
+
+def test_identical_prompts_hit_cache_without_upstream():
+    llm, stub = _client(['{"area": "京都"}'])
+    msgs = [{"role": "system", "content": "S"}, {"role": "user", "content": "金運を上げたい"}]
+
+    first = llm.chat(msgs)
+    second = llm.chat([msgs[0], {"role": "user", "content": "金運を上げたい "}])
+
+    assert first == second == {"role": "assistant", "content": '{"area": "京都"}'}
+    assert len(stub.calls) == 1
+    stats = rc.llm_cache_stats()
+    assert stats["misses"] == 1 and stats["l1_hits"] == 1
+
+
+def test_failures_are_not_cached(monkeypatch):
+    monkeypatch.setenv("LLM_RETRIES", "0")
+    llm, stub = _client([RuntimeError("timeout"), '{"ok": 1}'])
+    msgs = [{"role": "user", "content": "q"}]
+
+    assert llm.chat(msgs) == PLACEHOLDER
+    assert llm.chat(msgs)["content"] == '{"ok": 1}'
+    assert len(stub.calls) == 2
+
+
+def test_negative_results_use_short_ttl(settings, monkeypatch):
+    settings.LLM_CACHE_NEGATIVE_TTL_S = 30
+    llm, stub = _client(["すみません、わかりません"])
+    monkeypatch.setattr("temples.llm.intent_extractor.LLMClient", lambda: llm)
+
+    assert extract_intent("よくわからない要望") == extract_intent("よくわからない要望")
+    assert len(stub.calls) == 1
+    assert rc.llm_cache_stats()["negative_stored"] == 1
+
+
+def test_cache_can_be_disabled(settings):
+    settings.LLM_RESPONSE_CACHE = False
+    llm, stub = _client(['{"x": 1}'])
+    msgs = [{"role": "user", "content": "q"}]
+    llm.chat(msgs)
+    llm.chat(msgs)
+    assert len(stub.calls) == 2
+
+
+def test_generate_plan_reuses_response_for_rounded_coords(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("LLM_COORD_ROUND", "3")
+    calls = []
+    plan = {"summary": "s", "spots": [{"name": "伏見稲荷大社", "reason": "商売繁盛"}]}
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(output_text=json.dumps(plan, ensure_ascii=False))
+
+    monkeypatch.setattr(
+        orchestrator, "make_openai_client", lambda cfg: SimpleNamespace(responses=SimpleNamespace(create=create))
+    )
+
+    a = orchestrator.generate_plan("金運を上げたい", lat=34.98541, lng=135.75872, transport="walk")
+    b = orchestrator.generate_plan("金運を上げたい", lat=34.98549, lng=135.75868, transport="walk")
+
+    assert a == b and a["spots"][0]["name"] == "伏見稲荷大社"
+    assert len(calls) == 1
+
+
+def test_clear_deletes_llm_keys_only_on_shared_redis(monkeypatch):
+    deleted = []
+
+    class _SharedRedis:
+        def delete_pattern(self, pattern):
+            deleted.append(pattern)
+
+        def clear(self):
+            raise AssertionError("must not FLUSHDB a shared redis")
+
+    monkeypatch.setattr(rc._tier, "l2", _SharedRedis())
+    rc.clear_llm_cache()
+
+    assert deleted == ["llm:*"]
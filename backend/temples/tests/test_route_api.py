@@ -59,3 +59,38 @@ def test_route_api_latlng_range_validation(api_client, origin):
     }
     res = api_client.post("/api/route/", data=payload, format="json")
     assert res.status_code == 400
+
+
+def test_route_api_optimize_reorders_and_allows_more_stops(api_client):
+    dests = [{"lat": 35.60 + i * 0.01, "lng": 139.70} for i in range(8)]
+    shuffled = [dests[i] for i in (5, 0, 7, 2, 6, 1, 4, 3)]
+    payload = {
+        "mode": "walking",
+        "origin": {"lat": 35.59, "lng": 139.70},
+        "destinations": shuffled,
+        "optimize": True,
+    }
+    res = api_client.post("/api/route/", data=payload, format="json")
+    assert res.status_code == 200, res.content
+    body = res.json()
+
+    assert sorted(body["order"]) == list(range(8))
+    assert [shuffled[i]["lat"] for i in body["order"]] == [d["lat"] for d in dests]
+    assert body["optimization"]["method"] == "exact"
+    assert [leg["to"]["lat"] for leg in body["legs"]] == pytest.approx([d["lat"] for d in dests])
+
+
+def test_route_api_optimize_honours_fixed_end_and_validates_times(api_client):
+    payload = {
+        "mode": "walking",
+        "origin": {"lat": 35.59, "lng": 139.70},
+        "destinations": [{"lat": 35.62, "lng": 139.70}, {"lat": 35.60, "lng": 139.70}, {"lat": 35.61, "lng": 139.70}],
+        "optimize": True,
+        "fixed_end": True,
+    }
+    res = api_client.post("/api/route/", data=payload, format="json")
+    assert res.status_code == 200, res.content
+    assert res.json()["order"] == [1, 0, 2]  # 最後の destination は固定
+
+    payload["destinations"][0]["open"] = "25:99"
+    assert api_client.post("/api/route/", data=payload, format="json").status_code == 400
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from temples import route_service as rs
+from temples.upstream import aio
+
+
+class _SlowAdapter(rs.BaseRouteAdapter):
+    cache_legs = True
+
+    def __init__(self, delay=0.2, multi=None):
+        self.delay = delay
+        self.multi = multi
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_leg(self, mode, a, b):
+        with self.lock:
+            self.calls.append((a.lat, b.lat))
+        time.sleep(self.delay)
+        return {**rs.DummyAdapter().get_leg(mode, a, b), "provider": "fake"}
+
+    def get_legs(self, mode, points):
+        return self.multi(points) if self.multi else None
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    adapter = _SlowAdapter()
+    monkeypatch.setattr(rs, "get_adapter", lambda: ("fake", adapter))
+    rs.cache.clear()
+    yield adapter
+    rs.cache.clear()
+
+
+def _pts(*lats):
+    return [rs.Point(lat, 139.70 + lat / 100) for lat in lats]
+
+
+def test_uncached_legs_are_fetched_concurrently(fake):
+    origin, *dests = _pts(35.60, 35.61, 35.62, 35.63, 35.64)
+
+    t0 = time.perf_counter()
+    out = rs.build_route("walking", origin, dests)
+    elapsed = time.perf_counter() - t0
+
+    assert len(fake.calls) == 4
+    assert elapsed < 0.2 * 3  # 直列なら 0.8 秒
+    assert [leg["to"]["lat"] for leg in out["legs"]] == [d.lat for d in dests]  # 順序は保つ
+    assert out["distance_m_total"] == sum(leg["distance_m"] for leg in out["legs"])
+
+
+def test_legs_are_cached_independently_across_routes(fake):
+    a, b, c, d = _pts(35.60, 35.61, 35.62, 35.63)
+    rs.build_route("walking", a, [b, c])
+    fake.calls.clear()
+
+    out = rs.build_route("walking", a, [b, c, d])
+
+    assert fake.calls == [(c.lat, d.lat)]  # a→b, b→c は前のルートの区間を使う
+    assert len(out["legs"]) == 3 and out["cached"] is False
+
+
+def test_multi_waypoint_request_replaces_per_leg_calls(fake):
+    seen = []
+
+    def multi(points):
+        seen.append(len(points))
+        return [rs.DummyAdapter().get_leg("walking", a, b) for a, b in zip(points, points[1:], strict=False)]
+
+    fake.multi = multi
+    origin, *dests = _pts(35.60, 35.61, 35.62, 35.63)
+    out = rs.build_route("walking", origin, dests)
+
+    assert seen == [4] and fake.calls == []
+    assert len(out["legs"]) == 3
+
+
+def test_throttled_legs_are_not_cached(fake, monkeypatch):
+    origin, *dests = _pts(35.60, 35.61)
+    monkeypatch.setattr(
+        fake, "get_leg", lambda mode, a, b: rs._throttled_leg(a, b)
+    )
+    rs.build_route("walking", origin, dests)
+    assert rs.cache.get(rs._cache_key("walking", origin, dests)) is None
+    assert rs.cache.get(rs._leg_key("fake", "walking", origin, dests[0])) is None
+
+
+def test_osrm_multi_waypoint_splits_legs(monkeypatch):
+    captured = {}
+
+    class _R:
+        def raise_for_status(self):
+            return None
+
+        def json(self):
+            return {
+                "routes": [
+                    {
+                        "legs": [
+                            {
+                                "distance": 100.4,
+                                "duration": 80.2,
+                                "steps": [
+                                    {"geometry": {"coordinates": [[139.0, 35.0], [139.001, 35.001]]}},
+                                    {"geometry": {"coordinates": [[139.001, 35.001], [139.002, 35.002]]}},
+                                ],
+                            },
+                            {
+                                "distance": 50,
+                                "duration": 40,
+                                "steps": [{"geometry": {"coordinates": [[139.002, 35.002], [139.003, 35.003]]}}],
+                            },
+                        ]
+                    }
+                ]
+            }
+
+    def fake_get(url, params=None, timeout=None):
+        captured.update(url=url, params=params)
+        return _R()
+
+    monkeypatch.setattr(rs, "_session", lambda: SimpleNamespace(get=fake_get))
+    monkeypatch.setattr(rs, "_allow", lambda: True)
+    pts = [rs.Point(35.0, 139.0), rs.Point(35.002, 139.002), rs.Point(35.003, 139.003)]
+
+    legs = rs.OSRMAdapter("http://osrm").get_legs("walking", pts)
+
+    assert captured["url"] == "http://osrm/route/v1/foot/139.0,35.0;139.002,35.002;139.003,35.003"
+    assert captured["params"]["steps"] == "true"
+    assert [(leg["distance_m"], leg["duration_s"]) for leg in legs] == [(100, 80), (50, 40)]
+    assert legs[0]["geometry"] == [(35.0, 139.0), (35.001, 139.001), (35.002, 139.002)]
+    assert legs[1]["to"] == {"lat": 35.003, "lng": 139.003}
+
+
+def test_osrm_missing_legs_share_one_event_loop(monkeypatch):
+    seen = []
+
+    async def handler(request):
+        seen.append(request.url.path)
+        await asyncio.sleep(0.2)
+        a, b = (tuple(map(float, p.split(","))) for p in request.url.path.rsplit("/", 1)[1].split(";"))
+        return httpx.Response(
+            200,
+            json={"routes": [{"distance": 120.6, "duration": 95.2, "geometry": {"coordinates": [list(a), list(b)]}}]},
+        )
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(aio, "async_client", lambda provider: client)
+    adapter = rs.OSRMAdapter("http://osrm")
+    monkeypatch.setattr(adapter, "get_legs", lambda mode, points: None)
+    monkeypatch.setattr(rs, "get_adapter", lambda: ("osrm", adapter))
+    monkeypatch.setattr(rs, "_allow", lambda: True)
+    rs.cache.clear()
+    origin, *dests = _pts(35.60, 35.61, 35.62, 35.63)
+
+    t0 = time.perf_counter()
+    out = rs.build_route("walking", origin, dests)
+    elapsed = time.perf_counter() - t0
+
+    assert len(seen) == 3 and elapsed < 0.2 * 2.5  # 直列なら 0.6 秒
+    assert [leg["to"]["lat"] for leg in out["legs"]] == [d.lat for d in dests]
+    assert out["legs"][0]["provider"] == "osrm" and out["legs"][0]["distance_m"] == 120
+    assert out["legs"][0]["geometry"] == [(origin.lat, origin.lng), (dests[0].lat, dests[0].lng)]
+    rs.cache.clear()
@@ -0,0 +1,168 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+import responses
+
+from temples import upstream
+from temples.services import request_profiler as profiler
+from temples.upstream import aio
+from temples.upstream.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, UpstreamUnavailable
+
+URL = "https://upstream.example/api"
+
+
+@pytest.fixture
+def fast_policy(settings, monkeypatch):
+    settings.UPSTREAM_POLICIES = {
+        "test": {"retries": 2, "breaker_failures": 3, "breaker_reset_s": 60, "backoff_base_s": 0.0}
+    }
+    upstream.reset()
+    monkeypatch.setattr("temples.upstream.sync.time.sleep", lambda s: None)
+    yield
+    upstream.reset()
+
+
+class _Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_breaker_opens_then_admits_single_probe():
+    clock = _Clock()
+    br = CircuitBreaker("x", failure_threshold=2, reset_timeout=10, clock=clock)
+    br.record_failure()
+    assert br.state == CLOSED
+    br.record_failure()
+    assert br.state == OPEN and not br.allow()
+
+    clock.t = 10
+    assert br.allow() and br.state == HALF_OPEN
+    assert not br.allow()  # 試行は 1 本だけ
+    br.record_failure()
+    assert br.state == OPEN
+
+    clock.t = 20
+    assert br.allow()
+    br.record_success()
+    assert br.state == CLOSED and br.allow()
+
+
+@responses.activate
+def test_sync_session_retries_5xx_then_succeeds(fast_policy):
+    responses.add(responses.GET, URL, status=503)
+    responses.add(responses.GET, URL, json={"ok": True})
+
+    r = upstream.session("test").get(URL)
+
+    assert r.json() == {"ok": True} and len(responses.calls) == 2
+    assert upstream.breaker_for("test").state == CLOSED
+
+
+@responses.activate
+def test_sync_session_does_not_retry_post(fast_policy):
+    responses.add(responses.POST, URL, status=502)
+    r = upstream.session("test").post(URL, json={})
+    assert r.status_code == 502 and len(responses.calls) == 1
+
+
+@responses.activate
+def test_breaker_short_circuits_after_repeated_failures(fast_policy):
+    responses.add(responses.GET, URL, body=requests.ConnectionError("down"))
+
+    with pytest.raises(requests.ConnectionError):
+        upstream.session("test").get(URL)  # 3 回試して 3 回失敗 → open
+    assert len(responses.calls) == 3
+
+    with pytest.raises(UpstreamUnavailable):
+        upstream.session("test").get(URL)
+    assert len(responses.calls) == 3  # 上流には行かない
+    assert upstream.breaker_stats()["test"]["rejected"] == 1
+
+
+
+@responses.activate
+def test_slot_timeout_in_half_open_does_not_strand_the_probe(settings):
+    settings.UPSTREAM_POLICIES = {
+        "test": {"max_connections": 1, "timeout_s": 0.05, "retries": 0, "breaker_failures": 1, "breaker_reset_s": 0}
+    }
+    upstream.reset()
+    responses.add(responses.GET, URL, json={"ok": True})
+    sess = upstream.session("test")
+    br = upstream.breaker_for("test")
+    br.record_failure()  # open → reset_timeout 0 なので次の呼び出しは half_open の試行
+
+    assert sess._slots.acquire(timeout=1)  # 枠を使い切る
+    try:
+        with pytest.raises(UpstreamUnavailable, match="slots exhausted"):
+            sess.get(URL)
+    finally:
+        sess._slots.release()
+
+    assert not br.is_open()
+    assert sess.get(URL).json() == {"ok": True} and br.state == CLOSED
+    upstream.reset()
+
+def test_policy_overrides_from_settings(settings):
+    settings.UPSTREAM_POLICIES = {"google_places": {"retries": 0, "retry_methods": ["GET"]}}
+    pol = upstream.policy_for("google_places")
+    assert pol.retries == 0 and pol.max_connections == 16 and pol.retry_methods == frozenset({"GET"})
+
+
+def test_async_client_retries_and_shares_breaker(fast_policy):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.params.get("q"))
+        return httpx.Response(500 if len(calls) == 1 else 200, json={"n": len(calls)})
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        aio._clients[loop] = {"test": httpx.AsyncClient(transport=httpx.MockTransport(handler))}
+        try:
+            one = await aio.aget_json("test", URL, {"q": "a"})
+            many = await aio.gather_json("test", [(URL, {"q": "b"}), (URL, {"q": "c"})])
+        finally:
+            await aio.aclose()
+        return one, many
+
+    one, many = asyncio.run(run())
+
+    assert one == {"n": 2} and calls[:2] == ["a", "a"]
+    assert sorted(calls[2:]) == ["b", "c"] and all(isinstance(m, dict) for m in many)
+    assert upstream.breaker_for("test").state == CLOSED
+
+
+def test_sync_wrapper_runs_concurrently_and_keeps_request_context(fast_policy, monkeypatch):
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, json={"q": request.url.params.get("q")})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(aio, "async_client", lambda provider: client)
+
+    with profiler.profile_request("test.upstream") as prof:
+        t0 = time.perf_counter()
+        out = aio.get_json_many("test", [(URL, {"q": str(i)}) for i in range(4)])
+        elapsed = time.perf_counter() - t0
+
+    assert [o["q"] for o in out] == ["0", "1", "2", "3"]
+    assert elapsed < 0.2 * 3  # 直列なら 0.8 秒
+    assert prof.upstream == {"test": 4}
+
+
+def test_run_sync_refuses_running_loop():
+    async def inner():
+        coro = asyncio.sleep(0)
+        try:
+            aio.run_sync(coro)
+        finally:
+            coro.close()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(inner())
@@ -0,0 +1,39 @@
+# backend/temples/upstream/__init__.py
+"""
+外部 API（Google Places / Geocoding / ルーティング / Nominatim）の呼び出し層。
+
+- policy: provider ごとの接続数・タイムアウト・再試行・ブレーカ閾値
+- sync.session(provider): 既存の同期呼び出し箇所向けの requests.Session
+- aio.arequest / aget_json: ASGI 向けの httpx.AsyncClient 版（同期の呼び出し元からは aio.run_sync）
+- deadline.deadline_scope: 呼び出し全体の締め切り（入れ子は短い方）
+"""
+from __future__ import annotations
+
+from .breaker import CircuitBreaker, UpstreamUnavailable, breaker_for, breaker_stats, reset_breakers
+from .deadline import Deadline, DeadlineExceeded, deadline_scope
+from .policy import ProviderPolicy, policy_for
+from .sync import UpstreamSession, reset_sessions, session
+
+
+def reset() -> None:
+    """ブレーカと Session を作り直す（テスト・設定変更用）。"""
+    reset_breakers()
+    reset_sessions()
+
+
+__all__ = [
+    "CircuitBreaker",
+    "Deadline",
+    "DeadlineExceeded",
+    "ProviderPolicy",
+    "UpstreamSession",
+    "UpstreamUnavailable",
+    "breaker_for",
+    "breaker_stats",
+    "deadline_scope",
+    "policy_for",
+    "reset",
+    "reset_breakers",
+    "reset_sessions",
+    "session",
+]
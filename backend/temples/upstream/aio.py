@@ -0,0 +1,196 @@
+# backend/temples/upstream/aio.py
+"""
+asyncio 版の上流クライアント（httpx.AsyncClient）。
+
+- provider ごと・イベントループごとに 1 つの AsyncClient（接続プールは policy.max_connections）
+- h2 パッケージがあれば HTTP/2 で多重化する（無ければ HTTP/1.1 のまま）
+- 再試行・ブレーカは同期版（upstream.sync）と同じ方針・同じ状態を共有する
+
+ASGI のビューから多数の上流呼び出しを 1 ワーカーで並行に待つときに使う。
+同期のコード（WSGI / ASGI の sync ビュー）からは run_sync / get_json_many で、プロセスに 1 つの
+バックグラウンドのイベントループに載せて待つ（クライアントと接続プールは呼び出しをまたいで使い回す）。
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+import httpx
+from temples.services.request_profiler import record_upstream
+
+from .breaker import UpstreamUnavailable, breaker_for
+from .policy import policy_for
+from .retry import backoff_delay, is_failure_status
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - 任意依存
+    HTTP2_AVAILABLE = False
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def async_client(provider: str) -> httpx.AsyncClient:
+    """実行中のイベントループに紐づく provider 用クライアント。"""
+    loop = asyncio.get_running_loop()
+    per_loop = _clients.setdefault(loop, {})
+    client = per_loop.get(provider)
+    if client is None or client.is_closed:
+        pol = policy_for(provider)
+        client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=max(1, pol.max_connections),
+                max_keepalive_connections=max(1, pol.max_connections),
+            ),
+            timeout=httpx.Timeout(pol.timeout_s, connect=pol.connect_timeout_s),
+        )
+        per_loop[provider] = client
+    return client
+
+
+async def arequest(provider: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """provider の方針（再試行・ブレーカ・既定タイムアウト）で 1 リクエストを送る。"""
+    pol = policy_for(provider)
+    client = async_client(provider)
+    attempts = 1 + (pol.retries if method.upper() in pol.retry_methods else 0)
+
+    for attempt in range(attempts):
+        last = attempt == attempts - 1
+        breaker = breaker_for(provider)
+        breaker.before_call()
+        record_upstream(provider)
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.PoolTimeout as e:
+            breaker.release()
+            raise UpstreamUnavailable(f"connection slots exhausted: {provider}") from e
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            if last:
+                raise
+            log.info("[upstream] %s %s retry=%d err=%s", provider, method, attempt + 1, type(e).__name__)
+            await asyncio.sleep(backoff_delay(attempt, pol))
+            continue
+        except BaseException:
+            # キャンセル（deadline 切れなど）は上流の失敗として数えない
+            breaker.release()
+            raise
+
+        if is_failure_status(resp.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if resp.status_code in pol.retry_statuses and not last:
+            await asyncio.sleep(backoff_delay(attempt, pol, retry_after=resp.headers.get("Retry-After")))
+            continue
+        return resp
+    raise AssertionError("unreachable")  # pragma: no cover
+
+
+async def aget_json(
+    provider: str,
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    **kwargs: Any,
+) -> Any:
+    resp = await arequest(provider, "GET", url, params=params, **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def gather_json(provider: str, requests_: list, *, return_exceptions: bool = True) -> list:
+    """[(url, params), ...] を並行に取る。接続数は provider のプールで頭打ちになる。"""
+    return await asyncio.gather(
+        *(aget_json(provider, url, params) for url, params in requests_),
+        return_exceptions=return_exceptions,
+    )
+
+
+async def aclose() -> None:
+    """実行中ループのクライアントを閉じる（ASGI の終了処理やテスト用）。"""
+    loop = asyncio.get_running_loop()
+    per_loop = _clients.pop(loop, {})
+    for client in per_loop.values():
+        await client.aclose()
+
+
+# ---- 同期の呼び出し元向け ----
+_bg_lock = threading.Lock()
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_pid: Optional[int] = None
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _bg_loop, _bg_pid
+    with _bg_lock:
+        # fork 後の子プロセスにはループのスレッドが引き継がれないので作り直す
+        if _bg_loop is None or _bg_pid != os.getpid() or _bg_loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="upstream-aio", daemon=True).start()
+            _bg_loop, _bg_pid = loop, os.getpid()
+        return _bg_loop
+
+
+def run_sync(coro: Awaitable[T], *, timeout: Optional[float] = None) -> T:
+    """
+    コルーチンをバックグラウンドのループで走らせ、結果を待って返す（例外はそのまま投げ直す）。
+    呼び出し元の contextvars（deadline・プロファイラ）を引き継ぐ。イベントループの中からは呼ばないこと。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError("run_sync() cannot be called from a running event loop; await the coroutine")
+
+    loop = _background_loop()
+    ctx = contextvars.copy_context()
+    done: "concurrent.futures.Future[T]" = concurrent.futures.Future()
+
+    def start() -> None:
+        task = loop.create_task(coro, context=ctx)
+
+        def finish(t: "asyncio.Task[T]") -> None:
+            if t.cancelled():
+                done.cancel()
+            elif t.exception() is not None:
+                done.set_exception(t.exception())
+            else:
+                done.set_result(t.result())
+
+        task.add_done_callback(finish)
+
+    loop.call_soon_threadsafe(start)
+    return done.result(timeout)
+
+
+def get_json_many(provider: str, requests_: list, *, return_exceptions: bool = True) -> list:
+    """gather_json の同期版。"""
+    return run_sync(gather_json(provider, requests_, return_exceptions=return_exceptions))
+
+
+__all__ = [
+    "HTTP2_AVAILABLE",
+    "aclose",
+    "aget_json",
+    "arequest",
+    "async_client",
+    "gather_json",
+    "get_json_many",
+    "run_sync",
+]
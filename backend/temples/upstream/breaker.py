@@ -0,0 +1,152 @@
+# backend/temples/upstream/breaker.py
+"""
+プロセス内のサーキットブレーカ。
+
+closed: 通常。連続失敗が failure_threshold に達したら open
+open:   reset_timeout 秒は呼ばずに即失敗させる
+half_open: reset_timeout 経過後、1 本だけ試しに通す（成功で closed、失敗で再び open）
+
+スレッド・asyncio のどちらから使ってもよい（状態更新は短いロック区間だけ）。
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict
+
+import requests
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(requests.exceptions.ConnectionError):
+    """ブレーカが開いている / 接続枠が空かない。呼び出し側では接続失敗と同じに扱える。"""
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._counters = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._counters["rejected"] += 1
+            return False
+
+    def is_open(self) -> bool:
+        """今呼べば遮断されるか（allow と違い試行枠を消費しない）。"""
+        with self._lock:
+            if self._state == OPEN:
+                return self._clock() - self._opened_at < self.reset_timeout
+            return self._state == HALF_OPEN and self._probing
+
+    def before_call(self) -> None:
+        if not self.allow():
+            raise UpstreamUnavailable(f"circuit open: {self.name}")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                log.info("[breaker] %s closed", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._counters["opened"] += 1
+                    log.warning("[breaker] %s open after %d failures", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+
+    def release(self) -> None:
+        """成否を判定できずに終わった呼び出し（呼び出し側のバグなど）。試行枠だけ返す。"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self._state, "failures": self._failures, **self._counters}
+
+
+_registry: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(provider: str) -> CircuitBreaker:
+    """provider ごとに 1 つ（同期 / 非同期クライアントで共有）。"""
+    with _registry_lock:
+        br = _registry.get(provider)
+        if br is None:
+            from .policy import policy_for
+
+            pol = policy_for(provider)
+            br = CircuitBreaker(provider, failure_threshold=pol.breaker_failures, reset_timeout=pol.breaker_reset_s)
+            _registry[provider] = br
+        return br
+
+
+def reset_breakers() -> None:
+    with _registry_lock:
+        _registry.clear()
+
+
+def breaker_stats() -> Dict[str, Dict[str, object]]:
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: br.stats() for name, br in items}
+
+
+__all__ = [
+    "CLOSED",
+    "HALF_OPEN",
+    "OPEN",
+    "CircuitBreaker",
+    "UpstreamUnavailable",
+    "breaker_for",
+    "breaker_stats",
+    "reset_breakers",
+]
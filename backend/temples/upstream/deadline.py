@@ -0,0 +1,67 @@
+# backend/temples/upstream/deadline.py
+"""
+呼び出し全体の締め切り（end-to-end の残り時間）。
+
+with deadline_scope(3.0):
+    ...  # この中の上流呼び出しは remaining() を超えて待たない
+
+入れ子にした場合は短い方が勝つ（外側の残りを内側で延ばすことはできない）。
+contextvars で持つので、copy_context() したスレッドにも引き継がれる。
+"""
+from __future__ import annotations
+
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """締め切りまでに結果が得られなかった。"""
+
+
+class Deadline:
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires_at = math.inf if seconds is None else time.monotonic() + max(0.0, float(seconds))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def shorter(self, seconds: Optional[float]) -> "Deadline":
+        """self と「今から seconds 秒」の早い方。"""
+        other = Deadline(seconds)
+        return self if self.expires_at <= other.expires_at else other
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def effective_deadline(seconds: Optional[float] = None) -> Deadline:
+    """実行中の締め切りと seconds の早い方（どちらも無ければ無期限）。"""
+    outer = _current.get()
+    if outer is None:
+        return Deadline(seconds)
+    return outer.shorter(seconds)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Deadline]:
+    dl = effective_deadline(seconds)
+    token = _current.set(dl)
+    try:
+        yield dl
+    finally:
+        _current.reset(token)
+
+
+__all__ = ["Deadline", "DeadlineExceeded", "current_deadline", "deadline_scope", "effective_deadline"]
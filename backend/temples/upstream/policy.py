@@ -0,0 +1,67 @@
+# backend/temples/upstream/policy.py
+"""
+上流（Google Places / Geocoding / ルーティング / Nominatim / LLM）ごとの呼び出し方針。
+
+既定値はここに置き、settings.UPSTREAM_POLICIES = {"google_places": {"retries": 0}, ...}
+で項目単位に上書きできる。
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field, replace
+from typing import Dict, FrozenSet
+
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class ProviderPolicy:
+    name: str
+    max_connections: int = 8  # プロセス内で同時に張る接続の上限
+    timeout_s: float = 10.0  # 読み取りタイムアウト（呼び出し側が timeout を渡せばそちら）
+    connect_timeout_s: float = 3.0
+    retries: int = 1  # 失敗時の追加試行回数（retry_methods のみ）
+    backoff_base_s: float = 0.2
+    backoff_cap_s: float = 2.0
+    retry_statuses: FrozenSet[int] = field(default_factory=lambda: frozenset({429, 500, 502, 503, 504}))
+    retry_methods: FrozenSet[str] = field(default_factory=lambda: frozenset({"GET", "HEAD"}))
+    breaker_failures: int = 5  # 連続失敗がこの回数に達したら遮断
+    breaker_reset_s: float = 30.0  # 遮断からこの秒数後に 1 本だけ試す
+
+
+_DEFAULTS: Dict[str, ProviderPolicy] = {
+    "google_places": ProviderPolicy("google_places", max_connections=16, timeout_s=8.0, retries=2),
+    "google_geocode": ProviderPolicy(
+        "google_geocode", max_connections=int(os.getenv("GEOCODE_HTTP_POOL", "16")), timeout_s=6.0
+    ),
+    # ORS / OSRM（同時に有効なのはどちらか一方）
+    "routing": ProviderPolicy("routing", max_connections=8, timeout_s=10.0),
+    # 公開 Nominatim は 1 req/s の利用規約なので接続も絞る
+    "nominatim": ProviderPolicy("nominatim", max_connections=2, timeout_s=10.0),
+    # LLM は 1 回が長いので、遮断を早めにして締め切り内で決定的なフォールバックに回す
+    "llm": ProviderPolicy(
+        "llm",
+        max_connections=8,
+        timeout_s=20.0,
+        retries=2,
+        backoff_base_s=0.5,
+        backoff_cap_s=4.0,
+        breaker_failures=3,
+        breaker_reset_s=30.0,
+    ),
+}
+
+
+def policy_for(provider: str) -> ProviderPolicy:
+    base = _DEFAULTS.get(provider) or ProviderPolicy(provider)
+    overrides = (getattr(settings, "UPSTREAM_POLICIES", None) or {}).get(provider) or {}
+    if not overrides:
+        return base
+    known = {k: v for k, v in overrides.items() if k in ProviderPolicy.__dataclass_fields__ and k != "name"}
+    for k in ("retry_statuses", "retry_methods"):
+        if k in known:
+            known[k] = frozenset(known[k])
+    return replace(base, **known)
+
+
+__all__ = ["ProviderPolicy", "policy_for"]
@@ -0,0 +1,27 @@
+# backend/temples/upstream/retry.py
+"""再試行の待ち時間（指数バックオフ + full jitter、Retry-After は上限付きで尊重）。"""
+from __future__ import annotations
+
+import random
+from typing import Optional
+
+from .policy import ProviderPolicy
+
+
+def backoff_delay(attempt: int, policy: ProviderPolicy, *, retry_after: Optional[str] = None) -> float:
+    """attempt は 0 始まり（1 回目の失敗後が 0）。"""
+    cap = policy.backoff_cap_s
+    if retry_after:
+        try:
+            return min(cap, max(0.0, float(retry_after)))
+        except ValueError:
+            pass  # HTTP-date 形式は扱わずバックオフに任せる
+    return random.uniform(0.0, min(cap, policy.backoff_base_s * (2**attempt)))
+
+
+def is_failure_status(status: int) -> bool:
+    """ブレーカの失敗に数えるのは 5xx だけ（4xx は呼び出し側の問題）。"""
+    return status >= 500
+
+
+__all__ = ["backoff_delay", "is_failure_status"]
@@ -0,0 +1,112 @@
+# backend/temples/upstream/sync.py
+"""
+既存の同期呼び出し箇所向けのラッパ。
+
+session(provider) は requests.Session の派生で、get / post などの呼び方はそのまま、
+接続プール・既定タイムアウト・再試行・サーキットブレーカを provider の方針で掛ける。
+transport は requests のままなので、テストの responses モックや req_history はそのまま効く。
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .breaker import UpstreamUnavailable, breaker_for
+from .policy import ProviderPolicy, policy_for
+from .retry import backoff_delay, is_failure_status
+
+log = logging.getLogger(__name__)
+
+
+class UpstreamSession(requests.Session):
+    def __init__(self, policy: ProviderPolicy):
+        super().__init__()
+        self.policy = policy
+        # 接続プールと同じ数だけ同時に出す（超えた分はプールの空きを待つ）
+        self._slots = threading.BoundedSemaphore(max(1, policy.max_connections))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, policy.max_connections))
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    @property
+    def breaker(self):
+        return breaker_for(self.policy.name)
+
+    def request(self, method, url, *args, **kwargs):
+        pol = self.policy
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = (pol.connect_timeout_s, pol.timeout_s)
+        attempts = 1 + (pol.retries if str(method).upper() in pol.retry_methods else 0)
+        err = None
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            breaker = self.breaker
+            # 枠を先に取る。ブレーカを先に通すと、枠待ちで諦めたとき half_open の試行枠が返らない
+            if not self._slots.acquire(timeout=pol.timeout_s):
+                raise UpstreamUnavailable(f"connection slots exhausted: {pol.name}")
+            try:
+                breaker.before_call()
+            except UpstreamUnavailable:
+                self._slots.release()
+                raise
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                if last:
+                    raise
+                err = e
+            except Exception:
+                breaker.release()
+                raise
+            finally:
+                self._slots.release()
+
+            if err is not None:
+                log.info("[upstream] %s %s retry=%d err=%s", pol.name, method, attempt + 1, type(err).__name__)
+                time.sleep(backoff_delay(attempt, pol))
+                err = None
+                continue
+
+            if is_failure_status(resp.status_code):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status_code in pol.retry_statuses and not last:
+                delay = backoff_delay(attempt, pol, retry_after=resp.headers.get("Retry-After"))
+                log.info("[upstream] %s %s status=%d retry=%d", pol.name, method, resp.status_code, attempt + 1)
+                resp.close()
+                time.sleep(delay)
+                continue
+            return resp
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+_sessions: Dict[str, UpstreamSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def session(provider: str) -> UpstreamSession:
+    """provider ごとの共有 Session（プロセスで 1 つ）。"""
+    with _sessions_lock:
+        sess = _sessions.get(provider)
+        if sess is None:
+            sess = UpstreamSession(policy_for(provider))
+            _sessions[provider] = sess
+        return sess
+
+
+def reset_sessions() -> None:
+    with _sessions_lock:
+        for sess in _sessions.values():
+            sess.close()
+        _sessions.clear()
+
+
+__all__ = ["UpstreamSession", "reset_sessions", "session"]
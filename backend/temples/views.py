@@ -20,13 +20,12 @@ from django.views.generic import TemplateView
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from .api.throttles import ScopedCounterThrottle
 from .models import Shrine
-from .route_service import Point as RoutePoint
-from .route_service import build_route
+from .route_service import build_route_from_request
 from .serializers import RouteRequestSerializer, ShrineSerializer
 
 # GeoDjangoシンボルは別名に一本化（mypy競合回避）
@@ -55,7 +54,7 @@ class PopularShrinesView(ListAPIView):
 
     permission_classes = [AllowAny]
     # pytest のときはスロットル無効
-    throttle_classes = [] if getattr(settings, "IS_PYTEST", False) else [ScopedRateThrottle]
+    throttle_classes = [] if getattr(settings, "IS_PYTEST", False) else [ScopedCounterThrottle]
     throttle_scope = "places"
     serializer_class = ShrineSerializer
 
@@ -320,9 +319,7 @@ class RouteAPIView(APIView):
         s.is_valid(raise_exception=True)
         data = s.validated_data
 
-        origin = RoutePoint(**data["origin"])
-        destinations = [RoutePoint(**p) for p in data["destinations"]]
-        result = build_route(data["mode"], origin, destinations)
+        result = build_route_from_request(data)
 
         # Serializer での再検証は省略（クライアント合意のスキーマで返す）
         return Response(result)
@@ -1,14 +1,15 @@
 # backend/temples/views/places.py
 from typing import Optional
 
-from django.http import HttpResponse
+from django.conf import settings
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.throttling import ScopedRateThrottle
 from rest_framework.views import APIView
 
+from temples.api.throttles import ScopedCounterThrottle
 from temples import services
-from temples.services.places import PlacesError
+from temples.services.asset_store import asset_response
+from temples.services.places import PlacesError, places_photo_asset
 
 
 
@@ -46,7 +47,7 @@ class DualScopedThrottleView(APIView):
     settings.REST_FRAMEWORK.DEFAULT_THROTTLE_RATES のキーと一致している必要あり
     """
 
-    throttle_classes = [ScopedRateThrottle, ScopedRateThrottle]
+    throttle_classes = [ScopedCounterThrottle, ScopedCounterThrottle]
     throttle_scope = "places_burst"
 
     def get_throttles(self):
@@ -109,11 +110,8 @@ class PlacesPhotoProxyView(DualScopedThrottleView):
                 return Response({"detail": "photo_reference は必須です"}, status=status.HTTP_400_BAD_REQUEST)
 
             maxwidth = _to_int(request.query_params.get("maxwidth")) or 800
-            content, content_type, max_age = services.places_photo(ref, maxwidth)
-
-            resp = HttpResponse(content, content_type=content_type)
-            resp["Cache-Control"] = f"public, max-age={max_age}"
-            return resp
+            asset = places_photo_asset(ref, maxwidth)
+            return asset_response(request, asset, max_age=settings.PLACE_PHOTO_MAX_AGE)
         except PlacesError as e:
             return Response({"detail": str(e)}, status=e.status or 500)
 